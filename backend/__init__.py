@@ -18,12 +18,16 @@ from .modelos import (
     PreguntaEntrevista, RespuestaEntrevista,
     RequisitoExtraido, RespuestaExtraccionRequisitos,
     ResultadoMatching, RespuestaMatchingCV,
+    ResultadoMatchingLigero, RespuestaMatchingLigera,
     EvaluacionRespuesta,
+    ConsumoLlamada, ConsumoEvaluacion,
     RequirementType, ConfidenceLevel,
     Requirement, Phase1Result, EvaluationResult,
     InterviewQuestion, InterviewResponse,
     RequirementsExtractionResponse, CVMatchingResponse,
+    LeanRequirementMatch, LeanCVMatchingResponse,
     ResponseEvaluation,
+    CallUsage, EvaluationUsage,
 )
 
 from .utilidades import (
@@ -36,6 +40,7 @@ from .utilidades import (
 
 from .nucleo import (
     AnalizadorFase1, Phase1Analyzer,
+    ProcesadorLotesFase1, Phase1BatchProcessor,
     EntrevistadorFase2, Phase2Interviewer, AgenticInterviewer,
     AlmacenVectorialHistorial, HistoryVectorStore,
     AsistenteHistorial, HistoryChatbot,
@@ -46,6 +51,7 @@ from .orquestacion import (
     EstadoFase1, Phase1State,
     crear_grafo_fase1, create_phase1_graph,
     ejecutar_grafo_fase1, run_phase1_graph,
+    aejecutar_grafo_fase1, arun_phase1_graph,
 )
 
 from .infraestructura import (
@@ -56,6 +62,8 @@ from .infraestructura import (
     obtener_modelos_disponibles, get_available_models,
     obtener_modelo_por_defecto, get_default_model,
     configurar_langsmith, configure_langsmith,
+    medir_consumo, measure_usage,
+    obtener_consumo_agregado, get_usage_summary,
     extraer_texto_de_pdf, extract_text_from_pdf,
     extraer_oferta_web, scrape_job_offer_url,
     MemoriaUsuario, UserMemory,
@@ -66,6 +74,7 @@ from .infraestructura import (
 from .recursos import (
     PROMPT_EXTRACCION_REQUISITOS,
     PROMPT_MATCHING_CV,
+    PROMPT_MATCHING_CV_LIGERO,
     PROMPT_EVALUAR_RESPUESTA,
     PROMPT_SISTEMA_AGENTE,
     PROMPT_SALUDO_AGENTE,
@@ -84,16 +93,21 @@ __all__ = [
     "PreguntaEntrevista", "RespuestaEntrevista",
     "RequisitoExtraido", "RespuestaExtraccionRequisitos",
     "ResultadoMatching", "RespuestaMatchingCV",
+    "ResultadoMatchingLigero", "RespuestaMatchingLigera",
     "EvaluacionRespuesta",
+    "ConsumoLlamada", "ConsumoEvaluacion",
     "RequirementType", "ConfidenceLevel",
     "Requirement", "Phase1Result", "EvaluationResult",
     "InterviewQuestion", "InterviewResponse",
     "RequirementsExtractionResponse", "CVMatchingResponse",
+    "LeanRequirementMatch", "LeanCVMatchingResponse",
     "ResponseEvaluation",
+    "CallUsage", "EvaluationUsage",
     "RegistroOperacional", "obtener_registro_operacional",
     "Colores", "Indicadores",
     "calcular_puntuacion", "cargar_archivo_texto",
     "AnalizadorFase1", "Phase1Analyzer",
+    "ProcesadorLotesFase1", "Phase1BatchProcessor",
     "EntrevistadorFase2", "Phase2Interviewer", "AgenticInterviewer",
     "AlmacenVectorialHistorial", "HistoryVectorStore",
     "AsistenteHistorial", "HistoryChatbot",
@@ -101,6 +115,7 @@ __all__ = [
     "EstadoFase1", "Phase1State",
     "crear_grafo_fase1", "create_phase1_graph",
     "ejecutar_grafo_fase1", "run_phase1_graph",
+    "aejecutar_grafo_fase1", "arun_phase1_graph",
     "FabricaLLM", "LLMFactory",
     "FabricaEmbeddings", "EmbeddingFactory",
     "ComparadorSemantico", "SemanticMatcher",
@@ -108,6 +123,8 @@ __all__ = [
     "obtener_modelos_disponibles", "get_available_models",
     "obtener_modelo_por_defecto", "get_default_model",
     "configurar_langsmith", "configure_langsmith",
+    "medir_consumo", "measure_usage",
+    "obtener_consumo_agregado", "get_usage_summary",
     "extraer_texto_de_pdf", "extract_text_from_pdf",
     "extraer_oferta_web", "scrape_job_offer_url",
     "MemoriaUsuario", "UserMemory",
@@ -115,5 +132,6 @@ __all__ = [
     "crear_evaluacion_enriquecida", "create_enriched_evaluation",
     "PROMPT_EXTRACCION_REQUISITOS",
     "PROMPT_MATCHING_CV",
+    "PROMPT_MATCHING_CV_LIGERO",
     "PROMPT_EVALUAR_RESPUESTA",
 ]
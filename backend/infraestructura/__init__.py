@@ -7,6 +7,22 @@ from .llm import (
     configurar_langsmith, configure_langsmith,
     obtener_cliente_langsmith, get_langsmith_client,
     langsmith_habilitado, is_langsmith_enabled,
+    CacheRespuestasLLM, LLMResponseCache,
+    configurar_cache_llm, configure_llm_cache,
+    obtener_cache_llm, get_llm_cache,
+    configurar_cache_embeddings, configure_embedding_cache,
+    obtener_cache_embeddings, get_embedding_cache,
+    configurar_cache_indices_cv, configure_cv_index_cache,
+    obtener_cache_indices_cv, get_cv_index_cache,
+    RegistroClientes, ClientRegistry,
+    obtener_registro_clientes, get_client_registry,
+    LimitesProveedor, ProviderLimits,
+    configurar_limites, configure_limits,
+    PoliticaCobertura, HedgingPolicy,
+    configurar_cobertura, configure_hedging,
+    medir_consumo, measure_usage,
+    obtener_consumo_agregado, get_usage_summary,
+    configurar_proveedor_local, configure_local_stub,
     FabricaEmbeddings, EmbeddingFactory,
     ComparadorSemantico, SemanticMatcher,
     HiperparametrosLLM, LLMHyperparameters,
@@ -37,6 +53,22 @@ __all__ = [
     "configurar_langsmith", "configure_langsmith",
     "obtener_cliente_langsmith", "get_langsmith_client",
     "langsmith_habilitado", "is_langsmith_enabled",
+    "CacheRespuestasLLM", "LLMResponseCache",
+    "configurar_cache_llm", "configure_llm_cache",
+    "obtener_cache_llm", "get_llm_cache",
+    "configurar_cache_embeddings", "configure_embedding_cache",
+    "obtener_cache_embeddings", "get_embedding_cache",
+    "configurar_cache_indices_cv", "configure_cv_index_cache",
+    "obtener_cache_indices_cv", "get_cv_index_cache",
+    "RegistroClientes", "ClientRegistry",
+    "obtener_registro_clientes", "get_client_registry",
+    "LimitesProveedor", "ProviderLimits",
+    "configurar_limites", "configure_limits",
+    "PoliticaCobertura", "HedgingPolicy",
+    "configurar_cobertura", "configure_hedging",
+    "medir_consumo", "measure_usage",
+    "obtener_consumo_agregado", "get_usage_summary",
+    "configurar_proveedor_local", "configure_local_stub",
     "FabricaEmbeddings", "EmbeddingFactory",
     "ComparadorSemantico", "SemanticMatcher",
     "HiperparametrosLLM", "LLMHyperparameters",
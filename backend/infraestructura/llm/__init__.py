@@ -8,11 +8,124 @@ from .llm_proveedor import (
     obtener_cliente_langsmith, get_langsmith_client,
     langsmith_habilitado, is_langsmith_enabled,
 )
+from .cache_respuestas import (
+    CacheRespuestasLLM, LLMResponseCache,
+    configurar_cache_llm, configure_llm_cache,
+    obtener_cache_llm, get_llm_cache,
+    desactivar_cache_llm, disable_llm_cache,
+    calcular_version_prompts, compute_prompts_version,
+)
+from .registro_clientes import (
+    RegistroClientes, ClientRegistry,
+    obtener_registro_clientes, get_client_registry,
+    calcular_huella_api_key, fingerprint_api_key,
+)
+from .limitador_tasa import (
+    LimitesProveedor, ProviderLimits,
+    GobernadorModelo, ModelGovernor,
+    EmbeddingsGobernados, GovernedEmbeddings,
+    obtener_gobernador, get_governor,
+    configurar_limites, configure_limits,
+    obtener_estadisticas_limitador, get_rate_limiter_stats,
+    es_error_saturacion, is_saturation_error,
+)
+from .cobertura import (
+    PoliticaCobertura, HedgingPolicy,
+    RunnableConCobertura, HedgedRunnable,
+    configurar_cobertura, configure_hedging,
+    obtener_politica_cobertura, get_hedging_policy,
+    desactivar_cobertura, disable_hedging,
+    obtener_estadisticas_cobertura, get_hedging_stats,
+)
+from .contabilidad import (
+    ColectorConsumo, UsageCollector,
+    EmbeddingsContabilizados, MeteredEmbeddings,
+    medir_consumo, measure_usage,
+    etiquetar_etapa, tag_stage,
+    registrar_consumo, record_usage,
+    obtener_consumo_agregado, get_usage_summary,
+    reiniciar_consumo_agregado, reset_usage_summary,
+    configurar_precios, configure_prices,
+    calcular_coste, compute_cost,
+)
+from .cache_prompts import (
+    bloques_prefijo, prefix_blocks,
+    texto_contenido, content_text,
+    marcar_prefijos, mark_prefixes,
+    aplicar_cache_prompt, apply_prompt_caching,
+    PROVEEDORES_CACHE_EXPLICITA,
+)
+from .salida_incremental import (
+    ExtractorObjetosJSON, IncrementalJSONObjectExtractor,
+    texto_fragmento, chunk_text,
+    ainvocar_con_elementos, ainvoke_with_items,
+)
+from .proveedor_local import (
+    ChatLocalStub, LocalStubChatModel,
+    EmbeddingsLocalStub, LocalStubEmbeddings,
+    ConfiguracionStub, StubConfig,
+    ErrorProveedorLocal, LocalStubError,
+    configurar_proveedor_local, configure_local_stub,
+    obtener_configuracion_local, get_local_stub_config,
+    PROVEEDOR_LOCAL,
+)
+from .lotes_proveedor import (
+    BackendLotes, BatchBackend,
+    BackendLotesOpenAI, OpenAIBatchBackend,
+    BackendLotesLocal, LocalBatchBackend,
+    RespuestaLote, BatchResponse,
+    construir_peticion_lote, build_batch_request,
+    crear_backend_lotes, create_batch_backend,
+    ESTADO_EN_CURSO, ESTADO_COMPLETADO, ESTADO_FALLIDO, ESTADO_EXPIRADO, DESCUENTO_LOTES,
+)
+from .cache_embeddings import (
+    AlmacenEmbeddings, EmbeddingStore,
+    EmbeddingsCacheados, CachedEmbeddings,
+    configurar_cache_embeddings, configure_embedding_cache,
+    obtener_cache_embeddings, get_embedding_cache,
+    desactivar_cache_embeddings, disable_embedding_cache,
+)
+from .embeddings_locales import (
+    EmbeddingsNgramas, HashingNgramEmbeddings,
+    EmbeddingsSentenceTransformers, SentenceTransformerEmbeddings,
+    crear_embeddings_ngramas, create_ngram_embeddings,
+    PROVEEDOR_EMBEDDINGS_LOCAL, PROVEEDOR_SENTENCE_TRANSFORMERS,
+    SENTENCE_TRANSFORMERS_DISPONIBLE,
+)
+from .busqueda_matryoshka import (
+    IndiceMatryoshka, MatryoshkaIndex,
+    truncar_vectores, truncate_vectors,
+    crear_indice_matryoshka, create_matryoshka_index,
+)
+from .cache_indices_cv import (
+    IndiceCV, CVIndex,
+    CacheIndicesCV, CVIndexCache,
+    calcular_clave_indice_cv, compute_cv_index_key,
+    configurar_cache_indices_cv, configure_cv_index_cache,
+    obtener_cache_indices_cv, get_cv_index_cache,
+    desactivar_cache_indices_cv, disable_cv_index_cache,
+)
+from .indice_matriz import IndiceMatrizCV, CVMatrixIndex, normalizar_filas, normalize_rows
+from .troceado_cv import (
+    FragmentoCV, CVChunk,
+    trocear_cv, chunk_cv,
+)
+from .matriz_similitud import (
+    MatrizSimilitud, SimilarityMatrix,
+)
+from .bm25 import (
+    IndiceBM25, BM25Index,
+    tokenizar, tokenize,
+    fusionar_rrf, reciprocal_rank_fusion,
+    PROVEEDOR_LEXICO,
+)
 from .embedding_proveedor import FabricaEmbeddings, EmbeddingFactory
 from .comparador_semantico import ComparadorSemantico, SemanticMatcher
 from .hiperparametros import (
     HiperparametrosLLM, LLMHyperparameters,
     ConfiguracionHiperparametros, HyperparametersConfig,
+    ModeloEtapa, StageModel,
+    ReglaEscalado, EscalationRule,
 )
 from .configuracion_modelos import (
     ConfiguracionProveedor, ProviderConfig,
@@ -29,10 +142,91 @@ __all__ = [
     "configurar_langsmith", "configure_langsmith",
     "obtener_cliente_langsmith", "get_langsmith_client",
     "langsmith_habilitado", "is_langsmith_enabled",
+    "CacheRespuestasLLM", "LLMResponseCache",
+    "configurar_cache_llm", "configure_llm_cache",
+    "obtener_cache_llm", "get_llm_cache",
+    "desactivar_cache_llm", "disable_llm_cache",
+    "calcular_version_prompts", "compute_prompts_version",
+    "RegistroClientes", "ClientRegistry",
+    "obtener_registro_clientes", "get_client_registry",
+    "calcular_huella_api_key", "fingerprint_api_key",
+    "LimitesProveedor", "ProviderLimits",
+    "GobernadorModelo", "ModelGovernor",
+    "EmbeddingsGobernados", "GovernedEmbeddings",
+    "obtener_gobernador", "get_governor",
+    "configurar_limites", "configure_limits",
+    "obtener_estadisticas_limitador", "get_rate_limiter_stats",
+    "es_error_saturacion", "is_saturation_error",
+    "PoliticaCobertura", "HedgingPolicy",
+    "RunnableConCobertura", "HedgedRunnable",
+    "configurar_cobertura", "configure_hedging",
+    "obtener_politica_cobertura", "get_hedging_policy",
+    "desactivar_cobertura", "disable_hedging",
+    "obtener_estadisticas_cobertura", "get_hedging_stats",
+    "ColectorConsumo", "UsageCollector",
+    "EmbeddingsContabilizados", "MeteredEmbeddings",
+    "medir_consumo", "measure_usage",
+    "etiquetar_etapa", "tag_stage",
+    "registrar_consumo", "record_usage",
+    "obtener_consumo_agregado", "get_usage_summary",
+    "reiniciar_consumo_agregado", "reset_usage_summary",
+    "configurar_precios", "configure_prices",
+    "calcular_coste", "compute_cost",
+    "bloques_prefijo", "prefix_blocks",
+    "texto_contenido", "content_text",
+    "marcar_prefijos", "mark_prefixes",
+    "aplicar_cache_prompt", "apply_prompt_caching",
+    "PROVEEDORES_CACHE_EXPLICITA",
+    "ExtractorObjetosJSON", "IncrementalJSONObjectExtractor",
+    "texto_fragmento", "chunk_text",
+    "ainvocar_con_elementos", "ainvoke_with_items",
+    "ChatLocalStub", "LocalStubChatModel",
+    "EmbeddingsLocalStub", "LocalStubEmbeddings",
+    "ConfiguracionStub", "StubConfig",
+    "ErrorProveedorLocal", "LocalStubError",
+    "configurar_proveedor_local", "configure_local_stub",
+    "BackendLotes", "BatchBackend",
+    "BackendLotesOpenAI", "OpenAIBatchBackend",
+    "BackendLotesLocal", "LocalBatchBackend",
+    "RespuestaLote", "BatchResponse",
+    "construir_peticion_lote", "build_batch_request",
+    "crear_backend_lotes", "create_batch_backend",
+    "ESTADO_EN_CURSO", "ESTADO_COMPLETADO", "ESTADO_FALLIDO", "ESTADO_EXPIRADO", "DESCUENTO_LOTES",
+    "obtener_configuracion_local", "get_local_stub_config",
+    "PROVEEDOR_LOCAL",
+    "AlmacenEmbeddings", "EmbeddingStore",
+    "EmbeddingsCacheados", "CachedEmbeddings",
+    "configurar_cache_embeddings", "configure_embedding_cache",
+    "obtener_cache_embeddings", "get_embedding_cache",
+    "desactivar_cache_embeddings", "disable_embedding_cache",
+    "EmbeddingsNgramas", "HashingNgramEmbeddings",
+    "EmbeddingsSentenceTransformers", "SentenceTransformerEmbeddings",
+    "crear_embeddings_ngramas", "create_ngram_embeddings",
+    "PROVEEDOR_EMBEDDINGS_LOCAL", "PROVEEDOR_SENTENCE_TRANSFORMERS",
+    "SENTENCE_TRANSFORMERS_DISPONIBLE",
+    "IndiceMatryoshka", "MatryoshkaIndex",
+    "truncar_vectores", "truncate_vectors",
+    "crear_indice_matryoshka", "create_matryoshka_index",
+    "IndiceCV", "CVIndex",
+    "CacheIndicesCV", "CVIndexCache",
+    "calcular_clave_indice_cv", "compute_cv_index_key",
+    "configurar_cache_indices_cv", "configure_cv_index_cache",
+    "obtener_cache_indices_cv", "get_cv_index_cache",
+    "desactivar_cache_indices_cv", "disable_cv_index_cache",
+    "IndiceMatrizCV", "CVMatrixIndex", "normalizar_filas", "normalize_rows",
+    "FragmentoCV", "CVChunk",
+    "trocear_cv", "chunk_cv",
+    "MatrizSimilitud", "SimilarityMatrix",
+    "IndiceBM25", "BM25Index",
+    "tokenizar", "tokenize",
+    "fusionar_rrf", "reciprocal_rank_fusion",
+    "PROVEEDOR_LEXICO",
     "FabricaEmbeddings", "EmbeddingFactory",
     "ComparadorSemantico", "SemanticMatcher",
     "HiperparametrosLLM", "LLMHyperparameters",
     "ConfiguracionHiperparametros", "HyperparametersConfig",
+    "ModeloEtapa", "StageModel",
+    "ReglaEscalado", "EscalationRule",
     "ConfiguracionProveedor", "ProviderConfig",
     "obtener_modelos_disponibles", "get_available_models",
     "obtener_modelo_por_defecto", "get_default_model",
@@ -0,0 +1,163 @@
+"""
+Indice lexico BM25 en proceso para los chunks de un CV.
+El tokenizador conserva los tokens tecnicos ("pl/sql", "c++", "c#", "node.js", "k8s") y
+ademas emite sus partes, de modo que "PL/SQL" tambien cuenta para "SQL". Complementa a
+los embeddings (que diluyen esos tokens) y da pistas aunque no haya proveedor de embeddings.
+"""
+
+import json
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+PROVEEDOR_LEXICO = "bm25"
+
+_TOKEN = re.compile(r"\w+(?:[./\-+#][\w+#]*)*")
+_SEPARADORES = re.compile(r"[./\-]")
+
+_PALABRAS_VACIAS = frozenset("""
+a al algo ante con como de del desde durante e el en entre la las lo los o para por que se sin sobre su sus un una unos unas y
+an and as at be by for from in into is of on or the to with
+""".split())
+
+# Formas equivalentes frecuentes en ofertas y CVs: se unifican en documentos y consultas
+_SINONIMOS = {
+    "k8s": "kubernetes",
+    "postgres": "postgresql",
+    "golang": "go",
+    "js": "javascript",
+    "ts": "typescript",
+    "reactjs": "react",
+    "react.js": "react",
+    "nodejs": "node.js",
+    "vuejs": "vue",
+    "vue.js": "vue",
+}
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Tokens en minusculas y sin tildes; los compuestos se emiten enteros y por partes."""
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    normalizado = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    tokens = []
+    for token in _TOKEN.findall(normalizado):
+        token = _SINONIMOS.get(token.rstrip("./-"), token.rstrip("./-"))
+        if not token or token in _PALABRAS_VACIAS:
+            continue
+        tokens.append(token)
+        if _SEPARADORES.search(token):
+            tokens.extend(
+                _SINONIMOS.get(parte, parte) for parte in _SEPARADORES.split(token)
+                if parte and parte not in _PALABRAS_VACIAS
+            )
+    return tokens
+
+
+tokenize = tokenizar
+
+
+class IndiceBM25:
+    """
+    Indice invertido BM25 (Okapi) sobre textos cortos.
+    buscar() devuelve, por consulta, (posicion, score BM25, cobertura), donde cobertura es la
+    fraccion del IDF de los terminos de la consulta presente en el texto (entre 0 y 1).
+    offsets (opcional): (inicio, fin) de cada texto en el documento troceado.
+    """
+    
+    def __init__(
+        self,
+        textos: Sequence[str],
+        k1: float = 1.5,
+        b: float = 0.75,
+        offsets: Optional[Sequence[Tuple[int, int]]] = None
+    ):
+        self.textos: List[str] = list(textos)
+        self.k1 = k1
+        self.b = b
+        self.offsets: Optional[List[Tuple[int, int]]] = [tuple(o) for o in offsets] if offsets is not None else None
+        if self.offsets is not None and len(self.offsets) != len(self.textos):
+            raise ValueError(f"{len(self.offsets)} offsets para {len(self.textos)} textos")
+        
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._longitudes: List[int] = []
+        for posicion, texto in enumerate(self.textos):
+            tokens = tokenizar(texto)
+            self._longitudes.append(len(tokens))
+            for token, frecuencia in Counter(tokens).items():
+                self._postings[token][posicion] = frecuencia
+        self._longitud_media = (sum(self._longitudes) / len(self._longitudes)) if self._longitudes else 0.0
+    
+    def __len__(self) -> int:
+        return len(self.textos)
+    
+    def idf(self, token: str) -> float:
+        documentos = len(self._postings.get(token, ()))
+        return math.log(1 + (len(self.textos) - documentos + 0.5) / (documentos + 0.5))
+    
+    def puntuar(self, consulta: str) -> Tuple[List[float], List[float]]:
+        """Scores BM25 y cobertura de la consulta para cada texto."""
+        scores = [0.0] * len(self.textos)
+        cubierto = [0.0] * len(self.textos)
+        terminos = set(tokenizar(consulta))
+        total_idf = sum(self.idf(t) for t in terminos)
+        for termino in terminos:
+            idf = self.idf(termino)
+            for posicion, frecuencia in self._postings.get(termino, {}).items():
+                normalizacion = 1 - self.b + self.b * self._longitudes[posicion] / (self._longitud_media or 1)
+                scores[posicion] += idf * frecuencia * (self.k1 + 1) / (frecuencia + self.k1 * normalizacion)
+                cubierto[posicion] += idf
+        return scores, [c / total_idf if total_idf else 0.0 for c in cubierto]
+    
+    score = puntuar
+    
+    def buscar(self, consultas: Sequence[str], k: int) -> List[List[Tuple[int, float, float]]]:
+        """Top-k por score BM25 de cada consulta (solo textos con algun termino en comun)."""
+        resultados = []
+        for consulta in consultas:
+            scores, coberturas = self.puntuar(consulta)
+            orden = sorted((p for p in range(len(scores)) if scores[p] > 0), key=lambda p: -scores[p])[:k]
+            resultados.append([(p, scores[p], coberturas[p]) for p in orden])
+        return resultados
+    
+    search = buscar
+    
+    def save_local(self, ruta: str) -> None:
+        """Persiste los textos y offsets (el indice se reconstruye al cargar: es inmediato)."""
+        directorio = Path(ruta)
+        directorio.mkdir(parents=True, exist_ok=True)
+        datos = {"textos": self.textos, "k1": self.k1, "b": self.b, "offsets": self.offsets}
+        (directorio / "bm25.json").write_text(json.dumps(datos, ensure_ascii=False), encoding="utf-8")
+    
+    guardar = save_local
+    
+    @classmethod
+    def load_local(cls, ruta: str) -> "IndiceBM25":
+        datos = json.loads((Path(ruta) / "bm25.json").read_text(encoding="utf-8"))
+        return cls(datos["textos"], k1=datos["k1"], b=datos["b"], offsets=datos.get("offsets"))
+    
+    cargar = load_local
+    
+    @staticmethod
+    def existe(ruta: str) -> bool:
+        return (Path(ruta) / "bm25.json").exists()
+    
+    exists = existe
+
+
+BM25Index = IndiceBM25
+
+
+def fusionar_rrf(rankings: Sequence[Sequence[str]], k: int = 60) -> Dict[str, float]:
+    """Reciprocal rank fusion: suma de 1/(k + rango) de cada elemento en cada ranking."""
+    fusion: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rango, elemento in enumerate(ranking, start=1):
+            fusion[elemento] += 1.0 / (k + rango)
+    return dict(fusion)
+
+
+reciprocal_rank_fusion = fusionar_rrf
@@ -0,0 +1,135 @@
+"""
+Busqueda en dos etapas con embeddings truncados (Matryoshka).
+Los modelos entrenados con Matryoshka (text-embedding-3, text-embedding-004) concentran la
+informacion en las primeras componentes: un prefijo corto renormalizado basta para un
+barrido grueso, y la lista corta se reordena con el vector completo.
+"""
+
+import os
+from typing import Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+
+def truncar_vectores(vectores: np.ndarray, dimensiones: int) -> np.ndarray:
+    """Prefijo de cada vector renormalizado a norma 1 (filas nulas se dejan a cero)."""
+    prefijos = np.array(np.asarray(vectores, dtype=np.float32)[:, :dimensiones], dtype=np.float32)
+    normas = np.linalg.norm(prefijos, axis=1, keepdims=True)
+    np.divide(prefijos, normas, out=prefijos, where=normas > 0)
+    return prefijos
+
+
+truncate_vectors = truncar_vectores
+
+
+class IndiceMatryoshka:
+    """
+    Indice grueso sobre los prefijos de los vectores de un indice FAISS completo.
+    buscar() devuelve lo mismo que index.search() del indice completo (distancias L2 al
+    cuadrado con el vector completo), pero solo lee completos k * factor_candidatos vectores.
+    
+    ids (posicion -> id de documento, p. ej. index_to_docstore_id) permite detectar que el
+    indice completo se ha sustituido aunque tenga el mismo numero de vectores; sin ids se
+    comparan los prefijos de la primera y la ultima fila cubiertas.
+    """
+    
+    def __init__(self, dimensiones_gruesas: int = 64, factor_candidatos: int = 10):
+        if dimensiones_gruesas <= 0:
+            raise ValueError("dimensiones_gruesas debe ser positivo")
+        self.dimensiones_gruesas = dimensiones_gruesas
+        self.factor_candidatos = max(1, factor_candidatos)
+        self._indice: Optional[faiss.IndexFlatL2] = None
+        self._ids_extremos: Optional[Tuple[str, str]] = None
+    
+    @property
+    def ntotal(self) -> int:
+        return self._indice.ntotal if self._indice is not None else 0
+    
+    def metadatos(self, dimensiones_completas: int) -> dict:
+        """Dimensiones de cada etapa, para registrarlas junto al indice."""
+        return {
+            "coarse_dimensions": self.dimensiones_gruesas,
+            "full_dimensions": dimensiones_completas,
+            "coarse_candidates_factor": self.factor_candidatos,
+        }
+    
+    def reiniciar(self) -> None:
+        """Descarta los prefijos (el indice completo se ha reconstruido)."""
+        self._indice = None
+        self._ids_extremos = None
+    
+    reset = reiniciar
+    
+    def _vigente(self, indice_completo: faiss.Index, ids: Optional[Dict[int, str]]) -> bool:
+        """Si los vectores ya cubiertos siguen siendo las primeras filas del indice completo."""
+        cubiertos = self._indice.ntotal
+        if cubiertos > indice_completo.ntotal:
+            return False
+        if cubiertos == 0:
+            return True
+        if ids is not None and self._ids_extremos is not None:
+            return (ids[0], ids[cubiertos - 1]) == self._ids_extremos
+        filas = np.array([0, cubiertos - 1], dtype=np.int64)
+        prefijos = truncar_vectores(indice_completo.reconstruct_batch(filas), self.dimensiones_gruesas)
+        return np.array_equal(prefijos, self._indice.reconstruct_batch(filas))
+    
+    def sincronizar(self, indice_completo: faiss.Index, ids: Optional[Dict[int, str]] = None) -> None:
+        """Anade los prefijos de los vectores nuevos; si el indice completo es otro, los rehace."""
+        if self._indice is None or not self._vigente(indice_completo, ids):
+            self._indice = faiss.IndexFlatL2(min(self.dimensiones_gruesas, indice_completo.d))
+        pendientes = indice_completo.ntotal - self._indice.ntotal
+        if pendientes > 0:
+            vectores = indice_completo.reconstruct_n(self._indice.ntotal, pendientes)
+            self._indice.add(truncar_vectores(vectores, self.dimensiones_gruesas))
+        cubiertos = self._indice.ntotal
+        self._ids_extremos = (ids[0], ids[cubiertos - 1]) if ids is not None and cubiertos else None
+    
+    sync = sincronizar
+    
+    def buscar(
+        self,
+        indice_completo: faiss.Index,
+        consultas: np.ndarray,
+        k: int,
+        ids: Optional[Dict[int, str]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        consultas = np.asarray(consultas, dtype=np.float32)
+        num_candidatos = k * self.factor_candidatos
+        # Sin ventaja si el prefijo no es mas corto o la lista corta cubriria casi todo el indice
+        if self.dimensiones_gruesas >= indice_completo.d or indice_completo.ntotal <= num_candidatos:
+            return indice_completo.search(consultas, k)
+        
+        self.sincronizar(indice_completo, ids)
+        _, candidatos = self._indice.search(truncar_vectores(consultas, self.dimensiones_gruesas), num_candidatos)
+        
+        distancias = np.full((len(consultas), k), np.inf, dtype=np.float32)
+        posiciones = np.full((len(consultas), k), -1, dtype=np.int64)
+        for i, (consulta, fila) in enumerate(zip(consultas, candidatos)):
+            fila = fila[fila != -1]
+            diferencias = indice_completo.reconstruct_batch(fila) - consulta
+            exactas = np.einsum("ij,ij->i", diferencias, diferencias)
+            orden = np.argsort(exactas, kind="stable")[:k]
+            distancias[i, :len(orden)] = exactas[orden]
+            posiciones[i, :len(orden)] = fila[orden]
+        return distancias, posiciones
+    
+    search = buscar
+
+
+MatryoshkaIndex = IndiceMatryoshka
+
+
+def crear_indice_matryoshka(
+    dimensiones_gruesas: Optional[int] = None,
+    factor_candidatos: int = 10
+) -> Optional[IndiceMatryoshka]:
+    """Indice grueso configurado; sin dimensiones usa VELORA_DIMENSIONES_GRUESAS (0 o vacio: desactivado)."""
+    if dimensiones_gruesas is None:
+        dimensiones_gruesas = int(os.getenv("VELORA_DIMENSIONES_GRUESAS", "0") or 0)
+    if dimensiones_gruesas <= 0:
+        return None
+    return IndiceMatryoshka(dimensiones_gruesas, factor_candidatos)
+
+
+create_matryoshka_index = crear_indice_matryoshka
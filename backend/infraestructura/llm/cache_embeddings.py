@@ -0,0 +1,312 @@
+"""
+Cache persistente de embeddings direccionada por contenido.
+La clave combina proveedor, modelo, dimensiones, tipo (documento/consulta) y el texto
+normalizado; el vector se guarda como float32 binario. Solo los fallos llegan a la API.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+from ...modelos import ConsumoLlamada
+from .contabilidad import registrar_consumo
+
+
+TIPO_DOCUMENTO = "documento"
+TIPO_CONSULTA = "consulta"
+
+# SQLite limita los parametros por sentencia; las consultas por lotes se trocean
+_TAMANO_LOTE_SQL = 500
+
+
+def normalizar_texto(texto: str) -> str:
+    """NFC y espacios colapsados: variantes triviales del mismo texto comparten vector."""
+    return " ".join(unicodedata.normalize("NFC", texto).split())
+
+
+normalize_text = normalizar_texto
+
+
+def calcular_clave_embedding(
+    texto: str,
+    proveedor: str,
+    modelo: str,
+    dimensiones: Optional[int],
+    tipo: str = TIPO_DOCUMENTO
+) -> str:
+    contenido = json.dumps([proveedor, modelo, dimensiones, tipo, normalizar_texto(texto)], ensure_ascii=False)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+compute_embedding_key = calcular_clave_embedding
+
+
+def _a_binario(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _desde_binario(datos: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(datos)
+    return vector.tolist()
+
+
+class AlmacenEmbeddings:
+    """
+    Almacen en disco (SQLite, vectores float32) con eviccion LRU acotada por entradas.
+    El ultimo acceso se actualiza en cada lectura, asi que los vectores frecuentes sobreviven.
+    """
+    
+    def __init__(self, ruta: str = "data/cache_embeddings/vectores.sqlite", max_entradas: int = 200_000):
+        self.ruta = Path(ruta)
+        self.max_entradas = max_entradas
+        
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._conexion = sqlite3.connect(str(self.ruta), check_same_thread=False)
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS vectores ("
+            "clave TEXT PRIMARY KEY, vector BLOB NOT NULL, ultimo_acceso REAL NOT NULL)"
+        )
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_acceso ON vectores(ultimo_acceso)")
+        self._conexion.commit()
+    
+    def obtener_lote(self, claves: Sequence[str]) -> Dict[str, List[float]]:
+        """Vectores encontrados para las claves (las ausentes no aparecen en el resultado)."""
+        unicas = list(dict.fromkeys(claves))
+        encontrados: Dict[str, List[float]] = {}
+        ahora = time.time()
+        
+        with self._lock:
+            for i in range(0, len(unicas), _TAMANO_LOTE_SQL):
+                lote = unicas[i:i + _TAMANO_LOTE_SQL]
+                marcadores = ",".join("?" * len(lote))
+                filas = self._conexion.execute(
+                    f"SELECT clave, vector FROM vectores WHERE clave IN ({marcadores})", lote
+                ).fetchall()
+                for clave, datos in filas:
+                    encontrados[clave] = _desde_binario(datos)
+            
+            if encontrados:
+                self._conexion.executemany(
+                    "UPDATE vectores SET ultimo_acceso = ? WHERE clave = ?",
+                    [(ahora, clave) for clave in encontrados]
+                )
+                self._conexion.commit()
+            self.aciertos += len(encontrados)
+            self.fallos += len(unicas) - len(encontrados)
+        return encontrados
+    
+    get_many = obtener_lote
+    
+    def guardar_lote(self, vectores: Dict[str, Sequence[float]]) -> None:
+        if not vectores:
+            return
+        ahora = time.time()
+        with self._lock:
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO vectores (clave, vector, ultimo_acceso) VALUES (?, ?, ?)",
+                [(clave, _a_binario(vector), ahora) for clave, vector in vectores.items()]
+            )
+            self._evictar()
+            self._conexion.commit()
+    
+    put_many = guardar_lote
+    
+    def _evictar(self) -> None:
+        """Elimina las entradas menos usadas hasta cumplir max_entradas."""
+        entradas = self._conexion.execute("SELECT COUNT(*) FROM vectores").fetchone()[0]
+        sobrantes = entradas - self.max_entradas
+        if sobrantes > 0:
+            self._conexion.execute(
+                "DELETE FROM vectores WHERE clave IN "
+                "(SELECT clave FROM vectores ORDER BY ultimo_acceso ASC LIMIT ?)",
+                (sobrantes,)
+            )
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._conexion.execute("DELETE FROM vectores")
+            self._conexion.commit()
+            self.aciertos = 0
+            self.fallos = 0
+    
+    limpiar = clear
+    
+    def estadisticas(self) -> dict:
+        """Contadores de aciertos/fallos (por texto) y ocupacion actual."""
+        with self._lock:
+            entradas, total_bytes = self._conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM vectores"
+            ).fetchone()
+        consultas = self.aciertos + self.fallos
+        return {
+            "hits": self.aciertos,
+            "misses": self.fallos,
+            "hit_rate": self.aciertos / consultas if consultas else 0.0,
+            "entries": entradas,
+            "bytes": total_bytes,
+        }
+    
+    get_stats = estadisticas
+
+
+EmbeddingStore = AlmacenEmbeddings
+
+
+_almacen_embeddings: Optional[AlmacenEmbeddings] = None
+_cache_embeddings_desactivada = False
+
+
+def configurar_cache_embeddings(
+    ruta: str = "data/cache_embeddings/vectores.sqlite",
+    max_entradas: int = 200_000
+) -> AlmacenEmbeddings:
+    """Activa (o reubica) la cache de embeddings del proceso."""
+    global _almacen_embeddings, _cache_embeddings_desactivada
+    _almacen_embeddings = AlmacenEmbeddings(ruta=ruta, max_entradas=max_entradas)
+    _cache_embeddings_desactivada = False
+    return _almacen_embeddings
+
+
+configure_embedding_cache = configurar_cache_embeddings
+
+
+def obtener_cache_embeddings() -> Optional[AlmacenEmbeddings]:
+    """
+    Almacen activo. Activa por defecto en la primera consulta (ruta en VELORA_CACHE_EMBEDDINGS_RUTA);
+    VELORA_CACHE_EMBEDDINGS=0 o desactivar_cache_embeddings() la desactivan.
+    """
+    if _cache_embeddings_desactivada:
+        return None
+    if _almacen_embeddings is None:
+        if os.getenv("VELORA_CACHE_EMBEDDINGS", "1").lower() in ("0", "false", "no"):
+            return None
+        return configurar_cache_embeddings(
+            ruta=os.getenv("VELORA_CACHE_EMBEDDINGS_RUTA", "data/cache_embeddings/vectores.sqlite")
+        )
+    return _almacen_embeddings
+
+
+get_embedding_cache = obtener_cache_embeddings
+
+
+def desactivar_cache_embeddings() -> None:
+    global _almacen_embeddings, _cache_embeddings_desactivada
+    _almacen_embeddings = None
+    _cache_embeddings_desactivada = True
+
+
+disable_embedding_cache = desactivar_cache_embeddings
+
+
+class EmbeddingsCacheados(Embeddings):
+    """
+    Consulta el almacen por lotes y solo envia al modelo los textos que faltan (sin repetidos).
+    Un lote servido entero desde la cache se contabiliza como llamada cacheada.
+    En las variantes asincronas el acceso a SQLite va a un hilo (asyncio.to_thread, que conserva
+    los colectores de consumo) para no bloquear el bucle de eventos.
+    """
+    
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        proveedor: str,
+        modelo: str,
+        dimensiones: Optional[int] = None,
+        almacen: Optional[AlmacenEmbeddings] = None,
+        etapa: str = "embeddings"
+    ):
+        self.embeddings = embeddings
+        self.proveedor = proveedor
+        self.modelo = modelo
+        self.dimensiones = dimensiones
+        self.etapa = etapa
+        self._almacen = almacen
+    
+    def __getattr__(self, nombre: str) -> Any:
+        return getattr(self.__dict__["embeddings"], nombre)
+    
+    @property
+    def almacen(self) -> Optional[AlmacenEmbeddings]:
+        return self._almacen or obtener_cache_embeddings()
+    
+    def _claves(self, textos: List[str], tipo: str) -> List[str]:
+        return [calcular_clave_embedding(t, self.proveedor, self.modelo, self.dimensiones, tipo) for t in textos]
+    
+    def _registrar_acierto(self) -> None:
+        registrar_consumo(ConsumoLlamada(
+            etapa=self.etapa, tipo="embedding", proveedor=self.proveedor, modelo=self.modelo, desde_cache=True
+        ))
+    
+    def _pendientes(self, textos: List[str], claves: List[str], encontrados: Dict[str, List[float]]) -> Dict[str, str]:
+        """clave -> texto de los fallos, sin duplicados y en orden de aparicion."""
+        return {c: t for c, t in zip(claves, textos) if c not in encontrados}
+    
+    def _consultar(self, textos: List[str], tipo: str, almacen: AlmacenEmbeddings) -> tuple:
+        """(claves, encontrados en el almacen, pendientes) de los textos."""
+        claves = self._claves(textos, tipo)
+        encontrados = almacen.obtener_lote(claves)
+        return claves, encontrados, self._pendientes(textos, claves, encontrados)
+    
+    def _completar(
+        self,
+        claves: List[str],
+        encontrados: Dict[str, List[float]],
+        pendientes: Dict[str, str],
+        nuevos: List[List[float]],
+        almacen: AlmacenEmbeddings
+    ) -> List[List[float]]:
+        # Redondeo a float32 tambien en los fallos: el mismo texto da el mismo vector con o sin cache
+        calculados = {clave: _desde_binario(_a_binario(v)) for clave, v in zip(pendientes, nuevos)}
+        almacen.guardar_lote(calculados)
+        if not pendientes:
+            self._registrar_acierto()
+        return [encontrados[c] if c in encontrados else calculados[c] for c in claves]
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        almacen = self.almacen
+        if almacen is None or not texts:
+            return self.embeddings.embed_documents(texts)
+        claves, encontrados, pendientes = self._consultar(texts, TIPO_DOCUMENTO, almacen)
+        nuevos = self.embeddings.embed_documents(list(pendientes.values())) if pendientes else []
+        return self._completar(claves, encontrados, pendientes, nuevos, almacen)
+    
+    def embed_query(self, text: str) -> List[float]:
+        almacen = self.almacen
+        if almacen is None:
+            return self.embeddings.embed_query(text)
+        claves, encontrados, pendientes = self._consultar([text], TIPO_CONSULTA, almacen)
+        nuevos = [self.embeddings.embed_query(text)] if pendientes else []
+        return self._completar(claves, encontrados, pendientes, nuevos, almacen)[0]
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        almacen = await asyncio.to_thread(lambda: self.almacen)
+        if almacen is None or not texts:
+            return await self.embeddings.aembed_documents(texts)
+        claves, encontrados, pendientes = await asyncio.to_thread(self._consultar, texts, TIPO_DOCUMENTO, almacen)
+        nuevos = await self.embeddings.aembed_documents(list(pendientes.values())) if pendientes else []
+        return await asyncio.to_thread(self._completar, claves, encontrados, pendientes, nuevos, almacen)
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        almacen = await asyncio.to_thread(lambda: self.almacen)
+        if almacen is None:
+            return await self.embeddings.aembed_query(text)
+        claves, encontrados, pendientes = await asyncio.to_thread(self._consultar, [text], TIPO_CONSULTA, almacen)
+        nuevos = [await self.embeddings.aembed_query(text)] if pendientes else []
+        return (await asyncio.to_thread(self._completar, claves, encontrados, pendientes, nuevos, almacen))[0]
+
+CachedEmbeddings = EmbeddingsCacheados
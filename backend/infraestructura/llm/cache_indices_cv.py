@@ -0,0 +1,188 @@
+"""
+Cache de indices de CVs (matriz NumPy, FAISS o BM25) direccionada por contenido.
+La clave combina el texto del CV, los parametros de troceado y el identificador del modelo
+de embeddings: el mismo CV evaluado contra varias ofertas se trocea y embebe una sola vez.
+LRU acotado en memoria y, opcionalmente, persistencia en disco (un directorio por indice).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Union
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from .indice_matriz import IndiceMatrizCV
+from .bm25 import IndiceBM25
+
+
+# Indices de CV: matriz NumPy (pocos chunks), vectorstore FAISS o BM25 (sin embeddings)
+IndiceCV = Union[IndiceMatrizCV, FAISS, IndiceBM25]
+CVIndex = IndiceCV
+
+
+def calcular_clave_indice_cv(
+    texto_cv: str,
+    id_modelo: str,
+    tamano_chunk: int,
+    solapamiento: int,
+    version_indice: str
+) -> str:
+    contenido = json.dumps([id_modelo, tamano_chunk, solapamiento, version_indice, texto_cv], ensure_ascii=False)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+compute_cv_index_key = calcular_clave_indice_cv
+
+
+class CacheIndicesCV:
+    """
+    LRU de indices de CV en memoria (max_entradas) con copia opcional en disco (ruta).
+    Los indices se comparten entre evaluaciones: solo se leen, nunca se modifican.
+    """
+    
+    def __init__(self, max_entradas: int = 32, ruta: Optional[str] = None, max_entradas_disco: int = 1000):
+        self.max_entradas = max_entradas
+        self.ruta = Path(ruta) if ruta else None
+        self.max_entradas_disco = max_entradas_disco
+        
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self._indices: "OrderedDict[str, IndiceCV]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        if self.ruta is not None:
+            self.ruta.mkdir(parents=True, exist_ok=True)
+    
+    def _recordar(self, clave: str, indice: IndiceCV) -> None:
+        self._indices[clave] = indice
+        self._indices.move_to_end(clave)
+        while len(self._indices) > self.max_entradas:
+            self._indices.popitem(last=False)
+    
+    def obtener(self, clave: str, embeddings: Embeddings) -> Optional[IndiceCV]:
+        """Indice cacheado (memoria y despues disco) o None."""
+        with self._lock:
+            indice = self._indices.get(clave)
+            if indice is not None:
+                self._indices.move_to_end(clave)
+                self.aciertos_memoria += 1
+                return indice
+        
+        directorio = self.ruta / clave if self.ruta is not None else None
+        if directorio is not None and directorio.exists():
+            try:
+                if IndiceMatrizCV.existe(str(directorio)):
+                    indice = IndiceMatrizCV.load_local(str(directorio))
+                elif IndiceBM25.existe(str(directorio)):
+                    indice = IndiceBM25.load_local(str(directorio))
+                else:
+                    indice = FAISS.load_local(str(directorio), embeddings, allow_dangerous_deserialization=True)
+                os.utime(directorio)
+                with self._lock:
+                    self._recordar(clave, indice)
+                    self.aciertos_disco += 1
+                return indice
+            except Exception:
+                shutil.rmtree(directorio, ignore_errors=True)
+        
+        with self._lock:
+            self.fallos += 1
+        return None
+    
+    get = obtener
+    
+    def guardar(self, clave: str, indice: IndiceCV) -> None:
+        with self._lock:
+            self._recordar(clave, indice)
+        if self.ruta is not None:
+            indice.save_local(str(self.ruta / clave))
+            self._evictar_disco()
+    
+    put = guardar
+    
+    def _evictar_disco(self) -> None:
+        """Borra los directorios usados hace mas tiempo hasta cumplir max_entradas_disco."""
+        directorios = [d for d in self.ruta.iterdir() if d.is_dir()]
+        sobrantes = len(directorios) - self.max_entradas_disco
+        if sobrantes > 0:
+            for directorio in sorted(directorios, key=lambda d: d.stat().st_mtime)[:sobrantes]:
+                shutil.rmtree(directorio, ignore_errors=True)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._indices.clear()
+            self.aciertos_memoria = 0
+            self.aciertos_disco = 0
+            self.fallos = 0
+        if self.ruta is not None:
+            shutil.rmtree(self.ruta, ignore_errors=True)
+            self.ruta.mkdir(parents=True, exist_ok=True)
+    
+    limpiar = clear
+    
+    def estadisticas(self) -> dict:
+        consultas = self.aciertos_memoria + self.aciertos_disco + self.fallos
+        return {
+            "memory_hits": self.aciertos_memoria,
+            "disk_hits": self.aciertos_disco,
+            "misses": self.fallos,
+            "hit_rate": (self.aciertos_memoria + self.aciertos_disco) / consultas if consultas else 0.0,
+            "entries": len(self._indices),
+        }
+    
+    get_stats = estadisticas
+
+
+CVIndexCache = CacheIndicesCV
+
+
+_cache_indices_cv: Optional[CacheIndicesCV] = None
+_cache_indices_cv_desactivada = False
+
+
+def configurar_cache_indices_cv(
+    max_entradas: int = 32,
+    ruta: Optional[str] = None,
+    max_entradas_disco: int = 1000
+) -> CacheIndicesCV:
+    """Activa (o reconfigura) la cache de indices de CV del proceso; con ruta tambien persiste en disco."""
+    global _cache_indices_cv, _cache_indices_cv_desactivada
+    _cache_indices_cv = CacheIndicesCV(max_entradas=max_entradas, ruta=ruta, max_entradas_disco=max_entradas_disco)
+    _cache_indices_cv_desactivada = False
+    return _cache_indices_cv
+
+
+configure_cv_index_cache = configurar_cache_indices_cv
+
+
+def obtener_cache_indices_cv() -> Optional[CacheIndicesCV]:
+    """
+    Cache activa. En memoria por defecto (VELORA_CACHE_INDICES_CV=0 la desactiva);
+    VELORA_CACHE_INDICES_CV_RUTA anade la copia en disco.
+    """
+    if _cache_indices_cv_desactivada:
+        return None
+    if _cache_indices_cv is None:
+        if os.getenv("VELORA_CACHE_INDICES_CV", "1").lower() in ("0", "false", "no"):
+            return None
+        return configurar_cache_indices_cv(ruta=os.getenv("VELORA_CACHE_INDICES_CV_RUTA") or None)
+    return _cache_indices_cv
+
+
+get_cv_index_cache = obtener_cache_indices_cv
+
+
+def desactivar_cache_indices_cv() -> None:
+    global _cache_indices_cv, _cache_indices_cv_desactivada
+    _cache_indices_cv = None
+    _cache_indices_cv_desactivada = True
+
+
+disable_cv_index_cache = desactivar_cache_indices_cv
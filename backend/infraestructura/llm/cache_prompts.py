@@ -0,0 +1,86 @@
+"""
+Cache de prefijos de prompt en el proveedor.
+Los prompts se ordenan de lo estable a lo variable (sistema -> requisitos -> CV) para que
+llamadas consecutivas compartan prefijo. OpenAI y Gemini reutilizan prefijos de forma
+automatica; Anthropic necesita puntos de corte explicitos (cache_control), que se anaden
+aqui justo antes del modelo para que el prompt siga siendo valido en cualquier proveedor.
+"""
+
+from typing import Any, List, Optional, Union
+
+from langchain_core.messages import BaseMessage
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableLambda
+
+
+PROVEEDORES_CACHE_EXPLICITA = frozenset({"anthropic"})
+CONTROL_CACHE = {"type": "ephemeral"}
+
+
+def bloques_prefijo(prefijo: str, sufijo: str) -> List[dict]:
+    """Contenido de mensaje en dos bloques: prefijo estable y sufijo variable."""
+    return [{"type": "text", "text": prefijo}, {"type": "text", "text": sufijo}]
+
+
+prefix_blocks = bloques_prefijo
+
+
+def texto_contenido(contenido: Union[str, list]) -> str:
+    """Texto de un mensaje, tanto si es una cadena como una lista de bloques."""
+    if isinstance(contenido, str):
+        return contenido
+    return "".join(
+        bloque if isinstance(bloque, str) else bloque.get("text", "")
+        for bloque in contenido
+        if isinstance(bloque, str) or bloque.get("type") == "text"
+    )
+
+
+content_text = texto_contenido
+
+
+def _con_punto_de_corte(contenido: Union[str, list], indice: int) -> list:
+    bloques = [{"type": "text", "text": contenido}] if isinstance(contenido, str) else list(contenido)
+    bloques[indice] = {**bloques[indice], "cache_control": CONTROL_CACHE}
+    return bloques
+
+
+def marcar_prefijos(mensajes: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Puntos de corte al final del mensaje de sistema y del prefijo del ultimo mensaje humano
+    (su penultimo bloque). Dos como maximo: Anthropic admite cuatro por peticion.
+    """
+    marcados = list(mensajes)
+    for i, mensaje in enumerate(marcados):
+        if mensaje.type == "system" and mensaje.content:
+            marcados[i] = mensaje.model_copy(update={"content": _con_punto_de_corte(mensaje.content, -1)})
+            break
+    
+    for i in range(len(marcados) - 1, -1, -1):
+        mensaje = marcados[i]
+        if mensaje.type == "human":
+            if isinstance(mensaje.content, list) and len(mensaje.content) > 1:
+                marcados[i] = mensaje.model_copy(update={"content": _con_punto_de_corte(mensaje.content, -2)})
+            break
+    return marcados
+
+
+mark_prefixes = marcar_prefijos
+
+
+def _marcar_entrada(entrada: Any) -> Any:
+    if isinstance(entrada, PromptValue):
+        return marcar_prefijos(entrada.to_messages())
+    if isinstance(entrada, list) and all(isinstance(m, BaseMessage) for m in entrada):
+        return marcar_prefijos(entrada)
+    return entrada
+
+
+def aplicar_cache_prompt(runnable: Runnable, proveedor: Optional[str]) -> Runnable:
+    """Marca el prefijo cacheable de la entrada si el proveedor lo requiere; si no, devuelve el runnable tal cual."""
+    if (proveedor or "openai").lower() not in PROVEEDORES_CACHE_EXPLICITA:
+        return runnable
+    return RunnableLambda(_marcar_entrada, name="marcar_cache_prompt") | runnable
+
+
+apply_prompt_caching = aplicar_cache_prompt
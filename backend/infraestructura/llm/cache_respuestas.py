@@ -0,0 +1,232 @@
+"""
+Cache de respuestas LLM: almacenamiento en disco direccionado por contenido.
+Evita repetir llamadas estructuradas identicas (reruns de Streamlit, re-evaluaciones).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from ...recursos import prompts as _modulo_prompts
+
+
+MARCA_CACHE = "velora_cache"
+
+# Solo las llamadas con Structured Output son deterministas y reutilizables
+_MARCADORES_SALIDA_ESTRUCTURADA = ("ls_structured_output_format", "'tools'", "response_format")
+
+
+def calcular_version_prompts() -> str:
+    """Hash de todos los prompts del sistema. Cambia si se edita cualquier prompt."""
+    textos = [
+        f"{nombre}={valor}"
+        for nombre, valor in sorted(vars(_modulo_prompts).items())
+        if nombre.startswith("PROMPT_") and isinstance(valor, str)
+    ]
+    return hashlib.sha256("\n".join(textos).encode("utf-8")).hexdigest()[:16]
+
+
+compute_prompts_version = calcular_version_prompts
+
+
+class CacheRespuestasLLM(BaseCache):
+    """
+    Cache persistente para LangChain con eviccion LRU acotada por entradas, bytes y TTL.
+    
+    La clave combina el llm_string de LangChain (proveedor, modelo, temperatura y
+    esquema de salida), el texto completo del prompt y la version de los prompts.
+    """
+    
+    def __init__(
+        self,
+        ruta: str = "data/cache_llm/respuestas.sqlite",
+        max_entradas: int = 2000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_segundos: Optional[float] = 7 * 24 * 3600,
+        version_prompts: Optional[str] = None,
+        solo_salida_estructurada: bool = True
+    ):
+        self.ruta = Path(ruta)
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.ttl_segundos = ttl_segundos
+        self.version_prompts = version_prompts or calcular_version_prompts()
+        self.solo_salida_estructurada = solo_salida_estructurada
+        
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._conexion = sqlite3.connect(str(self.ruta), check_same_thread=False)
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS respuestas ("
+            "clave TEXT PRIMARY KEY, valor TEXT NOT NULL, bytes INTEGER NOT NULL, "
+            "creado REAL NOT NULL, ultimo_acceso REAL NOT NULL)"
+        )
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_acceso ON respuestas(ultimo_acceso)")
+        self._conexion.commit()
+    
+    def _es_cacheable(self, llm_string: str) -> bool:
+        if not self.solo_salida_estructurada:
+            return True
+        return any(marcador in llm_string for marcador in _MARCADORES_SALIDA_ESTRUCTURADA)
+    
+    def _calcular_clave(self, prompt: str, llm_string: str) -> str:
+        contenido = json.dumps([self.version_prompts, llm_string, prompt], ensure_ascii=False)
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+    
+    def _expirada(self, creado: float, ahora: float) -> bool:
+        return self.ttl_segundos is not None and ahora - creado > self.ttl_segundos
+    
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        if not self._es_cacheable(llm_string):
+            return None
+        
+        clave = self._calcular_clave(prompt, llm_string)
+        ahora = time.time()
+        
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT valor, creado FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            
+            if fila is None or self._expirada(fila[1], ahora):
+                if fila is not None:
+                    self._conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                    self._conexion.commit()
+                self.fallos += 1
+                return None
+            
+            self._conexion.execute("UPDATE respuestas SET ultimo_acceso = ? WHERE clave = ?", (ahora, clave))
+            self._conexion.commit()
+            self.aciertos += 1
+        
+        try:
+            generaciones = [loads(texto, allowed_objects="core") for texto in json.loads(fila[0])]
+        except Exception:
+            return None
+        
+        for generacion in generaciones:
+            generacion.generation_info = {**(generacion.generation_info or {}), MARCA_CACHE: True}
+        return generaciones
+    
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if not self._es_cacheable(llm_string):
+            return
+        
+        try:
+            valor = json.dumps([dumps(generacion) for generacion in return_val])
+        except Exception:
+            return
+        
+        clave = self._calcular_clave(prompt, llm_string)
+        ahora = time.time()
+        
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, valor, bytes, creado, ultimo_acceso) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (clave, valor, len(valor.encode("utf-8")), ahora, ahora)
+            )
+            self._evictar(ahora)
+            self._conexion.commit()
+    
+    def _evictar(self, ahora: float) -> None:
+        """Elimina entradas expiradas y despues las menos usadas hasta cumplir los limites."""
+        if self.ttl_segundos is not None:
+            self._conexion.execute("DELETE FROM respuestas WHERE creado < ?", (ahora - self.ttl_segundos,))
+        
+        entradas, total_bytes = self._conexion.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM respuestas"
+        ).fetchone()
+        
+        while entradas > self.max_entradas or total_bytes > self.max_bytes:
+            fila = self._conexion.execute(
+                "SELECT clave, bytes FROM respuestas ORDER BY ultimo_acceso ASC LIMIT 1"
+            ).fetchone()
+            if fila is None:
+                break
+            self._conexion.execute("DELETE FROM respuestas WHERE clave = ?", (fila[0],))
+            entradas -= 1
+            total_bytes -= fila[1]
+    
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._conexion.execute("DELETE FROM respuestas")
+            self._conexion.commit()
+            self.aciertos = 0
+            self.fallos = 0
+    
+    limpiar = clear
+    
+    def estadisticas(self) -> dict:
+        """Contadores de aciertos/fallos y ocupacion actual."""
+        with self._lock:
+            entradas, total_bytes = self._conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM respuestas"
+            ).fetchone()
+        consultas = self.aciertos + self.fallos
+        return {
+            "hits": self.aciertos,
+            "misses": self.fallos,
+            "hit_rate": self.aciertos / consultas if consultas else 0.0,
+            "entries": entradas,
+            "bytes": total_bytes,
+            "prompts_version": self.version_prompts,
+        }
+    
+    get_stats = estadisticas
+
+
+LLMResponseCache = CacheRespuestasLLM
+
+
+_cache_llm: Optional[CacheRespuestasLLM] = None
+
+
+def configurar_cache_llm(
+    ruta: str = "data/cache_llm/respuestas.sqlite",
+    max_entradas: int = 2000,
+    max_bytes: int = 64 * 1024 * 1024,
+    ttl_segundos: Optional[float] = 7 * 24 * 3600
+) -> CacheRespuestasLLM:
+    """Activa la cache de respuestas para los LLMs creados a partir de ahora."""
+    global _cache_llm
+    _cache_llm = CacheRespuestasLLM(
+        ruta=ruta,
+        max_entradas=max_entradas,
+        max_bytes=max_bytes,
+        ttl_segundos=ttl_segundos
+    )
+    return _cache_llm
+
+
+configure_llm_cache = configurar_cache_llm
+
+
+def obtener_cache_llm() -> Optional[CacheRespuestasLLM]:
+    """Cache activa o None. Se activa tambien con VELORA_CACHE_LLM=1."""
+    if _cache_llm is None and os.getenv("VELORA_CACHE_LLM", "").lower() in ("1", "true", "yes"):
+        return configurar_cache_llm(ruta=os.getenv("VELORA_CACHE_LLM_RUTA", "data/cache_llm/respuestas.sqlite"))
+    return _cache_llm
+
+
+get_llm_cache = obtener_cache_llm
+
+
+def desactivar_cache_llm() -> None:
+    global _cache_llm
+    _cache_llm = None
+
+
+disable_llm_cache = desactivar_cache_llm
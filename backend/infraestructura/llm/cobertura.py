@@ -0,0 +1,277 @@
+"""
+Cobertura de latencia (hedged requests) para llamadas estructuradas.
+Si el modelo primario no responde dentro del presupuesto (percentil de su historial),
+se lanza la misma peticion a un proveedor secundario y gana la primera respuesta valida.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+@dataclass(frozen=True)
+class PoliticaCobertura:
+    """Cuando lanzar la peticion de cobertura y contra que proveedor/modelo."""
+    percentil: float = 0.9
+    presupuesto_inicial_s: float = 8.0
+    presupuesto_minimo_s: float = 2.0
+    muestras_minimas: int = 20
+    proveedor_secundario: Optional[str] = None
+    modelo_secundario: Optional[str] = None
+
+
+HedgingPolicy = PoliticaCobertura
+
+
+class EstadisticasCobertura:
+    """Historial de latencias del primario y contadores de coberturas."""
+    
+    def __init__(self, ventana: int = 200):
+        self.politica = PoliticaCobertura()
+        self._latencias: deque = deque(maxlen=ventana)
+        self._lock = threading.Lock()
+        self.llamadas = 0
+        self.disparadas = 0
+        self.ganadas = 0
+        self.conmutaciones = 0
+        self.segundos_ahorrados = 0.0
+    
+    def presupuesto(self, politica: PoliticaCobertura) -> float:
+        with self._lock:
+            if len(self._latencias) < politica.muestras_minimas:
+                return politica.presupuesto_inicial_s
+            ordenadas = sorted(self._latencias)
+        indice = min(len(ordenadas) - 1, int(politica.percentil * len(ordenadas)))
+        return max(politica.presupuesto_minimo_s, ordenadas[indice])
+    
+    def registrar_latencia_primario(self, segundos: float) -> None:
+        with self._lock:
+            self._latencias.append(segundos)
+    
+    def registrar_llamada(self) -> None:
+        with self._lock:
+            self.llamadas += 1
+    
+    def registrar_disparo(self) -> None:
+        with self._lock:
+            self.disparadas += 1
+    
+    def registrar_conmutacion(self) -> None:
+        with self._lock:
+            self.conmutaciones += 1
+    
+    def registrar_victoria(self, segundos_hasta_respuesta: float) -> None:
+        """
+        El ahorro se estima con la latencia media del primario en los casos
+        en que tardo mas que la respuesta de cobertura (0 si no hay historial).
+        """
+        with self._lock:
+            self.ganadas += 1
+            mas_lentas = [l for l in self._latencias if l > segundos_hasta_respuesta]
+            if mas_lentas:
+                self.segundos_ahorrados += sum(mas_lentas) / len(mas_lentas) - segundos_hasta_respuesta
+    
+    def resumen(self) -> dict:
+        presupuesto = self.presupuesto(self.politica)
+        with self._lock:
+            return {
+                "calls": self.llamadas,
+                "hedges_fired": self.disparadas,
+                "hedges_won": self.ganadas,
+                "failovers": self.conmutaciones,
+                "latency_saved_s": round(self.segundos_ahorrados, 3),
+                "budget_s": round(presupuesto, 3),
+                "samples": len(self._latencias),
+            }
+
+
+HedgingStats = EstadisticasCobertura
+
+
+_bucle: Optional[asyncio.AbstractEventLoop] = None
+_lock_bucle = threading.Lock()
+
+
+def _obtener_bucle() -> asyncio.AbstractEventLoop:
+    """Bucle de eventos propio (hilo daemon) en el que corren las llamadas cubiertas sincronas."""
+    global _bucle
+    with _lock_bucle:
+        if _bucle is None:
+            _bucle = asyncio.new_event_loop()
+            threading.Thread(target=_bucle.run_forever, name="velora-cobertura", daemon=True).start()
+        return _bucle
+
+
+async def _en_contexto(corrutina, contexto: contextvars.Context) -> Any:
+    # La tarea hereda los contextvars del llamante (colectores de consumo, etapa)
+    return await asyncio.get_running_loop().create_task(corrutina, context=contexto)
+
+
+class RunnableConCobertura(Runnable):
+    """
+    Envuelve un runnable estructurado primario con uno secundario de otro proveedor.
+    
+    - Si el primario responde dentro del presupuesto, no hay coste extra.
+    - Si se agota el presupuesto, se lanza el secundario y gana la primera respuesta valida.
+    - Si el primario falla, se conmuta al secundario (failover).
+    La peticion perdedora se cancela. invoke ejecuta ainvoke en un bucle de eventos propio:
+    un hilo no se puede interrumpir, una tarea si.
+    """
+    
+    def __init__(
+        self,
+        primario: Runnable,
+        secundario: Runnable,
+        clave: str,
+        politica: Optional[PoliticaCobertura] = None
+    ):
+        self.primario = primario
+        self.secundario = secundario
+        self.clave = clave
+        self.politica = politica or PoliticaCobertura()
+        self.estadisticas = _obtener_estadisticas(clave)
+        self.estadisticas.politica = self.politica
+    
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        futuro = asyncio.run_coroutine_threadsafe(
+            _en_contexto(self.ainvoke(input, config, **kwargs), contextvars.copy_context()), _obtener_bucle()
+        )
+        try:
+            return futuro.result()
+        except BaseException:
+            # Interrupcion del llamante (o error): ninguna de las dos peticiones sigue en vuelo
+            futuro.cancel()
+            raise
+    
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        self.estadisticas.registrar_llamada()
+        inicio = time.monotonic()
+        presupuesto = self.estadisticas.presupuesto(self.politica)
+        
+        tarea_primaria = asyncio.ensure_future(self.primario.ainvoke(input, config, **kwargs))
+        tareas = [tarea_primaria]
+        try:
+            terminadas, _ = await asyncio.wait({tarea_primaria}, timeout=presupuesto)
+            
+            if terminadas:
+                try:
+                    resultado = tarea_primaria.result()
+                    self.estadisticas.registrar_latencia_primario(time.monotonic() - inicio)
+                    if resultado is not None:
+                        return resultado
+                except Exception as error_primario:
+                    self.estadisticas.registrar_conmutacion()
+                    try:
+                        return await self.secundario.ainvoke(input, config, **kwargs)
+                    except Exception:
+                        raise error_primario
+            
+            self.estadisticas.registrar_disparo()
+            tareas.append(asyncio.ensure_future(self.secundario.ainvoke(input, config, **kwargs)))
+            pendientes = {tarea_primaria: "primario", tareas[1]: "secundario"}
+            errores = []
+            
+            while pendientes:
+                terminadas, _ = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for tarea in terminadas:
+                    origen = pendientes.pop(tarea)
+                    if tarea.exception() is not None:
+                        errores.append(tarea.exception())
+                        continue
+                    resultado = tarea.result()
+                    if resultado is None:
+                        continue
+                    if origen == "secundario":
+                        self.estadisticas.registrar_victoria(time.monotonic() - inicio)
+                    else:
+                        self.estadisticas.registrar_latencia_primario(time.monotonic() - inicio)
+                    return resultado
+            
+            if errores:
+                raise errores[0]
+            return None
+        finally:
+            # Tambien si se cancela al llamante: ninguna peticion creada aqui sigue en vuelo, y se
+            # espera a que terminen de cancelarse para que liberen su hueco del limitador
+            canceladas = [tarea for tarea in tareas if not tarea.done()]
+            for tarea in canceladas:
+                tarea.cancel()
+            if canceladas:
+                await asyncio.wait(canceladas)
+
+
+HedgedRunnable = RunnableConCobertura
+
+
+_estadisticas: Dict[str, EstadisticasCobertura] = {}
+_lock_estadisticas = threading.Lock()
+_politica_cobertura: Optional[PoliticaCobertura] = None
+
+
+def _obtener_estadisticas(clave: str) -> EstadisticasCobertura:
+    with _lock_estadisticas:
+        if clave not in _estadisticas:
+            _estadisticas[clave] = EstadisticasCobertura()
+        return _estadisticas[clave]
+
+
+def configurar_cobertura(
+    percentil: float = 0.9,
+    presupuesto_inicial_s: float = 8.0,
+    presupuesto_minimo_s: float = 2.0,
+    muestras_minimas: int = 20,
+    proveedor_secundario: Optional[str] = None,
+    modelo_secundario: Optional[str] = None
+) -> PoliticaCobertura:
+    """Activa la cobertura para los analizadores creados a partir de ahora."""
+    global _politica_cobertura
+    _politica_cobertura = PoliticaCobertura(
+        percentil=percentil,
+        presupuesto_inicial_s=presupuesto_inicial_s,
+        presupuesto_minimo_s=presupuesto_minimo_s,
+        muestras_minimas=muestras_minimas,
+        proveedor_secundario=proveedor_secundario,
+        modelo_secundario=modelo_secundario
+    )
+    return _politica_cobertura
+
+
+configure_hedging = configurar_cobertura
+
+
+def obtener_politica_cobertura() -> Optional[PoliticaCobertura]:
+    """Politica activa o None. Se activa tambien con VELORA_COBERTURA=1."""
+    if _politica_cobertura is None and os.getenv("VELORA_COBERTURA", "").lower() in ("1", "true", "yes"):
+        return configurar_cobertura(
+            proveedor_secundario=os.getenv("VELORA_COBERTURA_PROVEEDOR") or None,
+            modelo_secundario=os.getenv("VELORA_COBERTURA_MODELO") or None
+        )
+    return _politica_cobertura
+
+
+get_hedging_policy = obtener_politica_cobertura
+
+
+def desactivar_cobertura() -> None:
+    global _politica_cobertura
+    _politica_cobertura = None
+
+
+disable_hedging = desactivar_cobertura
+
+
+def obtener_estadisticas_cobertura() -> Dict[str, dict]:
+    """Coberturas disparadas, ganadas y latencia ahorrada por etapa y par de modelos."""
+    with _lock_estadisticas:
+        elementos = list(_estadisticas.items())
+    return {clave: estadisticas.resumen() for clave, estadisticas in elementos}
+
+
+get_hedging_stats = obtener_estadisticas_cobertura
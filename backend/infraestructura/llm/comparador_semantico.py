@@ -1,14 +1,48 @@
 """
 Comparador Semantico: Embeddings para enriquecer contexto en evaluacion de CV.
-Busqueda vectorial con FAISS. Prioriza comprension global sobre coincidencias literales.
+Busqueda por similitud coseno: matriz NumPy para CVs normales, FAISS para indices grandes.
+Hibrida por defecto: se fusiona con BM25 (tokens tecnicos exactos) mediante reciprocal rank
+fusion; sin proveedor de embeddings la evidencia es solo lexica.
+Prioriza comprension global sobre coincidencias literales.
 """
 
-import re
+import asyncio
+import threading
+import weakref
+from collections import OrderedDict
 from typing import List, Dict, Optional, Tuple
+
+import numpy as np
 from langchain_community.vectorstores import FAISS
 from langchain_core.embeddings import Embeddings
 
 from .embedding_proveedor import FabricaEmbeddings
+from .busqueda_matryoshka import IndiceMatryoshka, crear_indice_matryoshka
+from .cache_indices_cv import IndiceCV, CacheIndicesCV, calcular_clave_indice_cv, obtener_cache_indices_cv
+from .indice_matriz import IndiceMatrizCV, normalizar_filas
+from .bm25 import IndiceBM25, PROVEEDOR_LEXICO, fusionar_rrf
+from .troceado_cv import FragmentoCV, trocear_cv
+from .matriz_similitud import MatrizSimilitud
+
+
+TAMANO_CHUNK = 800
+SOLAPAMIENTO_CHUNK = 150
+# Cambiarla invalida los indices de CV cacheados (algoritmo de troceado o formato del indice)
+VERSION_INDICE = "v5"
+
+# Hasta este tamano el indice es una matriz NumPy (sin docstore, UUIDs ni Documents): se construye
+# mas rapido a cualquier tamano y FAISS solo la alcanza buscando hacia los 200 chunks (benchmarks/indice_cv.py).
+# Un CV da 5-30 chunks: FAISS y la busqueda Matryoshka quedan para documentos mucho mas largos
+MAX_CHUNKS_MATRIZ = 200
+
+# Similitud coseno minima de la evidencia: descarta solo chunks sin relacion (coseno negativo)
+UMBRAL_EVIDENCIA = 0.0
+
+# Candidatos de cada ranking (denso y lexico) que entran en la fusion, por resultado pedido
+FACTOR_FUSION = 3
+
+# Listas de requisitos (ofertas) cuyos vectores se conservan entre evaluaciones
+MAX_OFERTAS_VECTORES = 64
 
 
 class ComparadorSemantico:
@@ -16,20 +50,67 @@ class ComparadorSemantico:
     Comparador semantico que usa embeddings para enriquecer el contexto de evaluacion.
     Los resultados son sugerencias para el LLM, NO restricciones.
     El LLM siempre evalua el CV completo con comprension global.
+    
+    Con dimensiones_gruesas (o VELORA_DIMENSIONES_GRUESAS) las busquedas por lotes en indices FAISS
+    (mas de max_chunks_matriz chunks) hacen un barrido con el prefijo de cada vector y reordenan
+    la lista corta con el vector completo.
+    
+    Los indices de CV se cachean por contenido (texto, troceado y modelo): el mismo CV
+    evaluado contra varias ofertas se trocea y embebe una vez (ver cache_indices_cv).
+    
+    Los vectores de cada lista de requisitos tambien se reutilizan: al cribar muchos CVs contra
+    la misma oferta, los requisitos se embeben una vez (embeber_requisitos) y cada CV solo
+    embebe sus chunks. Las busquedas por lotes aceptan ademas vectores_requisitos precalculados.
+    
+    Sin proveedor (o con "bm25") no se usan embeddings: la evidencia sale solo de BM25 y su
+    score es la cobertura lexica del requisito (fraccion de su IDF presente en el chunk).
+    Con hibrido, la fusion RRF solo decide el orden y el score sigue siendo la similitud coseno;
+    la cobertura lexica se consulta aparte (coberturas_lexicas).
     """
     
-    def __init__(self, proveedor_embeddings: Optional[str] = None, api_key: Optional[str] = None):
-        if proveedor_embeddings and not FabricaEmbeddings.soporta_embeddings(proveedor_embeddings):
-            raise ValueError(f"'{proveedor_embeddings}' no soporta embeddings")
+    def __init__(
+        self,
+        proveedor_embeddings: Optional[str] = None,
+        api_key: Optional[str] = None,
+        dimensiones_gruesas: Optional[int] = None,
+        factor_candidatos: int = 10,
+        cache_indices: Optional[CacheIndicesCV] = None,
+        max_chunks_matriz: int = MAX_CHUNKS_MATRIZ,
+        hibrido: bool = True
+    ):
+        if not proveedor_embeddings or proveedor_embeddings.lower() == PROVEEDOR_LEXICO:
+            self.proveedor = PROVEEDOR_LEXICO
+            self.modelo = PROVEEDOR_LEXICO
+            self.embeddings: Optional[Embeddings] = None
+            self.id_modelo = PROVEEDOR_LEXICO
+        else:
+            if not FabricaEmbeddings.soporta_embeddings(proveedor_embeddings):
+                raise ValueError(f"'{proveedor_embeddings}' no soporta embeddings")
+            self.proveedor = proveedor_embeddings
+            self.modelo = FabricaEmbeddings.obtener_modelo_embedding(proveedor_embeddings)
+            self.embeddings = FabricaEmbeddings.crear_embeddings(proveedor=proveedor_embeddings, api_key=api_key)
+            self.id_modelo = FabricaEmbeddings.obtener_id_modelo(self.embeddings, proveedor_embeddings)
+        self.hibrido = hibrido
+        self.max_chunks_matriz = max_chunks_matriz
+        self._vectorstore: Optional[IndiceCV] = None
+        self._chunks: List[str] = []
         
-        if not proveedor_embeddings:
-            raise ValueError("Se requiere especificar un proveedor de embeddings")
+        busqueda_gruesa = crear_indice_matryoshka(dimensiones_gruesas, factor_candidatos)
+        self.dimensiones_gruesas = busqueda_gruesa.dimensiones_gruesas if busqueda_gruesa else None
+        self.factor_candidatos = factor_candidatos
+        # Un indice grueso por vectorstore (los indices por CV se crean y descartan por evaluacion)
+        self._indices_gruesos: "weakref.WeakKeyDictionary[FAISS, IndiceMatryoshka]" = weakref.WeakKeyDictionary()
         
-        self.proveedor = proveedor_embeddings
-        self.modelo = FabricaEmbeddings.obtener_modelo_embedding(proveedor_embeddings)
-        self.embeddings = FabricaEmbeddings.crear_embeddings(proveedor=proveedor_embeddings, api_key=api_key)
-        self._vectorstore: Optional[FAISS] = None
-        self._chunks: List[str] = []
+        # BM25 de cada indice denso, construido al primer uso (es inmediato) y ligado a su vida
+        self._indices_lexicos: "weakref.WeakKeyDictionary[object, IndiceBM25]" = weakref.WeakKeyDictionary()
+        
+        self._cache_indices = cache_indices
+        # Indexaciones en curso por clave: evaluaciones concurrentes del mismo CV comparten una
+        self._indexando: Dict[str, asyncio.Future] = {}
+        
+        self._vectores_requisitos: "OrderedDict[Tuple[str, ...], np.ndarray]" = OrderedDict()
+        self._lock_vectores = threading.Lock()
+        self._embebiendo: Dict[Tuple[str, ...], asyncio.Future] = {}
     
     @property
     def provider(self):
@@ -39,99 +120,492 @@ class ComparadorSemantico:
     def model(self):
         return self.modelo
     
-    def _dividir_cv_en_chunks(self, texto_cv: str, tamano_chunk: int = 800, solapamiento: int = 150) -> List[str]:
+    @property
+    def solo_lexico(self) -> bool:
+        return self.embeddings is None
+    
+    @property
+    def lexical_only(self) -> bool:
+        return self.solo_lexico
+    
+    @property
+    def cache_indices(self) -> Optional[CacheIndicesCV]:
+        return self._cache_indices or obtener_cache_indices_cv()
+    
+    def _dividir_cv_en_chunks(
+        self,
+        texto_cv: str,
+        tamano_chunk: int = TAMANO_CHUNK,
+        solapamiento: int = SOLAPAMIENTO_CHUNK
+    ) -> List[str]:
         """
         Divide el CV en chunks semanticos amplios para capturar contexto completo.
-        Prioriza secciones naturales del CV sobre division arbitraria.
+        Prioriza secciones naturales del CV sobre division arbitraria (ver troceado_cv).
         """
-        patrones_seccion = [
-            r'\n(?=(?:EXPERIENCIA|FORMACION|EDUCACION|HABILIDADES|SKILLS|IDIOMAS|PROYECTOS|CERTIFICACIONES|PERFIL|RESUMEN))',
-            r'\n(?=[A-ZÁÉÍÓÚÑ]{4,}\s*(?:\n|:))',
-            r'\n{2,}',
-        ]
-        
-        chunks = []
-        texto_actual = texto_cv
-        
-        for patron in patrones_seccion:
-            if len(texto_actual) > tamano_chunk:
-                partes = re.split(patron, texto_actual, flags=re.IGNORECASE)
-                if len(partes) > 1:
-                    chunks.extend([p.strip() for p in partes if p.strip()])
-                    break
-        
-        if not chunks:
-            chunks = self._dividir_por_tamano(texto_cv, tamano_chunk, solapamiento)
+        return [fragmento.texto for fragmento in trocear_cv(texto_cv, tamano_chunk, solapamiento)]
+    
+    def _preparar_fragmentos(self, texto_cv: str) -> List[FragmentoCV]:
+        fragmentos = trocear_cv(texto_cv, TAMANO_CHUNK, SOLAPAMIENTO_CHUNK)
+        return fragmentos or [FragmentoCV(texto_cv, 0, len(texto_cv))]
+    
+    def _preparar_chunks(self, texto_cv: str) -> List[str]:
+        return [fragmento.texto for fragmento in self._preparar_fragmentos(texto_cv)]
+    
+    def _clave_indice(self, texto_cv: str) -> str:
+        return calcular_clave_indice_cv(texto_cv, self.id_modelo, TAMANO_CHUNK, SOLAPAMIENTO_CHUNK, VERSION_INDICE)
+    
+    @staticmethod
+    def _chunks_de_indice(indice: IndiceCV) -> List[str]:
+        if isinstance(indice, (IndiceMatrizCV, IndiceBM25)):
+            return list(indice.textos)
+        return [indice.docstore.search(id_doc).page_content for id_doc in indice.index_to_docstore_id.values()]
+    
+    @staticmethod
+    def _offsets_de_indice(indice: IndiceCV) -> List[Tuple[int, int]]:
+        """(inicio, fin) de cada chunk en el CV, guardados al trocearlo (mismo orden que los chunks)."""
+        if isinstance(indice, (IndiceMatrizCV, IndiceBM25)):
+            offsets = indice.offsets
         else:
-            chunks_finales = []
-            for chunk in chunks:
-                if len(chunk) > tamano_chunk * 2:
-                    chunks_finales.extend(self._dividir_por_tamano(chunk, tamano_chunk, solapamiento))
-                else:
-                    chunks_finales.append(chunk)
-            chunks = chunks_finales
-        
-        return [c for c in chunks if len(c) > 30]
+            metadatos = [indice.docstore.search(id_doc).metadata for id_doc in indice.index_to_docstore_id.values()]
+            offsets = [(m["inicio"], m["fin"]) for m in metadatos] if all("inicio" in m for m in metadatos) else None
+        if offsets is None:
+            raise ValueError("El indice no guarda los offsets de sus chunks (no se creo con crear_indice)")
+        return offsets
     
-    def _dividir_por_tamano(self, texto: str, tamano_chunk: int, solapamiento: int) -> List[str]:
-        chunks = []
-        inicio = 0
-        
-        while inicio < len(texto):
-            fin = inicio + tamano_chunk
-            if fin < len(texto):
-                ultimo_corte = max(
-                    texto.rfind(' ', inicio, fin),
-                    texto.rfind('.', inicio, fin),
-                    texto.rfind('\n', inicio, fin)
-                )
-                if ultimo_corte > inicio:
-                    fin = ultimo_corte + 1
-            
-            chunk = texto[inicio:fin].strip()
-            if chunk:
-                chunks.append(chunk)
-            inicio = fin - solapamiento
-            if inicio < 0:
-                inicio = 0
+    def _construir_indice(
+        self,
+        chunks: List[str],
+        vectores: List[List[float]],
+        offsets: Optional[List[Tuple[int, int]]] = None
+    ) -> IndiceCV:
+        """Matriz NumPy hasta max_chunks_matriz chunks; por encima, FAISS con vectores normalizados."""
+        if len(chunks) <= self.max_chunks_matriz:
+            return IndiceMatrizCV(chunks, np.asarray(vectores, dtype=np.float32), offsets)
+        metadatos = [{"inicio": inicio, "fin": fin} for inicio, fin in offsets] if offsets is not None else None
+        return FAISS.from_embeddings(zip(chunks, vectores), self.embeddings, metadatas=metadatos, normalize_L2=True)
+    
+    def _indexar(self, texto_cv: str) -> IndiceCV:
+        fragmentos = self._preparar_fragmentos(texto_cv)
+        chunks = [fragmento.texto for fragmento in fragmentos]
+        offsets = [(fragmento.inicio, fragmento.fin) for fragmento in fragmentos]
+        if self.solo_lexico:
+            return IndiceBM25(chunks, offsets=offsets)
+        return self._construir_indice(chunks, self.embeddings.embed_documents(chunks), offsets)
+    
+    async def _aindexar(self, texto_cv: str) -> IndiceCV:
+        fragmentos = self._preparar_fragmentos(texto_cv)
+        chunks = [fragmento.texto for fragmento in fragmentos]
+        offsets = [(fragmento.inicio, fragmento.fin) for fragmento in fragmentos]
+        if self.solo_lexico:
+            return IndiceBM25(chunks, offsets=offsets)
+        return self._construir_indice(chunks, await self.embeddings.aembed_documents(chunks), offsets)
+    
+    def _indice_lexico(self, indice: IndiceCV) -> IndiceBM25:
+        if isinstance(indice, IndiceBM25):
+            return indice
+        lexico = self._indices_lexicos.get(indice)
+        if lexico is None:
+            lexico = IndiceBM25(self._chunks_de_indice(indice))
+            self._indices_lexicos[indice] = lexico
+        return lexico
+    
+    def crear_indice(self, texto_cv: str) -> IndiceCV:
+        """Indice del CV (cacheado por contenido) sin guardarlo en la instancia."""
+        cache = self.cache_indices
+        if cache is None:
+            return self._indexar(texto_cv)
         
-        return chunks
+        clave = self._clave_indice(texto_cv)
+        indice = cache.obtener(clave, self.embeddings)
+        if indice is None:
+            indice = self._indexar(texto_cv)
+            cache.guardar(clave, indice)
+        return indice
+    
+    create_index = crear_indice
     
     def indexar_cv(self, texto_cv: str) -> int:
-        """Indexa el CV creando vectorstore temporal. Retorna numero de chunks."""
-        self._chunks = self._dividir_cv_en_chunks(texto_cv)
-        if not self._chunks:
-            self._chunks = [texto_cv]
-        self._vectorstore = FAISS.from_texts(self._chunks, self.embeddings)
+        """Indexa el CV (o reutiliza su indice cacheado). Retorna numero de chunks."""
+        self._vectorstore = self.crear_indice(texto_cv)
+        self._chunks = self._chunks_de_indice(self._vectorstore)
         return len(self._chunks)
     
     index_cv = indexar_cv
     
-    def encontrar_evidencia(self, requisito: str, k: int = 3, umbral_score: float = 0.2) -> List[Tuple[str, float]]:
+    async def _acrear_y_guardar(self, texto_cv: str, clave: str, cache: CacheIndicesCV) -> IndiceCV:
+        indice = await self._aindexar(texto_cv)
+        cache.guardar(clave, indice)
+        return indice
+    
+    async def acrear_indice(self, texto_cv: str) -> IndiceCV:
+        """
+        Crea (o reutiliza de la cache) un indice del CV sin guardarlo en la instancia.
+        Permite evaluaciones concurrentes sobre el mismo comparador.
+        """
+        cache = self.cache_indices
+        if cache is None:
+            return await self._aindexar(texto_cv)
+        
+        clave = self._clave_indice(texto_cv)
+        en_curso = self._indexando.get(clave)
+        if en_curso is None:
+            indice = cache.obtener(clave, self.embeddings)
+            if indice is not None:
+                return indice
+            en_curso = asyncio.ensure_future(self._acrear_y_guardar(texto_cv, clave, cache))
+            self._indexando[clave] = en_curso
+            en_curso.add_done_callback(lambda _: self._indexando.pop(clave, None))
+        # shield: cancelar una evaluacion no cancela la indexacion que esperan las demas
+        return await asyncio.shield(en_curso)
+    
+    acreate_index = acrear_indice
+    
+    async def aindexar_cv(self, texto_cv: str) -> int:
+        """Version asincrona de indexar_cv."""
+        self._vectorstore = await self.acrear_indice(texto_cv)
+        self._chunks = self._chunks_de_indice(self._vectorstore)
+        return len(self._chunks)
+    
+    aindex_cv = aindexar_cv
+    
+    def _vectores_cacheados(self, clave: Tuple[str, ...]) -> Optional[np.ndarray]:
+        with self._lock_vectores:
+            vectores = self._vectores_requisitos.get(clave)
+            if vectores is not None:
+                self._vectores_requisitos.move_to_end(clave)
+            return vectores
+    
+    def _recordar_vectores(self, clave: Tuple[str, ...], vectores: List[List[float]]) -> np.ndarray:
+        matriz = np.asarray(vectores, dtype=np.float32)
+        matriz.setflags(write=False)
+        with self._lock_vectores:
+            self._vectores_requisitos[clave] = matriz
+            self._vectores_requisitos.move_to_end(clave)
+            while len(self._vectores_requisitos) > MAX_OFERTAS_VECTORES:
+                self._vectores_requisitos.popitem(last=False)
+        return matriz
+    
+    def _validar_vectores(self, unicos: List[str], vectores: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Vectores precalculados (una fila por requisito unico) o None si hay que embeber."""
+        if vectores is None or self.solo_lexico:
+            return None
+        vectores = np.asarray(vectores, dtype=np.float32)
+        if vectores.ndim != 2 or len(vectores) != len(unicos):
+            raise ValueError(f"vectores_requisitos tiene forma {vectores.shape} para {len(unicos)} requisitos unicos")
+        return vectores
+    
+    def embeber_requisitos(self, requisitos: List[str]) -> Optional[np.ndarray]:
+        """
+        Vectores (una fila por requisito unico, en orden) de una lista de requisitos, embebidos
+        una vez y reutilizados para cada CV evaluado contra ella. None si es solo lexico.
+        """
+        unicos = tuple(dict.fromkeys(requisitos))
+        if self.solo_lexico or not unicos:
+            return None
+        vectores = self._vectores_cacheados(unicos)
+        if vectores is None:
+            vectores = self._recordar_vectores(unicos, self.embeddings.embed_documents(list(unicos)))
+        return vectores
+    
+    embed_requirements = embeber_requisitos
+    
+    async def _aembeber_y_recordar(self, unicos: Tuple[str, ...]) -> np.ndarray:
+        return self._recordar_vectores(unicos, await self.embeddings.aembed_documents(list(unicos)))
+    
+    async def aembeber_requisitos(self, requisitos: List[str]) -> Optional[np.ndarray]:
+        """Version asincrona de embeber_requisitos: evaluaciones concurrentes comparten la llamada."""
+        unicos = tuple(dict.fromkeys(requisitos))
+        if self.solo_lexico or not unicos:
+            return None
+        vectores = self._vectores_cacheados(unicos)
+        if vectores is not None:
+            return vectores
+        en_curso = self._embebiendo.get(unicos)
+        if en_curso is None:
+            en_curso = asyncio.ensure_future(self._aembeber_y_recordar(unicos))
+            self._embebiendo[unicos] = en_curso
+            en_curso.add_done_callback(lambda _: self._embebiendo.pop(unicos, None))
+        return await asyncio.shield(en_curso)
+    
+    aembed_requirements = aembeber_requisitos
+    
+    def _buscar_faiss(self, vectorstore: FAISS, matriz: np.ndarray, k: int) -> Tuple[np.ndarray, List[List[str]]]:
+        """Similitud coseno y textos desde FAISS (vectores unitarios: coseno = 1 - L2^2 / 2)."""
+        if self.dimensiones_gruesas:
+            indice_grueso = self._indices_gruesos.get(vectorstore)
+            if indice_grueso is None:
+                indice_grueso = IndiceMatryoshka(self.dimensiones_gruesas, self.factor_candidatos)
+                self._indices_gruesos[vectorstore] = indice_grueso
+            distancias, posiciones = indice_grueso.buscar(vectorstore.index, matriz, k, vectorstore.index_to_docstore_id)
+        else:
+            distancias, posiciones = vectorstore.index.search(matriz, k)
+        textos = [
+            [
+                vectorstore.docstore.search(vectorstore.index_to_docstore_id[posicion]).page_content
+                if posicion != -1 else None
+                for posicion in fila
+            ]
+            for fila in posiciones
+        ]
+        return 1 - distancias / 2, textos
+    
+    def _buscar_denso(self, indice: IndiceCV, vectores: List[List[float]], k: int) -> List[List[Tuple[str, float]]]:
+        """Top-k por similitud coseno de cada vector de consulta."""
+        matriz = np.asarray(vectores, dtype=np.float32)
+        if isinstance(indice, IndiceMatrizCV):
+            similitudes, posiciones = indice.buscar(matriz, k)
+            textos = [[indice.textos[posicion] for posicion in fila] for fila in posiciones]
+        else:
+            similitudes, textos = self._buscar_faiss(indice, normalizar_filas(matriz), k)
+        return [
+            [(texto, float(similitud)) for similitud, texto in zip(fila_similitudes, fila_textos) if texto is not None]
+            for fila_similitudes, fila_textos in zip(similitudes, textos)
+        ]
+    
+    def _buscar_lote(
+        self,
+        indice: IndiceCV,
+        requisitos: List[str],
+        vectores: Optional[List[List[float]]],
+        k: int,
+        umbral_score: float
+    ) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        Top-k de todos los requisitos en una sola busqueda matricial (y una pasada BM25 si es
+        hibrida o solo lexica). Score: similitud coseno (cobertura lexica si no hay vectores).
+        """
+        lexica = self.solo_lexico or self.hibrido
+        num_candidatos = k * FACTOR_FUSION if lexica and vectores is not None else k
+        densos = self._buscar_denso(indice, vectores, num_candidatos) if vectores is not None else None
+        lexicos = None
+        if lexica:
+            bm25 = self._indice_lexico(indice)
+            lexicos = [
+                [(posicion, cobertura) for posicion, _, cobertura in fila]
+                for fila in bm25.buscar(requisitos, num_candidatos)
+            ]
+        
+        evidencia = {}
+        for i, requisito in enumerate(requisitos):
+            if densos is None:
+                candidatos = [(bm25.textos[posicion], cobertura) for posicion, cobertura in lexicos[i]]
+            elif lexicos is None:
+                candidatos = densos[i]
+            else:
+                # Los chunks que solo trae BM25 tambien se puntuan con su similitud coseno
+                similitudes = dict(densos[i])
+                solo_lexicos = [posicion for posicion, _ in lexicos[i] if bm25.textos[posicion] not in similitudes]
+                if solo_lexicos:
+                    similitudes.update(zip(
+                        (bm25.textos[posicion] for posicion in solo_lexicos),
+                        self._similitudes_chunks(indice, vectores[i], solo_lexicos)
+                    ))
+                fusion = fusionar_rrf([[t for t, _ in densos[i]], [bm25.textos[posicion] for posicion, _ in lexicos[i]]])
+                candidatos = [(texto, similitudes[texto]) for texto in sorted(fusion, key=lambda t: -fusion[t])]
+            evidencia[requisito] = [(texto, score) for texto, score in candidatos if score >= umbral_score][:k]
+        return evidencia
+    
+    @staticmethod
+    def _similitudes_chunks(indice: IndiceCV, vector: List[float], posiciones: List[int]) -> List[float]:
+        """Similitud coseno de un vector de consulta con los chunks en esas posiciones."""
+        if isinstance(indice, IndiceMatrizCV):
+            filas = indice.matriz[posiciones]
+        else:
+            filas = indice.index.reconstruct_batch(np.asarray(posiciones, dtype=np.int64))
+        return [float(similitud) for similitud in filas @ normalizar_filas(np.asarray(vector, dtype=np.float32))[0]]
+    
+    def _matriz_scores(
+        self,
+        indice: IndiceCV,
+        requisitos: List[str],
+        vectores: Optional[List[List[float]]],
+        num_chunks: int
+    ) -> np.ndarray:
+        """Scores requisito x chunk (mismos que _buscar_lote) en un producto matricial."""
+        scores = None
+        if vectores is not None:
+            if isinstance(indice, IndiceMatrizCV):
+                matriz_chunks = indice.matriz
+            else:
+                matriz_chunks = indice.index.reconstruct_n(0, indice.index.ntotal)
+            scores = normalizar_filas(np.asarray(vectores, dtype=np.float32)) @ matriz_chunks.T
+        elif self.solo_lexico:
+            bm25 = self._indice_lexico(indice)
+            scores = np.array([bm25.puntuar(requisito)[1] for requisito in requisitos], dtype=np.float32)
+        if scores is None:
+            scores = np.zeros((len(requisitos), num_chunks), dtype=np.float32)
+        return scores.reshape(len(requisitos), num_chunks)
+    
+    def encontrar_evidencia(
+        self,
+        requisito: str,
+        k: int = 3,
+        umbral_score: float = UMBRAL_EVIDENCIA,
+        indice: Optional[IndiceCV] = None
+    ) -> List[Tuple[str, float]]:
         """
         Encuentra contexto semantico relevante para un requisito.
-        Umbral bajo (0.2) para capturar evidencia implicita y contextual.
-        Retorna [(texto, score)].
+        Umbral bajo (coseno >= 0) para capturar evidencia implicita y contextual.
+        Retorna [(texto, similitud coseno)].
         """
-        if not self._vectorstore:
+        indice = indice if indice is not None else self._vectorstore
+        if indice is None:
             return []
         
-        resultados = self._vectorstore.similarity_search_with_score(requisito, k=k)
-        evidencia = []
-        for doc, score in resultados:
-            similitud = 1 / (1 + score)
-            if similitud >= umbral_score:
-                evidencia.append((doc.page_content, similitud))
-        return evidencia
+        vectores = None if self.solo_lexico else [self.embeddings.embed_query(requisito)]
+        return self._buscar_lote(indice, [requisito], vectores, k, umbral_score)[requisito]
     
     find_evidence = encontrar_evidencia
     
-    def encontrar_toda_la_evidencia(self, requisitos: List[str], k: int = 3) -> Dict[str, List[Tuple[str, float]]]:
-        """Encuentra contexto para multiples requisitos."""
-        return {req: self.encontrar_evidencia(req, k=k) for req in requisitos}
+    async def aencontrar_evidencia(
+        self,
+        requisito: str,
+        k: int = 3,
+        umbral_score: float = UMBRAL_EVIDENCIA,
+        indice: Optional[IndiceCV] = None
+    ) -> List[Tuple[str, float]]:
+        """Version asincrona de encontrar_evidencia (embedding de la consulta sin bloquear)."""
+        indice = indice if indice is not None else self._vectorstore
+        if indice is None:
+            return []
+        
+        vectores = None if self.solo_lexico else [await self.embeddings.aembed_query(requisito)]
+        return self._buscar_lote(indice, [requisito], vectores, k, umbral_score)[requisito]
+    
+    afind_evidence = aencontrar_evidencia
+    
+    def encontrar_toda_la_evidencia(
+        self,
+        requisitos: List[str],
+        k: int = 3,
+        umbral_score: float = UMBRAL_EVIDENCIA,
+        indice: Optional[IndiceCV] = None,
+        vectores_requisitos: Optional[np.ndarray] = None
+    ) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        Evidencia de todos los requisitos con una unica llamada de embeddings
+        (embed_documents) y una busqueda top-k matricial. Mismos scores que encontrar_evidencia.
+        vectores_requisitos (de embeber_requisitos) evita embeber los requisitos en cada CV;
+        sin ellos se usan los de la ultima vez que se vio la misma lista.
+        """
+        indice = indice if indice is not None else self._vectorstore
+        unicos = list(dict.fromkeys(requisitos))
+        if indice is None or not unicos:
+            return {req: [] for req in unicos}
+        
+        vectores = self._validar_vectores(unicos, vectores_requisitos)
+        if vectores is None:
+            vectores = self.embeber_requisitos(unicos)
+        return self._buscar_lote(indice, unicos, vectores, k, umbral_score)
     
     find_all_evidence = encontrar_toda_la_evidencia
     
+    async def aencontrar_toda_la_evidencia(
+        self,
+        requisitos: List[str],
+        k: int = 3,
+        umbral_score: float = UMBRAL_EVIDENCIA,
+        indice: Optional[IndiceCV] = None,
+        vectores_requisitos: Optional[np.ndarray] = None
+    ) -> Dict[str, List[Tuple[str, float]]]:
+        """Version asincrona de encontrar_toda_la_evidencia."""
+        indice = indice if indice is not None else self._vectorstore
+        unicos = list(dict.fromkeys(requisitos))
+        if indice is None or not unicos:
+            return {req: [] for req in unicos}
+        
+        vectores = self._validar_vectores(unicos, vectores_requisitos)
+        if vectores is None:
+            vectores = await self.aembeber_requisitos(unicos)
+        return self._buscar_lote(indice, unicos, vectores, k, umbral_score)
+    
+    afind_all_evidence = aencontrar_toda_la_evidencia
+    
+    def _evidencia_y_matriz(
+        self,
+        texto_cv: str,
+        indice: IndiceCV,
+        unicos: List[str],
+        vectores: Optional[List[List[float]]],
+        k: int,
+        umbral_score: float
+    ) -> Tuple[Dict[str, List[Tuple[str, float]]], MatrizSimilitud]:
+        offsets = self._offsets_de_indice(indice)
+        matriz = MatrizSimilitud.crear(unicos, self._matriz_scores(indice, unicos, vectores, len(offsets)), offsets)
+        return {req: matriz.evidencia(texto_cv, req, k, umbral_score) for req in unicos}, matriz
+    
+    def encontrar_evidencia_y_matriz(
+        self,
+        texto_cv: str,
+        requisitos: List[str],
+        k: int = 3,
+        umbral_score: float = UMBRAL_EVIDENCIA,
+        indice: Optional[IndiceCV] = None,
+        vectores_requisitos: Optional[np.ndarray] = None
+    ) -> Tuple[Dict[str, List[Tuple[str, float]]], MatrizSimilitud]:
+        """
+        Matriz de similitud requisito x chunk completa y la evidencia top-k que se lee de ella
+        (un producto matricial, o una pasada BM25 si es solo lexico). La evidencia va por score
+        de la matriz, no por la fusion RRF de encontrar_toda_la_evidencia. texto_cv es el CV
+        indexado en indice.
+        """
+        indice = indice if indice is not None else self._vectorstore
+        unicos = list(dict.fromkeys(requisitos))
+        if indice is None:
+            return {req: [] for req in unicos}, MatrizSimilitud.crear(unicos, np.zeros((len(unicos), 0)), [])
+        
+        vectores = self._validar_vectores(unicos, vectores_requisitos)
+        if vectores is None:
+            vectores = self.embeber_requisitos(unicos)
+        return self._evidencia_y_matriz(texto_cv, indice, unicos, vectores, k, umbral_score)
+    
+    find_evidence_and_matrix = encontrar_evidencia_y_matriz
+    
+    async def aencontrar_evidencia_y_matriz(
+        self,
+        texto_cv: str,
+        requisitos: List[str],
+        k: int = 3,
+        umbral_score: float = UMBRAL_EVIDENCIA,
+        indice: Optional[IndiceCV] = None,
+        vectores_requisitos: Optional[np.ndarray] = None
+    ) -> Tuple[Dict[str, List[Tuple[str, float]]], MatrizSimilitud]:
+        """Version asincrona de encontrar_evidencia_y_matriz."""
+        indice = indice if indice is not None else self._vectorstore
+        unicos = list(dict.fromkeys(requisitos))
+        if indice is None:
+            return {req: [] for req in unicos}, MatrizSimilitud.crear(unicos, np.zeros((len(unicos), 0)), [])
+        
+        vectores = self._validar_vectores(unicos, vectores_requisitos)
+        if vectores is None:
+            vectores = await self.aembeber_requisitos(unicos)
+        return self._evidencia_y_matriz(texto_cv, indice, unicos, vectores, k, umbral_score)
+    
+    afind_evidence_and_matrix = aencontrar_evidencia_y_matriz
+    
+    def coberturas_lexicas(
+        self,
+        evidencias: Dict[str, List[Tuple[str, float]]],
+        indice: Optional[IndiceCV] = None
+    ) -> Dict[str, float]:
+        """
+        Cobertura lexica (fraccion del IDF del requisito presente en el chunk) del mejor
+        fragmento de cada requisito. Vacio si la busqueda no es lexica (hibrido=False).
+        """
+        indice = indice if indice is not None else self._vectorstore
+        if indice is None or not (self.solo_lexico or self.hibrido):
+            return {}
+        
+        bm25 = self._indice_lexico(indice)
+        posiciones = {texto: posicion for posicion, texto in enumerate(bm25.textos)}
+        coberturas = {}
+        for requisito, evidencia in evidencias.items():
+            if evidencia and evidencia[0][0] in posiciones:
+                coberturas[requisito] = bm25.puntuar(requisito)[1][posiciones[evidencia[0][0]]]
+        return coberturas
+    
+    lexical_coverages = coberturas_lexicas
+    
     def obtener_mejor_score(self, requisito: str) -> float:
         evidencia = self.encontrar_evidencia(requisito, k=1)
         return evidencia[0][1] if evidencia else 0.0
@@ -139,9 +613,11 @@ class ComparadorSemantico:
     get_best_match_score = obtener_mejor_score
     
     def limpiar(self):
-        """Limpia vectorstore y chunks."""
+        """Limpia vectorstore y chunks (el indice sigue en la cache de indices de CV)."""
         self._vectorstore = None
         self._chunks = []
+        self._indices_gruesos.clear()
+        self._indices_lexicos.clear()
     
     clear = limpiar
 
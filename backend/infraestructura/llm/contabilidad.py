@@ -0,0 +1,360 @@
+"""
+Contabilidad de consumo: tokens, coste y latencia de cada llamada a LLM y embeddings.
+Un manejador global (registrado como hook de LangChain) mide todas las llamadas,
+las acumula por etapa/modelo y las reenvia a los colectores activos de cada evaluacion.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import Runnable
+from langchain_core.tracers.context import register_configure_hook
+
+from ...modelos import ConsumoLlamada, ConsumoEvaluacion
+from ...utilidades import obtener_registro_operacional
+from .cache_respuestas import MARCA_CACHE
+
+
+CLAVE_ETAPA = "velora_etapa"
+ETAPA_DESCONOCIDA = "unassigned"
+
+# USD por millon de tokens (entrada, salida). Aproximados: ajustar con configurar_precios
+PRECIOS_USD_POR_MILLON: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "claude-opus-4-5-20251101": (5.00, 25.00),
+    "claude-sonnet-4-5-20250929": (3.00, 15.00),
+    "claude-sonnet-4-20250514": (3.00, 15.00),
+    "claude-3-5-haiku-20241022": (0.80, 4.00),
+    "text-embedding-3-small": (0.02, 0.0),
+    "models/text-embedding-004": (0.0, 0.0),
+}
+
+
+# Fraccion del precio de entrada que se factura por token leido de la cache de prefijos
+FACTOR_PRECIO_CACHE: Dict[str, float] = {
+    "gpt": 0.5,
+    "gemini": 0.25,
+    "claude": 0.1,
+}
+
+
+def configurar_precios(precios: Dict[str, Tuple[float, float]]) -> None:
+    """Sustituye o amplia la tabla de precios (USD por millon de tokens de entrada/salida)."""
+    PRECIOS_USD_POR_MILLON.update(precios)
+
+
+configure_prices = configurar_precios
+
+
+def calcular_coste(modelo: str, tokens_entrada: int, tokens_salida: int, tokens_cacheados: int = 0) -> float:
+    """Coste en USD; los tokens_cacheados (incluidos en tokens_entrada) se facturan con descuento."""
+    precio = PRECIOS_USD_POR_MILLON.get(modelo)
+    if precio is None:
+        # Versiones con sufijo de fecha (gpt-4o-2024-08-06) usan el precio del modelo base
+        candidatos = [nombre for nombre in PRECIOS_USD_POR_MILLON if modelo.startswith(nombre)]
+        if not candidatos:
+            return 0.0
+        precio = PRECIOS_USD_POR_MILLON[max(candidatos, key=len)]
+    factor = next((f for prefijo, f in FACTOR_PRECIO_CACHE.items() if modelo.startswith(prefijo)), 1.0)
+    entrada_efectiva = tokens_entrada - tokens_cacheados * (1 - factor)
+    return (entrada_efectiva * precio[0] + tokens_salida * precio[1]) / 1_000_000
+
+
+compute_cost = calcular_coste
+
+
+def etiquetar_etapa(runnable: Runnable, etapa: str) -> Runnable:
+    """Marca las llamadas de un runnable con su etapa (metadato que lee el medidor)."""
+    return runnable.with_config(metadata={CLAVE_ETAPA: etapa})
+
+
+tag_stage = etiquetar_etapa
+
+
+class ColectorConsumo(BaseCallbackHandler):
+    """
+    Acumula las llamadas de una evaluacion.
+    Se activa con medir_consumo() o se adjunta como callback de un runnable
+    cuando las llamadas no caben en un unico bloque (p. ej. streaming de la entrevista).
+    """
+    
+    run_inline = True
+    
+    def __init__(self):
+        self._llamadas: List[ConsumoLlamada] = []
+        self._inicios: Dict[UUID, Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+    
+    def agregar(self, llamada: ConsumoLlamada) -> None:
+        with self._lock:
+            self._llamadas.append(llamada)
+    
+    def reiniciar(self) -> None:
+        with self._lock:
+            self._llamadas = []
+    
+    def resumen(self) -> ConsumoEvaluacion:
+        with self._lock:
+            return ConsumoEvaluacion(llamadas=list(self._llamadas))
+    
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[list], *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        self._inicios[run_id] = (time.monotonic(), metadata or {})
+    
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        self._inicios[run_id] = (time.monotonic(), metadata or {})
+    
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        inicio = self._inicios.pop(run_id, None)
+        if inicio is not None:
+            self._registrar(_construir_llamada(response, *inicio))
+    
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._inicios.pop(run_id, None)
+    
+    def _registrar(self, llamada: ConsumoLlamada) -> None:
+        self.agregar(llamada)
+
+
+UsageCollector = ColectorConsumo
+
+
+def _extraer_uso(respuesta: LLMResult) -> Tuple[int, int, int]:
+    """(entrada, salida, entrada leida de la cache de prefijos del proveedor)."""
+    entrada = salida = cacheados = 0
+    for generaciones in respuesta.generations:
+        for generacion in generaciones:
+            metadatos = getattr(getattr(generacion, "message", None), "usage_metadata", None) or {}
+            entrada += metadatos.get("input_tokens", 0)
+            salida += metadatos.get("output_tokens", 0)
+            cacheados += (metadatos.get("input_token_details") or {}).get("cache_read", 0) or 0
+    if entrada or salida:
+        return entrada, salida, cacheados
+    
+    uso = (respuesta.llm_output or {}).get("token_usage") or (respuesta.llm_output or {}).get("usage") or {}
+    if not isinstance(uso, dict):
+        return 0, 0, 0
+    detalles = uso.get("prompt_tokens_details") or {}
+    return (
+        int(uso.get("prompt_tokens") or uso.get("input_tokens") or 0),
+        int(uso.get("completion_tokens") or uso.get("output_tokens") or 0),
+        int(detalles.get("cached_tokens") or uso.get("cache_read_input_tokens") or 0)
+    )
+
+
+def _construir_llamada(respuesta: LLMResult, inicio: float, metadatos: dict) -> ConsumoLlamada:
+    duracion_ms = int((time.monotonic() - inicio) * 1000)
+    cacheada = any(
+        (generacion.generation_info or {}).get(MARCA_CACHE)
+        for generaciones in respuesta.generations
+        for generacion in generaciones
+    )
+    modelo = (
+        metadatos.get("ls_model_name")
+        or (respuesta.llm_output or {}).get("model_name")
+        or (respuesta.llm_output or {}).get("model")
+        or "unknown"
+    )
+    tokens_entrada, tokens_salida, tokens_cacheados = (0, 0, 0) if cacheada else _extraer_uso(respuesta)
+    return ConsumoLlamada(
+        etapa=metadatos.get(CLAVE_ETAPA) or metadatos.get("langgraph_node") or ETAPA_DESCONOCIDA,
+        tipo="llm",
+        proveedor=metadatos.get("ls_provider"),
+        modelo=modelo,
+        tokens_entrada=tokens_entrada,
+        tokens_salida=tokens_salida,
+        tokens_entrada_cacheados=tokens_cacheados,
+        duracion_ms=duracion_ms,
+        coste_usd=calcular_coste(modelo, tokens_entrada, tokens_salida, tokens_cacheados),
+        desde_cache=cacheada
+    )
+
+
+class AgregadoConsumo:
+    """Totales de proceso por (etapa, proveedor, modelo)."""
+    
+    def __init__(self):
+        self._totales: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+        self._lock = threading.Lock()
+    
+    def agregar(self, llamada: ConsumoLlamada) -> None:
+        clave = (llamada.etapa, llamada.proveedor or "", llamada.modelo)
+        with self._lock:
+            totales = self._totales.setdefault(clave, {
+                "calls": 0, "cached_calls": 0, "input_tokens": 0, "cached_input_tokens": 0,
+                "output_tokens": 0, "duration_ms": 0, "cost_usd": 0.0
+            })
+            totales["calls"] += 1
+            totales["cached_calls"] += int(llamada.desde_cache)
+            totales["input_tokens"] += llamada.tokens_entrada
+            totales["cached_input_tokens"] += llamada.tokens_entrada_cacheados
+            totales["output_tokens"] += llamada.tokens_salida
+            totales["duration_ms"] += llamada.duracion_ms
+            totales["cost_usd"] += llamada.coste_usd
+    
+    def consultar(self, agrupar_por: str = "stage") -> Dict[str, Dict[str, float]]:
+        """
+        Agrupa por 'stage', 'model' o 'stage_model'. Incluye latencia media por llamada
+        y la fraccion de tokens de entrada servidos desde la cache de prefijos.
+        """
+        resultado: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            elementos = [(clave, dict(totales)) for clave, totales in self._totales.items()]
+        
+        for (etapa, proveedor, modelo), totales in elementos:
+            nombre_modelo = f"{proveedor}/{modelo}" if proveedor else modelo
+            grupo = {"stage": etapa, "model": nombre_modelo}.get(agrupar_por, f"{etapa}:{nombre_modelo}")
+            acumulado = resultado.setdefault(grupo, dict.fromkeys(totales, 0))
+            for campo, valor in totales.items():
+                acumulado[campo] += valor
+        
+        for acumulado in resultado.values():
+            acumulado["cost_usd"] = round(acumulado["cost_usd"], 6)
+            acumulado["avg_duration_ms"] = round(acumulado["duration_ms"] / acumulado["calls"], 1) if acumulado["calls"] else 0.0
+            acumulado["cached_input_ratio"] = round(acumulado["cached_input_tokens"] / acumulado["input_tokens"], 3) if acumulado["input_tokens"] else 0.0
+        return resultado
+    
+    def reiniciar(self) -> None:
+        with self._lock:
+            self._totales = {}
+
+
+UsageAggregate = AgregadoConsumo
+
+
+_agregado = AgregadoConsumo()
+_colectores_activos: ContextVar[Tuple[ColectorConsumo, ...]] = ContextVar("velora_colectores_consumo", default=())
+
+
+def registrar_consumo(llamada: ConsumoLlamada) -> None:
+    """Anota una llamada en el agregado del proceso y en los colectores activos."""
+    _agregado.agregar(llamada)
+    obtener_registro_operacional().consumo_llamada(
+        etapa=llamada.etapa,
+        modelo=llamada.modelo,
+        tokens_entrada=llamada.tokens_entrada,
+        tokens_salida=llamada.tokens_salida,
+        duracion_ms=llamada.duracion_ms,
+        desde_cache=llamada.desde_cache,
+        tokens_cacheados=llamada.tokens_entrada_cacheados
+    )
+    for colector in _colectores_activos.get():
+        colector.agregar(llamada)
+
+
+record_usage = registrar_consumo
+
+
+class MedidorGlobal(ColectorConsumo):
+    """Mide todas las llamadas de LLM del proceso, se hayan creado o no con FabricaLLM."""
+    
+    def _registrar(self, llamada: ConsumoLlamada) -> None:
+        registrar_consumo(llamada)
+
+
+_medidor_global: ContextVar[Optional[MedidorGlobal]] = ContextVar("velora_medidor_consumo", default=MedidorGlobal())
+register_configure_hook(_medidor_global, inheritable=True)
+
+
+@contextmanager
+def medir_consumo(colector: Optional[ColectorConsumo] = None) -> Iterator[ColectorConsumo]:
+    """
+    Recoge las llamadas hechas dentro del bloque (incluidas tareas y hilos lanzados desde el).
+    Los colectores se anidan: un bloque externo tambien ve las llamadas del interno.
+    """
+    colector = colector or ColectorConsumo()
+    token = _colectores_activos.set(_colectores_activos.get() + (colector,))
+    try:
+        yield colector
+    finally:
+        _colectores_activos.reset(token)
+
+
+measure_usage = medir_consumo
+
+
+def obtener_consumo_agregado(agrupar_por: str = "stage") -> Dict[str, Dict[str, float]]:
+    """Consumo acumulado del proceso agrupado por 'stage', 'model' o 'stage_model'."""
+    return _agregado.consultar(agrupar_por)
+
+
+get_usage_summary = obtener_consumo_agregado
+
+
+def reiniciar_consumo_agregado() -> None:
+    _agregado.reiniciar()
+
+
+reset_usage_summary = reiniciar_consumo_agregado
+
+
+def _estimar_tokens(textos: List[str]) -> int:
+    return max(1, sum(len(texto) for texto in textos) // 4)
+
+
+class EmbeddingsContabilizados(Embeddings):
+    """
+    Mide las llamadas de embeddings. Los SDK no exponen el uso,
+    asi que los tokens se estiman (~4 caracteres por token).
+    """
+    
+    def __init__(self, embeddings: Embeddings, proveedor: str, modelo: str, etapa: str = "embeddings"):
+        self.embeddings = embeddings
+        self.proveedor = proveedor
+        self.modelo = modelo
+        self.etapa = etapa
+    
+    def __getattr__(self, nombre: str) -> Any:
+        return getattr(self.__dict__["embeddings"], nombre)
+    
+    def _registrar(self, textos: List[str], inicio: float) -> None:
+        tokens = _estimar_tokens(textos)
+        registrar_consumo(ConsumoLlamada(
+            etapa=self.etapa,
+            tipo="embedding",
+            proveedor=self.proveedor,
+            modelo=self.modelo,
+            tokens_entrada=tokens,
+            duracion_ms=int((time.monotonic() - inicio) * 1000),
+            coste_usd=calcular_coste(self.modelo, tokens, 0)
+        ))
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        inicio = time.monotonic()
+        vectores = self.embeddings.embed_documents(texts)
+        self._registrar(texts, inicio)
+        return vectores
+    
+    def embed_query(self, text: str) -> List[float]:
+        inicio = time.monotonic()
+        vector = self.embeddings.embed_query(text)
+        self._registrar([text], inicio)
+        return vector
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        inicio = time.monotonic()
+        vectores = await self.embeddings.aembed_documents(texts)
+        self._registrar(texts, inicio)
+        return vectores
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        inicio = time.monotonic()
+        vector = await self.embeddings.aembed_query(text)
+        self._registrar([text], inicio)
+        return vector
+
+
+MeteredEmbeddings = EmbeddingsContabilizados
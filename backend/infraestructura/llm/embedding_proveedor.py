@@ -1,7 +1,8 @@
 """
 Fábrica de Embeddings: Mapeo 1:1 proveedor → modelo de embedding.
 OpenAI → text-embedding-3-small, Google → text-embedding-004
-Anthropic NO ofrece embeddings propios.
+local → n-gramas con hashing en CPU (sin red), sentence-transformers → modelo CPU opcional
+Anthropic NO ofrece embeddings propios (usa el fallback, como mínimo local).
 """
 
 import os
@@ -9,6 +10,18 @@ from typing import Optional, List
 from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 
+from .registro_clientes import obtener_registro_clientes, construir_clave
+from .limitador_tasa import obtener_gobernador, EmbeddingsGobernados
+from .contabilidad import EmbeddingsContabilizados
+from .cache_embeddings import EmbeddingsCacheados
+from .proveedor_local import PROVEEDOR_LOCAL, MODELO_EMBEDDING_LOCAL, EmbeddingsLocalStub, kwargs_embeddings_local
+from .embeddings_locales import (
+    PROVEEDOR_EMBEDDINGS_LOCAL, PROVEEDOR_SENTENCE_TRANSFORMERS,
+    MODELO_NGRAMAS, MODELO_SENTENCE_TRANSFORMERS, DIMENSIONES_NGRAMAS,
+    SENTENCE_TRANSFORMERS_DISPONIBLE, EmbeddingsSentenceTransformers,
+    crear_embeddings_ngramas,
+)
+
 try:
     from langchain_google_genai import GoogleGenerativeAIEmbeddings
     GOOGLE_EMBEDDINGS_DISPONIBLE = True
@@ -20,13 +33,20 @@ except ImportError:
 MAPA_PROVEEDOR_EMBEDDING = {
     "openai": "text-embedding-3-small",
     "google": "models/text-embedding-004",
+    PROVEEDOR_LOCAL: MODELO_EMBEDDING_LOCAL,
+    PROVEEDOR_EMBEDDINGS_LOCAL: MODELO_NGRAMAS,
+    PROVEEDOR_SENTENCE_TRANSFORMERS: MODELO_SENTENCE_TRANSFORMERS,
 }
 
 DIMENSIONES_OPTIMIZADAS = {
     "openai": 512,
     "google": None,
+    PROVEEDOR_EMBEDDINGS_LOCAL: DIMENSIONES_NGRAMAS,
 }
 
+# Proveedores que calculan en CPU local: no necesitan API key ni red
+PROVEEDORES_EMBEDDINGS_LOCALES = [PROVEEDOR_EMBEDDINGS_LOCAL, PROVEEDOR_SENTENCE_TRANSFORMERS]
+
 PROVEEDORES_SIN_EMBEDDINGS = ["anthropic"]
 
 
@@ -38,6 +58,10 @@ class FabricaEmbeddings:
         proveedores = ["openai"]
         if GOOGLE_EMBEDDINGS_DISPONIBLE:
             proveedores.append("google")
+        if SENTENCE_TRANSFORMERS_DISPONIBLE:
+            proveedores.append(PROVEEDOR_SENTENCE_TRANSFORMERS)
+        # El ultimo: el fallback prefiere los proveedores remotos configurados
+        proveedores.append(PROVEEDOR_EMBEDDINGS_LOCAL)
         return proveedores
     
     @staticmethod
@@ -63,6 +87,8 @@ class FabricaEmbeddings:
             return False
         if proveedor_lower == "google" and not GOOGLE_EMBEDDINGS_DISPONIBLE:
             return False
+        if proveedor_lower == PROVEEDOR_SENTENCE_TRANSFORMERS and not SENTENCE_TRANSFORMERS_DISPONIBLE:
+            return False
         return proveedor_lower in MAPA_PROVEEDOR_EMBEDDING
     
     @staticmethod
@@ -94,7 +120,9 @@ class FabricaEmbeddings:
                 - Google: Sin cambios (768 dims por defecto)
         
         Returns:
-            Instancia de Embeddings configurada
+            Instancia de Embeddings configurada (compartida via registro de clientes,
+            sujeta al limitador de tasa del proveedor, con contabilidad de consumo y
+            con cache persistente de vectores: solo los textos nuevos llegan a la API)
         """
         if not proveedor:
             proveedor = "openai"
@@ -104,6 +132,15 @@ class FabricaEmbeddings:
             raise ValueError(f"'{proveedor}' no soporta embeddings. Disponibles: {FabricaEmbeddings.obtener_proveedores_disponibles()}")
         
         modelo_embedding = MAPA_PROVEEDOR_EMBEDDING[proveedor_lower]
+        registro = obtener_registro_clientes()
+        gobernador = obtener_gobernador(proveedor_lower, modelo_embedding)
+        
+        def gobernar(embeddings: Embeddings, dimensiones: Optional[int] = None, modelo: str = modelo_embedding) -> Embeddings:
+            embeddings = EmbeddingsContabilizados(embeddings, proveedor_lower, modelo)
+            if gobernador is not None:
+                embeddings = EmbeddingsGobernados(embeddings, gobernador)
+            # La cache va por fuera: los aciertos no consumen cuota ni cuentan como llamadas a la API
+            return EmbeddingsCacheados(embeddings, proveedor_lower, modelo, dimensiones)
         
         if proveedor_lower == "openai":
             kwargs = {"model": modelo_embedding}
@@ -115,7 +152,10 @@ class FabricaEmbeddings:
             key = api_key or os.getenv("OPENAI_API_KEY")
             if key:
                 kwargs["openai_api_key"] = key
-            return OpenAIEmbeddings(**kwargs)
+            return registro.obtener_o_crear(
+                construir_clave("embeddings", proveedor_lower, kwargs),
+                lambda: gobernar(OpenAIEmbeddings(**kwargs), kwargs.get("dimensions"))
+            )
         
         elif proveedor_lower == "google":
             if not GOOGLE_EMBEDDINGS_DISPONIBLE:
@@ -124,7 +164,32 @@ class FabricaEmbeddings:
             key = api_key or os.getenv("GOOGLE_API_KEY")
             if key:
                 kwargs["google_api_key"] = key
-            return GoogleGenerativeAIEmbeddings(**kwargs)
+            return registro.obtener_o_crear(
+                construir_clave("embeddings", proveedor_lower, kwargs),
+                lambda: gobernar(GoogleGenerativeAIEmbeddings(**kwargs))
+            )
+        
+        elif proveedor_lower == PROVEEDOR_LOCAL:
+            kwargs = kwargs_embeddings_local()
+            return registro.obtener_o_crear(
+                construir_clave("embeddings", proveedor_lower, kwargs),
+                lambda: gobernar(EmbeddingsLocalStub(**kwargs), kwargs["dimensiones"])
+            )
+        
+        elif proveedor_lower == PROVEEDOR_EMBEDDINGS_LOCAL:
+            # Sub-milisegundo por texto: la cache en disco costaria mas que recalcular
+            ngramas = crear_embeddings_ngramas()
+            return registro.obtener_o_crear(
+                construir_clave("embeddings", proveedor_lower, {"model": ngramas.modelo}),
+                lambda: EmbeddingsContabilizados(ngramas, proveedor_lower, ngramas.modelo)
+            )
+        
+        elif proveedor_lower == PROVEEDOR_SENTENCE_TRANSFORMERS:
+            kwargs = {"modelo": modelo_embedding}
+            return registro.obtener_o_crear(
+                construir_clave("embeddings", proveedor_lower, kwargs),
+                lambda: gobernar(EmbeddingsSentenceTransformers(**kwargs))
+            )
         
         raise ValueError(f"Proveedor no válido: {proveedor}")
     
@@ -144,7 +209,9 @@ class FabricaEmbeddings:
             return bool(api_key or os.getenv("OPENAI_API_KEY"))
         elif proveedor_lower == "google":
             return bool(api_key or os.getenv("GOOGLE_API_KEY"))
-        return False
+        if proveedor_lower in PROVEEDORES_EMBEDDINGS_LOCALES:
+            return FabricaEmbeddings.soporta_embeddings(proveedor_lower)
+        return proveedor_lower == PROVEEDOR_LOCAL
     
     @staticmethod
     def validate_api_key(provider: str, api_key: Optional[str] = None) -> bool:
@@ -163,6 +230,20 @@ class FabricaEmbeddings:
     def get_fallback_provider(exclude_provider: Optional[str] = None) -> Optional[str]:
         return FabricaEmbeddings.obtener_proveedor_fallback(exclude_provider)
     
+    @staticmethod
+    def obtener_id_modelo(embeddings: Embeddings, proveedor: str) -> str:
+        """
+        Identificador proveedor/modelo de una instancia creada por la fábrica.
+        Se guarda junto a los índices para no mezclar vectores de modelos distintos.
+        """
+        modelo = getattr(embeddings, "modelo", None) or FabricaEmbeddings.obtener_modelo_embedding(proveedor)
+        dimensiones = getattr(embeddings, "dimensiones", None)
+        return f"{proveedor.lower()}/{modelo}" + (f"@{dimensiones}" if dimensiones else "")
+    
+    @staticmethod
+    def get_model_id(embeddings: Embeddings, provider: str) -> str:
+        return FabricaEmbeddings.obtener_id_modelo(embeddings, provider)
+    
     @staticmethod
     def obtener_dimensiones_optimizadas(proveedor: str) -> Optional[int]:
         """Retorna las dimensiones optimizadas para el proveedor dado."""
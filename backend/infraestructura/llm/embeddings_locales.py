@@ -0,0 +1,180 @@
+"""
+Embeddings locales en CPU, sin red ni API key.
+- local: n-gramas de caracteres (3-5, dentro de cada palabra) y palabras completas, con
+  hashing con signo sobre un vector fijo, TF sublineal, IDF opcional y norma L2. NumPy puro.
+- sentence-transformers: modelo pequeno de frases si la libreria esta instalada (opcional).
+El identificador de modelo incluye version, dimensiones y huella del IDF, de modo que
+caches e indices creados con otra configuracion no se mezclan.
+"""
+
+import hashlib
+import importlib.util
+import os
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Any, Iterable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+PROVEEDOR_EMBEDDINGS_LOCAL = "local"
+PROVEEDOR_SENTENCE_TRANSFORMERS = "sentence-transformers"
+
+VERSION_NGRAMAS = "v1"
+DIMENSIONES_NGRAMAS = 512
+MODELO_NGRAMAS = f"ngram-hash-{VERSION_NGRAMAS}-{DIMENSIONES_NGRAMAS}"
+MODELO_SENTENCE_TRANSFORMERS = "paraphrase-multilingual-MiniLM-L12-v2"
+
+# find_spec no importa el paquete: sentence-transformers arrastra torch y tarda segundos en cargar
+SENTENCE_TRANSFORMERS_DISPONIBLE = importlib.util.find_spec("sentence_transformers") is not None
+
+_PALABRA = re.compile(r"\w+", re.UNICODE)
+
+
+def _normalizar(texto: str) -> str:
+    """Minusculas y sin tildes: 'Gestión' y 'gestion' comparten n-gramas."""
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def _rasgos(texto: str, n_min: int, n_max: int) -> Counter:
+    rasgos: Counter = Counter()
+    for palabra in _PALABRA.findall(_normalizar(texto)):
+        rasgos["w:" + palabra] += 1
+        marcada = f" {palabra} "
+        for n in range(n_min, n_max + 1):
+            for i in range(len(marcada) - n + 1):
+                rasgos[marcada[i:i + n]] += 1
+    return rasgos
+
+
+class EmbeddingsNgramas(Embeddings):
+    """
+    Vectorizador de n-gramas de caracteres con hashing. Determinista y sin estado:
+    el mismo texto produce siempre el mismo vector, asi que es apto para cache e indices.
+    """
+    
+    def __init__(
+        self,
+        dimensiones: int = DIMENSIONES_NGRAMAS,
+        n_min: int = 3,
+        n_max: int = 5,
+        idf: Optional[Sequence[float]] = None
+    ):
+        self.dimensiones = dimensiones
+        self.n_min = n_min
+        self.n_max = n_max
+        self.idf = np.asarray(idf, dtype=np.float32) if idf is not None else None
+        if self.idf is not None and self.idf.shape != (dimensiones,):
+            raise ValueError(f"El IDF debe tener {dimensiones} componentes (tiene {self.idf.shape})")
+    
+    @property
+    def modelo(self) -> str:
+        """Identificador estable de la configuracion (se registra junto a caches e indices)."""
+        nombre = f"ngram-hash-{VERSION_NGRAMAS}-{self.dimensiones}"
+        if (self.n_min, self.n_max) != (3, 5):
+            nombre += f"-n{self.n_min}{self.n_max}"
+        if self.idf is not None:
+            nombre += "-idf" + hashlib.sha256(self.idf.tobytes()).hexdigest()[:8]
+        return nombre
+    
+    def _indices(self, rasgos: Iterable[str]) -> tuple:
+        indices, signos = [], []
+        for rasgo in rasgos:
+            huella = zlib.crc32(rasgo.encode("utf-8"))
+            indices.append(huella % self.dimensiones)
+            signos.append(1.0 if huella & 0x80000000 else -1.0)
+        return np.asarray(indices, dtype=np.int64), np.asarray(signos, dtype=np.float32)
+    
+    def _vector(self, texto: str) -> List[float]:
+        rasgos = _rasgos(texto, self.n_min, self.n_max)
+        if not rasgos:
+            return [0.0] * self.dimensiones
+        indices, signos = self._indices(rasgos)
+        pesos = signos * (1.0 + np.log(np.fromiter(rasgos.values(), dtype=np.float32, count=len(rasgos))))
+        vector = np.bincount(indices, weights=pesos, minlength=self.dimensiones).astype(np.float32)
+        if self.idf is not None:
+            vector *= self.idf
+        norma = float(np.linalg.norm(vector))
+        return (vector / norma if norma else vector).tolist()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(texto) for texto in texts]
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # CPU y sub-milisegundo por texto corto: no compensa delegar en un hilo
+        return self.embed_documents(texts)
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+    
+    @classmethod
+    def ajustar(cls, corpus: Sequence[str], dimensiones: int = DIMENSIONES_NGRAMAS, n_min: int = 3, n_max: int = 5) -> "EmbeddingsNgramas":
+        """Vectorizador con IDF suavizado por cubeta, estimado sobre un corpus de referencia."""
+        base = cls(dimensiones, n_min, n_max)
+        frecuencia = np.zeros(dimensiones, dtype=np.float64)
+        for texto in corpus:
+            indices, _ = base._indices(_rasgos(texto, n_min, n_max))
+            frecuencia[np.unique(indices)] += 1
+        idf = np.log((1 + len(corpus)) / (1 + frecuencia)) + 1.0
+        return cls(dimensiones, n_min, n_max, idf=idf)
+    
+    fit = ajustar
+    
+    def guardar_idf(self, ruta: str) -> None:
+        if self.idf is None:
+            raise ValueError("Este vectorizador no tiene IDF")
+        np.save(ruta, self.idf)
+    
+    save_idf = guardar_idf
+
+
+HashingNgramEmbeddings = EmbeddingsNgramas
+
+
+def crear_embeddings_ngramas() -> EmbeddingsNgramas:
+    """Vectorizador por defecto; VELORA_EMBEDDINGS_LOCALES_IDF apunta a un IDF (.npy) ajustado."""
+    ruta_idf = os.getenv("VELORA_EMBEDDINGS_LOCALES_IDF")
+    if ruta_idf:
+        idf = np.load(ruta_idf)
+        return EmbeddingsNgramas(dimensiones=len(idf), idf=idf)
+    return EmbeddingsNgramas()
+
+
+create_ngram_embeddings = crear_embeddings_ngramas
+
+
+class EmbeddingsSentenceTransformers(Embeddings):
+    """Modelo sentence-transformers en CPU, cargado al primer uso."""
+    
+    def __init__(self, modelo: str = MODELO_SENTENCE_TRANSFORMERS, dispositivo: str = "cpu"):
+        if not SENTENCE_TRANSFORMERS_DISPONIBLE:
+            raise ImportError("sentence-transformers no instalado")
+        self.modelo = modelo
+        self.dispositivo = dispositivo
+        self._cliente: Any = None
+    
+    def _obtener_cliente(self) -> Any:
+        if self._cliente is None:
+            from sentence_transformers import SentenceTransformer
+            self._cliente = SentenceTransformer(self.modelo, device=self.dispositivo)
+        return self._cliente
+    
+    @property
+    def dimensiones(self) -> int:
+        return self._obtener_cliente().get_sentence_embedding_dimension()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._obtener_cliente().encode(list(texts), normalize_embeddings=True).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+SentenceTransformerEmbeddings = EmbeddingsSentenceTransformers
@@ -1,10 +1,12 @@
 """
 Hiperparametros centralizados para LLMs por contexto de uso.
 Optimizados para maxima reproducibilidad en extraccion y matching.
+Incluye el enrutado opcional de cada etapa a su propio modelo y el escalado por confianza.
 """
 
+import os
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 
 @dataclass(frozen=True)
@@ -13,6 +15,8 @@ class HiperparametrosLLM:
     temperature: float
     top_p: Optional[float] = None
     max_tokens: Optional[int] = None
+    # Salida de cada elemento de la respuesta (un requisito): fija cuantos caben en max_tokens
+    max_tokens_por_elemento: Optional[int] = None
     
     def to_dict(self) -> dict:
         resultado = {"temperature": self.temperature}
@@ -21,17 +25,56 @@ class HiperparametrosLLM:
         if self.max_tokens is not None:
             resultado["max_tokens"] = self.max_tokens
         return resultado
+    
+    def elementos_por_llamada(self) -> int:
+        """Elementos cuya salida cabe en max_tokens (0: sin limite)."""
+        if not self.max_tokens or not self.max_tokens_por_elemento:
+            return 0
+        return max(1, self.max_tokens // self.max_tokens_por_elemento)
 
 
 LLMHyperparameters = HiperparametrosLLM
 
 
-FASE1_EXTRACCION = HiperparametrosLLM(temperature=0.0, top_p=0.1)
-FASE1_MATCHING = HiperparametrosLLM(temperature=0.0, top_p=0.1)
-FASE2_ENTREVISTA = HiperparametrosLLM(temperature=0.3, top_p=0.9)
-FASE2_EVALUACION = HiperparametrosLLM(temperature=0.0, top_p=0.1)
-RAG_CHATBOT = HiperparametrosLLM(temperature=0.4, top_p=0.85)
-RESUMEN_ANALISIS = HiperparametrosLLM(temperature=0.1, top_p=0.9)
+# max_tokens acota la salida de cada etapa (la latencia crece con los tokens generados).
+# La extraccion admite ofertas de ~85 requisitos; el matching de mas de 25 se reparte en
+# varias llamadas (un JSON truncado no valida contra el esquema)
+FASE1_EXTRACCION = HiperparametrosLLM(temperature=0.0, top_p=0.1, max_tokens=4096, max_tokens_por_elemento=48)
+FASE1_MATCHING = HiperparametrosLLM(temperature=0.0, top_p=0.1, max_tokens=4096, max_tokens_por_elemento=160)
+FASE2_ENTREVISTA = HiperparametrosLLM(temperature=0.3, top_p=0.9, max_tokens=300)
+FASE2_EVALUACION = HiperparametrosLLM(temperature=0.0, top_p=0.1, max_tokens=512)
+RAG_CHATBOT = HiperparametrosLLM(temperature=0.4, top_p=0.85, max_tokens=1024)
+RESUMEN_ANALISIS = HiperparametrosLLM(temperature=0.1, top_p=0.9, max_tokens=512)
+
+
+@dataclass(frozen=True)
+class ModeloEtapa:
+    """Proveedor y modelo asignados a una etapa (sin modelo: el por defecto del proveedor)."""
+    proveedor: str
+    nombre_modelo: Optional[str] = None
+
+
+StageModel = ModeloEtapa
+
+
+@dataclass(frozen=True)
+class ReglaEscalado:
+    """Los matches con alguna de estas confianzas se re-verifican en un modelo mas fuerte."""
+    proveedor: str
+    nombre_modelo: Optional[str] = None
+    confianzas: Tuple[str, ...] = ("low",)
+
+
+EscalationRule = ReglaEscalado
+
+
+def _parsear_modelo(valor: str) -> Optional[Tuple[str, Optional[str]]]:
+    """'proveedor:modelo' o 'proveedor' -> (proveedor, modelo)."""
+    valor = (valor or "").strip()
+    if not valor:
+        return None
+    proveedor, _, modelo = valor.partition(":")
+    return proveedor.strip().lower(), modelo.strip() or None
 
 
 class ConfiguracionHiperparametros:
@@ -52,6 +95,9 @@ class ConfiguracionHiperparametros:
         "rag": RAG_CHATBOT,
     }
     
+    _MODELOS: Dict[str, ModeloEtapa] = {}
+    _ESCALADO: Optional[ReglaEscalado] = None
+    
     @classmethod
     def obtener_config(cls, contexto: str) -> HiperparametrosLLM:
         if contexto in cls._CONFIGS:
@@ -72,6 +118,15 @@ class ConfiguracionHiperparametros:
     def get_temperature(cls, context: str) -> float:
         return cls.obtener_temperatura(context)
     
+    @classmethod
+    def obtener_requisitos_por_llamada(cls) -> int:
+        """Requisitos por llamada de matching que caben en su max_tokens (0: sin limite)."""
+        return cls.obtener_config("phase1_matching").elementos_por_llamada()
+    
+    @classmethod
+    def get_requirements_per_call(cls) -> int:
+        return cls.obtener_requisitos_por_llamada()
+    
     @classmethod
     def listar_contextos(cls) -> list:
         return list(cls._CONFIGS.keys())
@@ -87,6 +142,105 @@ class ConfiguracionHiperparametros:
     @classmethod
     def get_all_configs(cls) -> dict:
         return cls.obtener_todas_las_configs()
+    
+    @classmethod
+    def asignar_modelo(cls, contexto: str, proveedor: str, nombre_modelo: Optional[str] = None) -> ModeloEtapa:
+        """Asigna un modelo propio a una etapa (p. ej. uno ligero para phase1_extraction)."""
+        if contexto not in cls._CONFIGS:
+            raise ValueError(f"Contexto no valido: {contexto}. Opciones: {cls.listar_contextos()}")
+        cls._MODELOS[contexto] = ModeloEtapa(proveedor=proveedor.lower(), nombre_modelo=nombre_modelo)
+        return cls._MODELOS[contexto]
+    
+    @classmethod
+    def assign_model(cls, context: str, provider: str, model_name: Optional[str] = None) -> ModeloEtapa:
+        return cls.asignar_modelo(context, provider, model_name)
+    
+    @classmethod
+    def obtener_modelo(cls, contexto: str) -> Optional[ModeloEtapa]:
+        """
+        Modelo asignado a la etapa o None (se usa el elegido en la interfaz).
+        Tambien se lee de VELORA_MODELO_<CONTEXTO>, p. ej. VELORA_MODELO_PHASE1_EXTRACTION=openai:gpt-4o-mini.
+        """
+        if contexto in cls._MODELOS:
+            return cls._MODELOS[contexto]
+        parseado = _parsear_modelo(os.getenv(f"VELORA_MODELO_{contexto.upper()}", ""))
+        return ModeloEtapa(*parseado) if parseado else None
+    
+    @classmethod
+    def get_model(cls, context: str) -> Optional[ModeloEtapa]:
+        return cls.obtener_modelo(context)
+    
+    @classmethod
+    def limpiar_modelos(cls) -> None:
+        cls._MODELOS.clear()
+    
+    @classmethod
+    def clear_models(cls) -> None:
+        cls.limpiar_modelos()
+    
+    @classmethod
+    def configurar_escalado(
+        cls,
+        proveedor: str,
+        nombre_modelo: Optional[str] = None,
+        confianzas: Tuple[str, ...] = ("low",)
+    ) -> ReglaEscalado:
+        """Activa la re-verificacion de matches poco fiables en el modelo indicado."""
+        cls._ESCALADO = ReglaEscalado(
+            proveedor=proveedor.lower(),
+            nombre_modelo=nombre_modelo,
+            confianzas=tuple(confianzas)
+        )
+        return cls._ESCALADO
+    
+    @classmethod
+    def configure_escalation(
+        cls,
+        provider: str,
+        model_name: Optional[str] = None,
+        confidences: Tuple[str, ...] = ("low",)
+    ) -> ReglaEscalado:
+        return cls.configurar_escalado(provider, model_name, confidences)
+    
+    @classmethod
+    def obtener_escalado(cls) -> Optional[ReglaEscalado]:
+        """Regla activa o None. Tambien se activa con VELORA_ESCALADO=proveedor:modelo."""
+        if cls._ESCALADO is not None:
+            return cls._ESCALADO
+        parseado = _parsear_modelo(os.getenv("VELORA_ESCALADO", ""))
+        return ReglaEscalado(*parseado) if parseado else None
+    
+    @classmethod
+    def get_escalation(cls) -> Optional[ReglaEscalado]:
+        return cls.obtener_escalado()
+    
+    @classmethod
+    def desactivar_escalado(cls) -> None:
+        cls._ESCALADO = None
+    
+    @classmethod
+    def disable_escalation(cls) -> None:
+        cls.desactivar_escalado()
+    
+    @classmethod
+    def obtener_enrutamiento(cls) -> dict:
+        """Modelo asignado por etapa (None = el de la interfaz) y regla de escalado."""
+        etapas = {}
+        for contexto in cls._CONFIGS:
+            asignado = cls.obtener_modelo(contexto)
+            etapas[contexto] = f"{asignado.proveedor}/{asignado.nombre_modelo or 'default'}" if asignado else None
+        escalado = cls.obtener_escalado()
+        return {
+            "stages": etapas,
+            "escalation": {
+                "model": f"{escalado.proveedor}/{escalado.nombre_modelo or 'default'}",
+                "confidences": list(escalado.confianzas)
+            } if escalado else None
+        }
+    
+    @classmethod
+    def get_routing(cls) -> dict:
+        return cls.obtener_enrutamiento()
 
 
 HyperparametersConfig = ConfiguracionHiperparametros
@@ -0,0 +1,90 @@
+"""
+Indice de fuerza bruta en NumPy para indices pequenos (los chunks de un CV).
+Una matriz de vectores normalizados y un producto matricial: sin docstore, UUIDs ni
+Documents, y con similitud coseno real como score.
+"""
+
+import json
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def normalizar_filas(vectores: np.ndarray) -> np.ndarray:
+    """Filas a norma 1 (las filas nulas quedan a cero)."""
+    matriz = np.array(vectores, dtype=np.float32, ndmin=2)
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    np.divide(matriz, normas, out=matriz, where=normas > 0)
+    return matriz
+
+
+normalize_rows = normalizar_filas
+
+
+class IndiceMatrizCV:
+    """
+    Textos y su matriz de embeddings normalizados; top-k por similitud coseno.
+    offsets (opcional): (inicio, fin) de cada texto en el documento troceado.
+    """
+    
+    def __init__(
+        self,
+        textos: Sequence[str],
+        vectores: np.ndarray,
+        offsets: Optional[Sequence[Tuple[int, int]]] = None
+    ):
+        self.textos: List[str] = list(textos)
+        self.matriz = normalizar_filas(vectores)
+        self.offsets: Optional[List[Tuple[int, int]]] = [tuple(o) for o in offsets] if offsets is not None else None
+        if len(self.textos) != len(self.matriz):
+            raise ValueError(f"{len(self.textos)} textos para {len(self.matriz)} vectores")
+        if self.offsets is not None and len(self.offsets) != len(self.textos):
+            raise ValueError(f"{len(self.offsets)} offsets para {len(self.textos)} textos")
+    
+    def __len__(self) -> int:
+        return len(self.textos)
+    
+    def buscar(self, consultas: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (similitudes, posiciones) de forma (consultas, min(k, n)), de mayor a menor similitud.
+        Las consultas se normalizan aqui.
+        """
+        consultas = np.asarray(consultas, dtype=np.float32)
+        normas = np.linalg.norm(consultas, axis=1, keepdims=True)
+        similitudes = (consultas @ self.matriz.T) / np.where(normas > 0, normas, 1)
+        # Con decenas de filas, ordenar todo es mas barato que argpartition + ordenar la seleccion
+        posiciones = np.argsort(-similitudes, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(similitudes, posiciones, axis=1), posiciones
+    
+    search = buscar
+    
+    def save_local(self, ruta: str) -> None:
+        """Persiste en un directorio (matriz .npy, textos y offsets JSON, sin pickle)."""
+        directorio = Path(ruta)
+        directorio.mkdir(parents=True, exist_ok=True)
+        np.save(directorio / "matriz.npy", self.matriz)
+        (directorio / "textos.json").write_text(json.dumps(self.textos, ensure_ascii=False), encoding="utf-8")
+        if self.offsets is not None:
+            (directorio / "offsets.json").write_text(json.dumps(self.offsets), encoding="utf-8")
+    
+    guardar = save_local
+    
+    @classmethod
+    def load_local(cls, ruta: str) -> "IndiceMatrizCV":
+        directorio = Path(ruta)
+        textos = json.loads((directorio / "textos.json").read_text(encoding="utf-8"))
+        ruta_offsets = directorio / "offsets.json"
+        offsets = json.loads(ruta_offsets.read_text(encoding="utf-8")) if ruta_offsets.exists() else None
+        return cls(textos, np.load(directorio / "matriz.npy"), offsets)
+    
+    cargar = load_local
+    
+    @staticmethod
+    def existe(ruta: str) -> bool:
+        return (Path(ruta) / "matriz.npy").exists()
+    
+    exists = existe
+
+
+CVMatrixIndex = IndiceMatrizCV
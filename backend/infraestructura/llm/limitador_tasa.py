@@ -0,0 +1,445 @@
+"""
+Limitador de tasa por proveedor y modelo: cubetas de tokens para peticiones y tokens
+por minuto, limite de llamadas simultaneas y enfriamiento con jitter ante 429/529.
+Todos los LLMs y embeddings de la fabrica comparten el mismo presupuesto.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from langchain_core.outputs import LLMResult
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from .cache_respuestas import MARCA_CACHE
+
+
+@dataclass(frozen=True)
+class LimitesProveedor:
+    """Presupuesto compartido: peticiones/min, tokens/min y llamadas en vuelo."""
+    rpm: int
+    tpm: int
+    max_en_vuelo: int = 8
+
+
+ProviderLimits = LimitesProveedor
+
+
+LIMITES_POR_DEFECTO: Dict[str, LimitesProveedor] = {
+    "openai": LimitesProveedor(rpm=500, tpm=200_000, max_en_vuelo=16),
+    "google": LimitesProveedor(rpm=300, tpm=1_000_000, max_en_vuelo=16),
+    "anthropic": LimitesProveedor(rpm=50, tpm=40_000, max_en_vuelo=8),
+}
+
+REINTENTOS_SDK = 6
+TOKENS_ESTIMADOS_INICIALES = 1500
+_ESPERA_MAXIMA_SONDEO = 0.25
+_ENFRIAMIENTO_BASE = 1.0
+_ENFRIAMIENTO_MAXIMO = 60.0
+
+# Run de LangChain en curso: lo fija ManejadorGobernador al empezar la llamada y el limitador
+# lo usa para asociar el hueco reservado a ese run (las tareas hijas heredan el contexto)
+_run_en_curso: ContextVar[Optional[UUID]] = ContextVar("velora_run_en_curso", default=None)
+
+
+def es_error_saturacion(error: BaseException) -> bool:
+    """Detecta 429 (rate limit) y 529 (overloaded) en errores de cualquier SDK."""
+    codigo = getattr(error, "status_code", None)
+    if codigo is None:
+        codigo = getattr(getattr(error, "response", None), "status_code", None)
+    if codigo in (429, 529):
+        return True
+    texto = str(error).lower()
+    return any(marca in texto for marca in ("rate limit", "rate_limit", "overloaded", "resource_exhausted", "429", "529"))
+
+
+is_saturation_error = es_error_saturacion
+
+
+class CubetaTokens:
+    """Cubeta de tokens clasica. Admite saldo negativo para cobrar consumos reales mayores."""
+    
+    def __init__(self, capacidad: float, recarga_por_segundo: float):
+        self.capacidad = capacidad
+        self.recarga_por_segundo = recarga_por_segundo
+        self.disponible = capacidad
+        self._ultima_recarga = time.monotonic()
+    
+    def _recargar(self, ahora: float) -> None:
+        transcurrido = ahora - self._ultima_recarga
+        self.disponible = min(self.capacidad, self.disponible + transcurrido * self.recarga_por_segundo)
+        self._ultima_recarga = ahora
+    
+    def espera_necesaria(self, cantidad: float, ahora: float) -> float:
+        self._recargar(ahora)
+        requerido = min(cantidad, self.capacidad)
+        if self.disponible >= requerido:
+            return 0.0
+        return (requerido - self.disponible) / self.recarga_por_segundo
+    
+    def consumir(self, cantidad: float) -> None:
+        self.disponible -= cantidad
+
+
+class GobernadorModelo:
+    """Presupuesto compartido de un proveedor/modelo."""
+    
+    def __init__(self, proveedor: str, modelo: str, limites: LimitesProveedor):
+        self.proveedor = proveedor
+        self.modelo = modelo
+        self.limites = limites
+        self._rpm = CubetaTokens(limites.rpm, limites.rpm / 60.0)
+        self._tpm = CubetaTokens(limites.tpm, limites.tpm / 60.0)
+        self._lock = threading.Lock()
+        self._en_vuelo = 0
+        # run_id -> (tarea, callback de cancelacion) de cada hueco reservado por una llamada LLM
+        self._reservas: Dict[UUID, Tuple[Optional[asyncio.Task], Optional[Callable]]] = {}
+        self._enfriamiento_hasta = 0.0
+        self._saturaciones_consecutivas = 0
+        self._tokens_estimados = float(TOKENS_ESTIMADOS_INICIALES)
+        
+        self.peticiones = 0
+        self.saturaciones = 0
+        self.segundos_espera = 0.0
+        self.max_en_vuelo_observado = 0
+        
+        self.limitador = LimitadorTasaLangChain(self)
+        self.manejador = ManejadorGobernador(self)
+    
+    def _intentar_reservar(self, tokens: Optional[float]) -> float:
+        """Reserva cupo si es posible. Retorna 0 si lo consiguio o los segundos a esperar."""
+        with self._lock:
+            ahora = time.monotonic()
+            if ahora < self._enfriamiento_hasta:
+                return self._enfriamiento_hasta - ahora
+            if self._en_vuelo >= self.limites.max_en_vuelo:
+                return _ESPERA_MAXIMA_SONDEO
+            
+            tokens_reserva = tokens if tokens is not None else self._tokens_estimados
+            espera = max(
+                self._rpm.espera_necesaria(1, ahora),
+                self._tpm.espera_necesaria(tokens_reserva, ahora)
+            )
+            if espera > 0:
+                return espera
+            
+            self._rpm.consumir(1)
+            self._tpm.consumir(tokens_reserva)
+            self._en_vuelo += 1
+            self.peticiones += 1
+            self.max_en_vuelo_observado = max(self.max_en_vuelo_observado, self._en_vuelo)
+            return 0.0
+    
+    def adquirir(self, bloqueante: bool = True, tokens: Optional[float] = None, run_id: Optional[UUID] = None) -> bool:
+        """Con run_id, el hueco queda asociado al run y se libera con liberar_run."""
+        inicio = time.monotonic()
+        while True:
+            espera = self._intentar_reservar(tokens)
+            if espera <= 0:
+                self.segundos_espera += time.monotonic() - inicio
+                self._registrar_reserva(run_id, None)
+                return True
+            if not bloqueante:
+                return False
+            time.sleep(min(espera, _ESPERA_MAXIMA_SONDEO))
+    
+    acquire = adquirir
+    
+    async def aadquirir(self, bloqueante: bool = True, tokens: Optional[float] = None, run_id: Optional[UUID] = None) -> bool:
+        """
+        Con run_id, el hueco queda asociado al run: se libera con liberar_run o, si la tarea que
+        lo reservo se cancela antes (CancelledError no dispara on_llm_error), al cancelarse.
+        """
+        inicio = time.monotonic()
+        while True:
+            espera = self._intentar_reservar(tokens)
+            if espera <= 0:
+                self.segundos_espera += time.monotonic() - inicio
+                self._registrar_reserva(run_id, asyncio.current_task())
+                return True
+            if not bloqueante:
+                return False
+            await asyncio.sleep(min(espera, _ESPERA_MAXIMA_SONDEO))
+    
+    aacquire = aadquirir
+    
+    def _registrar_reserva(self, run_id: Optional[UUID], tarea: Optional[asyncio.Task]) -> None:
+        if run_id is None:
+            return
+        al_terminar = None
+        if tarea is not None:
+            def al_terminar(t: asyncio.Task) -> None:
+                if t.cancelled():
+                    self.liberar_run(run_id)
+            
+            tarea.add_done_callback(al_terminar)
+        with self._lock:
+            self._reservas[run_id] = (tarea, al_terminar)
+    
+    def liberar_run(self, run_id: UUID, tokens_reales: Optional[int] = None, saturacion: bool = False) -> bool:
+        """Libera el hueco del run (una sola vez). Retorna False si el run no tenia hueco (p. ej. cache)."""
+        with self._lock:
+            reserva = self._reservas.pop(run_id, None)
+        if reserva is None:
+            return False
+        tarea, al_terminar = reserva
+        if al_terminar is not None and not tarea.done():
+            tarea.remove_done_callback(al_terminar)
+        if saturacion:
+            self.registrar_saturacion()
+        else:
+            self.liberar(tokens_reales)
+        return True
+    
+    release_run = liberar_run
+    
+    def liberar(self, tokens_reales: Optional[int] = None) -> None:
+        """Libera un hueco en vuelo y ajusta el cobro de TPM con el consumo real."""
+        with self._lock:
+            self._en_vuelo = max(0, self._en_vuelo - 1)
+            self._saturaciones_consecutivas = 0
+            if tokens_reales:
+                self._tpm.consumir(tokens_reales - self._tokens_estimados)
+                self._tokens_estimados = 0.8 * self._tokens_estimados + 0.2 * tokens_reales
+    
+    release = liberar
+    
+    def registrar_saturacion(self) -> float:
+        """Libera el hueco y aplica enfriamiento exponencial con jitter a todos los llamantes."""
+        with self._lock:
+            self._en_vuelo = max(0, self._en_vuelo - 1)
+            self._saturaciones_consecutivas += 1
+            self.saturaciones += 1
+            base = min(_ENFRIAMIENTO_MAXIMO, _ENFRIAMIENTO_BASE * 2 ** (self._saturaciones_consecutivas - 1))
+            espera = base * random.uniform(0.5, 1.5)
+            self._enfriamiento_hasta = max(self._enfriamiento_hasta, time.monotonic() + espera)
+            return espera
+    
+    record_saturation = registrar_saturacion
+    
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "provider": self.proveedor,
+                "model": self.modelo,
+                "rpm": self.limites.rpm,
+                "tpm": self.limites.tpm,
+                "max_in_flight": self.limites.max_en_vuelo,
+                "in_flight": self._en_vuelo,
+                "peak_in_flight": self.max_en_vuelo_observado,
+                "requests": self.peticiones,
+                "saturations": self.saturaciones,
+                "wait_seconds": round(self.segundos_espera, 3),
+                "estimated_tokens_per_call": int(self._tokens_estimados),
+            }
+    
+    get_stats = estadisticas
+
+
+ModelGovernor = GobernadorModelo
+
+
+class LimitadorTasaLangChain(BaseRateLimiter):
+    """Adaptador al hook rate_limiter de LangChain (se consulta tras la cache, antes de la API)."""
+    
+    def __init__(self, gobernador: GobernadorModelo):
+        self.gobernador = gobernador
+    
+    def acquire(self, *, blocking: bool = True) -> bool:
+        return self.gobernador.adquirir(bloqueante=blocking, run_id=_run_en_curso.get())
+    
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        return await self.gobernador.aadquirir(bloqueante=blocking, run_id=_run_en_curso.get())
+
+
+def _extraer_tokens(respuesta: LLMResult) -> Optional[int]:
+    uso = (respuesta.llm_output or {}).get("token_usage") or (respuesta.llm_output or {}).get("usage") or {}
+    total = uso.get("total_tokens") if isinstance(uso, dict) else None
+    if total:
+        return int(total)
+    
+    total = 0
+    for generaciones in respuesta.generations:
+        for generacion in generaciones:
+            metadatos = getattr(getattr(generacion, "message", None), "usage_metadata", None) or {}
+            total += metadatos.get("total_tokens", 0)
+    return total or None
+
+
+def _es_respuesta_cacheada(respuesta: LLMResult) -> bool:
+    return any(
+        (generacion.generation_info or {}).get(MARCA_CACHE)
+        for generaciones in respuesta.generations
+        for generacion in generaciones
+    )
+
+
+class ManejadorGobernador(BaseCallbackHandler):
+    """
+    Asocia cada llamada a su run_id, libera su hueco en vuelo al terminar (o fallar, tambien
+    por cancelacion) y detecta saturacion del proveedor. Las respuestas de cache no reservan hueco.
+    """
+    
+    run_inline = True
+    
+    def __init__(self, gobernador: GobernadorModelo):
+        self.gobernador = gobernador
+    
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+        _run_en_curso.set(run_id)
+    
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        _run_en_curso.set(run_id)
+    
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        tokens = None if _es_respuesta_cacheada(response) else _extraer_tokens(response)
+        self.gobernador.liberar_run(run_id, tokens)
+    
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self.gobernador.liberar_run(run_id, saturacion=es_error_saturacion(error))
+
+
+def _estimar_tokens(textos: List[str]) -> int:
+    return max(1, sum(len(texto) for texto in textos) // 4)
+
+
+class EmbeddingsGobernados(Embeddings):
+    """Embeddings que respetan el presupuesto del gobernador y reintentan ante saturacion."""
+    
+    def __init__(self, embeddings: Embeddings, gobernador: GobernadorModelo, max_reintentos: int = 5):
+        self.embeddings = embeddings
+        self.gobernador = gobernador
+        self.max_reintentos = max_reintentos
+    
+    def __getattr__(self, nombre: str) -> Any:
+        return getattr(self.__dict__["embeddings"], nombre)
+    
+    def _ejecutar(self, llamada: Callable[[], Any], tokens: int) -> Any:
+        for intento in range(self.max_reintentos + 1):
+            self.gobernador.adquirir(tokens=tokens)
+            saturado = False
+            try:
+                return llamada()
+            except Exception as e:
+                saturado = es_error_saturacion(e) and intento < self.max_reintentos
+                if not saturado:
+                    raise
+            finally:
+                # Tambien con BaseException (cancelacion): el hueco no puede quedarse reservado
+                if saturado:
+                    self.gobernador.registrar_saturacion()
+                else:
+                    self.gobernador.liberar()
+    
+    async def _aejecutar(self, llamada: Callable[[], Any], tokens: int) -> Any:
+        for intento in range(self.max_reintentos + 1):
+            await self.gobernador.aadquirir(tokens=tokens)
+            saturado = False
+            try:
+                return await llamada()
+            except Exception as e:
+                saturado = es_error_saturacion(e) and intento < self.max_reintentos
+                if not saturado:
+                    raise
+            finally:
+                # Tambien con BaseException (cancelacion): el hueco no puede quedarse reservado
+                if saturado:
+                    self.gobernador.registrar_saturacion()
+                else:
+                    self.gobernador.liberar()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._ejecutar(lambda: self.embeddings.embed_documents(texts), _estimar_tokens(texts))
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self._ejecutar(lambda: self.embeddings.embed_query(text), _estimar_tokens([text]))
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._aejecutar(lambda: self.embeddings.aembed_documents(texts), _estimar_tokens(texts))
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._aejecutar(lambda: self.embeddings.aembed_query(text), _estimar_tokens([text]))
+
+
+GovernedEmbeddings = EmbeddingsGobernados
+
+
+_gobernadores: Dict[Tuple[str, str], GobernadorModelo] = {}
+_limites_personalizados: Dict[Tuple[str, Optional[str]], LimitesProveedor] = {}
+_lock_gobernadores = threading.Lock()
+
+
+def limitador_habilitado() -> bool:
+    return os.getenv("VELORA_LIMITADOR_TASA", "1").lower() not in ("0", "false", "no")
+
+
+is_rate_limiter_enabled = limitador_habilitado
+
+
+def _resolver_limites(proveedor: str, modelo: str) -> Optional[LimitesProveedor]:
+    return (
+        _limites_personalizados.get((proveedor, modelo))
+        or _limites_personalizados.get((proveedor, None))
+        or LIMITES_POR_DEFECTO.get(proveedor)
+    )
+
+
+def obtener_gobernador(proveedor: str, modelo: Optional[str]) -> Optional[GobernadorModelo]:
+    """Gobernador compartido del proveedor/modelo, o None si el limitador esta desactivado."""
+    if not limitador_habilitado() or not proveedor:
+        return None
+    
+    proveedor = proveedor.lower()
+    modelo = modelo or ""
+    with _lock_gobernadores:
+        gobernador = _gobernadores.get((proveedor, modelo))
+        if gobernador is None:
+            limites = _resolver_limites(proveedor, modelo)
+            if limites is None:
+                return None
+            gobernador = GobernadorModelo(proveedor, modelo, limites)
+            _gobernadores[(proveedor, modelo)] = gobernador
+        return gobernador
+
+
+get_governor = obtener_gobernador
+
+
+def configurar_limites(
+    proveedor: str,
+    rpm: int,
+    tpm: int,
+    max_en_vuelo: int = 8,
+    modelo: Optional[str] = None
+) -> LimitesProveedor:
+    """Ajusta el presupuesto de un proveedor (o de un modelo concreto) segun el tier de la cuenta."""
+    limites = LimitesProveedor(rpm=rpm, tpm=tpm, max_en_vuelo=max_en_vuelo)
+    proveedor = proveedor.lower()
+    with _lock_gobernadores:
+        _limites_personalizados[(proveedor, modelo)] = limites
+        for clave, gobernador in _gobernadores.items():
+            if clave[0] == proveedor and (modelo is None or clave[1] == modelo):
+                gobernador.limites = _resolver_limites(*clave)
+                gobernador._rpm = CubetaTokens(gobernador.limites.rpm, gobernador.limites.rpm / 60.0)
+                gobernador._tpm = CubetaTokens(gobernador.limites.tpm, gobernador.limites.tpm / 60.0)
+    return limites
+
+
+configure_limits = configurar_limites
+
+
+def obtener_estadisticas_limitador() -> List[dict]:
+    with _lock_gobernadores:
+        gobernadores = list(_gobernadores.values())
+    return [g.estadisticas() for g in gobernadores]
+
+
+get_rate_limiter_stats = obtener_estadisticas_limitador
@@ -4,11 +4,23 @@ Incluye configuración de LangSmith para trazabilidad.
 """
 
 import os
-from typing import Optional
+from typing import Optional, Tuple, Type
+from pydantic import BaseModel
 from langchain_openai import ChatOpenAI
 from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
 
-from .configuracion_modelos import obtener_modelos_disponibles, obtener_modelo_por_defecto
+from .configuracion_modelos import (
+    obtener_modelos_disponibles, obtener_modelo_por_defecto,
+    obtener_modelo_recomendado, obtener_todos_los_proveedores
+)
+from .hiperparametros import ConfiguracionHiperparametros
+from .cache_respuestas import obtener_cache_llm
+from .registro_clientes import obtener_registro_clientes, construir_clave
+from .limitador_tasa import obtener_gobernador, obtener_estadisticas_limitador, REINTENTOS_SDK
+from .cobertura import RunnableConCobertura, obtener_politica_cobertura, obtener_estadisticas_cobertura
+from .proveedor_local import PROVEEDOR_LOCAL, MODELO_LOCAL, ChatLocalStub, kwargs_chat_local
+from .cache_prompts import aplicar_cache_prompt
 
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
@@ -32,6 +44,13 @@ except ImportError:
     ClienteLangSmith = None
 
 
+VARIABLES_API_KEY = {
+    "openai": "OPENAI_API_KEY",
+    "google": "GOOGLE_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+}
+
+
 _cliente_langsmith: Optional["ClienteLangSmith"] = None
 _langsmith_configurado: bool = False
 
@@ -81,6 +100,15 @@ def langsmith_habilitado() -> bool:
 is_langsmith_enabled = langsmith_habilitado
 
 
+def _parametros_muestreo(top_p: Optional[float], max_tokens: Optional[int], clave_max_tokens: str) -> dict:
+    parametros = {}
+    if top_p is not None:
+        parametros["top_p"] = top_p
+    if max_tokens is not None:
+        parametros[clave_max_tokens] = max_tokens
+    return parametros
+
+
 class FabricaLLM:
     """Fábrica para crear instancias de LLM de diferentes proveedores."""
     
@@ -119,40 +147,237 @@ class FabricaLLM:
         proveedor: str,
         nombre_modelo: str,
         temperatura: float = 0.1,
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        top_p: Optional[float] = None,
+        max_tokens: Optional[int] = None
     ) -> BaseChatModel:
-        """Crea instancia de LLM del proveedor especificado."""
+        """
+        Crea (o reutiliza del registro de clientes) un LLM del proveedor especificado.
+        Si la cache de respuestas esta activa (configurar_cache_llm), se adjunta al modelo.
+        Todas las instancias del mismo proveedor/modelo comparten el limitador de tasa.
+        top_p y max_tokens se traducen al parametro de cada proveedor (None = valor del proveedor).
+        """
         if not proveedor:
             proveedor = "openai"
         proveedor_lower = proveedor.lower()
         
+        kwargs = {"model": nombre_modelo, "temperature": temperatura}
+        cache = obtener_cache_llm()
+        if cache is not None:
+            kwargs["cache"] = cache
+        
+        gobernador = obtener_gobernador(proveedor_lower, nombre_modelo)
+        if gobernador is not None:
+            kwargs["rate_limiter"] = gobernador.limitador
+            kwargs["callbacks"] = [gobernador.manejador]
+            kwargs["max_retries"] = REINTENTOS_SDK
+        
         if proveedor_lower == "openai":
-            kwargs = {"model": nombre_modelo, "temperature": temperatura}
+            clase_llm = ChatOpenAI
+            # Sin esto el streaming de OpenAI no devuelve usage y la contabilidad queda a cero
+            kwargs["stream_usage"] = True
+            kwargs.update(_parametros_muestreo(top_p, max_tokens, "max_tokens"))
             if api_key:
                 kwargs["openai_api_key"] = api_key
-            return ChatOpenAI(**kwargs)
         
         elif proveedor_lower == "google":
             if not GOOGLE_DISPONIBLE:
                 raise ImportError("langchain-google-genai no instalado")
-            kwargs = {"model": nombre_modelo, "temperature": temperatura}
+            clase_llm = ChatGoogleGenerativeAI
+            # En Gemini 2.5 el limite incluye los tokens de razonamiento: se deja al proveedor
+            limite = None if (nombre_modelo or "").startswith("gemini-2.5") else max_tokens
+            kwargs.update(_parametros_muestreo(top_p, limite, "max_output_tokens"))
             if api_key:
                 kwargs["google_api_key"] = api_key
-            return ChatGoogleGenerativeAI(**kwargs)
         
         elif proveedor_lower == "anthropic":
             if not ANTHROPIC_DISPONIBLE:
                 raise ImportError("langchain-anthropic no instalado")
-            kwargs = {"model": nombre_modelo, "temperature": temperatura}
+            clase_llm = ChatAnthropic
+            # Los modelos Claude recientes rechazan temperature y top_p a la vez: prima temperature
+            kwargs.update(_parametros_muestreo(None, max_tokens, "max_tokens"))
             if api_key:
                 kwargs["anthropic_api_key"] = api_key
-            return ChatAnthropic(**kwargs)
         
-        raise ValueError(f"Proveedor no válido: {proveedor}")
+        elif proveedor_lower == PROVEEDOR_LOCAL:
+            # Determinista y sin red: para pruebas de carga y benchmarks
+            clase_llm = ChatLocalStub
+            kwargs["model"] = nombre_modelo or MODELO_LOCAL
+            kwargs.update(kwargs_chat_local())
+            kwargs.update(_parametros_muestreo(top_p, max_tokens, "max_tokens"))
+        
+        else:
+            raise ValueError(f"Proveedor no válido: {proveedor}")
+        
+        clave = construir_clave(
+            "llm", proveedor_lower,
+            {**kwargs, "api_key_efectiva": api_key or os.getenv(VARIABLES_API_KEY.get(proveedor_lower, ""), "")}
+        )
+        return obtener_registro_clientes().obtener_o_crear(clave, lambda: clase_llm(**kwargs))
+    
+    @staticmethod
+    def create_llm(
+        provider: str,
+        model_name: str,
+        temperature: float = 0.1,
+        api_key: Optional[str] = None,
+        top_p: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> BaseChatModel:
+        return FabricaLLM.crear_llm(provider, model_name, temperature, api_key, top_p, max_tokens)
+    
+    @staticmethod
+    def resolver_modelo_etapa(etapa: str, proveedor: str, nombre_modelo: Optional[str]) -> Tuple[str, Optional[str]]:
+        """Proveedor/modelo de la etapa: el asignado en ConfiguracionHiperparametros o el indicado."""
+        asignado = ConfiguracionHiperparametros.obtener_modelo(etapa)
+        if asignado is None:
+            return proveedor, nombre_modelo
+        return asignado.proveedor, asignado.nombre_modelo or obtener_modelo_por_defecto(asignado.proveedor)
+    
+    @staticmethod
+    def resolve_stage_model(stage: str, provider: str, model_name: Optional[str]) -> Tuple[str, Optional[str]]:
+        return FabricaLLM.resolver_modelo_etapa(stage, provider, model_name)
+    
+    @staticmethod
+    def crear_llm_etapa(
+        etapa: str,
+        proveedor: str,
+        nombre_modelo: Optional[str],
+        temperatura: Optional[float] = None,
+        api_key: Optional[str] = None
+    ) -> BaseChatModel:
+        """
+        Crea el LLM de una etapa con su modelo asignado (si lo hay) y su perfil de hiperparametros
+        (temperatura, top_p, max_tokens); temperatura sustituye a la del perfil si se indica.
+        La api_key recibida solo se usa si la etapa se queda en el mismo proveedor.
+        """
+        proveedor_etapa, modelo_etapa = FabricaLLM.resolver_modelo_etapa(etapa, proveedor, nombre_modelo)
+        perfil = ConfiguracionHiperparametros.obtener_config(etapa)
+        if temperatura is None:
+            temperatura = perfil.temperature
+        if (proveedor_etapa or "openai").lower() != (proveedor or "openai").lower():
+            api_key = None
+        return FabricaLLM.crear_llm(
+            proveedor_etapa, modelo_etapa, temperatura, api_key,
+            top_p=perfil.top_p, max_tokens=perfil.max_tokens
+        )
+    
+    @staticmethod
+    def create_stage_llm(
+        stage: str,
+        provider: str,
+        model_name: Optional[str],
+        temperature: Optional[float] = None,
+        api_key: Optional[str] = None
+    ) -> BaseChatModel:
+        return FabricaLLM.crear_llm_etapa(stage, provider, model_name, temperature, api_key)
+    
+    @staticmethod
+    def obtener_proveedor_secundario(proveedor: str) -> Optional[Tuple[str, str]]:
+        """Primer proveedor distinto del primario con API key, y su modelo para Structured Output."""
+        politica = obtener_politica_cobertura()
+        if politica is not None and politica.proveedor_secundario:
+            secundario = politica.proveedor_secundario.lower()
+            return secundario, politica.modelo_secundario or obtener_modelo_recomendado(secundario)
+        
+        disponibles = FabricaLLM.obtener_proveedores_disponibles()
+        for candidato in obtener_todos_los_proveedores():
+            if candidato == (proveedor or "openai").lower() or candidato not in disponibles:
+                continue
+            if os.getenv(VARIABLES_API_KEY[candidato]):
+                return candidato, obtener_modelo_recomendado(candidato)
+        return None
+    
+    @staticmethod
+    def aplicar_cobertura(
+        runnable: Runnable,
+        esquema: Type[BaseModel],
+        etapa: str,
+        proveedor: str,
+        nombre_modelo: str,
+        temperatura: float = 0.0
+    ) -> Runnable:
+        """
+        Envuelve una llamada estructurada con cobertura hacia un proveedor secundario.
+        Sin politica activa (configurar_cobertura / VELORA_COBERTURA) devuelve el runnable tal cual.
+        """
+        politica = obtener_politica_cobertura()
+        if politica is None:
+            return runnable
+        
+        secundario = FabricaLLM.obtener_proveedor_secundario(proveedor)
+        if secundario is None:
+            return runnable
+        
+        proveedor_secundario, modelo_secundario = secundario
+        perfil = ConfiguracionHiperparametros.obtener_config(etapa)
+        try:
+            llm_secundario = FabricaLLM.crear_llm(
+                proveedor_secundario, modelo_secundario, temperatura,
+                top_p=perfil.top_p, max_tokens=perfil.max_tokens
+            )
+        except (ImportError, ValueError):
+            return runnable
+        
+        return RunnableConCobertura(
+            primario=runnable,
+            secundario=llm_secundario.with_structured_output(esquema),
+            clave=f"{etapa}:{proveedor}/{nombre_modelo}->{proveedor_secundario}/{modelo_secundario}",
+            politica=politica
+        )
+    
+    @staticmethod
+    def apply_hedging(
+        runnable: Runnable,
+        schema: Type[BaseModel],
+        stage: str,
+        provider: str,
+        model_name: str,
+        temperature: float = 0.0
+    ) -> Runnable:
+        return FabricaLLM.aplicar_cobertura(runnable, schema, stage, provider, model_name, temperature)
+    
+    @staticmethod
+    def aplicar_cache_prompt(runnable: Runnable, proveedor: Optional[str]) -> Runnable:
+        """Marca el prefijo estable de los prompts en proveedores con cache explicita (Anthropic)."""
+        return aplicar_cache_prompt(runnable, proveedor)
+    
+    @staticmethod
+    def apply_prompt_caching(runnable: Runnable, provider: Optional[str]) -> Runnable:
+        return FabricaLLM.aplicar_cache_prompt(runnable, provider)
+    
+    @staticmethod
+    def obtener_estadisticas_cobertura() -> dict:
+        return obtener_estadisticas_cobertura()
+    
+    @staticmethod
+    def get_hedging_stats() -> dict:
+        return FabricaLLM.obtener_estadisticas_cobertura()
+    
+    @staticmethod
+    def obtener_estadisticas_cache() -> Optional[dict]:
+        cache = obtener_cache_llm()
+        return cache.estadisticas() if cache is not None else None
+    
+    @staticmethod
+    def get_cache_stats() -> Optional[dict]:
+        return FabricaLLM.obtener_estadisticas_cache()
+    
+    @staticmethod
+    def obtener_estadisticas_clientes() -> dict:
+        return obtener_registro_clientes().estadisticas()
+    
+    @staticmethod
+    def get_client_stats() -> dict:
+        return FabricaLLM.obtener_estadisticas_clientes()
+    
+    @staticmethod
+    def obtener_estadisticas_limitador() -> list:
+        return obtener_estadisticas_limitador()
     
     @staticmethod
-    def create_llm(provider: str, model_name: str, temperature: float = 0.1, api_key: Optional[str] = None) -> BaseChatModel:
-        return FabricaLLM.crear_llm(provider, model_name, temperature, api_key)
+    def get_rate_limiter_stats() -> list:
+        return FabricaLLM.obtener_estadisticas_limitador()
     
     @staticmethod
     def obtener_modelos_disponibles(proveedor: str) -> list:
@@ -0,0 +1,274 @@
+"""
+Backends de ejecucion por lotes (batch API) para llamadas estructuradas.
+Un trabajo es un fichero JSONL de peticiones /v1/chat/completions identificadas por custom_id;
+al completarse se descarga un mapa custom_id -> respuesta. Incluye un backend local basado
+en ficheros (respuestas del proveedor local-stub) para probar el flujo completo sin red.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from langchain_core.messages import BaseMessage
+
+from .proveedor_local import PROVEEDOR_LOCAL, GENERADORES_ESTRUCTURADOS, estimar_tokens
+from .cache_prompts import texto_contenido
+
+
+ESTADO_EN_CURSO = "in_progress"
+ESTADO_COMPLETADO = "completed"
+ESTADO_FALLIDO = "failed"
+ESTADO_EXPIRADO = "expired"
+
+# Las APIs batch facturan aproximadamente la mitad que las llamadas sincronas
+DESCUENTO_LOTES = 0.5
+
+ENDPOINT_CHAT = "/v1/chat/completions"
+
+
+@dataclass(frozen=True)
+class RespuestaLote:
+    """Respuesta de una peticion del lote: contenido JSON o error."""
+    contenido: Optional[str] = None
+    error: Optional[str] = None
+    tokens_entrada: int = 0
+    tokens_salida: int = 0
+    tokens_cacheados: int = 0
+
+
+BatchResponse = RespuestaLote
+
+
+def construir_peticion_lote(
+    custom_id: str,
+    modelo: str,
+    mensajes: List[BaseMessage],
+    esquema: Type[BaseModel],
+    temperatura: float = 0.0
+) -> dict:
+    """Linea JSONL de una peticion de chat con salida estructurada segun esquema."""
+    roles = {"system": "system", "human": "user", "ai": "assistant"}
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": ENDPOINT_CHAT,
+        "body": {
+            "model": modelo,
+            "temperature": temperatura,
+            "messages": [{"role": roles.get(m.type, "user"), "content": m.content} for m in mensajes],
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": esquema.__name__, "schema": esquema.model_json_schema()}
+            }
+        }
+    }
+
+
+build_batch_request = construir_peticion_lote
+
+
+def _parsear_linea_salida(linea: dict) -> Tuple[str, RespuestaLote]:
+    """Linea del fichero de salida (formato batch de OpenAI) -> (custom_id, respuesta)."""
+    custom_id = linea["custom_id"]
+    if linea.get("error"):
+        return custom_id, RespuestaLote(error=str(linea["error"]))
+    
+    respuesta = linea.get("response") or {}
+    cuerpo = respuesta.get("body") or {}
+    if respuesta.get("status_code", 200) >= 400:
+        return custom_id, RespuestaLote(error=str(cuerpo.get("error") or respuesta.get("status_code")))
+    
+    try:
+        contenido = cuerpo["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return custom_id, RespuestaLote(error="Respuesta sin contenido")
+    
+    uso = cuerpo.get("usage") or {}
+    return custom_id, RespuestaLote(
+        contenido=contenido,
+        tokens_entrada=uso.get("prompt_tokens", 0),
+        tokens_salida=uso.get("completion_tokens", 0),
+        tokens_cacheados=(uso.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    )
+
+
+def _leer_salida(texto: str) -> Dict[str, RespuestaLote]:
+    resultados = {}
+    for linea in texto.splitlines():
+        if linea.strip():
+            custom_id, respuesta = _parsear_linea_salida(json.loads(linea))
+            resultados[custom_id] = respuesta
+    return resultados
+
+
+class BackendLotes(ABC):
+    """Interfaz comun: enviar un JSONL, consultar el estado del trabajo y descargar sus respuestas."""
+    
+    proveedor: str = ""
+    
+    @abstractmethod
+    def enviar(self, ruta_entrada: Path) -> str:
+        """Envia el fichero de peticiones y devuelve el id del trabajo."""
+    
+    @abstractmethod
+    def consultar_estado(self, id_trabajo: str) -> str:
+        """ESTADO_EN_CURSO, ESTADO_COMPLETADO, ESTADO_FALLIDO o ESTADO_EXPIRADO."""
+    
+    @abstractmethod
+    def descargar_resultados(self, id_trabajo: str) -> Dict[str, RespuestaLote]:
+        """Respuestas de un trabajo completado, por custom_id."""
+
+
+BatchBackend = BackendLotes
+
+
+class BackendLotesOpenAI(BackendLotes):
+    """Batch API de OpenAI: ventana de 24h y coste reducido."""
+    
+    proveedor = "openai"
+    
+    def __init__(self, api_key: Optional[str] = None, ventana: str = "24h"):
+        from openai import OpenAI
+        self._cliente = OpenAI(api_key=api_key) if api_key else OpenAI()
+        self.ventana = ventana
+    
+    def enviar(self, ruta_entrada: Path) -> str:
+        with open(ruta_entrada, "rb") as f:
+            fichero = self._cliente.files.create(file=f, purpose="batch")
+        trabajo = self._cliente.batches.create(
+            input_file_id=fichero.id,
+            endpoint=ENDPOINT_CHAT,
+            completion_window=self.ventana
+        )
+        return trabajo.id
+    
+    def consultar_estado(self, id_trabajo: str) -> str:
+        estado = self._cliente.batches.retrieve(id_trabajo).status
+        if estado == "completed":
+            return ESTADO_COMPLETADO
+        if estado == "expired":
+            return ESTADO_EXPIRADO
+        if estado in ("failed", "cancelled", "cancelling"):
+            return ESTADO_FALLIDO
+        return ESTADO_EN_CURSO
+    
+    def descargar_resultados(self, id_trabajo: str) -> Dict[str, RespuestaLote]:
+        trabajo = self._cliente.batches.retrieve(id_trabajo)
+        resultados = {}
+        for id_fichero in (trabajo.output_file_id, trabajo.error_file_id):
+            if id_fichero:
+                resultados.update(_leer_salida(self._cliente.files.content(id_fichero).text))
+        return resultados
+
+
+OpenAIBatchBackend = BackendLotesOpenAI
+
+
+class BackendLotesLocal(BackendLotes):
+    """
+    Sustituto local basado en ficheros: cada trabajo es una carpeta con input.jsonl y,
+    transcurrido segundos_procesamiento, output.jsonl con respuestas del proveedor local-stub.
+    El estado vive en disco, asi que un proceso reiniciado puede seguir consultandolo.
+    """
+    
+    proveedor = PROVEEDOR_LOCAL
+    
+    def __init__(self, directorio: Path, segundos_procesamiento: float = 0.0, tasa_error: float = 0.0):
+        self.directorio = Path(directorio)
+        self.segundos_procesamiento = segundos_procesamiento
+        self.tasa_error = tasa_error
+    
+    def enviar(self, ruta_entrada: Path) -> str:
+        id_trabajo = f"local-{uuid.uuid4().hex[:12]}"
+        carpeta = self.directorio / id_trabajo
+        carpeta.mkdir(parents=True)
+        shutil.copyfile(ruta_entrada, carpeta / "input.jsonl")
+        (carpeta / "trabajo.json").write_text(json.dumps({"id": id_trabajo, "creado": time.time()}))
+        return id_trabajo
+    
+    def consultar_estado(self, id_trabajo: str) -> str:
+        carpeta = self.directorio / id_trabajo
+        if not (carpeta / "trabajo.json").exists():
+            return ESTADO_FALLIDO
+        if (carpeta / "output.jsonl").exists():
+            return ESTADO_COMPLETADO
+        
+        creado = json.loads((carpeta / "trabajo.json").read_text())["creado"]
+        if time.time() - creado < self.segundos_procesamiento:
+            return ESTADO_EN_CURSO
+        
+        self._procesar(carpeta)
+        return ESTADO_COMPLETADO
+    
+    def descargar_resultados(self, id_trabajo: str) -> Dict[str, RespuestaLote]:
+        return _leer_salida((self.directorio / id_trabajo / "output.jsonl").read_text(encoding="utf-8"))
+    
+    def _falla(self, custom_id: str) -> bool:
+        """Fallo simulado determinista por custom_id."""
+        if self.tasa_error <= 0:
+            return False
+        sorteo = int(hashlib.sha256(custom_id.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+        return sorteo < self.tasa_error
+    
+    def _responder(self, peticion: dict) -> dict:
+        custom_id = peticion["custom_id"]
+        cuerpo = peticion["body"]
+        nombre = (cuerpo.get("response_format") or {}).get("json_schema", {}).get("name")
+        generador = GENERADORES_ESTRUCTURADOS.get(nombre)
+        
+        if generador is None or self._falla(custom_id):
+            motivo = f"Esquema no soportado: {nombre}" if generador is None else "Error simulado del backend local"
+            return {"custom_id": custom_id, "response": None, "error": {"message": motivo}}
+        
+        usuario = [texto_contenido(m["content"]) for m in cuerpo["messages"] if m["role"] == "user"]
+        contenido = json.dumps(generador(usuario[-1] if usuario else ""), ensure_ascii=False)
+        return {
+            "custom_id": custom_id,
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "model": cuerpo.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": contenido}}],
+                    "usage": {
+                        "prompt_tokens": sum(estimar_tokens(texto_contenido(m["content"])) for m in cuerpo["messages"]),
+                        "completion_tokens": estimar_tokens(contenido)
+                    }
+                }
+            },
+            "error": None
+        }
+    
+    def _procesar(self, carpeta: Path) -> None:
+        with open(carpeta / "input.jsonl", encoding="utf-8") as f:
+            lineas = [json.dumps(self._responder(json.loads(linea)), ensure_ascii=False) for linea in f if linea.strip()]
+        temporal = carpeta / "output.jsonl.tmp"
+        temporal.write_text("\n".join(lineas) + "\n", encoding="utf-8")
+        os.replace(temporal, carpeta / "output.jsonl")
+
+
+LocalBatchBackend = BackendLotesLocal
+
+
+def crear_backend_lotes(
+    proveedor: str,
+    directorio: Path,
+    api_key: Optional[str] = None
+) -> BackendLotes:
+    """Backend de lotes para el proveedor: openai (Batch API) o local-stub (ficheros)."""
+    proveedor_lower = (proveedor or "openai").lower()
+    if proveedor_lower == "openai":
+        return BackendLotesOpenAI(api_key=api_key)
+    if proveedor_lower == PROVEEDOR_LOCAL:
+        return BackendLotesLocal(Path(directorio) / "backend_local")
+    raise ValueError(f"'{proveedor}' no tiene API de lotes soportada (usa openai o {PROVEEDOR_LOCAL})")
+
+
+create_batch_backend = crear_backend_lotes
@@ -0,0 +1,80 @@
+"""
+Matriz de similitud requisito x chunk de un CV.
+Se calcula de una vez en la etapa semantica y viaja en el estado del grafo: float32
+(requisitos x chunks) mas los offsets de cada chunk en el CV, sin copiar los textos.
+Los nodos posteriores eligen evidencia o deciden el enrutado sin nuevas busquedas.
+"""
+
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class MatrizSimilitud:
+    """
+    similitudes[i, j]: score del requisito i con el chunk j, en la escala de la evidencia
+    semantica (coseno, o cobertura lexica sin embeddings). offsets[j] = (inicio, fin) del chunk j
+    en el CV, de modo que su texto es cv[inicio:fin].
+    """
+    requisitos: Tuple[str, ...]
+    similitudes: np.ndarray
+    offsets: np.ndarray
+    
+    @classmethod
+    def crear(cls, requisitos: Sequence[str], similitudes: np.ndarray, offsets: Sequence[Tuple[int, int]]) -> "MatrizSimilitud":
+        similitudes = np.ascontiguousarray(similitudes, dtype=np.float32).reshape(len(requisitos), len(offsets))
+        offsets = np.asarray(offsets, dtype=np.int32).reshape(len(offsets), 2)
+        return cls(tuple(requisitos), similitudes, offsets)
+    
+    create = crear
+    
+    @property
+    def num_chunks(self) -> int:
+        return len(self.offsets)
+    
+    @property
+    def nbytes(self) -> int:
+        return self.similitudes.nbytes + self.offsets.nbytes
+    
+    def _fila(self, requisito: str) -> int:
+        try:
+            return self.requisitos.index(requisito)
+        except ValueError:
+            raise KeyError(requisito) from None
+    
+    def fila(self, requisito: str) -> np.ndarray:
+        """Scores del requisito con cada chunk."""
+        return self.similitudes[self._fila(requisito)]
+    
+    row = fila
+    
+    def mejores_scores(self) -> np.ndarray:
+        """Mejor score de cada requisito (en el orden de requisitos)."""
+        if not self.num_chunks:
+            return np.zeros(len(self.requisitos), dtype=np.float32)
+        return self.similitudes.max(axis=1)
+    
+    best_scores = mejores_scores
+    
+    def texto_chunk(self, cv: str, chunk: int) -> str:
+        inicio, fin = self.offsets[chunk]
+        return cv[inicio:fin]
+    
+    chunk_text = texto_chunk
+    
+    def top_k(self, requisito: str, k: int, umbral_score: float = 0.0) -> List[Tuple[int, float]]:
+        """[(chunk, score)] de mayor a menor score, solo los que alcanzan umbral_score."""
+        fila = self.fila(requisito)
+        orden = np.argsort(-fila, kind="stable")[:k]
+        return [(int(j), float(fila[j])) for j in orden if fila[j] >= umbral_score]
+    
+    def evidencia(self, cv: str, requisito: str, k: int = 2, umbral_score: float = 0.0) -> List[Tuple[str, float]]:
+        """Mismo formato que ComparadorSemantico.encontrar_evidencia: [(texto, score)]."""
+        return [(self.texto_chunk(cv, j), score) for j, score in self.top_k(requisito, k, umbral_score)]
+    
+    evidence = evidencia
+
+
+SimilarityMatrix = MatrizSimilitud
@@ -0,0 +1,517 @@
+"""
+Proveedor local "local-stub": LLM y embeddings deterministas sin red ni API key.
+Pensado para pruebas de carga y benchmarks: las respuestas estructuradas se derivan
+de la entrada (vinetas de la oferta, solapamiento de palabras clave con el CV) y la
+latencia y la tasa de errores se inyectan de forma configurable. Imita ademas la cache
+automatica de prefijos de OpenAI para que la contabilidad de tokens cacheados sea observable.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Type
+
+from pydantic import BaseModel, PrivateAttr
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel, LangSmithParams
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from .cache_prompts import texto_contenido
+
+
+PROVEEDOR_LOCAL = "local-stub"
+MODELO_LOCAL = "stub-v1"
+MODELO_EMBEDDING_LOCAL = "stub-hash"
+
+
+@dataclass(frozen=True)
+class ConfiguracionStub:
+    """Latencia y errores inyectados por el proveedor local."""
+    latencia_ms: float = 0.0
+    jitter_ms: float = 0.0
+    tasa_error: float = 0.0
+    codigo_error: int = 503
+    latencia_embeddings_ms: float = 0.0
+    dimensiones: int = 256
+    semilla: int = 0
+
+
+StubConfig = ConfiguracionStub
+
+
+_configuracion: Optional[ConfiguracionStub] = None
+
+
+def configurar_proveedor_local(
+    latencia_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    tasa_error: float = 0.0,
+    codigo_error: int = 503,
+    latencia_embeddings_ms: float = 0.0,
+    dimensiones: int = 256,
+    semilla: int = 0
+) -> ConfiguracionStub:
+    """Configura los modelos local-stub creados a partir de ahora."""
+    global _configuracion
+    if not 0.0 <= tasa_error <= 1.0:
+        raise ValueError("tasa_error debe estar entre 0 y 1")
+    _configuracion = ConfiguracionStub(
+        latencia_ms=latencia_ms,
+        jitter_ms=jitter_ms,
+        tasa_error=tasa_error,
+        codigo_error=codigo_error,
+        latencia_embeddings_ms=latencia_embeddings_ms,
+        dimensiones=dimensiones,
+        semilla=semilla
+    )
+    return _configuracion
+
+
+configure_local_stub = configurar_proveedor_local
+
+
+def obtener_configuracion_local() -> ConfiguracionStub:
+    """Configuracion activa; por defecto se lee de VELORA_STUB_* (sin latencia ni errores)."""
+    if _configuracion is not None:
+        return _configuracion
+    return ConfiguracionStub(
+        latencia_ms=float(os.getenv("VELORA_STUB_LATENCIA_MS", "0")),
+        jitter_ms=float(os.getenv("VELORA_STUB_JITTER_MS", "0")),
+        tasa_error=float(os.getenv("VELORA_STUB_TASA_ERROR", "0")),
+        latencia_embeddings_ms=float(os.getenv("VELORA_STUB_LATENCIA_EMBEDDINGS_MS", "0")),
+    )
+
+
+get_local_stub_config = obtener_configuracion_local
+
+
+class ErrorProveedorLocal(RuntimeError):
+    """Fallo simulado. status_code permite ejercitar la deteccion de saturacion (429/529)."""
+    
+    def __init__(self, status_code: int):
+        super().__init__(f"Error simulado del proveedor local-stub (status {status_code})")
+        self.status_code = status_code
+
+
+LocalStubError = ErrorProveedorLocal
+
+
+# --- Analisis lexico determinista ---
+
+_PALABRAS_VACIAS = {
+    "de", "la", "el", "en", "y", "o", "a", "los", "las", "del", "con", "por", "para", "un", "una",
+    "al", "se", "su", "sus", "que", "como", "mas", "muy", "sobre", "entre", "anos", "minimo",
+    "experiencia", "conocimiento", "conocimientos", "nivel", "buen", "buenos", "solido", "solidos",
+    "the", "and", "or", "of", "in", "with", "for", "to", "an", "on", "at", "years", "year",
+    "experience", "knowledge", "strong", "good", "plus",
+}
+
+_VINETA = re.compile(r"^\s*(?:[-*•·▪‣]|\d+[.)])\s+(.*\S)\s*$")
+_DESEABLE = re.compile(
+    r"deseable|valorable|se valora|plus|nice to have|preferred|preferible|opcional|optional|bonus",
+    re.IGNORECASE
+)
+_REQUISITO_MATCHING = re.compile(r"^\s*-\s*\[(OBLIGATORY|OPTIONAL)\]\s*(.+?)\s*$", re.IGNORECASE)
+_AFIRMATIVO = re.compile(r"\b(si|yes|tengo|he trabajado|he usado|trabaje|utilice|anos|years|proyecto|proyectos)\b")
+_NEGATIVO = re.compile(r"^\s*no\b|\b(nunca|never|no tengo|sin experiencia|desconozco)\b")
+
+
+def _normalizar(texto: str) -> str:
+    sin_tildes = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in sin_tildes if not unicodedata.combining(c))
+
+
+def _terminos(texto: str) -> Set[str]:
+    return {
+        palabra for palabra in re.findall(r"[a-z0-9+#]+", _normalizar(texto))
+        if palabra not in _PALABRAS_VACIAS and (len(palabra) >= 3 or any(c.isdigit() or c in "+#" for c in palabra))
+    }
+
+
+def _solapamiento(terminos: Set[str], referencia: Set[str]) -> float:
+    return len(terminos & referencia) / len(terminos) if terminos else 0.0
+
+
+def _seccion(texto: str, inicio: str, *fines: str) -> Optional[str]:
+    posicion = texto.find(inicio)
+    if posicion < 0:
+        return None
+    resto = texto[posicion + len(inicio):]
+    for fin in fines:
+        if fin in resto:
+            resto = resto[:resto.find(fin)]
+    return resto.strip()
+
+
+def extraer_requisitos_stub(oferta: str) -> dict:
+    """Cada vineta es un requisito; es deseable si ella o su cabecera de seccion lo indican."""
+    requisitos = []
+    vistos = set()
+    seccion_deseable = False
+    
+    for linea in oferta.splitlines():
+        vineta = _VINETA.match(linea)
+        if not vineta:
+            if linea.strip() and len(linea.strip()) <= 80:
+                seccion_deseable = bool(_DESEABLE.search(linea))
+            continue
+        
+        descripcion = vineta.group(1).strip()
+        clave = descripcion.lower()
+        if clave in vistos:
+            continue
+        vistos.add(clave)
+        deseable = seccion_deseable or bool(_DESEABLE.search(descripcion))
+        requisitos.append({"description": descripcion, "type": "optional" if deseable else "obligatory"})
+    
+    return {"requirements": requisitos}
+
+
+def evaluar_matching_stub(mensaje: str) -> dict:
+    """Cumplido si al menos un tercio de los terminos del requisito aparecen en el CV."""
+    cv = _seccion(mensaje, "CV del candidato:", "PISTAS SEMANTICAS", "VEREDICTOS DE CRIBADO") or mensaje
+    lista = _seccion(mensaje, "Requisitos a evaluar:", "CV del candidato:") or ""
+    lineas_cv = [linea.strip() for linea in cv.splitlines() if linea.strip()]
+    terminos_cv = _terminos(cv)
+    
+    coincidencias = []
+    for linea in lista.splitlines():
+        requisito = _REQUISITO_MATCHING.match(linea)
+        if not requisito:
+            continue
+        descripcion = requisito.group(2)
+        terminos = _terminos(descripcion)
+        ratio = _solapamiento(terminos, terminos_cv)
+        mejor_linea = max(lineas_cv, key=lambda l: len(terminos & _terminos(l)), default=None)
+        
+        coincidencias.append({
+            "requirement_description": descripcion,
+            "fulfilled": ratio >= 1 / 3,
+            "found_in_cv": ratio > 0,
+            "evidence": mejor_linea[:200] if ratio > 0 and mejor_linea else None,
+            "confidence": "high" if ratio >= 0.8 else ("medium" if ratio >= 1 / 3 else "low"),
+            "reasoning": f"Coincidencia lexica: {len(terminos & terminos_cv)}/{len(terminos)} terminos"
+        })
+    
+    cumplidos = sum(1 for c in coincidencias if c["fulfilled"])
+    return {
+        "matches": coincidencias,
+        "analysis_summary": f"{cumplidos}/{len(coincidencias)} requisitos con coincidencia lexica en el CV (local-stub)."
+    }
+
+
+def cribar_matching_stub(mensaje: str) -> dict:
+    """Cribado ligero: mismo veredicto que evaluar_matching_stub, sin evidencia ni razonamiento."""
+    coincidencias = evaluar_matching_stub(mensaje)["matches"]
+    return {"matches": [
+        {clave: c[clave] for clave in ("requirement_description", "fulfilled", "confidence")}
+        for c in coincidencias
+    ]}
+
+
+def evaluar_respuesta_stub(mensaje: str) -> dict:
+    """Cumplido si la respuesta no es negativa y afirma experiencia o menciona el requisito."""
+    requisito = re.search(r"Requisito:\s*(.+)", mensaje)
+    respuesta = _seccion(mensaje, "Respuesta del candidato:") or ""
+    respuesta_normalizada = _normalizar(respuesta)
+    
+    ratio = _solapamiento(_terminos(requisito.group(1)) if requisito else set(), _terminos(respuesta))
+    afirmativa = bool(_AFIRMATIVO.search(respuesta_normalizada))
+    negativa = bool(_NEGATIVO.search(respuesta_normalizada))
+    cumplido = not negativa and (ratio >= 0.34 or afirmativa)
+    
+    return {
+        "fulfilled": cumplido,
+        "evidence": respuesta[:200] if cumplido else None,
+        "confidence": "high" if cumplido and afirmativa and ratio >= 0.5 else ("medium" if cumplido else "low")
+    }
+
+
+GENERADORES_ESTRUCTURADOS = {
+    "RespuestaExtraccionRequisitos": extraer_requisitos_stub,
+    "RespuestaMatchingCV": evaluar_matching_stub,
+    "RespuestaMatchingLigera": cribar_matching_stub,
+    "EvaluacionRespuesta": evaluar_respuesta_stub,
+}
+
+
+def _texto_libre(mensaje: str) -> str:
+    huella = hashlib.sha256(mensaje.encode("utf-8")).hexdigest()[:8]
+    primera_linea = next((linea.strip() for linea in mensaje.splitlines() if linea.strip()), "")
+    return f"[local-stub {huella}] {primera_linea[:160]}"
+
+
+def estimar_tokens(texto: str) -> int:
+    """Tokens aproximados (~4 caracteres por token) de las respuestas locales."""
+    return max(1, len(texto) // 4)
+
+
+estimate_tokens = estimar_tokens
+
+
+class _CachePrefijosStub:
+    """
+    Cache de prefijos al estilo de OpenAI: a partir de ~1024 tokens, el prompt se
+    reutiliza en tramos de ~128 tokens (aqui, caracteres / 4) ya vistos en llamadas previas.
+    """
+    
+    MINIMO = 4096
+    TRAMO = 512
+    
+    def __init__(self, capacidad: int = 20000):
+        self.capacidad = capacidad
+        self._huellas: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def consultar(self, texto: str) -> int:
+        """Caracteres del prefijo mas largo ya visto; registra los prefijos de esta llamada."""
+        datos = texto.encode("utf-8")
+        huellas = []
+        resumen = hashlib.blake2b(digest_size=16)
+        for fin in range(self.TRAMO, len(datos) + 1, self.TRAMO):
+            resumen.update(datos[fin - self.TRAMO:fin])
+            if fin >= self.MINIMO:
+                huellas.append((fin, resumen.copy().hexdigest()))
+        
+        with self._lock:
+            reutilizado = max((fin for fin, huella in huellas if huella in self._huellas), default=0)
+            for _, huella in huellas:
+                self._huellas[huella] = None
+                self._huellas.move_to_end(huella)
+            while len(self._huellas) > self.capacidad:
+                self._huellas.popitem(last=False)
+        return reutilizado
+
+
+_cache_prefijos = _CachePrefijosStub()
+
+
+# --- Modelos ---
+
+class ChatLocalStub(BaseChatModel):
+    """
+    Chat model determinista. with_structured_output enlaza el nombre del esquema
+    (response_format) y el contenido generado es JSON valido para ese esquema.
+    """
+    
+    model: str = MODELO_LOCAL
+    temperature: float = 0.0
+    top_p: Optional[float] = None
+    max_tokens: Optional[int] = None
+    latencia_ms: float = 0.0
+    jitter_ms: float = 0.0
+    tasa_error: float = 0.0
+    codigo_error: int = 503
+    semilla: int = 0
+    max_retries: int = 0
+    
+    _aleatorio: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    
+    def model_post_init(self, __context: Any) -> None:
+        self._aleatorio = random.Random(self.semilla)
+    
+    @property
+    def _llm_type(self) -> str:
+        return PROVEEDOR_LOCAL
+    
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model, "latencia_ms": self.latencia_ms, "tasa_error": self.tasa_error}
+    
+    def _get_ls_params(self, stop: Optional[List[str]] = None, **kwargs: Any) -> LangSmithParams:
+        return LangSmithParams(ls_provider=PROVEEDOR_LOCAL, ls_model_name=self.model, ls_model_type="chat")
+    
+    def with_structured_output(self, schema: Type[BaseModel], *, include_raw: bool = False, **kwargs: Any) -> Runnable:
+        nombre = schema.__name__
+        if include_raw or nombre not in GENERADORES_ESTRUCTURADOS:
+            motivo = "include_raw=True" if include_raw else f"el esquema '{nombre}'"
+            raise ValueError(
+                f"local-stub no admite {motivo}; esquemas soportados: {', '.join(sorted(GENERADORES_ESTRUCTURADOS))}"
+            )
+        return self.bind(response_format=nombre) | RunnableLambda(
+            lambda mensaje: schema.model_validate_json(mensaje.content),
+            name=f"parse_{nombre}"
+        )
+    
+    def _sortear(self) -> tuple:
+        with self._lock:
+            espera = max(0.0, self.latencia_ms + self._aleatorio.uniform(-self.jitter_ms, self.jitter_ms))
+            falla = self._aleatorio.random() < self.tasa_error
+        return espera / 1000, falla
+    
+    def _responder(self, mensajes: List[BaseMessage], response_format: Optional[str]) -> AIMessage:
+        humanos = [texto_contenido(m.content) for m in mensajes if m.type == "human"]
+        ultimo = humanos[-1] if humanos else ""
+        if response_format:
+            contenido = json.dumps(GENERADORES_ESTRUCTURADOS[response_format](ultimo), ensure_ascii=False)
+        else:
+            contenido = _texto_libre(ultimo)
+            if self.max_tokens is not None:
+                contenido = contenido[:self.max_tokens * 4]
+        
+        prompt = "".join(texto_contenido(m.content) for m in mensajes)
+        entrada = estimar_tokens(prompt)
+        cacheados = min(entrada, _cache_prefijos.consultar(prompt) // 4)
+        salida = estimar_tokens(contenido)
+        return AIMessage(
+            content=contenido,
+            usage_metadata={
+                "input_tokens": entrada,
+                "output_tokens": salida,
+                "total_tokens": entrada + salida,
+                "input_token_details": {"cache_read": cacheados}
+            },
+            response_metadata={"model_name": self.model}
+        )
+    
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        response_format: Optional[str] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        for intento in range(self.max_retries + 1):
+            espera, falla = self._sortear()
+            time.sleep(espera)
+            if not falla:
+                break
+            if intento == self.max_retries:
+                raise ErrorProveedorLocal(self.codigo_error)
+        return ChatResult(generations=[ChatGeneration(message=self._responder(messages, response_format))])
+    
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        response_format: Optional[str] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        for intento in range(self.max_retries + 1):
+            espera, falla = self._sortear()
+            await asyncio.sleep(espera)
+            if not falla:
+                break
+            if intento == self.max_retries:
+                raise ErrorProveedorLocal(self.codigo_error)
+        return ChatResult(generations=[ChatGeneration(message=self._responder(messages, response_format))])
+    
+    def _trocear(self, mensaje: AIMessage) -> Iterator[ChatGenerationChunk]:
+        palabras = re.findall(r"\S+\s*", mensaje.content) or [""]
+        for i, palabra in enumerate(palabras):
+            ultimo = i == len(palabras) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=palabra,
+                usage_metadata=mensaje.usage_metadata if ultimo else None
+            ))
+    
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        resultado = self._generate(messages, stop, **kwargs)
+        for chunk in self._trocear(resultado.generations[0].message):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+    
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        resultado = await self._agenerate(messages, stop, **kwargs)
+        for chunk in self._trocear(resultado.generations[0].message):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+LocalStubChatModel = ChatLocalStub
+
+
+class EmbeddingsLocalStub(Embeddings):
+    """
+    Pseudo-embeddings por hashing de terminos (feature hashing con signo, normalizados L2).
+    Textos con vocabulario comun quedan cerca, asi que la busqueda semantica sigue siendo util.
+    """
+    
+    def __init__(self, dimensiones: int = 256, latencia_ms: float = 0.0, tasa_error: float = 0.0, codigo_error: int = 503, semilla: int = 0):
+        self.dimensiones = dimensiones
+        self.latencia_ms = latencia_ms
+        self.tasa_error = tasa_error
+        self.codigo_error = codigo_error
+        self._aleatorio = random.Random(semilla)
+        self._lock = threading.Lock()
+    
+    def _vector(self, texto: str) -> List[float]:
+        vector = [0.0] * self.dimensiones
+        for termino in sorted(_terminos(texto)) or [""]:
+            huella = hashlib.blake2b(termino.encode("utf-8"), digest_size=8).digest()
+            indice = int.from_bytes(huella[:4], "little") % self.dimensiones
+            vector[indice] += 1.0 if huella[4] & 1 else -1.0
+        norma = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norma for v in vector]
+    
+    def _falla(self) -> bool:
+        with self._lock:
+            return self._aleatorio.random() < self.tasa_error
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latencia_ms / 1000)
+        if self._falla():
+            raise ErrorProveedorLocal(self.codigo_error)
+        return [self._vector(texto) for texto in texts]
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latencia_ms / 1000)
+        if self._falla():
+            raise ErrorProveedorLocal(self.codigo_error)
+        return [self._vector(texto) for texto in texts]
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+LocalStubEmbeddings = EmbeddingsLocalStub
+
+
+def kwargs_chat_local() -> Dict[str, Any]:
+    configuracion = asdict(obtener_configuracion_local())
+    configuracion.pop("latencia_embeddings_ms")
+    configuracion.pop("dimensiones")
+    return configuracion
+
+
+def kwargs_embeddings_local() -> Dict[str, Any]:
+    configuracion = obtener_configuracion_local()
+    return {
+        "dimensiones": configuracion.dimensiones,
+        "latencia_ms": configuracion.latencia_embeddings_ms,
+        "tasa_error": configuracion.tasa_error,
+        "codigo_error": configuracion.codigo_error,
+        "semilla": configuracion.semilla,
+    }
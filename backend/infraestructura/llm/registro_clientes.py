@@ -0,0 +1,141 @@
+"""
+Registro de clientes: reutiliza instancias de LLM y embeddings en todo el proceso.
+Cada instancia conserva su cliente HTTP, evitando repetir el handshake TLS en cada rerun.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def calcular_huella_api_key(api_key: Optional[str]) -> str:
+    """Huella corta de la API key para usarla en claves sin exponer el secreto."""
+    if not api_key:
+        return "sin-key"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+fingerprint_api_key = calcular_huella_api_key
+
+
+def _valor_clave(nombre: str, valor: Any) -> Hashable:
+    if "api_key" in nombre:
+        return calcular_huella_api_key(valor)
+    if valor is None or isinstance(valor, (str, int, float, bool)):
+        return valor
+    if isinstance(valor, (list, tuple)):
+        return tuple(_valor_clave(nombre, elemento) for elemento in valor)
+    return (type(valor).__name__, id(valor))
+
+
+def construir_clave(tipo: str, proveedor: str, kwargs: Dict[str, Any]) -> Tuple:
+    """Clave estable a partir de los kwargs de construccion (la API key se reduce a huella)."""
+    return (tipo, proveedor) + tuple(sorted((k, _valor_clave(k, v)) for k, v in kwargs.items()))
+
+
+build_client_key = construir_clave
+
+
+class RegistroClientes:
+    """
+    Registro thread-safe de clientes por clave (proveedor, modelo, temperatura, huella de key).
+    Expulsa entradas inactivas mas alla del TTL y las menos usadas si se supera el maximo.
+    """
+    
+    def __init__(self, ttl_inactividad: float = 1800.0, max_clientes: int = 64):
+        self.ttl_inactividad = ttl_inactividad
+        self.max_clientes = max_clientes
+        self._clientes: "OrderedDict[Tuple, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.creados = 0
+        self.reutilizados = 0
+        self.expulsados = 0
+    
+    def obtener_o_crear(self, clave: Tuple, constructor: Callable[[], Any]) -> Any:
+        ahora = time.monotonic()
+        with self._lock:
+            self._expulsar_inactivos(ahora)
+            entrada = self._clientes.get(clave)
+            if entrada is not None:
+                entrada[1] = ahora
+                self._clientes.move_to_end(clave)
+                self.reutilizados += 1
+                return entrada[0]
+        
+        cliente = constructor()
+        
+        with self._lock:
+            entrada = self._clientes.get(clave)
+            if entrada is not None:
+                self.reutilizados += 1
+                return entrada[0]
+            self._clientes[clave] = [cliente, ahora]
+            self.creados += 1
+            while len(self._clientes) > self.max_clientes:
+                self._clientes.popitem(last=False)
+                self.expulsados += 1
+        return cliente
+    
+    get_or_create = obtener_o_crear
+    
+    def _expulsar_inactivos(self, ahora: float) -> None:
+        caducadas = [
+            clave for clave, (_, ultimo_uso) in self._clientes.items()
+            if ahora - ultimo_uso > self.ttl_inactividad
+        ]
+        for clave in caducadas:
+            del self._clientes[clave]
+        self.expulsados += len(caducadas)
+    
+    def expulsar_inactivos(self) -> int:
+        with self._lock:
+            antes = len(self._clientes)
+            self._expulsar_inactivos(time.monotonic())
+            return antes - len(self._clientes)
+    
+    evict_idle = expulsar_inactivos
+    
+    @property
+    def cantidad_activos(self) -> int:
+        with self._lock:
+            return len(self._clientes)
+    
+    @property
+    def live_count(self) -> int:
+        return self.cantidad_activos
+    
+    def estadisticas(self) -> dict:
+        with self._lock:
+            por_tipo: Dict[str, int] = {}
+            for clave in self._clientes:
+                por_tipo[clave[0]] = por_tipo.get(clave[0], 0) + 1
+            return {
+                "live": len(self._clientes),
+                "live_by_type": por_tipo,
+                "created": self.creados,
+                "reused": self.reutilizados,
+                "evicted": self.expulsados,
+            }
+    
+    get_stats = estadisticas
+    
+    def limpiar(self) -> None:
+        with self._lock:
+            self._clientes.clear()
+    
+    clear = limpiar
+
+
+ClientRegistry = RegistroClientes
+
+
+_registro_clientes = RegistroClientes()
+
+
+def obtener_registro_clientes() -> RegistroClientes:
+    return _registro_clientes
+
+
+get_client_registry = obtener_registro_clientes
@@ -0,0 +1,123 @@
+"""
+Salida estructurada incremental.
+Mientras el modelo genera el JSON de una respuesta estructurada, cada objeto de una lista
+(p. ej. "matches") se emite en cuanto se cierra, sin esperar al resto de la respuesta.
+Funciona con JSON en el contenido (json_schema) y con argumentos de tool calls.
+"""
+
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessageChunk
+from langchain_core.runnables import Runnable
+
+
+class ExtractorObjetosJSON:
+    """
+    Lee un JSON por fragmentos y devuelve los objetos completos de la lista bajo `campo`
+    en el objeto raiz. No valida el resto del documento: eso lo hace el parser final.
+    """
+    
+    def __init__(self, campo: str):
+        self.campo = campo
+        self._pila: List[str] = []
+        self._en_cadena = False
+        self._escape = False
+        self._inicio_cadena = 0
+        self._ultima_cadena: Optional[str] = None
+        self._ultima_clave: Optional[str] = None
+        self._nivel_lista: Optional[int] = None
+        self._inicio_objeto: Optional[int] = None
+        self._texto = ""
+    
+    def alimentar(self, fragmento: str) -> List[dict]:
+        """Anade un fragmento y devuelve los objetos de la lista cerrados en el."""
+        objetos = []
+        inicio = len(self._texto)
+        self._texto += fragmento
+        for i in range(inicio, len(self._texto)):
+            caracter = self._texto[i]
+            if self._en_cadena:
+                if self._escape:
+                    self._escape = False
+                elif caracter == "\\":
+                    self._escape = True
+                elif caracter == '"':
+                    self._en_cadena = False
+                    self._ultima_cadena = self._texto[self._inicio_cadena + 1:i]
+                continue
+            
+            if caracter == '"':
+                self._en_cadena = True
+                self._inicio_cadena = i
+            elif caracter == ":":
+                self._ultima_clave = self._ultima_cadena
+            elif caracter in "{[":
+                if caracter == "[" and self._pila == ["{"] and self._ultima_clave == self.campo:
+                    self._nivel_lista = 2
+                elif caracter == "{" and self._nivel_lista is not None and len(self._pila) == self._nivel_lista:
+                    self._inicio_objeto = i
+                self._pila.append(caracter)
+            elif caracter in "}]" and self._pila:
+                self._pila.pop()
+                if caracter == "}" and self._inicio_objeto is not None and len(self._pila) == self._nivel_lista:
+                    try:
+                        objetos.append(json.loads(self._texto[self._inicio_objeto:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._inicio_objeto = None
+                elif caracter == "]" and self._nivel_lista is not None and len(self._pila) < self._nivel_lista:
+                    self._nivel_lista = None
+        return objetos
+
+
+IncrementalJSONObjectExtractor = ExtractorObjetosJSON
+
+
+def texto_fragmento(fragmento: Any) -> str:
+    """Texto JSON de un fragmento de streaming: contenido o argumentos de tool call."""
+    if not isinstance(fragmento, AIMessageChunk):
+        return ""
+    if fragmento.tool_call_chunks:
+        return "".join(c.get("args") or "" for c in fragmento.tool_call_chunks)
+    contenido = fragmento.content
+    if isinstance(contenido, str):
+        return contenido
+    return "".join(
+        bloque.get("text") or bloque.get("partial_json") or ""
+        for bloque in contenido if isinstance(bloque, dict)
+    )
+
+
+chunk_text = texto_fragmento
+
+
+async def ainvocar_con_elementos(
+    runnable: Runnable,
+    entrada: Any,
+    campo: str,
+    al_emitir: Callable[[dict], None]
+) -> Any:
+    """
+    Ejecuta el runnable en streaming y llama a al_emitir con cada objeto de la lista `campo`
+    en cuanto se cierra. Devuelve la salida final (validada) del runnable.
+    Si hay varias llamadas al modelo (p. ej. cobertura), cada una tiene su extractor.
+    """
+    extractores: Dict[str, ExtractorObjetosJSON] = {}
+    id_raiz = None
+    resultado = None
+    async for evento in runnable.astream_events(entrada, version="v2"):
+        tipo = evento["event"]
+        if id_raiz is None:
+            # El primer evento es el inicio del propio runnable (puede tener padres si corre en un grafo)
+            id_raiz = evento["run_id"]
+        if tipo == "on_chat_model_stream":
+            extractor = extractores.setdefault(evento["run_id"], ExtractorObjetosJSON(campo))
+            for objeto in extractor.alimentar(texto_fragmento(evento["data"].get("chunk"))):
+                al_emitir(objeto)
+        elif tipo.endswith("_end") and evento["run_id"] == id_raiz:
+            resultado = evento["data"].get("output")
+    return resultado
+
+
+ainvoke_with_items = ainvocar_con_elementos
@@ -0,0 +1,161 @@
+"""
+Troceado de CVs en una sola pasada.
+Recorre el texto linea a linea detectando encabezados de seccion y parrafos, y empaqueta
+bloques contiguos de la misma seccion. Solo los parrafos que no caben se cortan en ventanas
+con solapamiento, y cada ventana avanza siempre: el coste es lineal y no hay duplicados.
+Cada fragmento es un corte exacto del texto original (offsets estables).
+"""
+
+import itertools
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+
+# Encabezado: linea corta (hasta 60 caracteres sin la sangria) con una seccion conocida o en
+# mayusculas, que puede llevar cifras y signos ("PROYECTO 1", "SQL-2"). "Experiencia con
+# Python en..." no es encabezado.
+_LONGITUD_MAXIMA_ENCABEZADO = 60
+_SECCIONES = (
+    "EXPERIENCIA", "EXPERIENCE", "FORMACI[OÓ]N", "EDUCACI[OÓ]N", "EDUCATION", "HABILIDADES", "SKILLS",
+    "IDIOMAS", "LANGUAGES", "PROYECTOS", "PROJECTS", "CERTIFICACIONES", "CERTIFICATIONS",
+    "PERFIL", "PROFILE", "RESUMEN", "SUMMARY",
+)
+_ENCABEZADO = re.compile(
+    r"(?i:" + "|".join(_SECCIONES) + r")\b.*"
+    r"|[A-ZÁÉÍÓÚÑ]{3,}[A-ZÁÉÍÓÚÑ0-9.\-][A-ZÁÉÍÓÚÑ0-9 \t/&.\-]*:?[ \t]*"
+)
+# Lineas que pueden cerrar un bloque: en blanco o empezadas como un encabezado. Las demas
+# (la mayoria) se saltan dentro del motor de regex sin pasar por Python.
+_CANDIDATA = re.compile(
+    r"\n[ \t]*(?=\n|[A-ZÁÉÍÓÚÑ]{3}|(?i:" + "|".join(sorted({s[:3] for s in _SECCIONES})) + "))"
+)
+_CORTE = re.compile(r"[\s.]")
+
+
+@dataclass(frozen=True)
+class FragmentoCV:
+    """Fragmento del CV: texto == texto_cv[inicio:fin]; seccion es el encabezado que lo contiene."""
+    texto: str
+    inicio: int
+    fin: int
+    seccion: Optional[str] = None
+
+
+CVChunk = FragmentoCV
+
+
+def _bloques(texto: str) -> List[Tuple[int, int, Optional[str]]]:
+    """
+    Parrafos (inicio, fin, encabezado si el bloque abre una seccion) en orden. Cada bloque
+    termina en una linea en blanco o en un encabezado; solo se examinan las lineas candidatas.
+    """
+    bloques = []
+    inicio, encabezado, fin_encabezado = 0, None, 0
+    
+    def cerrar(fin: int):
+        if texto[inicio:fin].strip():
+            bloques.append((inicio, fin, encabezado))
+    
+    longitud = len(texto)
+    for posicion in itertools.chain((0,), (candidata.start() + 1 for candidata in _CANDIDATA.finditer(texto))):
+        fin_linea = texto.find("\n", posicion)
+        if fin_linea == -1:
+            fin_linea = longitud
+        contenido = texto[posicion:fin_linea].lstrip(" \t")
+        
+        if not contenido:
+            # Linea en blanco entre dos saltos; las que siguen a un encabezado no lo separan de su contenido
+            if 0 < posicion and fin_linea < longitud and (encabezado is None or texto[fin_encabezado:posicion - 1].strip()):
+                cerrar(posicion - 1)
+                inicio, encabezado = fin_linea, None
+        elif len(contenido) <= _LONGITUD_MAXIMA_ENCABEZADO and _ENCABEZADO.fullmatch(contenido):
+            cerrar(max(0, posicion - 1))
+            inicio, encabezado, fin_encabezado = posicion, contenido.strip().rstrip(":"), fin_linea
+    cerrar(longitud)
+    return bloques
+
+
+def _ventanas(texto: str, inicio: int, fin: int, tamano_chunk: int, solapamiento: int) -> List[Tuple[int, int]]:
+    """
+    Ventanas de hasta tamano_chunk sobre [inicio, fin), cortadas en el ultimo espacio o punto.
+    Cada ventana empieza despues que la anterior, asi que se recorre el texto una sola vez.
+    """
+    ventanas = []
+    while fin - inicio > tamano_chunk:
+        limite = inicio + tamano_chunk
+        # El corte debe dejar sitio al solapamiento para que la siguiente ventana avance
+        corte = max(texto.rfind(c, inicio + solapamiento + 1, limite) for c in " \n.") + 1
+        if corte <= 0:
+            corte = limite
+        ventanas.append((inicio, corte))
+        
+        siguiente = _CORTE.search(texto, corte - solapamiento, corte)
+        inicio = siguiente.end() if siguiente and siguiente.end() < corte else corte - solapamiento
+    ventanas.append((inicio, fin))
+    return ventanas
+
+
+def trocear_cv(
+    texto: str,
+    tamano_chunk: int = 800,
+    solapamiento: int = 150,
+    longitud_minima: int = 30
+) -> List[FragmentoCV]:
+    """
+    Fragmentos del CV en orden. Si el CV no cabe en un fragmento, cada encabezado de seccion
+    abre uno nuevo; los parrafos se agrupan hasta el doble de tamano_chunk y los que superan
+    ese limite se cortan en ventanas de tamano_chunk. Los fragmentos
+    mas cortos que longitud_minima se unen al anterior y los textos repetidos se descartan.
+    """
+    solapamiento = max(0, min(solapamiento, tamano_chunk // 2))
+    respetar_secciones = len(texto) > tamano_chunk
+    # Como el troceado anterior: una seccion de hasta el doble de tamano_chunk no se parte
+    maximo = tamano_chunk * 2
+    tramos: List[Tuple[int, int, Optional[str]]] = []
+    actual: Optional[List] = None
+    seccion = None
+    
+    def cerrar():
+        nonlocal actual
+        if actual is not None:
+            tramos.append(tuple(actual))
+            actual = None
+    
+    for inicio, fin, encabezado in _bloques(texto):
+        seccion = encabezado or seccion
+        if actual is not None:
+            if encabezado and respetar_secciones and actual[1] - actual[0] >= longitud_minima:
+                cerrar()
+            elif fin - actual[0] > maximo:
+                cerrar()
+        
+        if fin - inicio > maximo:
+            cerrar()
+            tramos.extend((a, b, seccion) for a, b in _ventanas(texto, inicio, fin, tamano_chunk, solapamiento))
+        elif actual is None:
+            actual = [inicio, fin, seccion]
+        else:
+            actual[1] = fin
+    cerrar()
+    
+    fragmentos: List[FragmentoCV] = []
+    vistos = set()
+    for inicio, fin, seccion_tramo in tramos:
+        while inicio < fin and texto[inicio].isspace():
+            inicio += 1
+        while fin > inicio and texto[fin - 1].isspace():
+            fin -= 1
+        if inicio == fin:
+            continue
+        if fin - inicio < longitud_minima and fragmentos:
+            anterior = fragmentos.pop()
+            inicio, seccion_tramo = anterior.inicio, anterior.seccion
+        contenido = texto[inicio:fin]
+        if contenido and contenido not in vistos:
+            vistos.add(contenido)
+            fragmentos.append(FragmentoCV(contenido, inicio, fin, seccion_tramo))
+    return [f for f in fragmentos if len(f.texto) >= longitud_minima]
+
+
+chunk_cv = trocear_cv
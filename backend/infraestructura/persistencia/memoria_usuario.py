@@ -41,6 +41,7 @@ class EvaluacionEnriquecida(BaseModel):
     provider: str = Field(...)
     model: str = Field(...)
     full_evaluation: Dict[str, Any] = Field(default_factory=dict)
+    usage: Optional[Dict[str, Any]] = Field(None)
 
 
 EnrichedEvaluation = EvaluacionEnriquecida
@@ -165,6 +166,8 @@ def crear_evaluacion_enriquecida(
     
     eval_completa = resultado_evaluacion.model_dump() if resultado_evaluacion else {"phase1_result": resultado_fase1.model_dump()}
     
+    consumo = resultado_evaluacion.consumo if resultado_evaluacion else resultado_fase1.consumo
+    
     return EvaluacionEnriquecida(
         evaluation_id=eval_id, user_id=id_usuario, timestamp=timestamp, score=puntuacion,
         status=estado, phase_completed="phase2" if fase2_completada else "phase1",
@@ -175,7 +178,8 @@ def crear_evaluacion_enriquecida(
         unfulfilled_optional_count=len(opcionales_no_cumplidos),
         rejection_reason=razon_rechazo, gap_summary=resumen_brechas,
         strengths_summary=resumen_fortalezas, searchable_text=texto_buscable,
-        provider=proveedor, model=modelo, full_evaluation=eval_completa
+        provider=proveedor, model=modelo, full_evaluation=eval_completa,
+        usage=consumo.resumen() if consumo else None
     )
 
 
@@ -288,6 +292,32 @@ class MemoriaUsuario:
     
     get_average_score = obtener_puntuacion_promedio
     
+    def obtener_consumo_agregado(self, id_usuario: str) -> Dict[str, Any]:
+        """Suma el consumo registrado (tokens, coste, latencia) de las evaluaciones del usuario, total y por etapa."""
+        campos = ("calls", "cached_calls", "input_tokens", "cached_input_tokens", "output_tokens", "duration_ms", "cost_usd")
+        total = dict.fromkeys(campos, 0)
+        etapas: Dict[str, Dict[str, Any]] = {}
+        evaluaciones_con_consumo = 0
+        
+        for evaluacion in self.obtener_evaluaciones(id_usuario):
+            uso = evaluacion.get("usage")
+            if not uso:
+                continue
+            evaluaciones_con_consumo += 1
+            for campo in campos:
+                total[campo] += uso.get(campo, 0)
+            for etapa, valores in uso.get("stages", {}).items():
+                acumulado = etapas.setdefault(etapa, dict.fromkeys(campos, 0))
+                for campo in campos:
+                    acumulado[campo] += valores.get(campo, 0)
+        
+        total["cost_usd"] = round(total["cost_usd"], 6)
+        for valores in [total, *etapas.values()]:
+            valores["cached_input_ratio"] = round(valores["cached_input_tokens"] / valores["input_tokens"], 3) if valores["input_tokens"] else 0.0
+        return {**total, "evaluations": evaluaciones_con_consumo, "stages": etapas}
+    
+    get_usage_summary = obtener_consumo_agregado
+    
     def limpiar_datos_usuario(self, id_usuario: str) -> bool:
         archivo = self.ruta_almacenamiento / f"{id_usuario}.json"
         try:
@@ -3,7 +3,7 @@ Modelos de datos Velora - Estructuras Pydantic para validación y tipado.
 Incluye modelos para Structured Output de LangChain.
 """
 
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from pydantic import BaseModel, Field
 from enum import Enum
 
@@ -67,6 +67,18 @@ class RespuestaMatchingCV(BaseModel):
     analysis_summary: str = Field(...)
 
 
+class ResultadoMatchingLigero(BaseModel):
+    """Veredicto de cribado requisito vs CV, sin evidencia ni razonamiento."""
+    requirement_description: str = Field(...)
+    fulfilled: bool = Field(...)
+    confidence: Literal["high", "medium", "low"] = Field(...)
+
+
+class RespuestaMatchingLigera(BaseModel):
+    """Respuesta LLM: matching de cribado con salida minima."""
+    matches: List[ResultadoMatchingLigero] = Field(...)
+
+
 class EvaluacionRespuesta(BaseModel):
     """Evaluación de respuesta del candidato en entrevista."""
     fulfilled: bool = Field(...)
@@ -74,6 +86,71 @@ class EvaluacionRespuesta(BaseModel):
     confidence: Literal["high", "medium", "low"] = Field(...)
 
 
+# Modelos de consumo (tokens, coste y latencia por llamada)
+class ConsumoLlamada(BaseModel):
+    """Consumo de una llamada a LLM o embeddings."""
+    
+    etapa: str = Field(..., alias="stage")
+    tipo: Literal["llm", "embedding"] = Field(default="llm", alias="kind")
+    proveedor: Optional[str] = Field(None, alias="provider")
+    modelo: str = Field(..., alias="model")
+    tokens_entrada: int = Field(default=0, alias="input_tokens")
+    tokens_salida: int = Field(default=0, alias="output_tokens")
+    tokens_entrada_cacheados: int = Field(default=0, alias="cached_input_tokens")
+    duracion_ms: int = Field(default=0, alias="duration_ms")
+    coste_usd: float = Field(default=0.0, alias="cost_usd")
+    desde_cache: bool = Field(default=False, alias="cached")
+    
+    class Config:
+        populate_by_name = True
+
+
+class ConsumoEvaluacion(BaseModel):
+    """Llamadas realizadas durante una evaluacion y sus totales."""
+    
+    llamadas: List[ConsumoLlamada] = Field(default_factory=list, alias="calls")
+    
+    class Config:
+        populate_by_name = True
+    
+    def combinar(self, otro: Optional["ConsumoEvaluacion"]) -> "ConsumoEvaluacion":
+        if otro is None:
+            return self
+        return ConsumoEvaluacion(llamadas=self.llamadas + otro.llamadas)
+    
+    combine = combinar
+    
+    def totales(self) -> Dict[str, float]:
+        tokens_entrada = sum(l.tokens_entrada for l in self.llamadas)
+        tokens_cacheados = sum(l.tokens_entrada_cacheados for l in self.llamadas)
+        return {
+            "calls": len(self.llamadas),
+            "cached_calls": sum(1 for l in self.llamadas if l.desde_cache),
+            "input_tokens": tokens_entrada,
+            "cached_input_tokens": tokens_cacheados,
+            "cached_input_ratio": round(tokens_cacheados / tokens_entrada, 3) if tokens_entrada else 0.0,
+            "output_tokens": sum(l.tokens_salida for l in self.llamadas),
+            "duration_ms": sum(l.duracion_ms for l in self.llamadas),
+            "cost_usd": round(sum(l.coste_usd for l in self.llamadas), 6),
+        }
+    
+    totals = totales
+    
+    def por_etapa(self) -> Dict[str, Dict[str, float]]:
+        etapas: Dict[str, List[ConsumoLlamada]] = {}
+        for llamada in self.llamadas:
+            etapas.setdefault(llamada.etapa, []).append(llamada)
+        return {etapa: ConsumoEvaluacion(llamadas=llamadas).totales() for etapa, llamadas in etapas.items()}
+    
+    by_stage = por_etapa
+    
+    def resumen(self) -> dict:
+        """Totales y desglose por etapa (lo que se persiste en EvaluacionEnriquecida)."""
+        return {**self.totales(), "stages": self.por_etapa()}
+    
+    summary = resumen
+
+
 # Modelos de resultados
 class ResultadoFase1(BaseModel):
     """Resultado del análisis automático CV vs Oferta."""
@@ -84,6 +161,7 @@ class ResultadoFase1(BaseModel):
     requisitos_no_cumplidos: List[Requisito] = Field(default_factory=list, alias="unfulfilled_requirements")
     requisitos_faltantes: List[str] = Field(default_factory=list, alias="missing_requirements")
     resumen_analisis: str = Field(..., alias="analysis_summary")
+    consumo: Optional[ConsumoEvaluacion] = Field(None, alias="usage")
 
     class Config:
         populate_by_name = True
@@ -123,6 +201,7 @@ class ResultadoEvaluacion(BaseModel):
     requisitos_finales_no_cumplidos: List[Requisito] = Field(default_factory=list, alias="final_unfulfilled_requirements")
     descartado_final: bool = Field(..., alias="final_discarded")
     resumen_evaluacion: str = Field(..., alias="evaluation_summary")
+    consumo: Optional[ConsumoEvaluacion] = Field(None, alias="usage")
 
     class Config:
         populate_by_name = True
@@ -141,3 +220,7 @@ CVMatchingResponse = RespuestaMatchingCV
 ResponseEvaluation = EvaluacionRespuesta
 ExtractedRequirement = RequisitoExtraido
 RequirementMatch = ResultadoMatching
+LeanRequirementMatch = ResultadoMatchingLigero
+LeanCVMatchingResponse = RespuestaMatchingLigera
+CallUsage = ConsumoLlamada
+EvaluationUsage = ConsumoEvaluacion
@@ -2,7 +2,10 @@
 Capa de Núcleo: Lógica de negocio central del sistema Velora.
 """
 
-from .analisis import AnalizadorFase1, Phase1Analyzer
+from .analisis import (
+    AnalizadorFase1, Phase1Analyzer,
+    ProcesadorLotesFase1, Phase1BatchProcessor,
+)
 from .entrevista import EntrevistadorFase2, Phase2Interviewer, AgenticInterviewer
 from .historial import (
     AlmacenVectorialHistorial, HistoryVectorStore,
@@ -12,6 +15,7 @@ from .historial import (
 
 __all__ = [
     "AnalizadorFase1", "Phase1Analyzer",
+    "ProcesadorLotesFase1", "Phase1BatchProcessor",
     "EntrevistadorFase2", "Phase2Interviewer", "AgenticInterviewer",
     "AlmacenVectorialHistorial", "HistoryVectorStore",
     "AsistenteHistorial", "HistoryChatbot",
@@ -3,5 +3,9 @@ Módulo de Análisis: Fase 1 - Extracción de requisitos y matching con CV.
 """
 
 from .analizador import AnalizadorFase1, Phase1Analyzer
+from .lotes import ProcesadorLotesFase1, Phase1BatchProcessor
 
-__all__ = ["AnalizadorFase1", "Phase1Analyzer"]
+__all__ = [
+    "AnalizadorFase1", "Phase1Analyzer",
+    "ProcesadorLotesFase1", "Phase1BatchProcessor",
+]
@@ -5,28 +5,222 @@ Uso Structured Output para respuestas validas garantizadas.
 Incluye normalizacion atomica post-extraccion para reproducibilidad.
 """
 
+import asyncio
 import re
 import time
-from typing import List, Optional, Dict, AsyncGenerator
+from typing import List, Optional, Dict, AsyncGenerator, Tuple, Union
 from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
 
 from ...modelos import (
     ResultadoFase1, TipoRequisito,
-    RespuestaExtraccionRequisitos, RespuestaMatchingCV
+    RespuestaExtraccionRequisitos, RespuestaMatchingCV, RespuestaMatchingLigera,
+    ResultadoMatching, ResultadoMatchingLigero
 )
-from ...recursos import PROMPT_EXTRACCION_REQUISITOS, PROMPT_MATCHING_CV
+from ...recursos import PROMPT_EXTRACCION_REQUISITOS, PROMPT_MATCHING_CV, PROMPT_MATCHING_CV_LIGERO
 from ...infraestructura.llm import (
     FabricaLLM, FabricaEmbeddings,
-    ConfiguracionHiperparametros, ComparadorSemantico
+    ConfiguracionHiperparametros, ComparadorSemantico,
+    medir_consumo, etiquetar_etapa, bloques_prefijo
 )
 from ...utilidades import (
     calcular_puntuacion, procesar_coincidencias,
     agregar_requisitos_no_procesados, obtener_registro_operacional,
-    obtener_contexto_prompt
+    obtener_contexto_prompt, seleccionar_para_escalado, fusionar_escalado,
+    es_candidato_apto, fusionar_detalle,
+    dividir_requisitos_en_lotes, fusionar_coincidencias_lotes, resumir_coincidencias
 )
 
 
+# Similitud coseno minima para mostrar una pista semantica al LLM
+# (equivale al antiguo 0.4 sobre 1/(1+L2^2) con embeddings normalizados)
+UMBRAL_PISTA_SEMANTICA = 0.25
+# Cobertura lexica minima (fraccion del IDF del requisito en el fragmento) para dar la pista sin similitud
+UMBRAL_PISTA_LEXICA = 0.5
+
+
+def crear_prompt_extraccion() -> ChatPromptTemplate:
+    """Prompt de extraccion de requisitos (entrada: job_offer)."""
+    return ChatPromptTemplate.from_messages([
+        ("system", PROMPT_EXTRACCION_REQUISITOS),
+        ("human", "{job_offer}")
+    ])
+
+
+def normalizar_requisitos(resultado: RespuestaExtraccionRequisitos) -> List[dict]:
+    """Requisitos extraidos sin duplicados, como dicts description/type."""
+    requisitos = []
+    vistos = set()
+    
+    for req in resultado.requirements:
+        clave = req.description.lower().strip()
+        if clave not in vistos:
+            vistos.add(clave)
+            requisitos.append({
+                "description": req.description.strip(),
+                "type": req.type
+            })
+    
+    return requisitos
+
+
+def crear_prompt_matching(
+    cv: str,
+    requisitos: List[dict],
+    evidencia_semantica: Optional[Dict[str, dict]] = None,
+    veredictos: Optional[List[dict]] = None,
+    ligero: bool = False
+) -> Tuple[ChatPromptTemplate, dict]:
+    """
+    Prompt de matching y sus entradas, ordenado de lo estable a lo variable para la cache
+    de prefijos: sistema, fecha y requisitos (comunes a los CV de una oferta) y despues
+    el CV con sus pistas semanticas. Con ligero, el sistema pide solo veredicto y confianza;
+    con veredictos (del cribado), se pide la evidencia y el razonamiento que los justifican.
+    """
+    texto_requisitos = "\n".join(f"- [{req['type'].upper()}] {req['description']}" for req in requisitos)
+    
+    pistas = []
+    for req in requisitos:
+        ev_sem = (evidencia_semantica or {}).get(req['description'].lower())
+        if not ev_sem:
+            continue
+        cobertura = ev_sem.get('lexical_coverage')
+        if ev_sem.get('semantic_score', 0) > UMBRAL_PISTA_SEMANTICA or (cobertura or 0) >= UMBRAL_PISTA_LEXICA:
+            scores = f"Score: {ev_sem['semantic_score']:.2f}" + (f", cobertura lexica: {cobertura:.2f}" if cobertura is not None else "")
+            pistas.append(f"- {req['description']} [{scores}]: \"{ev_sem['text'][:150]}...\"")
+    texto_pistas = "\n\nPISTAS SEMANTICAS (fragmentos del CV similares a cada requisito):\n" + "\n".join(pistas) if pistas else ""
+    
+    texto_veredictos = ""
+    if veredictos:
+        texto_veredictos = "\n\nVEREDICTOS DE CRIBADO (manten fulfilled y confidence; aporta found_in_cv, evidence y reasoning):\n" + "\n".join(
+            f"- {v['requirement_description']}: {'CUMPLE' if v['fulfilled'] else 'NO CUMPLE'} ({v['confidence']})"
+            for v in veredictos
+        )
+    
+    contexto_temporal = obtener_contexto_prompt()
+    
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", PROMPT_MATCHING_CV_LIGERO if ligero else PROMPT_MATCHING_CV),
+        ("human", bloques_prefijo(
+            f"CONTEXTO TEMPORAL: {contexto_temporal}\n\nRequisitos a evaluar:\n{{requirements_list}}",
+            "\n\nCV del candidato:\n{cv}{semantic_hints}{screening_verdicts}"
+        ))
+    ])
+    
+    return prompt, {
+        "requirements_list": texto_requisitos,
+        "cv": cv,
+        "semantic_hints": texto_pistas,
+        "screening_verdicts": texto_veredictos
+    }
+
+
+def construir_mapa_evidencia(
+    requisitos: List[dict],
+    evidencias: Dict[str, list],
+    coberturas: Optional[Dict[str, float]] = None
+) -> Dict[str, dict]:
+    """
+    Mejor fragmento y score de cada requisito (clave: descripcion en minusculas), con la
+    cobertura lexica del fragmento si se da (ComparadorSemantico.coberturas_lexicas).
+    """
+    mapa_evidencia = {}
+    for req in requisitos:
+        evidencia = evidencias.get(req["description"])
+        if evidencia:
+            mejor_texto, mejor_score = evidencia[0]
+            mapa_evidencia[req["description"].lower()] = {
+                "text": mejor_texto,
+                "semantic_score": mejor_score,
+                "lexical_coverage": (coberturas or {}).get(req["description"]),
+                "all_evidence": evidencia
+            }
+    return mapa_evidencia
+
+
+build_evidence_map = construir_mapa_evidencia
+
+
+def coincidencia_a_dict(
+    match: Union[ResultadoMatching, ResultadoMatchingLigero],
+    evidencia_semantica: Optional[Dict[str, dict]]
+) -> dict:
+    """
+    Coincidencia del LLM como dict, con el score semantico del requisito si lo hay.
+    Acepta la coincidencia ligera (sin evidencia ni razonamiento: found_in_cv = fulfilled).
+    """
+    evidencia = getattr(match, "evidence", None)
+    razonamiento = getattr(match, "reasoning", None)
+    match_dict = {
+        "requirement_description": match.requirement_description.strip(),
+        "fulfilled": match.fulfilled,
+        "found_in_cv": getattr(match, "found_in_cv", match.fulfilled),
+        "evidence": evidencia.strip() if evidencia else None,
+        "confidence": match.confidence,
+        "reasoning": razonamiento.strip() if razonamiento else None,
+        "semantic_score": None
+    }
+    
+    if evidencia_semantica:
+        desc_lower = match.requirement_description.lower().strip()
+        desc_limpia = re.sub(r'^\s*\[(OBLIGATORY|OPTIONAL)\]\s*', '', desc_lower, flags=re.IGNORECASE)
+        ev_sem = evidencia_semantica.get(desc_limpia)
+        if ev_sem:
+            match_dict["semantic_score"] = ev_sem.get("semantic_score")
+    return match_dict
+
+
+match_to_dict = coincidencia_a_dict
+
+
+def procesar_resultado_matching(
+    resultado: Union[RespuestaMatchingCV, RespuestaMatchingLigera],
+    evidencia_semantica: Optional[Dict[str, dict]]
+) -> dict:
+    """Coincidencias del LLM como dicts; sin analysis_summary (cribado ligero) se resume el recuento."""
+    coincidencias = [coincidencia_a_dict(match, evidencia_semantica) for match in resultado.matches]
+    
+    resumen = getattr(resultado, "analysis_summary", None)
+    if resumen is None:
+        cumplidos = sum(1 for m in coincidencias if m["fulfilled"])
+        resumen = f"Cribado: {cumplidos}/{len(coincidencias)} requisitos cumplidos."
+    return {"matches": coincidencias, "analysis_summary": resumen}
+
+
+def construir_resultado_fase1(
+    requisitos: List[dict],
+    evidencia_semantica: Optional[Dict[str, dict]],
+    resultado_matching: dict
+) -> ResultadoFase1:
+    """Puntuacion y listas de requisitos a partir de las coincidencias del matching."""
+    coincidencias = resultado_matching["matches"]
+    resumen_analisis = resultado_matching["analysis_summary"]
+    
+    req_cumplidos, req_no_cumplidos, req_faltantes, procesados = \
+        procesar_coincidencias(coincidencias, requisitos, evidencia_semantica)
+    
+    agregar_requisitos_no_procesados(
+        requisitos, procesados, req_no_cumplidos, req_faltantes
+    )
+    
+    tiene_obligatorio_no_cumplido = any(
+        req.tipo == TipoRequisito.OBLIGATORIO
+        for req in req_no_cumplidos
+    )
+    
+    puntuacion = calcular_puntuacion(len(requisitos), len(req_cumplidos), tiene_obligatorio_no_cumplido)
+    
+    return ResultadoFase1(
+        puntuacion=puntuacion,
+        descartado=tiene_obligatorio_no_cumplido,
+        requisitos_cumplidos=req_cumplidos,
+        requisitos_no_cumplidos=req_no_cumplidos,
+        requisitos_faltantes=req_faltantes,
+        resumen_analisis=resumen_analisis
+    )
+
+
 class AnalizadorFase1:
     """
     Analizador de Fase 1: Extrae requisitos y evalua su cumplimiento contra el CV.
@@ -35,6 +229,17 @@ class AnalizadorFase1:
     - Agrupacion inteligente de requisitos via LLM
     - Fecha actual dinamica para calculos de experiencia temporal
     - Reproducibilidad en extraccion de requisitos
+    
+    Con matching_ligero el matching devuelve solo veredicto y confianza (cribado);
+    la evidencia y el razonamiento se generan despues solo para los candidatos aptos
+    (detallar_aptos) o bajo demanda con detallar_coincidencias.
+    
+    proveedor_embeddings elige el proveedor de las pistas semanticas (p. ej. "local" para
+    embeddings en CPU sin red); por defecto el del LLM o, si no tiene, el primer fallback.
+    
+    tamano_lote_matching (con LangGraph) reparte los requisitos en lotes que se evaluan a la
+    vez; por defecto VELORA_TAMANO_LOTE_MATCHING o 12. Sin LangGraph solo se reparten las
+    ofertas cuyos requisitos no caben en el max_tokens del matching.
     """
     
     def __init__(
@@ -45,37 +250,75 @@ class AnalizadorFase1:
         temperatura: Optional[float] = None,
         api_key: Optional[str] = None,
         usar_matching_semantico: bool = True,
-        usar_langgraph: bool = False
+        usar_langgraph: bool = False,
+        matching_ligero: bool = False,
+        detallar_aptos: bool = True,
+        proveedor_embeddings: Optional[str] = None,
+        tamano_lote_matching: Optional[int] = None
     ):
         self.proveedor = proveedor
         self.api_key = api_key
         self.usar_matching_semantico = usar_matching_semantico
         self.usar_langgraph = usar_langgraph
+        self.matching_ligero = matching_ligero
+        self.detallar_aptos = detallar_aptos
+        self.tamano_lote_matching = tamano_lote_matching
         self._registro = obtener_registro_operacional()
         
         temp_efectiva = temperatura if temperatura is not None else ConfiguracionHiperparametros.obtener_temperatura("phase1_extraction")
         
-        self._embeddings_disponibles = FabricaEmbeddings.soporta_embeddings(proveedor)
-        self._advertencia_embeddings = FabricaEmbeddings.obtener_mensaje_proveedor(proveedor)
+        self._embeddings_disponibles = FabricaEmbeddings.soporta_embeddings(proveedor_embeddings or proveedor)
+        self._advertencia_embeddings = FabricaEmbeddings.obtener_mensaje_proveedor(proveedor_embeddings or proveedor)
         
         if llm is None:
+            perfil = ConfiguracionHiperparametros.obtener_config("phase1_extraction")
             self.llm = FabricaLLM.crear_llm(
                 proveedor=proveedor,
                 nombre_modelo=nombre_modelo,
                 temperatura=temp_efectiva,
-                api_key=api_key
+                api_key=api_key,
+                top_p=perfil.top_p,
+                max_tokens=perfil.max_tokens
             )
         else:
             self.llm = llm
         
         self._registro.config_proveedor(proveedor, nombre_modelo)
         
-        self.llm_extraccion = self.llm.with_structured_output(RespuestaExtraccionRequisitos)
-        self.llm_matching = self.llm.with_structured_output(RespuestaMatchingCV)
+        # Con un LLM inyectado todas las etapas lo usan; si no, cada etapa puede tener su modelo
+        llm_ext, proveedor_ext, modelo_ext = self._llm_etapa("phase1_extraction", llm, nombre_modelo, temperatura)
+        llm_match, proveedor_match, modelo_match = self._llm_etapa("phase1_matching", llm, nombre_modelo, temperatura)
+        
+        self.llm_extraccion = etiquetar_etapa(FabricaLLM.aplicar_cobertura(
+            FabricaLLM.aplicar_cache_prompt(llm_ext.with_structured_output(RespuestaExtraccionRequisitos), proveedor_ext),
+            RespuestaExtraccionRequisitos, "phase1_extraction",
+            proveedor_ext, modelo_ext, temp_efectiva
+        ), "phase1_extraction")
+        self.llm_matching = etiquetar_etapa(FabricaLLM.aplicar_cobertura(
+            FabricaLLM.aplicar_cache_prompt(llm_match.with_structured_output(RespuestaMatchingCV), proveedor_match),
+            RespuestaMatchingCV, "phase1_matching",
+            proveedor_match, modelo_match, temp_efectiva
+        ), "phase1_matching")
+        
+        self.llm_cribado: Optional[Runnable] = None
+        self._llm_detalle: Optional[Runnable] = None
+        if matching_ligero:
+            self.llm_cribado = etiquetar_etapa(FabricaLLM.aplicar_cobertura(
+                FabricaLLM.aplicar_cache_prompt(llm_match.with_structured_output(RespuestaMatchingLigera), proveedor_match),
+                RespuestaMatchingLigera, "phase1_matching",
+                proveedor_match, modelo_match, temp_efectiva
+            ), "phase1_matching")
+            # La evidencia de los aptos se contabiliza aparte del cribado
+            self._llm_detalle = etiquetar_etapa(self.llm_matching, "phase1_detail")
+        
+        self._modelo_escalado: Optional[str] = None
+        self.llm_escalado, self._confianzas_escalado = self._crear_llm_escalado(
+            proveedor_match, modelo_match, temp_efectiva
+        )
         
         self.comparador_semantico: Optional[ComparadorSemantico] = None
         if usar_matching_semantico:
-            self._inicializar_comparador_semantico(proveedor, api_key)
+            self._inicializar_comparador_semantico(proveedor, api_key, proveedor_embeddings)
         else:
             self._registro.config_semantic(habilitado=False)
         
@@ -86,9 +329,66 @@ class AnalizadorFase1:
         else:
             self._registro.config_langgraph(habilitado=False)
     
-    def _inicializar_comparador_semantico(self, proveedor: str, api_key: Optional[str]):
+    def _llm_etapa(
+        self,
+        etapa: str,
+        llm_inyectado: Optional[BaseChatModel],
+        nombre_modelo: Optional[str],
+        temperatura: Optional[float]
+    ) -> Tuple[BaseChatModel, str, Optional[str]]:
+        """
+        LLM de la etapa con su proveedor/modelo (el asignado en ConfiguracionHiperparametros o el general)
+        y su perfil de hiperparametros. Etapas con el mismo perfil comparten cliente via el registro.
+        """
+        if llm_inyectado is not None:
+            return self.llm, self.proveedor, nombre_modelo
+        
+        proveedor_etapa, modelo_etapa = FabricaLLM.resolver_modelo_etapa(etapa, self.proveedor, nombre_modelo)
+        if (proveedor_etapa, modelo_etapa) != (self.proveedor, nombre_modelo):
+            self._registro.info(f"Etapa {etapa}: {proveedor_etapa}/{modelo_etapa}", "CONFIG")
+        llm_etapa = FabricaLLM.crear_llm_etapa(etapa, self.proveedor, nombre_modelo, temperatura, self.api_key)
+        return llm_etapa, proveedor_etapa, modelo_etapa
+    
+    def _crear_llm_escalado(
+        self,
+        proveedor_matching: Optional[str],
+        modelo_matching: Optional[str],
+        temperatura: float
+    ) -> Tuple[Optional[Runnable], Tuple[str, ...]]:
+        """Matching estructurado en el modelo de escalado, o (None, ()) si no hay regla activa."""
+        regla = ConfiguracionHiperparametros.obtener_escalado()
+        if regla is None:
+            return None, ()
+        
+        modelo = regla.nombre_modelo or FabricaLLM.obtener_modelo_por_defecto(regla.proveedor) or None
+        if (regla.proveedor, modelo) == ((proveedor_matching or "openai").lower(), modelo_matching):
+            return None, ()
+        
+        api_key = self.api_key if regla.proveedor == (self.proveedor or "openai").lower() else None
+        perfil = ConfiguracionHiperparametros.obtener_config("phase1_matching")
         try:
-            if FabricaEmbeddings.soporta_embeddings(proveedor):
+            llm_fuerte = FabricaLLM.crear_llm(
+                regla.proveedor, modelo, temperatura, api_key,
+                top_p=perfil.top_p, max_tokens=perfil.max_tokens
+            )
+        except (ImportError, ValueError) as e:
+            self._registro.advertencia("CONFIG", f"Escalado desactivado: {e}")
+            return None, ()
+        
+        self._modelo_escalado = f"{regla.proveedor}/{modelo or 'default'}"
+        self._registro.info(f"Escalado de confianza {list(regla.confianzas)} -> {self._modelo_escalado}", "CONFIG")
+        # Misma cobertura que llm_matching (perfil phase1_matching): es la llamada de matching mas lenta
+        return etiquetar_etapa(FabricaLLM.aplicar_cobertura(
+            FabricaLLM.aplicar_cache_prompt(llm_fuerte.with_structured_output(RespuestaMatchingCV), regla.proveedor),
+            RespuestaMatchingCV, "phase1_matching",
+            regla.proveedor, modelo, temperatura
+        ), "phase1_escalation"), regla.confianzas
+    
+    def _inicializar_comparador_semantico(self, proveedor: str, api_key: Optional[str], proveedor_embeddings: Optional[str] = None):
+        try:
+            if proveedor_embeddings:
+                api_key_embeddings = api_key if proveedor_embeddings == proveedor else None
+            elif FabricaEmbeddings.soporta_embeddings(proveedor):
                 proveedor_embeddings = proveedor
                 api_key_embeddings = api_key
             else:
@@ -98,12 +398,10 @@ class AnalizadorFase1:
                     api_key_embeddings = None
                     self._registro.info(f"Embeddings: usando {fallback} como fallback")
                 else:
-                    self.comparador_semantico = None
-                    self._registro.config_semantic(
-                        habilitado=True, inicializado=False,
-                        razon="No hay proveedor de embeddings disponible"
-                    )
-                    return
+                    # Sin embeddings las pistas salen solo de BM25 sobre los chunks del CV
+                    proveedor_embeddings = None
+                    api_key_embeddings = None
+                    self._registro.info("Embeddings: no hay proveedor disponible, evidencia solo léxica (BM25)")
             
             self.comparador_semantico = ComparadorSemantico(
                 proveedor_embeddings=proveedor_embeddings,
@@ -118,7 +416,17 @@ class AnalizadorFase1:
     def _inicializar_langgraph(self):
         try:
             from ...orquestacion.grafo_fase1 import crear_grafo_fase1
-            self._grafo = crear_grafo_fase1(self.llm, self.comparador_semantico)
+            self._grafo = crear_grafo_fase1(
+                self.llm, self.comparador_semantico,
+                llm_extraccion=self.llm_extraccion,
+                llm_matching=self.llm_cribado or self.llm_matching,
+                matching_ligero=self.matching_ligero,
+                llm_detalle=self._llm_detalle if self.detallar_aptos else None,
+                llm_escalado=self.llm_escalado,
+                confianzas_escalado=self._confianzas_escalado,
+                modelo_escalado=self._modelo_escalado,
+                tamano_lote_matching=self.tamano_lote_matching
+            )
         except ImportError:
             self._grafo = None
             self.usar_langgraph = False
@@ -134,62 +442,248 @@ class AnalizadorFase1:
     
     get_embedding_status = obtener_estado_embeddings
     
+    def _crear_chain_extraccion(self):
+        return crear_prompt_extraccion() | self.llm_extraccion
+    
+    def _normalizar_requisitos(self, resultado: RespuestaExtraccionRequisitos) -> List[dict]:
+        return normalizar_requisitos(resultado)
+    
     def extraer_requisitos(self, oferta_trabajo: str) -> List[dict]:
         """
         Extrae requisitos de una oferta de trabajo.
         El LLM aplica la logica de agrupacion directamente via prompt.
         """
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", PROMPT_EXTRACCION_REQUISITOS),
-            ("human", "{job_offer}")
-        ])
-        
-        chain = prompt | self.llm_extraccion
+        chain = self._crear_chain_extraccion()
         resultado: RespuestaExtraccionRequisitos = chain.invoke({"job_offer": oferta_trabajo})
-        
-        requisitos = []
-        vistos = set()
-        
-        for req in resultado.requirements:
-            clave = req.description.lower().strip()
-            if clave not in vistos:
-                vistos.add(clave)
-                requisitos.append({
-                    "description": req.description.strip(),
-                    "type": req.type
-                })
-        
-        return requisitos
+        return self._normalizar_requisitos(resultado)
     
     extract_requirements = extraer_requisitos
     
+    async def aextraer_requisitos(self, oferta_trabajo: str) -> List[dict]:
+        """Version asincrona de extraer_requisitos."""
+        chain = self._crear_chain_extraccion()
+        resultado: RespuestaExtraccionRequisitos = await chain.ainvoke({"job_offer": oferta_trabajo})
+        return self._normalizar_requisitos(resultado)
+    
+    aextract_requirements = aextraer_requisitos
+    
+    @staticmethod
+    def _construir_mapa_evidencia(
+        requisitos: List[dict],
+        evidencias: Dict[str, list],
+        coberturas: Optional[Dict[str, float]] = None
+    ) -> Dict[str, dict]:
+        return construir_mapa_evidencia(requisitos, evidencias, coberturas)
+    
     def _obtener_evidencia_semantica(self, cv: str, requisitos: List[dict]) -> Dict[str, dict]:
         if not self.comparador_semantico:
             return {}
         
         try:
             self.comparador_semantico.indexar_cv(cv)
-            
-            mapa_evidencia = {}
-            for req in requisitos:
-                desc = req["description"]
-                evidencia = self.comparador_semantico.encontrar_evidencia(desc, k=2)
-                
-                if evidencia:
-                    mejor_texto, mejor_score = evidencia[0]
-                    mapa_evidencia[desc.lower()] = {
-                        "text": mejor_texto,
-                        "semantic_score": mejor_score,
-                        "all_evidence": evidencia
-                    }
-            
-            return mapa_evidencia
+            evidencias = self.comparador_semantico.encontrar_toda_la_evidencia(
+                [req["description"] for req in requisitos], k=2
+            )
+            return self._construir_mapa_evidencia(
+                requisitos, evidencias, self.comparador_semantico.coberturas_lexicas(evidencias)
+            )
         except Exception:
             return {}
         finally:
             if self.comparador_semantico:
                 self.comparador_semantico.limpiar()
     
+    async def _aobtener_evidencia_semantica(self, cv: str, requisitos: List[dict]) -> Dict[str, dict]:
+        """Indice propio por llamada: varias evaluaciones pueden compartir el comparador."""
+        if not self.comparador_semantico:
+            return {}
+        
+        try:
+            indice = await self.comparador_semantico.acrear_indice(cv)
+            evidencias = await self.comparador_semantico.aencontrar_toda_la_evidencia(
+                [req["description"] for req in requisitos], k=2, indice=indice
+            )
+            return self._construir_mapa_evidencia(
+                requisitos, evidencias, self.comparador_semantico.coberturas_lexicas(evidencias, indice)
+            )
+        except Exception:
+            return {}
+    
+    def _preparar_matching(
+        self,
+        cv: str,
+        requisitos: List[dict],
+        evidencia_semantica: Optional[Dict[str, dict]],
+        llm_estructurado: Optional[Runnable] = None,
+        veredictos: Optional[List[dict]] = None
+    ) -> tuple:
+        """Construye la chain de matching y sus entradas (por defecto la de cribado o llm_matching)."""
+        if llm_estructurado is None and self.llm_cribado is not None:
+            prompt, entradas = crear_prompt_matching(cv, requisitos, evidencia_semantica, ligero=True)
+            return prompt | self.llm_cribado, entradas
+        prompt, entradas = crear_prompt_matching(cv, requisitos, evidencia_semantica, veredictos)
+        return prompt | (llm_estructurado or self.llm_matching), entradas
+    
+    def _procesar_resultado_matching(
+        self,
+        resultado: RespuestaMatchingCV,
+        evidencia_semantica: Optional[Dict[str, dict]]
+    ) -> dict:
+        return procesar_resultado_matching(resultado, evidencia_semantica)
+    
+    @staticmethod
+    def _unir_lotes_matching(lotes: List[List[dict]], resultados: List[dict], requisitos: List[dict]) -> dict:
+        if len(resultados) == 1:
+            return resultados[0]
+        coincidencias = fusionar_coincidencias_lotes(
+            [(lote, resultado["matches"]) for lote, resultado in zip(lotes, resultados)], requisitos
+        )
+        return {"matches": coincidencias, "analysis_summary": resumir_coincidencias(coincidencias, requisitos)}
+    
+    def _invocar_matching(
+        self,
+        cv: str,
+        requisitos: List[dict],
+        evidencia_semantica: Optional[Dict[str, dict]],
+        llm_estructurado: Optional[Runnable] = None,
+        veredictos: Optional[List[dict]] = None
+    ) -> dict:
+        """Matching procesado; los requisitos que no caben en max_tokens se evaluan por lotes y se fusionan."""
+        lotes = dividir_requisitos_en_lotes(requisitos, ConfiguracionHiperparametros.obtener_requisitos_por_llamada())
+        resultados = []
+        for lote in lotes:
+            chain, entradas = self._preparar_matching(cv, lote, evidencia_semantica, llm_estructurado, veredictos)
+            resultados.append(self._procesar_resultado_matching(chain.invoke(entradas), evidencia_semantica))
+        return self._unir_lotes_matching(lotes, resultados, requisitos)
+    
+    async def _ainvocar_matching(
+        self,
+        cv: str,
+        requisitos: List[dict],
+        evidencia_semantica: Optional[Dict[str, dict]],
+        llm_estructurado: Optional[Runnable] = None,
+        veredictos: Optional[List[dict]] = None
+    ) -> dict:
+        """Version asincrona de _invocar_matching (los lotes se evaluan a la vez)."""
+        lotes = dividir_requisitos_en_lotes(requisitos, ConfiguracionHiperparametros.obtener_requisitos_por_llamada())
+        
+        async def evaluar(lote: List[dict]) -> dict:
+            chain, entradas = self._preparar_matching(cv, lote, evidencia_semantica, llm_estructurado, veredictos)
+            return self._procesar_resultado_matching(await chain.ainvoke(entradas), evidencia_semantica)
+        
+        resultados = await asyncio.gather(*(evaluar(lote) for lote in lotes))
+        return self._unir_lotes_matching(lotes, list(resultados), requisitos)
+    
+    def _requisitos_a_escalar(self, requisitos: List[dict], resultado_matching: dict) -> List[dict]:
+        if self.llm_escalado is None:
+            return []
+        return seleccionar_para_escalado(resultado_matching["matches"], requisitos, self._confianzas_escalado)
+    
+    def _aplicar_escalado(
+        self,
+        requisitos: List[dict],
+        dudosos: List[dict],
+        resultado_matching: dict,
+        reverificado: dict
+    ) -> dict:
+        self._registro.escalado_confianza(len(dudosos), len(requisitos), self._modelo_escalado)
+        return {
+            "matches": fusionar_escalado(resultado_matching["matches"], reverificado["matches"], requisitos),
+            "analysis_summary": resultado_matching["analysis_summary"]
+        }
+    
+    def _escalar(
+        self,
+        cv: str,
+        requisitos: List[dict],
+        evidencia_semantica: Optional[Dict[str, dict]],
+        resultado_matching: dict
+    ) -> dict:
+        """Re-verifica en el modelo de escalado los matches poco fiables; si falla, conserva los originales."""
+        dudosos = self._requisitos_a_escalar(requisitos, resultado_matching)
+        if not dudosos:
+            return resultado_matching
+        
+        try:
+            reverificado = self._invocar_matching(cv, dudosos, evidencia_semantica, self.llm_escalado)
+        except Exception as e:
+            self._registro.advertencia("MATCHING", f"Escalado fallido, se conservan los matches originales: {e}")
+            return resultado_matching
+        return self._aplicar_escalado(requisitos, dudosos, resultado_matching, reverificado)
+    
+    async def _aescalar(
+        self,
+        cv: str,
+        requisitos: List[dict],
+        evidencia_semantica: Optional[Dict[str, dict]],
+        resultado_matching: dict
+    ) -> dict:
+        """Version asincrona de _escalar."""
+        dudosos = self._requisitos_a_escalar(requisitos, resultado_matching)
+        if not dudosos:
+            return resultado_matching
+        
+        try:
+            reverificado = await self._ainvocar_matching(cv, dudosos, evidencia_semantica, self.llm_escalado)
+        except Exception as e:
+            self._registro.advertencia("MATCHING", f"Escalado fallido, se conservan los matches originales: {e}")
+            return resultado_matching
+        return self._aplicar_escalado(requisitos, dudosos, resultado_matching, reverificado)
+    
+    def _requiere_detalle(self, requisitos: List[dict], resultado_matching: dict) -> bool:
+        return (
+            self.matching_ligero and self.detallar_aptos
+            and es_candidato_apto(resultado_matching["matches"], requisitos)
+        )
+    
+    def _fusionar_detalle(self, requisitos: List[dict], resultado_matching: dict, detalle: dict) -> dict:
+        self._registro.info(f"Evidencia generada para {len(detalle['matches'])} requisitos (candidato apto)", "MATCHING")
+        return {
+            "matches": fusionar_detalle(resultado_matching["matches"], detalle["matches"], requisitos),
+            "analysis_summary": detalle["analysis_summary"]
+        }
+    
+    def detallar_coincidencias(
+        self,
+        cv: str,
+        requisitos: List[dict],
+        resultado_matching: dict,
+        evidencia_semantica: Optional[Dict[str, dict]] = None
+    ) -> dict:
+        """
+        Genera evidencia y razonamiento para los veredictos de un cribado ligero sin cambiarlos.
+        Si la llamada falla, devuelve el resultado de cribado tal cual.
+        """
+        try:
+            detalle = self._invocar_matching(
+                cv, requisitos, evidencia_semantica, self._llm_detalle or self.llm_matching, resultado_matching["matches"]
+            )
+        except Exception as e:
+            self._registro.advertencia("MATCHING", f"Detalle fallido, se conserva el cribado: {e}")
+            return resultado_matching
+        return self._fusionar_detalle(requisitos, resultado_matching, detalle)
+    
+    explain_matches = detallar_coincidencias
+    
+    async def adetallar_coincidencias(
+        self,
+        cv: str,
+        requisitos: List[dict],
+        resultado_matching: dict,
+        evidencia_semantica: Optional[Dict[str, dict]] = None
+    ) -> dict:
+        """Version asincrona de detallar_coincidencias."""
+        try:
+            detalle = await self._ainvocar_matching(
+                cv, requisitos, evidencia_semantica, self._llm_detalle or self.llm_matching, resultado_matching["matches"]
+            )
+        except Exception as e:
+            self._registro.advertencia("MATCHING", f"Detalle fallido, se conserva el cribado: {e}")
+            return resultado_matching
+        return self._fusionar_detalle(requisitos, resultado_matching, detalle)
+    
+    aexplain_matches = adetallar_coincidencias
+    
     def evaluar_cv_con_requisitos(
         self,
         cv: str,
@@ -203,86 +697,100 @@ class AnalizadorFase1:
         if not requisitos:
             return {"matches": [], "analysis_summary": "No hay requisitos para evaluar."}
         
-        lineas = []
-        for req in requisitos:
-            linea = f"- [{req['type'].upper()}] {req['description']}"
-            
-            if evidencia_semantica:
-                ev_sem = evidencia_semantica.get(req['description'].lower())
-                if ev_sem and ev_sem.get('semantic_score', 0) > 0.4:
-                    linea += f"\n  [PISTA SEMANTICA - Score: {ev_sem['semantic_score']:.2f}]: \"{ev_sem['text'][:150]}...\""
-            
-            lineas.append(linea)
-        
-        texto_requisitos = "\n".join(lineas)
-        
-        contexto_temporal = obtener_contexto_prompt()
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", PROMPT_MATCHING_CV),
-            ("human", f"CONTEXTO TEMPORAL: {contexto_temporal}\n\nCV del candidato:\n{{cv}}\n\nRequisitos a evaluar:\n{{requirements_list}}")
-        ])
-        
-        chain = prompt | self.llm_matching
-        resultado: RespuestaMatchingCV = chain.invoke({
-            "cv": cv,
-            "requirements_list": texto_requisitos
-        })
-        
-        coincidencias = []
-        for match in resultado.matches:
-            match_dict = {
-                "requirement_description": match.requirement_description.strip(),
-                "fulfilled": match.fulfilled,
-                "found_in_cv": match.found_in_cv,
-                "evidence": match.evidence.strip() if match.evidence else None,
-                "confidence": match.confidence,
-                "reasoning": match.reasoning.strip() if match.reasoning else None,
-                "semantic_score": None
-            }
-            
-            if evidencia_semantica:
-                desc_lower = match.requirement_description.lower().strip()
-                desc_limpia = re.sub(r'^\s*\[(OBLIGATORY|OPTIONAL)\]\s*', '', desc_lower, flags=re.IGNORECASE)
-                ev_sem = evidencia_semantica.get(desc_limpia)
-                if ev_sem:
-                    match_dict["semantic_score"] = ev_sem.get("semantic_score")
-            
-            coincidencias.append(match_dict)
-        
-        return {"matches": coincidencias, "analysis_summary": resultado.analysis_summary}
+        resultado_matching = self._invocar_matching(cv, requisitos, evidencia_semantica)
+        resultado_matching = self._escalar(cv, requisitos, evidencia_semantica, resultado_matching)
+        if self._requiere_detalle(requisitos, resultado_matching):
+            return self.detallar_coincidencias(cv, requisitos, resultado_matching, evidencia_semantica)
+        return resultado_matching
     
     match_cv_with_requirements = evaluar_cv_con_requisitos
     
+    async def aevaluar_cv_con_requisitos(
+        self,
+        cv: str,
+        requisitos: List[dict],
+        evidencia_semantica: Optional[Dict[str, dict]] = None
+    ) -> dict:
+        """Version asincrona de evaluar_cv_con_requisitos."""
+        if not requisitos:
+            return {"matches": [], "analysis_summary": "No hay requisitos para evaluar."}
+        
+        resultado_matching = await self._ainvocar_matching(cv, requisitos, evidencia_semantica)
+        resultado_matching = await self._aescalar(cv, requisitos, evidencia_semantica, resultado_matching)
+        if self._requiere_detalle(requisitos, resultado_matching):
+            return await self.adetallar_coincidencias(cv, requisitos, resultado_matching, evidencia_semantica)
+        return resultado_matching
+    
+    amatch_cv_with_requirements = aevaluar_cv_con_requisitos
+    
     def analizar(self, oferta_trabajo: str, cv: str) -> ResultadoFase1:
         tiempo_inicio = time.time()
         
-        if self.usar_langgraph and self._grafo:
-            self._registro.fase1_inicio(modo="langgraph")
-            resultado = self._analizar_con_langgraph(oferta_trabajo, cv)
-        else:
-            self._registro.fase1_inicio(modo="tradicional")
-            resultado = self._analizar_tradicional(oferta_trabajo, cv)
+        with medir_consumo() as colector:
+            if self.usar_langgraph and self._grafo:
+                self._registro.fase1_inicio(modo="langgraph")
+                resultado = self._analizar_con_langgraph(oferta_trabajo, cv)
+            else:
+                self._registro.fase1_inicio(modo="tradicional")
+                resultado = self._analizar_tradicional(oferta_trabajo, cv)
+        
+        resultado.consumo = colector.resumen()
+        self._registrar_fin(resultado, tiempo_inicio)
+        return resultado
+    
+    analyze = analizar
+    
+    async def aanalizar(self, oferta_trabajo: str, cv: str) -> ResultadoFase1:
+        """
+        Version asincrona de analizar. Las esperas de red ceden el event loop,
+        de modo que un solo loop puede atender muchas evaluaciones a la vez.
+        """
+        tiempo_inicio = time.time()
+        
+        with medir_consumo() as colector:
+            if self.usar_langgraph and self._grafo:
+                self._registro.fase1_inicio(modo="langgraph")
+                resultado = await self._aanalizar_con_langgraph(oferta_trabajo, cv)
+            else:
+                self._registro.fase1_inicio(modo="tradicional")
+                resultado = await self._aanalizar_tradicional(oferta_trabajo, cv)
         
+        resultado.consumo = colector.resumen()
+        self._registrar_fin(resultado, tiempo_inicio)
+        return resultado
+    
+    aanalyze = aanalizar
+    
+    def _registrar_fin(self, resultado: ResultadoFase1, tiempo_inicio: float) -> None:
         duracion_ms = int((time.time() - tiempo_inicio) * 1000)
         self._registro.fase1_completa(
             descartado=resultado.descartado,
             puntuacion=resultado.puntuacion,
             duracion_ms=duracion_ms
         )
-        
-        return resultado
-    
-    analyze = analizar
+        if resultado.consumo is not None:
+            totales = resultado.consumo.totales()
+            self._registro.consumo_evaluacion(
+                "FASE 1", totales["calls"], totales["input_tokens"] + totales["output_tokens"],
+                totales["cost_usd"], totales["duration_ms"]
+            )
     
     def _analizar_con_langgraph(self, oferta_trabajo: str, cv: str) -> ResultadoFase1:
         from ...orquestacion.grafo_fase1 import ejecutar_grafo_fase1
         return ejecutar_grafo_fase1(self._grafo, oferta_trabajo, cv)
     
+    async def _aanalizar_con_langgraph(self, oferta_trabajo: str, cv: str) -> ResultadoFase1:
+        from ...orquestacion.grafo_fase1 import aejecutar_grafo_fase1
+        return await aejecutar_grafo_fase1(self._grafo, oferta_trabajo, cv)
+    
     async def analizar_streaming(self, oferta_trabajo: str, cv: str) -> AsyncGenerator[dict, None]:
+        """
+        Eventos de progreso del analisis. Con LangGraph incluye cada veredicto del matching
+        (event="match") en cuanto se genera; en modo tradicional solo inicio y resultado.
+        """
         if not self.usar_langgraph or not self._grafo:
             yield {"node": "start", "messages": ["[START] Iniciando analisis..."]}
-            resultado = self._analizar_tradicional(oferta_trabajo, cv)
+            resultado = await self._aanalizar_tradicional(oferta_trabajo, cv)
             yield {"node": "complete", "messages": ["[OK] Analisis completado"], "result": resultado}
             return
         
@@ -299,9 +807,7 @@ class AnalizadorFase1:
     
     analyze_streaming = analizar_streaming
     
-    def _analizar_tradicional(self, oferta_trabajo: str, cv: str) -> ResultadoFase1:
-        requisitos = self.extraer_requisitos(oferta_trabajo)
-        
+    def _validar_requisitos(self, requisitos: List[dict]) -> None:
         if not requisitos:
             raise ValueError(
                 "No se encontraron requisitos en la oferta de trabajo. "
@@ -311,6 +817,10 @@ class AnalizadorFase1:
         obligatorios = sum(1 for r in requisitos if r["type"] == "obligatory")
         opcionales = len(requisitos) - obligatorios
         self._registro.extraccion_completa(len(requisitos), obligatorios, opcionales)
+    
+    def _analizar_tradicional(self, oferta_trabajo: str, cv: str) -> ResultadoFase1:
+        requisitos = self.extraer_requisitos(oferta_trabajo)
+        self._validar_requisitos(requisitos)
         
         evidencia_semantica = {}
         if self.usar_matching_semantico and self.comparador_semantico:
@@ -318,39 +828,33 @@ class AnalizadorFase1:
             self._registro.evidencia_semantica_encontrada(len(evidencia_semantica), len(requisitos))
         
         resultado_matching = self.evaluar_cv_con_requisitos(cv, requisitos, evidencia_semantica)
-        coincidencias = resultado_matching["matches"]
-        resumen_analisis = resultado_matching["analysis_summary"]
-        
-        req_cumplidos, req_no_cumplidos, req_faltantes, procesados = \
-            procesar_coincidencias(coincidencias, requisitos, evidencia_semantica)
-        
-        agregar_requisitos_no_procesados(
-            requisitos, procesados, req_no_cumplidos, req_faltantes
-        )
-        
-        total_requisitos = len(requisitos)
-        cantidad_cumplidos = len(req_cumplidos)
-        tiene_obligatorio_no_cumplido = any(
-            req.tipo == TipoRequisito.OBLIGATORIO
-            for req in req_no_cumplidos
-        )
+        return self._construir_resultado(requisitos, evidencia_semantica, resultado_matching)
+    
+    async def _aanalizar_tradicional(self, oferta_trabajo: str, cv: str) -> ResultadoFase1:
+        requisitos = await self.aextraer_requisitos(oferta_trabajo)
+        self._validar_requisitos(requisitos)
         
-        puntuacion = calcular_puntuacion(total_requisitos, cantidad_cumplidos, tiene_obligatorio_no_cumplido)
+        evidencia_semantica = {}
+        if self.usar_matching_semantico and self.comparador_semantico:
+            evidencia_semantica = await self._aobtener_evidencia_semantica(cv, requisitos)
+            self._registro.evidencia_semantica_encontrada(len(evidencia_semantica), len(requisitos))
         
+        resultado_matching = await self.aevaluar_cv_con_requisitos(cv, requisitos, evidencia_semantica)
+        return self._construir_resultado(requisitos, evidencia_semantica, resultado_matching)
+    
+    def _construir_resultado(
+        self,
+        requisitos: List[dict],
+        evidencia_semantica: Dict[str, dict],
+        resultado_matching: dict
+    ) -> ResultadoFase1:
+        resultado = construir_resultado_fase1(requisitos, evidencia_semantica, resultado_matching)
         self._registro.matching_completo(
-            cumplidos=cantidad_cumplidos,
-            no_cumplidos=len(req_no_cumplidos),
-            puntuacion=puntuacion
-        )
-        
-        return ResultadoFase1(
-            puntuacion=puntuacion,
-            descartado=tiene_obligatorio_no_cumplido,
-            requisitos_cumplidos=req_cumplidos,
-            requisitos_no_cumplidos=req_no_cumplidos,
-            requisitos_faltantes=req_faltantes,
-            resumen_analisis=resumen_analisis
+            cumplidos=len(resultado.requisitos_cumplidos),
+            no_cumplidos=len(resultado.requisitos_no_cumplidos),
+            puntuacion=resultado.puntuacion
         )
+        return resultado
 
 
 Phase1Analyzer = AnalizadorFase1
@@ -0,0 +1,371 @@
+"""
+Fase 1 en modo lotes: cribado masivo de candidaturas con la API batch del proveedor.
+
+Dos trabajos encadenados: extraccion (una peticion por oferta distinta) y matching
+(una por candidatura). El progreso se guarda en disco, de modo que una ejecucion
+interrumpida se retoma con el mismo directorio sin reenviar trabajos.
+
+Con proveedor_embeddings el matching lleva pistas semanticas: los requisitos de cada
+oferta se embeben una vez y esos vectores se reutilizan en todos sus CVs.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from ...modelos import (
+    ResultadoFase1, RespuestaExtraccionRequisitos, RespuestaMatchingCV,
+    ConsumoLlamada, ConsumoEvaluacion
+)
+from ...infraestructura.llm import (
+    FabricaLLM, ConfiguracionHiperparametros, ComparadorSemantico,
+    BackendLotes, RespuestaLote, crear_backend_lotes, construir_peticion_lote,
+    registrar_consumo, calcular_coste,
+    ESTADO_COMPLETADO, ESTADO_FALLIDO, ESTADO_EXPIRADO, DESCUENTO_LOTES
+)
+from ...utilidades import obtener_registro_operacional
+from .analizador import (
+    crear_prompt_extraccion, normalizar_requisitos, construir_mapa_evidencia,
+    crear_prompt_matching, procesar_resultado_matching, construir_resultado_fase1
+)
+
+
+# Caracteres del fragmento de evidencia que se guardan (los que usan el prompt y el resultado)
+LONGITUD_PISTA = 150
+
+# Reenvios de un trabajo que el proveedor da por fallido o expirado antes de abandonar el lote
+MAX_REENVIOS = 2
+
+
+def _huella(texto: str) -> str:
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:16]
+
+
+class ProcesadorLotesFase1:
+    """
+    Ejecuta la Fase 1 de muchas candidaturas por lotes.
+    
+    - candidaturas: {id_candidatura: (oferta, cv)}
+    - avanzar() da un paso sin bloquear (util desde un cron); ejecutar() sondea hasta terminar.
+    - Sin proveedor_embeddings el matching va sin pistas semanticas. Con el (p. ej. "local" o
+      "bm25" para solo lexico), las pistas se calculan aqui antes de enviar el matching.
+    
+    Uso:
+        procesador = ProcesadorLotesFase1("data/lotes/campana-01", proveedor="openai", nombre_modelo="gpt-4o-mini")
+        resultados = procesador.ejecutar(candidaturas)
+        errores = procesador.obtener_errores()
+    """
+    
+    def __init__(
+        self,
+        directorio: str,
+        proveedor: str = "openai",
+        nombre_modelo: Optional[str] = None,
+        api_key: Optional[str] = None,
+        backend: Optional[BackendLotes] = None,
+        intervalo_sondeo_s: float = 60.0,
+        proveedor_embeddings: Optional[str] = None
+    ):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.proveedor = (proveedor or "openai").lower()
+        self.nombre_modelo = nombre_modelo or FabricaLLM.obtener_modelo_por_defecto(self.proveedor) or None
+        self.backend = backend or crear_backend_lotes(self.proveedor, self.directorio, api_key)
+        self.intervalo_sondeo_s = intervalo_sondeo_s
+        self.comparador_semantico = ComparadorSemantico(proveedor_embeddings) if proveedor_embeddings else None
+        self._registro = obtener_registro_operacional()
+    
+    @property
+    def _ruta_estado(self) -> Path:
+        return self.directorio / "estado.json"
+    
+    @property
+    def _ruta_resultados(self) -> Path:
+        return self.directorio / "resultados.json"
+    
+    def _modelo_etapa(self, etapa: str) -> str:
+        """Modelo asignado a la etapa si es del mismo proveedor (un trabajo es de un solo proveedor)."""
+        proveedor_etapa, modelo_etapa = FabricaLLM.resolver_modelo_etapa(etapa, self.proveedor, self.nombre_modelo)
+        if proveedor_etapa == self.proveedor and modelo_etapa:
+            return modelo_etapa
+        return self.nombre_modelo or self.proveedor
+    
+    # --- Estado persistente ---
+    
+    @staticmethod
+    def _firma(candidaturas: Dict[str, Tuple[str, str]]) -> str:
+        partes = [f"{id_c}:{_huella(oferta)}:{_huella(cv)}" for id_c, (oferta, cv) in sorted(candidaturas.items())]
+        return _huella("\n".join(partes))
+    
+    def _cargar_estado(self, candidaturas: Dict[str, Tuple[str, str]]) -> dict:
+        firma = self._firma(candidaturas)
+        if not self._ruta_estado.exists():
+            return {
+                "firma": firma,
+                "proveedor": self.proveedor,
+                "trabajo_extraccion": None,
+                "requisitos": None,
+                "trabajo_matching": None,
+                "reenvios": {},
+                "evidencia": {},
+                "errores": {},
+                "completado": False
+            }
+        
+        estado = json.loads(self._ruta_estado.read_text(encoding="utf-8"))
+        if estado["firma"] != firma:
+            raise ValueError(
+                f"{self.directorio} contiene un lote con otras candidaturas; usa un directorio nuevo"
+            )
+        return estado
+    
+    def _guardar_estado(self, estado: dict) -> None:
+        temporal = self._ruta_estado.with_suffix(".tmp")
+        temporal.write_text(json.dumps(estado, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(temporal, self._ruta_estado)
+    
+    # --- Trabajos ---
+    
+    def _enviar(self, nombre: str, peticiones: List[dict]) -> str:
+        ruta = self.directorio / f"{nombre}.jsonl"
+        with open(ruta, "w", encoding="utf-8") as f:
+            for peticion in peticiones:
+                f.write(json.dumps(peticion, ensure_ascii=False) + "\n")
+        
+        id_trabajo = self.backend.enviar(ruta)
+        self._registro.info(f"Trabajo de {nombre} enviado: {id_trabajo} ({len(peticiones)} peticiones)", "LOTES")
+        return id_trabajo
+    
+    def _terminado(self, estado: dict, clave: str) -> bool:
+        """
+        Consulta el trabajo guardado en estado[clave]. Si el proveedor lo da por fallido o
+        expirado se olvida su id para que el siguiente paso lo reenvie (hasta MAX_REENVIOS).
+        """
+        id_trabajo = estado[clave]
+        situacion = self.backend.consultar_estado(id_trabajo)
+        if situacion not in (ESTADO_FALLIDO, ESTADO_EXPIRADO):
+            return situacion == ESTADO_COMPLETADO
+        
+        reenvios = estado.setdefault("reenvios", {}).get(clave, 0) + 1
+        estado["reenvios"][clave] = reenvios
+        estado[clave] = None
+        self._guardar_estado(estado)
+        if reenvios > MAX_REENVIOS:
+            raise RuntimeError(f"El trabajo por lotes {id_trabajo} ha terminado como {situacion} tras {MAX_REENVIOS} reenvios")
+        self._registro.advertencia("LOTES", f"Trabajo {id_trabajo} {situacion}; se reenvia ({reenvios}/{MAX_REENVIOS})")
+        return False
+    
+    def _registrar_llamada(self, etapa: str, respuesta: RespuestaLote) -> ConsumoLlamada:
+        modelo = self._modelo_etapa(etapa)
+        llamada = ConsumoLlamada(
+            etapa=etapa,
+            proveedor=self.proveedor,
+            modelo=modelo,
+            tokens_entrada=respuesta.tokens_entrada,
+            tokens_salida=respuesta.tokens_salida,
+            tokens_entrada_cacheados=respuesta.tokens_cacheados,
+            coste_usd=calcular_coste(
+                modelo, respuesta.tokens_entrada, respuesta.tokens_salida, respuesta.tokens_cacheados
+            ) * DESCUENTO_LOTES
+        )
+        registrar_consumo(llamada)
+        return llamada
+    
+    def _peticiones_extraccion(self, ofertas: Dict[str, str]) -> List[dict]:
+        modelo = self._modelo_etapa("phase1_extraction")
+        temperatura = ConfiguracionHiperparametros.obtener_temperatura("phase1_extraction")
+        prompt = crear_prompt_extraccion()
+        return [
+            construir_peticion_lote(
+                f"ext-{huella}", modelo, prompt.format_messages(job_offer=oferta),
+                RespuestaExtraccionRequisitos, temperatura
+            )
+            for huella, oferta in ofertas.items()
+        ]
+    
+    def _procesar_extraccion(self, ofertas: Dict[str, str], respuestas: Dict[str, RespuestaLote]) -> Dict[str, object]:
+        """Requisitos por huella de oferta, o el mensaje de error de esa oferta."""
+        requisitos = {}
+        for huella in ofertas:
+            respuesta = respuestas.get(f"ext-{huella}")
+            if respuesta is None or respuesta.error:
+                requisitos[huella] = f"Error en extraccion: {respuesta.error if respuesta else 'sin respuesta'}"
+                continue
+            
+            self._registrar_llamada("phase1_extraction", respuesta)
+            try:
+                extraidos = normalizar_requisitos(RespuestaExtraccionRequisitos.model_validate_json(respuesta.contenido))
+            except ValidationError as e:
+                requisitos[huella] = f"Error en extraccion: {e}"
+                continue
+            requisitos[huella] = extraidos or "No se encontraron requisitos en la oferta de trabajo"
+        return requisitos
+    
+    def _evidencia_semantica(self, candidaturas: Dict[str, Tuple[str, str]], estado: dict) -> Dict[str, dict]:
+        """
+        Pistas semanticas por candidatura. Los vectores de los requisitos se calculan una vez
+        por oferta y cada CV solo trocea y embebe su texto. Se guarda el fragmento recortado.
+        """
+        if self.comparador_semantico is None:
+            return {}
+        
+        por_oferta: Dict[str, List[Tuple[str, str]]] = {}
+        for id_candidatura, (oferta, cv) in candidaturas.items():
+            if not isinstance(estado["requisitos"][_huella(oferta)], str):
+                por_oferta.setdefault(_huella(oferta), []).append((id_candidatura, cv))
+        
+        evidencia = {}
+        for huella, cvs in por_oferta.items():
+            requisitos = estado["requisitos"][huella]
+            descripciones = [req["description"] for req in requisitos]
+            try:
+                vectores = self.comparador_semantico.embeber_requisitos(descripciones)
+            except Exception as e:
+                self._registro.advertencia("LOTES", f"Pistas semanticas omitidas para la oferta {huella}: {e}")
+                continue
+            for id_candidatura, cv in cvs:
+                try:
+                    indice = self.comparador_semantico.crear_indice(cv)
+                    encontradas = self.comparador_semantico.encontrar_toda_la_evidencia(
+                        descripciones, k=1, indice=indice, vectores_requisitos=vectores
+                    )
+                    coberturas = self.comparador_semantico.coberturas_lexicas(encontradas, indice)
+                except Exception as e:
+                    self._registro.advertencia("LOTES", f"Pistas semanticas omitidas para {id_candidatura}: {e}")
+                    continue
+                evidencia[id_candidatura] = {
+                    descripcion: {
+                        "text": pista["text"][:LONGITUD_PISTA],
+                        "semantic_score": float(pista["semantic_score"]),
+                        "lexical_coverage": pista["lexical_coverage"]
+                    }
+                    for descripcion, pista in construir_mapa_evidencia(requisitos, encontradas, coberturas).items()
+                }
+        return evidencia
+    
+    def _peticiones_matching(self, candidaturas: Dict[str, Tuple[str, str]], estado: dict) -> List[dict]:
+        modelo = self._modelo_etapa("phase1_matching")
+        temperatura = ConfiguracionHiperparametros.obtener_temperatura("phase1_matching")
+        peticiones = []
+        estado["evidencia"] = self._evidencia_semantica(candidaturas, estado)
+        
+        for id_candidatura, (oferta, cv) in candidaturas.items():
+            requisitos = estado["requisitos"][_huella(oferta)]
+            if isinstance(requisitos, str):
+                estado["errores"][id_candidatura] = requisitos
+                continue
+            prompt, entradas = crear_prompt_matching(cv, requisitos, estado["evidencia"].get(id_candidatura))
+            peticiones.append(construir_peticion_lote(
+                f"match-{id_candidatura}", modelo, prompt.format_messages(**entradas),
+                RespuestaMatchingCV, temperatura
+            ))
+        return peticiones
+    
+    def _procesar_matching(
+        self,
+        candidaturas: Dict[str, Tuple[str, str]],
+        estado: dict,
+        respuestas: Dict[str, RespuestaLote]
+    ) -> Dict[str, ResultadoFase1]:
+        resultados = {}
+        for id_candidatura, (oferta, _) in candidaturas.items():
+            if id_candidatura in estado["errores"]:
+                continue
+            
+            respuesta = respuestas.get(f"match-{id_candidatura}")
+            if respuesta is None or respuesta.error:
+                estado["errores"][id_candidatura] = f"Error en matching: {respuesta.error if respuesta else 'sin respuesta'}"
+                continue
+            
+            llamada = self._registrar_llamada("phase1_matching", respuesta)
+            try:
+                matching = RespuestaMatchingCV.model_validate_json(respuesta.contenido)
+                requisitos = estado["requisitos"][_huella(oferta)]
+                evidencia = estado.get("evidencia", {}).get(id_candidatura)
+                resultado = construir_resultado_fase1(
+                    requisitos, evidencia or {}, procesar_resultado_matching(matching, evidencia)
+                )
+            except (ValidationError, ValueError) as e:
+                estado["errores"][id_candidatura] = f"Error en matching: {e}"
+                continue
+            
+            resultado.consumo = ConsumoEvaluacion(llamadas=[llamada])
+            resultados[id_candidatura] = resultado
+        return resultados
+    
+    # --- API publica ---
+    
+    def avanzar(self, candidaturas: Dict[str, Tuple[str, str]]) -> bool:
+        """Da un paso del lote (enviar, consultar o recoger). Devuelve True al terminar."""
+        estado = self._cargar_estado(candidaturas)
+        if estado["completado"]:
+            return True
+        
+        if estado["requisitos"] is None:
+            ofertas = {_huella(oferta): oferta for oferta, _ in candidaturas.values()}
+            if estado["trabajo_extraccion"] is None:
+                estado["trabajo_extraccion"] = self._enviar("extraccion", self._peticiones_extraccion(ofertas))
+                self._guardar_estado(estado)
+            if not self._terminado(estado, "trabajo_extraccion"):
+                return False
+            
+            respuestas = self.backend.descargar_resultados(estado["trabajo_extraccion"])
+            estado["requisitos"] = self._procesar_extraccion(ofertas, respuestas)
+            self._guardar_estado(estado)
+        
+        if estado["trabajo_matching"] is None:
+            peticiones = self._peticiones_matching(candidaturas, estado)
+            if peticiones:
+                estado["trabajo_matching"] = self._enviar("matching", peticiones)
+            self._guardar_estado(estado)
+        
+        resultados = {}
+        if estado["trabajo_matching"] is not None:
+            if not self._terminado(estado, "trabajo_matching"):
+                return False
+            respuestas = self.backend.descargar_resultados(estado["trabajo_matching"])
+            resultados = self._procesar_matching(candidaturas, estado, respuestas)
+        
+        self._ruta_resultados.write_text(json.dumps(
+            {id_c: r.model_dump(mode="json", by_alias=True) for id_c, r in resultados.items()},
+            ensure_ascii=False, indent=2
+        ), encoding="utf-8")
+        estado["completado"] = True
+        self._guardar_estado(estado)
+        self._registro.info(
+            f"Lote completado: {len(resultados)} evaluadas, {len(estado['errores'])} con error", "LOTES"
+        )
+        return True
+    
+    step = avanzar
+    
+    def ejecutar(self, candidaturas: Dict[str, Tuple[str, str]]) -> Dict[str, ResultadoFase1]:
+        """Envia (o retoma) el lote y sondea hasta tenerlo completo."""
+        while not self.avanzar(candidaturas):
+            time.sleep(self.intervalo_sondeo_s)
+        return self.obtener_resultados()
+    
+    run = ejecutar
+    
+    def obtener_resultados(self) -> Dict[str, ResultadoFase1]:
+        if not self._ruta_resultados.exists():
+            return {}
+        datos = json.loads(self._ruta_resultados.read_text(encoding="utf-8"))
+        return {id_c: ResultadoFase1.model_validate(r) for id_c, r in datos.items()}
+    
+    get_results = obtener_resultados
+    
+    def obtener_errores(self) -> Dict[str, str]:
+        if not self._ruta_estado.exists():
+            return {}
+        return json.loads(self._ruta_estado.read_text(encoding="utf-8"))["errores"]
+    
+    get_errors = obtener_errores
+
+
+Phase1BatchProcessor = ProcesadorLotesFase1
@@ -13,7 +13,7 @@ from langchain_core.output_parsers import StrOutputParser
 
 from ...modelos import (
     ResultadoFase1, TipoRequisito, RespuestaEntrevista,
-    EvaluacionRespuesta
+    EvaluacionRespuesta, ConsumoEvaluacion
 )
 from ...recursos import (
     PROMPT_EVALUAR_RESPUESTA,
@@ -22,7 +22,10 @@ from ...recursos import (
     PROMPT_PREGUNTA_AGENTE,
     PROMPT_CIERRE_AGENTE
 )
-from ...infraestructura.llm import FabricaLLM, ConfiguracionHiperparametros
+from ...infraestructura.llm import (
+    FabricaLLM, ConfiguracionHiperparametros,
+    ColectorConsumo, etiquetar_etapa
+)
 from ...utilidades import obtener_registro_operacional
 
 logger = logging.getLogger(__name__)
@@ -52,7 +55,8 @@ class EntrevistadorFase2:
         temp_evaluacion = ConfiguracionHiperparametros.obtener_temperatura("phase2_evaluation")
         
         if llm is None:
-            self.llm = FabricaLLM.crear_llm(
+            self.llm = FabricaLLM.crear_llm_etapa(
+                "phase2_interview",
                 proveedor=proveedor,
                 nombre_modelo=nombre_modelo,
                 temperatura=temp_entrevista,
@@ -61,12 +65,25 @@ class EntrevistadorFase2:
         else:
             self.llm = llm
         
-        self._llm_evaluacion = FabricaLLM.crear_llm(
+        proveedor_evaluacion, _ = FabricaLLM.resolver_modelo_etapa("phase2_evaluation", proveedor, nombre_modelo)
+        self._llm_evaluacion = etiquetar_etapa(FabricaLLM.aplicar_cache_prompt(FabricaLLM.crear_llm_etapa(
+            "phase2_evaluation",
             proveedor=proveedor,
             nombre_modelo=nombre_modelo,
             temperatura=temp_evaluacion,
             api_key=api_key
-        ).with_structured_output(EvaluacionRespuesta)
+        ).with_structured_output(EvaluacionRespuesta), proveedor_evaluacion), "phase2_evaluation")
+        
+        proveedor_entrevista = proveedor if llm is not None else FabricaLLM.resolver_modelo_etapa(
+            "phase2_interview", proveedor, nombre_modelo
+        )[0]
+        
+        # La conversacion se reparte entre varios generadores de streaming:
+        # su consumo se acumula por sesion con un colector adjunto al LLM
+        self._consumo_sesion = ColectorConsumo()
+        self._llm_conversacion = etiquetar_etapa(
+            FabricaLLM.aplicar_cache_prompt(self.llm, proveedor_entrevista), "phase2_interview"
+        ).with_config(callbacks=[self._consumo_sesion])
         
         self._nombre_candidato: str = ""
         self._contexto_cv: str = ""
@@ -85,6 +102,7 @@ class EntrevistadorFase2:
         """Configura una nueva sesión de entrevista a partir del resultado de Fase 1."""
         self._historial_conversacion = []
         self._indice_actual = 0
+        self._consumo_sesion.reiniciar()
         self._nombre_candidato = nombre_candidato or "candidato"
         self._contexto_cv = contexto_cv[:2000]
         
@@ -114,21 +132,24 @@ class EntrevistadorFase2:
     
     initialize_interview = inicializar_entrevista
     
+    def _prompt_sistema(self) -> str:
+        """Igual en saludo, preguntas y cierre para que el proveedor reutilice el prefijo."""
+        return PROMPT_SISTEMA_AGENTE.format(
+            nombre_candidato=self._nombre_candidato,
+            resumen_cv=self._contexto_cv[:500]
+        )
+    
     def transmitir_saludo(self) -> Generator[str, None, None]:
         """Genera saludo inicial con streaming token-by-token."""
         prompt = ChatPromptTemplate.from_messages([
-            ("system", PROMPT_SISTEMA_AGENTE.format(
-                nombre_candidato=self._nombre_candidato,
-                requisitos_pendientes=len(self._requisitos_pendientes),
-                resumen_cv=self._contexto_cv[:500]
-            )),
+            ("system", self._prompt_sistema()),
             ("human", PROMPT_SALUDO_AGENTE.format(
                 nombre_candidato=self._nombre_candidato,
                 cantidad_preguntas=len(self._requisitos_pendientes)
             ))
         ])
         
-        chain = prompt | self.llm | StrOutputParser()
+        chain = prompt | self._llm_conversacion | StrOutputParser()
         
         saludo = ""
         try:
@@ -161,11 +182,7 @@ class EntrevistadorFase2:
         historial_texto = self._construir_contexto_conversacion()
         
         prompt = ChatPromptTemplate.from_messages([
-            ("system", PROMPT_SISTEMA_AGENTE.format(
-                nombre_candidato=self._nombre_candidato,
-                requisitos_pendientes=len(self._requisitos_pendientes) - indice_pregunta,
-                resumen_cv=self._contexto_cv[:500]
-            )),
+            ("system", self._prompt_sistema()),
             ("human", PROMPT_PREGUNTA_AGENTE.format(
                 requisito=requisito["description"],
                 tipo_requisito="OBLIGATORIO" if requisito["type"] == "obligatory" else "DESEABLE",
@@ -176,7 +193,7 @@ class EntrevistadorFase2:
             ))
         ])
         
-        chain = prompt | self.llm | StrOutputParser()
+        chain = prompt | self._llm_conversacion | StrOutputParser()
         
         texto_pregunta = ""
         try:
@@ -214,17 +231,13 @@ class EntrevistadorFase2:
     def transmitir_cierre(self) -> Generator[str, None, None]:
         """Genera mensaje de cierre con streaming."""
         prompt = ChatPromptTemplate.from_messages([
-            ("system", PROMPT_SISTEMA_AGENTE.format(
-                nombre_candidato=self._nombre_candidato,
-                requisitos_pendientes=0,
-                resumen_cv=self._contexto_cv[:300]
-            )),
+            ("system", self._prompt_sistema()),
             ("human", PROMPT_CIERRE_AGENTE.format(
                 nombre_candidato=self._nombre_candidato
             ))
         ])
         
-        chain = prompt | self.llm | StrOutputParser()
+        chain = prompt | self._llm_conversacion | StrOutputParser()
         
         cierre = ""
         try:
@@ -276,47 +289,90 @@ class EntrevistadorFase2:
     
     register_response = registrar_respuesta
     
-    def evaluar_respuesta(
+    def _preparar_evaluacion(
         self,
         descripcion_requisito: str,
         tipo_requisito: TipoRequisito,
         contexto_cv: str,
         respuesta_candidato: str
-    ) -> Dict[str, Any]:
-        """Evalúa si la respuesta del candidato cumple un requisito."""
+    ) -> tuple:
         prompt = ChatPromptTemplate.from_messages([
             ("system", PROMPT_EVALUAR_RESPUESTA),
-            ("human", """Requisito: {requirement_description}
-Tipo: {requirement_type}
-
-Contexto del CV:
+            ("human", """Contexto del CV:
 {cv_context}
 
+Requisito: {requirement_description}
+Tipo: {requirement_type}
+
 Respuesta del candidato:
 {candidate_response}""")
         ])
         
         chain = prompt | self._llm_evaluacion
+        entradas = {
+            "requirement_description": descripcion_requisito,
+            "requirement_type": tipo_requisito.value if isinstance(tipo_requisito, TipoRequisito) else tipo_requisito,
+            "cv_context": contexto_cv[:1500],
+            "candidate_response": respuesta_candidato
+        }
+        return chain, entradas
+    
+    @staticmethod
+    def _formatear_evaluacion(resultado: EvaluacionRespuesta) -> Dict[str, Any]:
+        return {
+            "fulfilled": resultado.fulfilled,
+            "evidence": resultado.evidence.strip() if resultado.evidence else None,
+            "confidence": resultado.confidence
+        }
+    
+    def evaluar_respuesta(
+        self,
+        descripcion_requisito: str,
+        tipo_requisito: TipoRequisito,
+        contexto_cv: str,
+        respuesta_candidato: str
+    ) -> Dict[str, Any]:
+        """Evalúa si la respuesta del candidato cumple un requisito."""
+        chain, entradas = self._preparar_evaluacion(
+            descripcion_requisito, tipo_requisito, contexto_cv, respuesta_candidato
+        )
         
         try:
-            resultado: EvaluacionRespuesta = chain.invoke({
-                "requirement_description": descripcion_requisito,
-                "requirement_type": tipo_requisito.value if isinstance(tipo_requisito, TipoRequisito) else tipo_requisito,
-                "cv_context": contexto_cv[:1500],
-                "candidate_response": respuesta_candidato
-            })
-            
-            return {
-                "fulfilled": resultado.fulfilled,
-                "evidence": resultado.evidence.strip() if resultado.evidence else None,
-                "confidence": resultado.confidence
-            }
+            resultado: EvaluacionRespuesta = chain.invoke(entradas)
+            return self._formatear_evaluacion(resultado)
         except Exception as e:
             logger.error(f"Error evaluando respuesta: {e}")
             return {"fulfilled": False, "evidence": None, "confidence": "low"}
     
     evaluate_response = evaluar_respuesta
     
+    async def aevaluar_respuesta(
+        self,
+        descripcion_requisito: str,
+        tipo_requisito: TipoRequisito,
+        contexto_cv: str,
+        respuesta_candidato: str
+    ) -> Dict[str, Any]:
+        """Versión asíncrona de evaluar_respuesta."""
+        chain, entradas = self._preparar_evaluacion(
+            descripcion_requisito, tipo_requisito, contexto_cv, respuesta_candidato
+        )
+        
+        try:
+            resultado: EvaluacionRespuesta = await chain.ainvoke(entradas)
+            return self._formatear_evaluacion(resultado)
+        except Exception as e:
+            logger.error(f"Error evaluando respuesta: {e}")
+            return {"fulfilled": False, "evidence": None, "confidence": "low"}
+    
+    aevaluate_response = aevaluar_respuesta
+    
+    def obtener_consumo(self) -> ConsumoEvaluacion:
+        """Consumo de la conversacion (saludo, preguntas y cierre) de la sesion actual."""
+        return self._consumo_sesion.resumen()
+    
+    get_usage = obtener_consumo
+    
     def obtener_respuestas_entrevista(self) -> List[RespuestaEntrevista]:
         """Obtiene las respuestas formateadas para el sistema de evaluación."""
         respuestas = []
@@ -3,10 +3,12 @@ Módulo de Historial: Gestión y consulta RAG del historial de evaluaciones.
 """
 
 from .almacen_vectorial import AlmacenVectorialHistorial, HistoryVectorStore, normalizar_texto_para_embedding
+from .cuantizacion import CUANTIZACIONES, validar_cuantizacion, validate_quantization
 from .asistente import AsistenteHistorial, HistoryChatbot
 
 __all__ = [
     "AlmacenVectorialHistorial", "HistoryVectorStore",
     "normalizar_texto_para_embedding",
+    "CUANTIZACIONES", "validar_cuantizacion", "validate_quantization",
     "AsistenteHistorial", "HistoryChatbot",
 ]
@@ -2,21 +2,37 @@
 Almacén vectorial FAISS para búsqueda semántica en el historial de evaluaciones.
 
 El proveedor de embeddings es configurable e independiente del LLM de análisis.
+Cada índice guarda el proveedor y el identificador del modelo con el que se creó.
+Opcionalmente los vectores se guardan cuantizados (fp16, int8 o PQ) y los mejores
+candidatos se reordenan con la distancia exacta. Con dimensiones gruesas, la búsqueda
+barre primero el prefijo de cada vector (Matryoshka) y reordena con el vector completo.
 """
 
+import asyncio
+import json
 import logging
+import os
 import unicodedata
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
 from ...utilidades import obtener_registro_operacional
-from ...infraestructura.llm import FabricaEmbeddings
+from ...infraestructura.llm import FabricaEmbeddings, crear_indice_matryoshka
+from .cuantizacion import (
+    CUANTIZACION_FP16, MINIMO_ENTRENAMIENTO,
+    validar_cuantizacion, crear_indice, tipo_cuantizacion, reconstruir_vectores, bytes_indice,
+)
 
 logger = logging.getLogger(__name__)
 
+# Copia float32 de los vectores de un indice cuantizado (filas en orden de insercion, sin cabecera)
+ARCHIVO_VECTORES_EXACTOS = "vectores_exactos.f32"
+
 
 def normalizar_texto_para_embedding(texto: str) -> str:
     """Normaliza texto para evitar errores de codificación en APIs de embeddings."""
@@ -41,6 +57,15 @@ class AlmacenVectorialHistorial:
     Gestiona el almacenamiento vectorial del historial de evaluaciones.
     
     Soporta múltiples proveedores de embeddings (OpenAI, Google, etc.).
+    
+    cuantizacion ("fp16", "int8", "pq"; por defecto VELORA_CUANTIZACION_HISTORIAL o sin
+    cuantizar) reduce el tamaño del índice. Con factor_reordenacion > 1 se recuperan
+    k * factor candidatos del índice cuantizado y se reordenan con sus vectores exactos,
+    leídos de una copia float32 en disco (memmap: solo se leen las filas candidatas).
+    
+    dimensiones_gruesas (por defecto VELORA_DIMENSIONES_GRUESAS; desactivado si no se indica)
+    activa la búsqueda en dos etapas: prefijo corto para la lista de k * factor_candidatos_gruesos
+    candidatos y vector completo para ordenarla. Las dimensiones se registran en search_stages.json.
     """
     
     def __init__(
@@ -48,13 +73,22 @@ class AlmacenVectorialHistorial:
         id_usuario: str,
         ruta_almacenamiento: str = "data/vectores",
         proveedor_embeddings: Optional[str] = None,
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        cuantizacion: Optional[str] = None,
+        factor_reordenacion: int = 4,
+        dimensiones_gruesas: Optional[int] = None,
+        factor_candidatos_gruesos: int = 10
     ):
         """Inicializa el almacén vectorial para un usuario."""
         self.id_usuario = id_usuario
         self.ruta_almacenamiento = Path(ruta_almacenamiento)
         self.ruta_store = self.ruta_almacenamiento / id_usuario
         self.proveedor_embeddings = proveedor_embeddings
+        self.cuantizacion = validar_cuantizacion(
+            cuantizacion if cuantizacion is not None else os.getenv("VELORA_CUANTIZACION_HISTORIAL")
+        )
+        self.factor_reordenacion = factor_reordenacion
+        self._indice_grueso = crear_indice_matryoshka(dimensiones_gruesas, factor_candidatos_gruesos)
         
         self.ruta_almacenamiento.mkdir(parents=True, exist_ok=True)
         
@@ -62,8 +96,10 @@ class AlmacenVectorialHistorial:
             proveedor=proveedor_embeddings,
             api_key=api_key
         )
+        self.id_modelo = FabricaEmbeddings.obtener_id_modelo(self.embeddings, proveedor_embeddings or "openai")
         
         self.vectorstore: Optional[FAISS] = None
+        self._exactos: Optional[np.ndarray] = None
         self._cargar_existente_si_compatible()
         
         self.ultimos_documentos_recuperados: List[Document] = []
@@ -88,14 +124,51 @@ class AlmacenVectorialHistorial:
     def last_retrieved_docs(self):
         return self.ultimos_documentos_recuperados
     
+    @property
+    def model_id(self):
+        return self.id_modelo
+    
+    @property
+    def quantization(self):
+        return self.cuantizacion
+    
+    @property
+    def dimensiones_gruesas(self) -> Optional[int]:
+        return self._indice_grueso.dimensiones_gruesas if self._indice_grueso else None
+    
+    @property
+    def coarse_dimensions(self):
+        return self.dimensiones_gruesas
+    
+    def _guardar_identificacion(self):
+        (self.ruta_store / "embedding_provider.txt").write_text(self.proveedor_embeddings, encoding='utf-8')
+        (self.ruta_store / "embedding_model.txt").write_text(self.id_modelo, encoding='utf-8')
+        
+        archivo_etapas = self.ruta_store / "search_stages.json"
+        if self._indice_grueso is not None:
+            etapas = self._indice_grueso.metadatos(self.vectorstore.index.d)
+            archivo_etapas.write_text(json.dumps(etapas), encoding='utf-8')
+        elif archivo_etapas.exists():
+            archivo_etapas.unlink()
+    
     def _cargar_existente_si_compatible(self):
-        """Carga un vectorstore existente solo si fue creado con el mismo proveedor."""
+        """Carga un vectorstore existente solo si fue creado con el mismo proveedor y modelo."""
         ruta_indice = self.ruta_store / "index.faiss"
         archivo_proveedor = self.ruta_store / "embedding_provider.txt"
+        archivo_modelo = self.ruta_store / "embedding_model.txt"
         
         if not ruta_indice.exists():
             return
         
+        if archivo_modelo.exists():
+            modelo_guardado = archivo_modelo.read_text(encoding='utf-8').strip()
+            if modelo_guardado != self.id_modelo:
+                logger.warning(
+                    f"Índice incompatible: creado con '{modelo_guardado}', "
+                    f"actual '{self.id_modelo}'. Re-indexación necesaria."
+                )
+                return
+        
         if archivo_proveedor.exists():
             try:
                 proveedor_guardado = archivo_proveedor.read_text(encoding='utf-8').strip()
@@ -115,10 +188,134 @@ class AlmacenVectorialHistorial:
                 allow_dangerous_deserialization=True
             )
             logger.info(f"VectorStore cargado para usuario {self.id_usuario}")
+            if self._recuantizar_si_procede():
+                self.vectorstore.save_local(str(self.ruta_store))
+                self._guardar_identificacion()
+            elif tipo_cuantizacion(self.vectorstore.index) is not None and self._vectores_exactos() is None:
+                self._recalcular_exactos()
         except Exception as e:
             logger.warning(f"Error al cargar vectorstore: {e}")
             self.vectorstore = None
     
+    def _crear_vectorstore(self, textos: List[str], metadatos: List[dict]) -> FAISS:
+        """Vectorstore con índice plano o cuantizado según la configuración."""
+        if self._indice_grueso is not None:
+            self._indice_grueso.reiniciar()
+        if self.cuantizacion is None:
+            self._ruta_exactos.unlink(missing_ok=True)
+            return FAISS.from_texts(textos, self.embeddings, metadatas=metadatos)
+        
+        vectores = np.asarray(self.embeddings.embed_documents(textos), dtype=np.float32)
+        vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=crear_indice(vectores, self.cuantizacion),
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={}
+        )
+        vectorstore.add_embeddings(zip(textos, vectores.tolist()), metadatas=metadatos)
+        self._guardar_exactos(vectores)
+        return vectorstore
+    
+    # --- Copia exacta de los vectores (solo índices cuantizados) ---
+    
+    @property
+    def _ruta_exactos(self) -> Path:
+        return self.ruta_store / ARCHIVO_VECTORES_EXACTOS
+    
+    def _guardar_exactos(self, vectores: np.ndarray, anadir: bool = False) -> None:
+        self.ruta_store.mkdir(parents=True, exist_ok=True)
+        self._exactos = None
+        with open(self._ruta_exactos, "ab" if anadir else "wb") as f:
+            f.write(np.ascontiguousarray(vectores, dtype=np.float32).tobytes())
+    
+    def _vectores_exactos(self) -> Optional[np.ndarray]:
+        """Copia float32 mapeada en memoria, o None si falta o no corresponde al índice."""
+        if self._exactos is not None and len(self._exactos) == self.vectorstore.index.ntotal:
+            return self._exactos
+        indice = self.vectorstore.index
+        if not self._ruta_exactos.exists() or self._ruta_exactos.stat().st_size != indice.ntotal * indice.d * 4:
+            return None
+        if indice.ntotal == 0:
+            return np.zeros((0, indice.d), dtype=np.float32)
+        self._exactos = np.memmap(self._ruta_exactos, dtype=np.float32, mode="r", shape=(indice.ntotal, indice.d))
+        return self._exactos
+    
+    def _recalcular_exactos(self) -> None:
+        """Rehace la copia exacta desde los textos (índices guardados sin ella): una sola vez."""
+        textos = [
+            self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[posicion]).page_content
+            for posicion in range(self.vectorstore.index.ntotal)
+        ]
+        self._guardar_exactos(np.asarray(self.embeddings.embed_documents(textos), dtype=np.float32))
+        logger.info(f"Copia exacta de {len(textos)} vectores regenerada para {self.id_usuario}")
+    
+    def _recuantizar_si_procede(self) -> bool:
+        """
+        Pasa al tipo de índice configurado un índice plano, o uno fp16 provisional que ya
+        reúne vectores suficientes para entrenar. Las posiciones se conservan, así que el
+        mapeo al docstore sigue siendo válido.
+        """
+        indice = self.vectorstore.index
+        actual = tipo_cuantizacion(indice)
+        if self.cuantizacion is None or actual == self.cuantizacion:
+            return False
+        if actual not in (None, CUANTIZACION_FP16) or indice.ntotal < MINIMO_ENTRENAMIENTO[self.cuantizacion]:
+            return False
+        
+        vectores = reconstruir_vectores(indice)
+        nuevo = crear_indice(vectores, self.cuantizacion)
+        nuevo.add(vectores)
+        self.vectorstore.index = nuevo
+        if actual is None:
+            # Desde un índice plano los vectores reconstruidos son los exactos
+            self._guardar_exactos(vectores)
+        if self._indice_grueso is not None:
+            self._indice_grueso.reiniciar()
+        logger.info(f"Índice de {self.id_usuario} cuantizado a {self.cuantizacion} ({indice.ntotal} vectores)")
+        return True
+    
+    def _num_candidatos(self, k: int) -> int:
+        if self.factor_reordenacion > 1 and tipo_cuantizacion(self.vectorstore.index) is not None:
+            return k * self.factor_reordenacion
+        return k
+    
+    def _candidatos(self, vector: List[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(distancias, posiciones) del top-k del índice FAISS, en dos etapas si hay índice grueso."""
+        consulta = np.asarray([vector], dtype=np.float32)
+        if self._indice_grueso is None:
+            distancias, posiciones = self.vectorstore.index.search(consulta, k)
+        else:
+            distancias, posiciones = self._indice_grueso.buscar(
+                self.vectorstore.index, consulta, k, self.vectorstore.index_to_docstore_id
+            )
+        validas = posiciones[0] != -1
+        return distancias[0][validas], posiciones[0][validas]
+    
+    def _resultados(self, vector: List[float], k: int) -> List[tuple]:
+        """
+        [(documento, distancia L2 al cuadrado)] de los k más cercanos. Con índice cuantizado y
+        reordenación, los candidatos se ordenan por la distancia a su vector exacto.
+        """
+        num_candidatos = self._num_candidatos(k)
+        distancias, posiciones = self._candidatos(vector, num_candidatos)
+        exactos = self._vectores_exactos() if num_candidatos > k else None
+        if exactos is not None and len(posiciones):
+            diferencias = exactos[posiciones] - np.asarray(vector, dtype=np.float32)
+            distancias = np.einsum("ij,ij->i", diferencias, diferencias)
+            orden = np.argsort(distancias, kind="stable")
+            distancias, posiciones = distancias[orden], posiciones[orden]
+        return [
+            (self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[int(posicion)]), float(distancia))
+            for distancia, posicion in zip(distancias[:k], posiciones[:k])
+        ]
+    
+    def _buscar_con_puntuaciones(self, consulta: str, k: int) -> List[tuple]:
+        return self._resultados(self.embeddings.embed_query(consulta), k)
+    
+    async def _abuscar_con_puntuaciones(self, consulta: str, k: int) -> List[tuple]:
+        vector = await self.embeddings.aembed_query(consulta)
+        return await asyncio.get_running_loop().run_in_executor(None, self._resultados, vector, k)
+    
     def indexar_evaluaciones(self, evaluaciones: List[tuple]) -> bool:
         """Indexa evaluaciones para búsqueda semántica."""
         if not evaluaciones:
@@ -129,11 +326,10 @@ class AlmacenVectorialHistorial:
             textos = [normalizar_texto_para_embedding(texto) for texto, _ in evaluaciones]
             metadatos = [meta for _, meta in evaluaciones]
             
-            self.vectorstore = FAISS.from_texts(textos, self.embeddings, metadatas=metadatos)
+            self.vectorstore = self._crear_vectorstore(textos, metadatos)
             self.vectorstore.save_local(str(self.ruta_store))
             
-            archivo_proveedor = self.ruta_store / "embedding_provider.txt"
-            archivo_proveedor.write_text(self.proveedor_embeddings, encoding='utf-8')
+            self._guardar_identificacion()
             
             logger.info(f"Indexadas {len(evaluaciones)} evaluaciones para {self.id_usuario}")
             
@@ -154,16 +350,19 @@ class AlmacenVectorialHistorial:
             texto_normalizado = normalizar_texto_para_embedding(texto_busqueda)
             
             if self.vectorstore is None:
-                self.vectorstore = FAISS.from_texts(
-                    [texto_normalizado], self.embeddings, metadatas=[metadata]
-                )
+                self.vectorstore = self._crear_vectorstore([texto_normalizado], [metadata])
             else:
-                self.vectorstore.add_texts([texto_normalizado], metadatas=[metadata])
+                vector = np.asarray(self.embeddings.embed_documents([texto_normalizado]), dtype=np.float32)
+                self.vectorstore.add_embeddings([(texto_normalizado, vector[0].tolist())], metadatas=[metadata])
+                if tipo_cuantizacion(self.vectorstore.index) is not None:
+                    self._guardar_exactos(vector, anadir=True)
+                    if self._vectores_exactos() is None:
+                        self._recalcular_exactos()
+                self._recuantizar_si_procede()
             
             self.vectorstore.save_local(str(self.ruta_store))
             
-            archivo_proveedor = self.ruta_store / "embedding_provider.txt"
-            archivo_proveedor.write_text(self.proveedor_embeddings, encoding='utf-8')
+            self._guardar_identificacion()
             
             logger.info(f"Evaluación añadida al índice de {self.id_usuario}")
             return True
@@ -182,7 +381,7 @@ class AlmacenVectorialHistorial:
         
         try:
             consulta_normalizada = normalizar_texto_para_embedding(consulta)
-            documentos = self.vectorstore.similarity_search(consulta_normalizada, k=k)
+            documentos = [doc for doc, _ in self._buscar_con_puntuaciones(consulta_normalizada, k)]
             self.ultimos_documentos_recuperados = documentos
             
             registro = obtener_registro_operacional()
@@ -196,6 +395,28 @@ class AlmacenVectorialHistorial:
     
     search = buscar
     
+    async def abuscar(self, consulta: str, k: int = 5) -> List[Document]:
+        """Versión asíncrona de buscar."""
+        if self.vectorstore is None:
+            logger.warning("VectorStore no inicializado")
+            return []
+        
+        try:
+            consulta_normalizada = normalizar_texto_para_embedding(consulta)
+            documentos = [doc for doc, _ in await self._abuscar_con_puntuaciones(consulta_normalizada, k)]
+            self.ultimos_documentos_recuperados = documentos
+            
+            registro = obtener_registro_operacional()
+            registro.rag_consulta(len(documentos))
+            
+            return documentos
+        
+        except Exception as e:
+            logger.error(f"Error en búsqueda: {e}")
+            return []
+    
+    asearch = abuscar
+    
     def buscar_con_puntuaciones(self, consulta: str, k: int = 5) -> List[tuple]:
         """Realiza búsqueda semántica con scores de similitud."""
         if self.vectorstore is None:
@@ -203,7 +424,7 @@ class AlmacenVectorialHistorial:
         
         try:
             consulta_normalizada = normalizar_texto_para_embedding(consulta)
-            resultados = self.vectorstore.similarity_search_with_score(consulta_normalizada, k=k)
+            resultados = self._buscar_con_puntuaciones(consulta_normalizada, k)
             self.ultimos_documentos_recuperados = [doc for doc, _ in resultados]
             return resultados
             
@@ -247,6 +468,17 @@ class AlmacenVectorialHistorial:
     @property
     def document_count(self) -> int:
         return self.cantidad_documentos
+    
+    @property
+    def bytes_indice(self) -> int:
+        """Tamaño del índice FAISS serializado (0 si no hay índice)."""
+        if self.vectorstore is None:
+            return 0
+        return bytes_indice(self.vectorstore.index)
+    
+    @property
+    def index_bytes(self) -> int:
+        return self.bytes_indice
 
 
 HistoryVectorStore = AlmacenVectorialHistorial
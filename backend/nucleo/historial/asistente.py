@@ -13,7 +13,7 @@ from langchain_core.language_models import BaseChatModel
 
 from .almacen_vectorial import AlmacenVectorialHistorial
 from ...infraestructura.persistencia import MemoriaUsuario
-from ...infraestructura.llm import FabricaEmbeddings
+from ...infraestructura.llm import FabricaEmbeddings, etiquetar_etapa
 
 logger = logging.getLogger(__name__)
 
@@ -53,7 +53,8 @@ class AsistenteHistorial:
         llm: BaseChatModel,
         memoria: Optional[MemoriaUsuario] = None,
         proveedor_embeddings: Optional[str] = None,
-        api_key_embeddings: Optional[str] = None
+        api_key_embeddings: Optional[str] = None,
+        cuantizacion: Optional[str] = None
     ):
         """Inicializa el asistente RAG con almacén vectorial y LLM."""
         self.id_usuario = id_usuario
@@ -70,7 +71,8 @@ class AsistenteHistorial:
         self.almacen_vectorial = AlmacenVectorialHistorial(
             id_usuario,
             proveedor_embeddings=proveedor_actual,
-            api_key=api_key_embeddings
+            api_key=api_key_embeddings,
+            cuantizacion=cuantizacion
         )
         self._asegurar_indexacion()
         
@@ -139,31 +141,33 @@ Texto completo: {doc.page_content[:500]}
         
         return "\n".join(partes)
     
+    def _crear_chain_consulta(self):
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", PROMPT_ASISTENTE_HISTORIAL),
+            ("human", "{question}")
+        ])
+        return prompt | etiquetar_etapa(self.llm, "history_chat")
+    
+    def _registrar_respuesta(self, pregunta: str, respuesta) -> str:
+        if hasattr(respuesta, 'content'):
+            texto_respuesta = respuesta.content
+        else:
+            texto_respuesta = str(respuesta)
+        
+        self.historial_conversacion.append((pregunta, texto_respuesta))
+        return texto_respuesta
+    
     def consultar(self, pregunta: str, k: int = 5) -> str:
         """Procesa una pregunta del usuario sobre su historial."""
         documentos = self.almacen_vectorial.buscar(pregunta, k=k)
         self.ultimos_documentos_recuperados = documentos
         
         contexto = self._formatear_contexto(documentos)
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", PROMPT_ASISTENTE_HISTORIAL),
-            ("human", "{question}")
-        ])
-        
-        chain = prompt | self.llm
+        chain = self._crear_chain_consulta()
         
         try:
             respuesta = chain.invoke({"context": contexto, "question": pregunta})
-            
-            if hasattr(respuesta, 'content'):
-                texto_respuesta = respuesta.content
-            else:
-                texto_respuesta = str(respuesta)
-            
-            self.historial_conversacion.append((pregunta, texto_respuesta))
-            
-            return texto_respuesta
+            return self._registrar_respuesta(pregunta, respuesta)
             
         except Exception as e:
             logger.error(f"Error al generar respuesta: {e}")
@@ -171,6 +175,24 @@ Texto completo: {doc.page_content[:500]}
     
     query = consultar
     
+    async def aconsultar(self, pregunta: str, k: int = 5) -> str:
+        """Versión asíncrona de consultar."""
+        documentos = await self.almacen_vectorial.abuscar(pregunta, k=k)
+        self.ultimos_documentos_recuperados = documentos
+        
+        contexto = self._formatear_contexto(documentos)
+        chain = self._crear_chain_consulta()
+        
+        try:
+            respuesta = await chain.ainvoke({"context": contexto, "question": pregunta})
+            return self._registrar_respuesta(pregunta, respuesta)
+        
+        except Exception as e:
+            logger.error(f"Error al generar respuesta: {e}")
+            return f"Error al procesar la consulta: {str(e)}"
+    
+    aquery = aconsultar
+    
     def consultar_con_historial(self, pregunta: str, k: int = 5) -> str:
         """Procesa una pregunta considerando el historial de conversación."""
         documentos = self.almacen_vectorial.buscar(pregunta, k=k)
@@ -188,7 +210,7 @@ Texto completo: {doc.page_content[:500]}
         prompt = ChatPromptTemplate.from_messages(mensajes)
         
         try:
-            chain = prompt | self.llm
+            chain = prompt | etiquetar_etapa(self.llm, "history_chat")
             respuesta = chain.invoke({})
             
             if hasattr(respuesta, 'content'):
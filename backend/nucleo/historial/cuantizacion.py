@@ -0,0 +1,106 @@
+"""
+Indices FAISS cuantizados para el historial.
+- fp16: cuantizador escalar de media precision (2 bytes por componente, sin entrenamiento).
+- int8: cuantizador escalar de 8 bits por componente (entrenado con los propios vectores).
+- pq: product quantization, 1 byte por cada 8 componentes (requiere al menos 256 vectores).
+Si aun no hay vectores suficientes para entrenar, se usa fp16 hasta alcanzarlos.
+"""
+
+from typing import Optional
+
+import faiss
+import numpy as np
+
+
+CUANTIZACION_FP16 = "fp16"
+CUANTIZACION_INT8 = "int8"
+CUANTIZACION_PQ = "pq"
+CUANTIZACIONES = (CUANTIZACION_FP16, CUANTIZACION_INT8, CUANTIZACION_PQ)
+
+# Vectores minimos para entrenar cada cuantizador (PQ de 8 bits necesita 256 centroides)
+MINIMO_ENTRENAMIENTO = {CUANTIZACION_FP16: 0, CUANTIZACION_INT8: 32, CUANTIZACION_PQ: 256}
+
+
+def validar_cuantizacion(cuantizacion: Optional[str]) -> Optional[str]:
+    """Normaliza el nombre ('', 'none' y 'float32' equivalen a sin cuantizar)."""
+    if cuantizacion is None:
+        return None
+    valor = cuantizacion.strip().lower()
+    if valor in ("", "none", "float32", "flat"):
+        return None
+    if valor not in CUANTIZACIONES:
+        raise ValueError(f"Cuantización no soportada: {cuantizacion}. Opciones: {', '.join(CUANTIZACIONES)}")
+    return valor
+
+
+validate_quantization = validar_cuantizacion
+
+
+def _subcuantizadores_pq(dimensiones: int) -> int:
+    """Mayor divisor de las dimensiones que no supera dimensiones/8 (un byte por cada ~8 componentes)."""
+    for m in range(max(1, dimensiones // 8), 0, -1):
+        if dimensiones % m == 0:
+            return m
+    return 1
+
+
+def crear_indice(vectores: np.ndarray, cuantizacion: Optional[str]) -> faiss.Index:
+    """
+    Indice L2 vacio (pero entrenado) para los vectores dados.
+    Con menos vectores de los necesarios para entrenar int8/pq se devuelve un indice fp16.
+    """
+    dimensiones = vectores.shape[1]
+    if cuantizacion is None:
+        return faiss.IndexFlatL2(dimensiones)
+    if len(vectores) < MINIMO_ENTRENAMIENTO[cuantizacion]:
+        cuantizacion = CUANTIZACION_FP16
+
+    if cuantizacion == CUANTIZACION_FP16:
+        indice = faiss.IndexScalarQuantizer(dimensiones, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    elif cuantizacion == CUANTIZACION_INT8:
+        indice = faiss.IndexScalarQuantizer(dimensiones, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    else:
+        indice = faiss.IndexPQ(dimensiones, _subcuantizadores_pq(dimensiones), 8, faiss.METRIC_L2)
+        # Los historiales rara vez llegan a los ~10k vectores que FAISS recomienda; evita el aviso
+        indice.pq.cp.min_points_per_centroid = 1
+
+    if not indice.is_trained:
+        indice.train(np.ascontiguousarray(vectores, dtype=np.float32))
+    return indice
+
+
+create_index = crear_indice
+
+
+def tipo_cuantizacion(indice: faiss.Index) -> Optional[str]:
+    """Cuantizacion de un indice ya construido (None para indices float32)."""
+    indice = faiss.downcast_index(indice)
+    if isinstance(indice, faiss.IndexPQ):
+        return CUANTIZACION_PQ
+    if isinstance(indice, faiss.IndexScalarQuantizer):
+        if indice.sq.qtype == faiss.ScalarQuantizer.QT_fp16:
+            return CUANTIZACION_FP16
+        if indice.sq.qtype == faiss.ScalarQuantizer.QT_8bit:
+            return CUANTIZACION_INT8
+    return None
+
+
+quantization_type = tipo_cuantizacion
+
+
+def reconstruir_vectores(indice: faiss.Index) -> np.ndarray:
+    """Vectores (decodificados) almacenados en el indice, en orden de insercion."""
+    if indice.ntotal == 0:
+        return np.zeros((0, indice.d), dtype=np.float32)
+    return indice.reconstruct_n(0, indice.ntotal)
+
+
+reconstruct_vectors = reconstruir_vectores
+
+
+def bytes_indice(indice: faiss.Index) -> int:
+    """Tamano serializado del indice: lo que ocupa en disco y, en la practica, en memoria."""
+    return int(faiss.serialize_index(indice).size)
+
+
+index_bytes = bytes_indice
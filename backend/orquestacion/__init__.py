@@ -6,18 +6,23 @@ from .orquestador import (
     Orquestador, CoordinadorEvaluacion, Orchestrator, CandidateEvaluator,
 )
 from .grafo_fase1 import (
-    EstadoFase1, Phase1State,
-    crear_grafo_fase1, ejecutar_grafo_fase1, ejecutar_grafo_fase1_streaming,
-    crear_nodo_extraccion, crear_nodo_embedding, crear_nodo_matching, crear_nodo_puntuacion,
-    create_phase1_graph, run_phase1_graph, run_phase1_graph_streaming,
-    create_extract_node, create_embed_node, create_match_node, create_score_node,
+    EstadoFase1, Phase1State, EstadoLoteMatching, MatchBatchState, TAMANO_LOTE_MATCHING,
+    crear_grafo_fase1, ejecutar_grafo_fase1, aejecutar_grafo_fase1, ejecutar_grafo_fase1_streaming,
+    crear_nodo_extraccion, crear_nodo_indexado, crear_nodo_embedding, crear_nodo_matching, crear_nodo_puntuacion,
+    crear_reparto_matching, crear_nodo_fusion_matching, obtener_tamano_lote_matching,
+    create_phase1_graph, run_phase1_graph, arun_phase1_graph, run_phase1_graph_streaming,
+    create_extract_node, create_index_node, create_embed_node, create_match_node, create_score_node,
+    create_match_router, create_match_merge_node, get_match_batch_size,
 )
+from ..utilidades.procesamiento import dividir_requisitos_en_lotes, split_requirements
 
 __all__ = [
     "Orquestador", "CoordinadorEvaluacion", "Orchestrator", "CandidateEvaluator",
-    "EstadoFase1", "Phase1State",
-    "crear_grafo_fase1", "ejecutar_grafo_fase1", "ejecutar_grafo_fase1_streaming",
-    "crear_nodo_extraccion", "crear_nodo_embedding", "crear_nodo_matching", "crear_nodo_puntuacion",
-    "create_phase1_graph", "run_phase1_graph", "run_phase1_graph_streaming",
-    "create_extract_node", "create_embed_node", "create_match_node", "create_score_node",
+    "EstadoFase1", "Phase1State", "EstadoLoteMatching", "MatchBatchState", "TAMANO_LOTE_MATCHING",
+    "crear_grafo_fase1", "ejecutar_grafo_fase1", "aejecutar_grafo_fase1", "ejecutar_grafo_fase1_streaming",
+    "crear_nodo_extraccion", "crear_nodo_indexado", "crear_nodo_embedding", "crear_nodo_matching", "crear_nodo_puntuacion",
+    "crear_reparto_matching", "crear_nodo_fusion_matching", "dividir_requisitos_en_lotes", "obtener_tamano_lote_matching",
+    "create_phase1_graph", "run_phase1_graph", "arun_phase1_graph", "run_phase1_graph_streaming",
+    "create_extract_node", "create_index_node", "create_embed_node", "create_match_node", "create_score_node",
+    "create_match_router", "create_match_merge_node", "split_requirements", "get_match_batch_size",
 ]
@@ -1,35 +1,68 @@
 """
 Grafo LangGraph para orquestacion multi-agente de la Fase 1.
 
-Flujo: extraer_requisitos -> embeber_cv -> matching_semantico -> calcular_puntuacion
+Flujo:
+    extraer_requisitos --+                  +-> matching_semantico (lote 1) --+
+                         +-> embeber_cv ----+   ...                           +-> fusionar_matching -> calcular_puntuacion
+    indexar_cv ----------+                  +-> matching_semantico (lote n) --+
+
+El troceado y embedding del CV no dependen de los requisitos: indexar_cv corre en paralelo
+con la llamada de extraccion y embeber_cv solo busca los requisitos en el indice.
+Los requisitos se evaluan en lotes concurrentes (Send): una oferta larga no genera una
+respuesta enorme y la latencia depende del lote mayor, no de la lista completa.
 """
 
+import asyncio
+import os
 import re
-from typing import TypedDict, List, Optional, Dict, Annotated
+from typing import TypedDict, List, Optional, Dict, Annotated, Tuple, Callable
 from operator import add
 from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableLambda, RunnableConfig
+from pydantic import ValidationError
 
-from langgraph.graph import StateGraph, END
+from langgraph.config import get_stream_writer
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 
 from ..modelos import (
     Requisito, TipoRequisito, ResultadoFase1,
-    RespuestaExtraccionRequisitos, RespuestaMatchingCV
+    RespuestaExtraccionRequisitos, RespuestaMatchingCV,
+    ResultadoMatching, ResultadoMatchingLigero
 )
-from ..recursos import PROMPT_EXTRACCION_REQUISITOS, PROMPT_MATCHING_CV
+from ..recursos import PROMPT_EXTRACCION_REQUISITOS
 from ..utilidades import (
     calcular_puntuacion, procesar_coincidencias,
     agregar_requisitos_no_procesados, obtener_registro_operacional,
-    obtener_contexto_prompt
+    seleccionar_para_escalado, fusionar_escalado,
+    es_candidato_apto, fusionar_detalle, requisito_de_coincidencia,
+    dividir_requisitos_en_lotes, fusionar_coincidencias_lotes, resumir_coincidencias
 )
-from ..infraestructura.llm import ComparadorSemantico
+from ..infraestructura.llm import ConfiguracionHiperparametros, ComparadorSemantico, IndiceCV, MatrizSimilitud, etiquetar_etapa, ainvocar_con_elementos
+from ..nucleo.analisis.analizador import (
+    crear_prompt_matching, procesar_resultado_matching, coincidencia_a_dict, construir_mapa_evidencia
+)
+
+
+# Clave de configurable que activa la emision de cada veredicto en cuanto se genera
+EMITIR_COINCIDENCIAS = "emitir_coincidencias"
+
+# Requisitos por llamada de matching (VELORA_TAMANO_LOTE_MATCHING)
+TAMANO_LOTE_MATCHING = 12
 
 
 class EstadoFase1(TypedDict):
     oferta_trabajo: str
     cv: str
     requisitos: List[dict]
+    # Indice del CV (indexar_cv, en paralelo con la extraccion); None sin comparador o si fallo
+    indice_cv: Optional[IndiceCV]
     evidencia_semantica: Dict[str, dict]
+    # Scores requisito x chunk de la etapa semantica (None sin comparador o si fallo)
+    matriz_similitud: Optional[MatrizSimilitud]
+    # Resultado de cada lote de matching (los escriben en paralelo; fusionar_matching los combina)
+    lotes_matching: Annotated[List[dict], add]
     coincidencias: List[dict]
     requisitos_cumplidos: List[Requisito]
     requisitos_no_cumplidos: List[Requisito]
@@ -44,202 +77,559 @@ class EstadoFase1(TypedDict):
 Phase1State = EstadoFase1
 
 
-def crear_nodo_extraccion(llm: BaseChatModel):
-    """Nodo que extrae requisitos via LLM."""
-    llm_extraccion = llm.with_structured_output(RespuestaExtraccionRequisitos)
+class EstadoLoteMatching(TypedDict):
+    """Entrada de matching_semantico para un lote (enviada con Send)."""
+    cv: str
+    requisitos: List[dict]
+    evidencia_semantica: Dict[str, dict]
+    lote: int
+    num_lotes: int
+
+
+MatchBatchState = EstadoLoteMatching
+
+
+def crear_nodo_extraccion(llm: BaseChatModel, llm_extraccion: Optional[Runnable] = None) -> RunnableLambda:
+    """Nodo que extrae requisitos via LLM (sincrono y asincrono)."""
+    llm_extraccion = llm_extraccion or etiquetar_etapa(
+        llm.with_structured_output(RespuestaExtraccionRequisitos), "phase1_extraction"
+    )
+    
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", PROMPT_EXTRACCION_REQUISITOS),
+        ("human", "{job_offer}")
+    ])
+    
+    chain = prompt | llm_extraccion
+    
+    def procesar_resultado(resultado: RespuestaExtraccionRequisitos) -> dict:
+        requisitos = []
+        vistos = set()
+        
+        for req in resultado.requirements:
+            clave = req.description.lower().strip()
+            if clave not in vistos:
+                vistos.add(clave)
+                requisitos.append({
+                    "description": req.description.strip(),
+                    "type": req.type
+                })
+        
+        if not requisitos:
+            return {
+                "error": "No se encontraron requisitos en la oferta",
+                "requisitos": [],
+                "mensajes": ["[WARN] No se encontraron requisitos"]
+            }
+        
+        return {
+            "requisitos": requisitos,
+            "mensajes": [f"[OK] Extraidos {len(requisitos)} requisitos"]
+        }
+    
+    def resultado_error(e: Exception) -> dict:
+        return {
+            "error": f"Error en extraccion: {str(e)}",
+            "requisitos": [],
+            "mensajes": [f"[ERROR] {str(e)}"]
+        }
     
     def extraer_requisitos(estado: EstadoFase1) -> dict:
         registro = obtener_registro_operacional()
         registro.nodo_langgraph("extraer_requisitos", "ejecutando")
         
-        oferta = estado["oferta_trabajo"]
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", PROMPT_EXTRACCION_REQUISITOS),
-            ("human", "{job_offer}")
-        ])
-        
-        chain = prompt | llm_extraccion
+        try:
+            return procesar_resultado(chain.invoke({"job_offer": estado["oferta_trabajo"]}))
+        except Exception as e:
+            return resultado_error(e)
+    
+    async def aextraer_requisitos(estado: EstadoFase1) -> dict:
+        registro = obtener_registro_operacional()
+        registro.nodo_langgraph("extraer_requisitos", "ejecutando")
         
         try:
-            resultado: RespuestaExtraccionRequisitos = chain.invoke({"job_offer": oferta})
-            
-            requisitos = []
-            vistos = set()
-            
-            for req in resultado.requirements:
-                clave = req.description.lower().strip()
-                if clave not in vistos:
-                    vistos.add(clave)
-                    requisitos.append({
-                        "description": req.description.strip(),
-                        "type": req.type
-                    })
-            
-            if not requisitos:
-                return {
-                    "error": "No se encontraron requisitos en la oferta",
-                    "requisitos": [],
-                    "mensajes": ["[WARN] No se encontraron requisitos"]
-                }
-            
-            return {
-                "requisitos": requisitos,
-                "mensajes": [f"[OK] Extraidos {len(requisitos)} requisitos"]
-            }
+            return procesar_resultado(await chain.ainvoke({"job_offer": estado["oferta_trabajo"]}))
         except Exception as e:
-            return {
-                "error": f"Error en extraccion: {str(e)}",
-                "requisitos": [],
-                "mensajes": [f"[ERROR] {str(e)}"]
-            }
+            return resultado_error(e)
     
-    return extraer_requisitos
+    return RunnableLambda(extraer_requisitos, afunc=aextraer_requisitos, name="extraer_requisitos")
 
 
 create_extract_node = crear_nodo_extraccion
 
 
-def crear_nodo_embedding(comparador_semantico: Optional[ComparadorSemantico]):
+def crear_nodo_indexado(comparador_semantico: Optional[ComparadorSemantico]) -> RunnableLambda:
+    """Nodo que trocea y embebe el CV (o toma su indice de la cache); no necesita los requisitos."""
     
-    def embeber_cv(estado: EstadoFase1) -> dict:
+    def omitir() -> Optional[dict]:
+        if not comparador_semantico:
+            return {"indice_cv": None, "mensajes": ["[SKIP] Indexado del CV (sin comparador semantico)"]}
+        return None
+    
+    def resultado_ok(indice: IndiceCV) -> dict:
+        return {"indice_cv": indice, "mensajes": ["[OK] CV indexado"]}
+    
+    def resultado_error(e: Exception) -> dict:
+        return {"indice_cv": None, "mensajes": [f"[WARN] Indexado del CV fallido: {str(e)}"]}
+    
+    def indexar_cv(estado: EstadoFase1) -> dict:
         registro = obtener_registro_operacional()
-        registro.nodo_langgraph("embeber_cv", "ejecutando")
+        registro.nodo_langgraph("indexar_cv", "ejecutando")
         
-        if estado.get("error"):
-            return {"evidencia_semantica": {}, "mensajes": ["[SKIP] Embeddings (error previo)"]}
+        salida = omitir()
+        if salida is not None:
+            return salida
+        try:
+            return resultado_ok(comparador_semantico.crear_indice(estado["cv"]))
+        except Exception as e:
+            return resultado_error(e)
+    
+    async def aindexar_cv(estado: EstadoFase1) -> dict:
+        registro = obtener_registro_operacional()
+        registro.nodo_langgraph("indexar_cv", "ejecutando")
         
-        cv = estado["cv"]
-        requisitos = estado["requisitos"]
+        salida = omitir()
+        if salida is not None:
+            return salida
+        try:
+            return resultado_ok(await comparador_semantico.acrear_indice(estado["cv"]))
+        except Exception as e:
+            return resultado_error(e)
+    
+    return RunnableLambda(indexar_cv, afunc=aindexar_cv, name="indexar_cv")
+
+
+create_index_node = crear_nodo_indexado
+
+
+def crear_nodo_embedding(comparador_semantico: Optional[ComparadorSemantico]) -> RunnableLambda:
+    """
+    Nodo que busca los requisitos en el indice del CV (estado["indice_cv"]). Sin indice en el
+    estado (grafo sin indexar_cv o indexado fallido) lo crea aqui.
+    """
+    
+    def omitir(estado: EstadoFase1) -> Optional[dict]:
+        if estado.get("error"):
+            return {"evidencia_semantica": {}, "matriz_similitud": None, "mensajes": ["[SKIP] Embeddings (error previo)"]}
         
-        if not comparador_semantico or not requisitos:
+        if not comparador_semantico or not estado["requisitos"]:
             return {
                 "evidencia_semantica": {},
+                "matriz_similitud": None,
                 "mensajes": ["[SKIP] Embeddings deshabilitados o sin requisitos"]
             }
+        return None
+    
+    def resultado_ok(mapa_evidencia: Dict[str, dict], matriz: MatrizSimilitud) -> dict:
+        return {
+            "evidencia_semantica": mapa_evidencia,
+            "matriz_similitud": matriz,
+            "mensajes": [
+                f"[OK] Evidencia semantica para {len(mapa_evidencia)} requisitos "
+                f"(matriz {len(matriz.requisitos)}x{matriz.num_chunks})"
+            ]
+        }
+    
+    def resultado_error(e: Exception) -> dict:
+        return {
+            "evidencia_semantica": {},
+            "matriz_similitud": None,
+            "mensajes": [f"[WARN] Embeddings fallaron: {str(e)}"]
+        }
+    
+    def embeber_cv(estado: EstadoFase1) -> dict:
+        registro = obtener_registro_operacional()
+        registro.nodo_langgraph("embeber_cv", "ejecutando")
+        
+        salida = omitir(estado)
+        if salida is not None:
+            return salida
+        
+        requisitos = estado["requisitos"]
         
         try:
-            comparador_semantico.indexar_cv(cv)
-            
-            mapa_evidencia = {}
-            for req in requisitos:
-                desc = req["description"]
-                evidencia = comparador_semantico.encontrar_evidencia(desc, k=2)
-                
-                if evidencia:
-                    mejor_texto, mejor_score = evidencia[0]
-                    mapa_evidencia[desc.lower()] = {
-                        "text": mejor_texto,
-                        "semantic_score": mejor_score,
-                        "all_evidence": evidencia
-                    }
+            indice = estado.get("indice_cv")
+            if indice is None:
+                indice = comparador_semantico.crear_indice(estado["cv"])
+            descripciones = [req["description"] for req in requisitos]
+            # Vectores de la oferta: se embeben con el primer CV y los demas los reutilizan
+            vectores = comparador_semantico.embeber_requisitos(descripciones)
+            evidencias, matriz = comparador_semantico.encontrar_evidencia_y_matriz(
+                estado["cv"], descripciones, k=2, indice=indice, vectores_requisitos=vectores
+            )
             
-            comparador_semantico.limpiar()
+            coberturas = comparador_semantico.coberturas_lexicas(evidencias, indice)
+            return resultado_ok(construir_mapa_evidencia(requisitos, evidencias, coberturas), matriz)
+        except Exception as e:
+            return resultado_error(e)
+    
+    async def aembeber_cv(estado: EstadoFase1) -> dict:
+        registro = obtener_registro_operacional()
+        registro.nodo_langgraph("embeber_cv", "ejecutando")
+        
+        salida = omitir(estado)
+        if salida is not None:
+            return salida
+        
+        requisitos = estado["requisitos"]
+        
+        try:
+            indice = estado.get("indice_cv")
+            if indice is None:
+                indice = await comparador_semantico.acrear_indice(estado["cv"])
+            descripciones = [req["description"] for req in requisitos]
+            vectores = await comparador_semantico.aembeber_requisitos(descripciones)
+            evidencias, matriz = await comparador_semantico.aencontrar_evidencia_y_matriz(
+                estado["cv"], descripciones, k=2, indice=indice, vectores_requisitos=vectores
+            )
             
-            return {
-                "evidencia_semantica": mapa_evidencia,
-                "mensajes": [f"[OK] Evidencia semantica para {len(mapa_evidencia)} requisitos"]
-            }
+            coberturas = comparador_semantico.coberturas_lexicas(evidencias, indice)
+            return resultado_ok(construir_mapa_evidencia(requisitos, evidencias, coberturas), matriz)
         except Exception as e:
-            return {
-                "evidencia_semantica": {},
-                "mensajes": [f"[WARN] Embeddings fallaron: {str(e)}"]
-            }
+            return resultado_error(e)
     
-    return embeber_cv
+    return RunnableLambda(embeber_cv, afunc=aembeber_cv, name="embeber_cv")
 
 
 create_embed_node = crear_nodo_embedding
 
 
-def crear_nodo_matching(llm: BaseChatModel):
-    """Nodo que evalua requisitos con fecha actual dinamica."""
-    llm_matching = llm.with_structured_output(RespuestaMatchingCV)
+def obtener_tamano_lote_matching() -> int:
+    """
+    Requisitos por llamada de matching; VELORA_TAMANO_LOTE_MATCHING lo cambia (0: sin dividir
+    salvo lo que exija max_tokens, ver ConfiguracionHiperparametros.obtener_requisitos_por_llamada).
+    """
+    return int(os.getenv("VELORA_TAMANO_LOTE_MATCHING", str(TAMANO_LOTE_MATCHING)) or 0)
+
+
+get_match_batch_size = obtener_tamano_lote_matching
+
+
+def _cadena_matching(
+    estado: EstadoLoteMatching,
+    requisitos: List[dict],
+    llm_estructurado: Runnable,
+    veredictos: Optional[List[dict]] = None,
+    ligero: bool = False
+) -> tuple:
+    prompt, entradas = crear_prompt_matching(
+        estado["cv"], requisitos, estado.get("evidencia_semantica", {}), veredictos, ligero=ligero
+    )
+    return prompt | llm_estructurado, entradas
+
+
+def _resumen_fusionado(resumenes: List[str], coincidencias: List[dict], requisitos: List[dict]) -> str:
+    """
+    Con un lote, su resumen. Con varios, cada resumen solo ve su parte de la oferta: el resumen
+    se genera a partir de los veredictos ya fusionados (sin otra llamada al LLM).
+    """
+    if len(resumenes) == 1:
+        return resumenes[0].strip()
+    return resumir_coincidencias(coincidencias, requisitos)
+
+
+def crear_reparto_matching(tamano_lote_matching: Optional[int] = None) -> Callable[[EstadoFase1], object]:
+    """
+    Arista condicional tras embeber_cv: un Send a matching_semantico por lote de requisitos
+    (se ejecutan a la vez) o, con error previo o sin requisitos, directamente a fusionar_matching.
+    """
+    tamano_lote = obtener_tamano_lote_matching() if tamano_lote_matching is None else tamano_lote_matching
+    # Un lote mayor que lo que cabe en max_tokens truncaria la respuesta estructurada
+    capacidad = ConfiguracionHiperparametros.obtener_requisitos_por_llamada()
+    if capacidad and (tamano_lote <= 0 or tamano_lote > capacidad):
+        tamano_lote = capacidad
+    
+    def repartir_matching(estado: EstadoFase1):
+        if estado.get("error") or not estado["requisitos"]:
+            return "fusionar_matching"
+        lotes = dividir_requisitos_en_lotes(estado["requisitos"], tamano_lote)
+        return [
+            Send("matching_semantico", {
+                "cv": estado["cv"],
+                "requisitos": lote,
+                "evidencia_semantica": estado.get("evidencia_semantica", {}),
+                "lote": posicion,
+                "num_lotes": len(lotes)
+            })
+            for posicion, lote in enumerate(lotes)
+        ]
+    
+    return repartir_matching
+
+
+create_match_router = crear_reparto_matching
+
+
+def crear_nodo_matching(
+    llm: BaseChatModel,
+    llm_matching: Optional[Runnable] = None,
+    llm_escalado: Optional[Runnable] = None,
+    confianzas_escalado: Tuple[str, ...] = ("low",),
+    modelo_escalado: Optional[str] = None,
+    matching_ligero: bool = False
+) -> RunnableLambda:
+    """
+    Nodo que evalua un lote de requisitos con fecha actual dinamica (recibe EstadoLoteMatching
+    via Send; con el estado completo evalua todos los requisitos como un unico lote).
+    Con llm_escalado, los matches con confianza en confianzas_escalado se re-verifican en ese modelo.
+    Con matching_ligero, llm_matching es un cribado ligero (veredicto y confianza).
+    El resultado se anade a lotes_matching; fusionar_matching los combina.
+    """
+    llm_matching = llm_matching or etiquetar_etapa(
+        llm.with_structured_output(RespuestaMatchingCV), "phase1_matching"
+    )
+    
+    def etiqueta(estado: EstadoLoteMatching) -> str:
+        num_lotes = estado.get("num_lotes", 1)
+        if num_lotes == 1:
+            return "Matching completado"
+        return f"Matching lote {estado.get('lote', 0) + 1}/{num_lotes}"
+    
+    def procesar_resultado(resultado: RespuestaMatchingCV, estado: EstadoLoteMatching) -> dict:
+        resultado_matching = procesar_resultado_matching(resultado, estado.get("evidencia_semantica", {}))
+        coincidencias = resultado_matching["matches"]
+        cumplidos = sum(1 for m in coincidencias if m["fulfilled"])
+        
+        return {
+            "coincidencias": coincidencias,
+            "resumen_analisis": resultado_matching["analysis_summary"],
+            "mensajes": [f"[OK] {etiqueta(estado)}: {cumplidos}/{len(coincidencias)} cumplidos"]
+        }
     
-    def matching_cv(estado: EstadoFase1) -> dict:
+    def a_escalar(salida: dict, estado: EstadoLoteMatching) -> List[dict]:
+        if llm_escalado is None:
+            return []
+        return seleccionar_para_escalado(salida["coincidencias"], estado["requisitos"], confianzas_escalado)
+    
+    def fusionar(salida: dict, reverificado: dict, dudosos: List[dict], estado: EstadoLoteMatching) -> dict:
+        requisitos = estado["requisitos"]
+        obtener_registro_operacional().escalado_confianza(len(dudosos), len(requisitos), modelo_escalado)
+        coincidencias = fusionar_escalado(salida["coincidencias"], reverificado["coincidencias"], requisitos)
+        cumplidos = sum(1 for m in coincidencias if m["fulfilled"])
+        return {
+            **salida,
+            "coincidencias": coincidencias,
+            "mensajes": [
+                f"[OK] {etiqueta(estado)}: {cumplidos}/{len(coincidencias)} cumplidos "
+                f"({len(dudosos)} re-verificados con {modelo_escalado})"
+            ]
+        }
+    
+    def escalar(salida: dict, estado: EstadoLoteMatching) -> dict:
+        dudosos = a_escalar(salida, estado)
+        if not dudosos:
+            return salida
+        chain, entradas = _cadena_matching(estado, dudosos, llm_escalado)
+        try:
+            return fusionar(salida, procesar_resultado(chain.invoke(entradas), estado), dudosos, estado)
+        except Exception:
+            return salida
+    
+    async def aescalar(salida: dict, estado: EstadoLoteMatching) -> dict:
+        dudosos = a_escalar(salida, estado)
+        if not dudosos:
+            return salida
+        chain, entradas = _cadena_matching(estado, dudosos, llm_escalado)
+        try:
+            return fusionar(salida, procesar_resultado(await chain.ainvoke(entradas), estado), dudosos, estado)
+        except Exception:
+            return salida
+    
+    def emisor_coincidencias(estado: EstadoLoteMatching) -> Callable[[dict], None]:
+        """Emite por el stream "custom" cada coincidencia valida, una vez por requisito."""
+        escribir = get_stream_writer()
+        esquema = ResultadoMatchingLigero if matching_ligero else ResultadoMatching
+        emitidas = set()
+        
+        def emitir(objeto: dict) -> None:
+            try:
+                match = esquema.model_validate(objeto)
+            except ValidationError:
+                return
+            coincidencia = coincidencia_a_dict(match, estado.get("evidencia_semantica", {}))
+            clave = coincidencia["requirement_description"].lower()
+            if clave in emitidas:
+                return
+            emitidas.add(clave)
+            escribir({"coincidencia": coincidencia, "requisito": requisito_de_coincidencia(coincidencia, estado["requisitos"])})
+        
+        return emitir
+    
+    def resultado_lote(salida: dict, estado: EstadoLoteMatching, error: Optional[str] = None) -> dict:
+        return {
+            "lotes_matching": [{
+                "lote": estado.get("lote", 0),
+                "requisitos": estado["requisitos"],
+                "coincidencias": salida["coincidencias"],
+                "resumen_analisis": salida["resumen_analisis"],
+                "error": error
+            }],
+            "mensajes": salida["mensajes"]
+        }
+    
+    def resultado_error(e: Exception, estado: EstadoLoteMatching) -> dict:
+        salida = {
+            "coincidencias": [],
+            "resumen_analisis": f"Error: {str(e)}",
+            "mensajes": [f"[ERROR] Error en matching: {str(e)}"]
+        }
+        return resultado_lote(salida, estado, f"Error en matching: {str(e)}")
+    
+    def matching_cv(estado: EstadoLoteMatching) -> dict:
+        registro = obtener_registro_operacional()
+        registro.nodo_langgraph("matching_semantico", "ejecutando")
+        
+        chain, entradas = _cadena_matching(estado, estado["requisitos"], llm_matching, ligero=matching_ligero)
+        
+        try:
+            salida = procesar_resultado(chain.invoke(entradas), estado)
+        except Exception as e:
+            return resultado_error(e, estado)
+        return resultado_lote(escalar(salida, estado), estado)
+    
+    async def amatching_cv(estado: EstadoLoteMatching, config: RunnableConfig) -> dict:
         registro = obtener_registro_operacional()
         registro.nodo_langgraph("matching_semantico", "ejecutando")
         
+        chain, entradas = _cadena_matching(estado, estado["requisitos"], llm_matching, ligero=matching_ligero)
+        
+        try:
+            if (config.get("configurable") or {}).get(EMITIR_COINCIDENCIAS):
+                resultado = await ainvocar_con_elementos(chain, entradas, "matches", emisor_coincidencias(estado))
+            else:
+                resultado = await chain.ainvoke(entradas)
+            salida = procesar_resultado(resultado, estado)
+        except Exception as e:
+            return resultado_error(e, estado)
+        return resultado_lote(await aescalar(salida, estado), estado)
+    
+    return RunnableLambda(matching_cv, afunc=amatching_cv, name="matching_semantico")
+
+
+create_match_node = crear_nodo_matching
+
+
+def crear_nodo_fusion_matching(llm_detalle: Optional[Runnable] = None) -> RunnableLambda:
+    """
+    Nodo que combina los lotes de matching en el orden de la oferta (sin depender del orden en
+    que terminan), con una coincidencia por requisito aunque varios lotes lo evaluen, y un
+    resumen unico. Un lote fallido hace fallar la evaluacion, como antes.
+    Con llm_detalle (matching ligero), si el candidato es apto genera la evidencia de cada lote.
+    """
+    
+    def omitir(estado: EstadoFase1) -> Optional[dict]:
         if estado.get("error"):
             return {"coincidencias": [], "mensajes": ["[SKIP] Matching (error previo)"]}
         
-        cv = estado["cv"]
-        requisitos = estado["requisitos"]
-        evidencia_semantica = estado.get("evidencia_semantica", {})
-        
-        if not requisitos:
+        if not estado["requisitos"]:
             return {
                 "coincidencias": [],
                 "resumen_analisis": "No hay requisitos para evaluar",
                 "mensajes": ["[WARN] Sin requisitos para evaluar"]
             }
+        return None
+    
+    def combinar(lotes: List[dict], estado: EstadoFase1) -> dict:
+        for lote in lotes:
+            if lote.get("error"):
+                return {
+                    "coincidencias": [],
+                    "resumen_analisis": lote["resumen_analisis"],
+                    "error": lote["error"],
+                    "mensajes": []
+                }
         
-        lineas = []
-        for req in requisitos:
-            linea = f"- [{req['type'].upper()}] {req['description']}"
-            
-            ev_sem = evidencia_semantica.get(req['description'].lower())
-            if ev_sem and ev_sem.get('semantic_score', 0) > 0.4:
-                linea += f"\n  [PISTA SEMANTICA - Score: {ev_sem['semantic_score']:.2f}]: \"{ev_sem['text'][:150]}...\""
-            
-            lineas.append(linea)
+        requisitos = estado["requisitos"]
+        coincidencias = fusionar_coincidencias_lotes(
+            [(lote["requisitos"], lote["coincidencias"]) for lote in lotes], requisitos
+        )
+        mensajes = []
+        if len(lotes) > 1:
+            cumplidos = sum(1 for m in coincidencias if m["fulfilled"])
+            mensajes.append(f"[OK] Matching completado: {cumplidos}/{len(coincidencias)} cumplidos ({len(lotes)} lotes)")
+        return {
+            "coincidencias": coincidencias,
+            "resumen_analisis": _resumen_fusionado([lote["resumen_analisis"] for lote in lotes], coincidencias, requisitos),
+            "mensajes": mensajes
+        }
+    
+    def requiere_detalle(salida: dict, estado: EstadoFase1) -> bool:
+        return (
+            llm_detalle is not None and not salida.get("error")
+            and es_candidato_apto(salida["coincidencias"], estado["requisitos"])
+        )
+    
+    def fusionar_detalles(salida: dict, lotes: List[dict], detalles: list, estado: EstadoFase1) -> dict:
+        """detalles: (coincidencias, resumen) de cada lote, o None si su detalle fallo."""
+        detalladas = [c for detalle in detalles if detalle is not None for c in detalle[0]]
+        if not detalladas:
+            return salida
+        resumenes = [
+            detalle[1] if detalle is not None else lote["resumen_analisis"]
+            for lote, detalle in zip(lotes, detalles)
+        ]
+        coincidencias = fusionar_detalle(salida["coincidencias"], detalladas, estado["requisitos"])
+        return {
+            **salida,
+            "coincidencias": coincidencias,
+            "resumen_analisis": _resumen_fusionado(resumenes, coincidencias, estado["requisitos"]),
+            "mensajes": salida["mensajes"] + [f"[OK] Evidencia generada para {len(detalladas)} requisitos"]
+        }
+    
+    def procesar_detalle(resultado: RespuestaMatchingCV, estado: EstadoFase1) -> tuple:
+        resultado_matching = procesar_resultado_matching(resultado, estado.get("evidencia_semantica", {}))
+        return resultado_matching["matches"], resultado_matching["analysis_summary"]
+    
+    def detallar_lote(lote: dict, estado: EstadoFase1) -> Optional[tuple]:
+        chain, entradas = _cadena_matching(estado, lote["requisitos"], llm_detalle, lote["coincidencias"])
+        try:
+            return procesar_detalle(chain.invoke(entradas), estado)
+        except Exception:
+            return None
+    
+    async def adetallar_lote(lote: dict, estado: EstadoFase1) -> Optional[tuple]:
+        chain, entradas = _cadena_matching(estado, lote["requisitos"], llm_detalle, lote["coincidencias"])
+        try:
+            return procesar_detalle(await chain.ainvoke(entradas), estado)
+        except Exception:
+            return None
+    
+    def lotes_ordenados(estado: EstadoFase1) -> List[dict]:
+        return sorted(estado.get("lotes_matching") or [], key=lambda lote: lote["lote"])
+    
+    def fusionar_matching(estado: EstadoFase1) -> dict:
+        registro = obtener_registro_operacional()
+        registro.nodo_langgraph("fusionar_matching", "ejecutando")
         
-        texto_requisitos = "\n".join(lineas)
-        contexto_temporal = obtener_contexto_prompt()
+        salida = omitir(estado)
+        if salida is not None:
+            return salida
         
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", PROMPT_MATCHING_CV),
-            ("human", f"CONTEXTO TEMPORAL: {contexto_temporal}\n\nCV del candidato:\n{{cv}}\n\nRequisitos a evaluar:\n{{requirements_list}}")
-        ])
+        lotes = lotes_ordenados(estado)
+        salida = combinar(lotes, estado)
+        if not requiere_detalle(salida, estado):
+            return salida
+        return fusionar_detalles(salida, lotes, [detallar_lote(lote, estado) for lote in lotes], estado)
+    
+    async def afusionar_matching(estado: EstadoFase1) -> dict:
+        registro = obtener_registro_operacional()
+        registro.nodo_langgraph("fusionar_matching", "ejecutando")
         
-        chain = prompt | llm_matching
+        salida = omitir(estado)
+        if salida is not None:
+            return salida
         
-        try:
-            resultado: RespuestaMatchingCV = chain.invoke({
-                "cv": cv,
-                "requirements_list": texto_requisitos
-            })
-            
-            coincidencias = []
-            for match in resultado.matches:
-                match_dict = {
-                    "requirement_description": match.requirement_description.strip(),
-                    "fulfilled": match.fulfilled,
-                    "found_in_cv": match.found_in_cv,
-                    "evidence": match.evidence.strip() if match.evidence else None,
-                    "confidence": match.confidence,
-                    "reasoning": match.reasoning.strip() if match.reasoning else None,
-                    "semantic_score": None
-                }
-                
-                if evidencia_semantica:
-                    desc_lower = match.requirement_description.lower().strip()
-                    desc_limpia = re.sub(r'^\s*\[(OBLIGATORY|OPTIONAL)\]\s*', '', desc_lower, flags=re.IGNORECASE)
-                    ev_sem = evidencia_semantica.get(desc_limpia)
-                    if ev_sem:
-                        match_dict["semantic_score"] = ev_sem.get("semantic_score")
-                
-                coincidencias.append(match_dict)
-            
-            cumplidos = sum(1 for m in coincidencias if m["fulfilled"])
-            
-            return {
-                "coincidencias": coincidencias,
-                "resumen_analisis": resultado.analysis_summary,
-                "mensajes": [f"[OK] Matching completado: {cumplidos}/{len(coincidencias)} cumplidos"]
-            }
-        except Exception as e:
-            return {
-                "coincidencias": [],
-                "resumen_analisis": f"Error: {str(e)}",
-                "error": f"Error en matching: {str(e)}",
-                "mensajes": [f"[ERROR] Error en matching: {str(e)}"]
-            }
+        lotes = lotes_ordenados(estado)
+        salida = combinar(lotes, estado)
+        if not requiere_detalle(salida, estado):
+            return salida
+        detalles = await asyncio.gather(*(adetallar_lote(lote, estado) for lote in lotes))
+        return fusionar_detalles(salida, lotes, list(detalles), estado)
     
-    return matching_cv
+    return RunnableLambda(fusionar_matching, afunc=afusionar_matching, name="fusionar_matching")
 
 
-create_match_node = crear_nodo_matching
+create_match_merge_node = crear_nodo_fusion_matching
 
 
 def crear_nodo_puntuacion():
@@ -297,24 +687,52 @@ create_score_node = crear_nodo_puntuacion
 
 def crear_grafo_fase1(
     llm: BaseChatModel,
-    comparador_semantico: Optional[ComparadorSemantico] = None
+    comparador_semantico: Optional[ComparadorSemantico] = None,
+    llm_extraccion: Optional[Runnable] = None,
+    llm_matching: Optional[Runnable] = None,
+    llm_escalado: Optional[Runnable] = None,
+    confianzas_escalado: Tuple[str, ...] = ("low",),
+    modelo_escalado: Optional[str] = None,
+    matching_ligero: bool = False,
+    llm_detalle: Optional[Runnable] = None,
+    tamano_lote_matching: Optional[int] = None
 ) -> StateGraph:
-    nodo_extraccion = crear_nodo_extraccion(llm)
+    """
+    llm_extraccion/llm_matching permiten inyectar las llamadas estructuradas
+    ya preparadas (p. ej. con cobertura); por defecto se derivan de llm.
+    llm_escalado activa la re-verificacion de matches poco fiables.
+    matching_ligero indica que llm_matching es un cribado ligero; llm_detalle genera la evidencia de los aptos.
+    tamano_lote_matching: requisitos por llamada de matching (por defecto VELORA_TAMANO_LOTE_MATCHING o 12).
+    """
+    nodo_extraccion = crear_nodo_extraccion(llm, llm_extraccion)
+    nodo_indexado = crear_nodo_indexado(comparador_semantico)
     nodo_embedding = crear_nodo_embedding(comparador_semantico)
-    nodo_matching = crear_nodo_matching(llm)
+    nodo_matching = crear_nodo_matching(
+        llm, llm_matching, llm_escalado, confianzas_escalado, modelo_escalado, matching_ligero
+    )
+    nodo_fusion_matching = crear_nodo_fusion_matching(llm_detalle)
     nodo_puntuacion = crear_nodo_puntuacion()
     
     grafo = StateGraph(EstadoFase1)
     
     grafo.add_node("extraer_requisitos", nodo_extraccion)
+    grafo.add_node("indexar_cv", nodo_indexado)
     grafo.add_node("embeber_cv", nodo_embedding)
     grafo.add_node("matching_semantico", nodo_matching)
+    grafo.add_node("fusionar_matching", nodo_fusion_matching)
     grafo.add_node("calcular_puntuacion", nodo_puntuacion)
     
-    grafo.set_entry_point("extraer_requisitos")
-    grafo.add_edge("extraer_requisitos", "embeber_cv")
-    grafo.add_edge("embeber_cv", "matching_semantico")
-    grafo.add_edge("matching_semantico", "calcular_puntuacion")
+    # Fan-out: la extraccion (LLM) y el indexado del CV (embeddings) corren a la vez
+    grafo.add_edge(START, "extraer_requisitos")
+    grafo.add_edge(START, "indexar_cv")
+    # Fan-in: embeber_cv espera a los dos
+    grafo.add_edge(["extraer_requisitos", "indexar_cv"], "embeber_cv")
+    # Map-reduce: un matching_semantico por lote de requisitos y fusion en orden
+    grafo.add_conditional_edges(
+        "embeber_cv", crear_reparto_matching(tamano_lote_matching), ["matching_semantico", "fusionar_matching"]
+    )
+    grafo.add_edge("matching_semantico", "fusionar_matching")
+    grafo.add_edge("fusionar_matching", "calcular_puntuacion")
     grafo.add_edge("calcular_puntuacion", END)
     
     return grafo.compile()
@@ -323,12 +741,14 @@ def crear_grafo_fase1(
 create_phase1_graph = crear_grafo_fase1
 
 
-def ejecutar_grafo_fase1(grafo, oferta_trabajo: str, cv: str) -> ResultadoFase1:
-    estado_inicial: EstadoFase1 = {
+def _crear_estado_inicial(oferta_trabajo: str, cv: str) -> EstadoFase1:
+    return {
         "oferta_trabajo": oferta_trabajo,
         "cv": cv,
         "requisitos": [],
         "evidencia_semantica": {},
+        "matriz_similitud": None,
+        "lotes_matching": [],
         "coincidencias": [],
         "requisitos_cumplidos": [],
         "requisitos_no_cumplidos": [],
@@ -339,9 +759,9 @@ def ejecutar_grafo_fase1(grafo, oferta_trabajo: str, cv: str) -> ResultadoFase1:
         "error": None,
         "mensajes": []
     }
-    
-    estado_final = grafo.invoke(estado_inicial)
-    
+
+
+def _construir_resultado(estado_final: dict) -> ResultadoFase1:
     if estado_final.get("error"):
         raise ValueError(estado_final["error"])
     
@@ -355,30 +775,65 @@ def ejecutar_grafo_fase1(grafo, oferta_trabajo: str, cv: str) -> ResultadoFase1:
     )
 
 
+def ejecutar_grafo_fase1(grafo, oferta_trabajo: str, cv: str) -> ResultadoFase1:
+    estado_final = grafo.invoke(_crear_estado_inicial(oferta_trabajo, cv))
+    return _construir_resultado(estado_final)
+
+
 run_phase1_graph = ejecutar_grafo_fase1
 
 
-async def ejecutar_grafo_fase1_streaming(grafo, oferta_trabajo: str, cv: str):
-    estado_inicial: EstadoFase1 = {
-        "oferta_trabajo": oferta_trabajo,
-        "cv": cv,
-        "requisitos": [],
-        "evidencia_semantica": {},
-        "coincidencias": [],
-        "requisitos_cumplidos": [],
-        "requisitos_no_cumplidos": [],
-        "requisitos_faltantes": [],
-        "puntuacion": 0.0,
-        "descartado": False,
-        "resumen_analisis": "",
-        "error": None,
-        "mensajes": []
-    }
+async def aejecutar_grafo_fase1(grafo, oferta_trabajo: str, cv: str) -> ResultadoFase1:
+    """Version asincrona: los nodos usan ainvoke y no bloquean el event loop."""
+    estado_final = await grafo.ainvoke(_crear_estado_inicial(oferta_trabajo, cv))
+    return _construir_resultado(estado_final)
+
+
+arun_phase1_graph = aejecutar_grafo_fase1
+
+
+def _evento_coincidencia(datos: dict) -> dict:
+    """Evento de un veredicto provisional (antes del escalado y la puntuacion)."""
+    coincidencia = datos["coincidencia"]
+    requisito = datos.get("requisito")
+    tipo = requisito["type"] if requisito else None
+    descarta = tipo == TipoRequisito.OBLIGATORIO.value and not coincidencia["fulfilled"]
     
-    async for estado in grafo.astream(estado_inicial):
-        for nombre_nodo, salida_nodo in estado.items():
+    descripcion = coincidencia["requirement_description"]
+    if descarta:
+        mensaje = f"[WARN] Requisito obligatorio no cumplido: {descripcion}"
+    else:
+        veredicto = "cumple" if coincidencia["fulfilled"] else "no cumple"
+        mensaje = f"[MATCH] {descripcion}: {veredicto} ({coincidencia['confidence']})"
+    return {
+        "node": "matching_semantico",
+        "event": "match",
+        "messages": [mensaje],
+        "match": coincidencia,
+        "requirement_type": tipo,
+        "disqualifying": descarta
+    }
+
+
+async def ejecutar_grafo_fase1_streaming(grafo, oferta_trabajo: str, cv: str):
+    """
+    Emite la salida de cada nodo y, durante el matching, cada veredicto en cuanto el modelo
+    cierra su objeto JSON (event="match"). Los veredictos son provisionales: el escalado puede
+    cambiarlos y la salida de calcular_puntuacion es la definitiva.
+    """
+    config = {"configurable": {EMITIR_COINCIDENCIAS: True}}
+    async for modo, datos in grafo.astream(
+        _crear_estado_inicial(oferta_trabajo, cv), config, stream_mode=["updates", "custom"]
+    ):
+        if modo == "custom":
+            if isinstance(datos, dict) and "coincidencia" in datos:
+                yield _evento_coincidencia(datos)
+            continue
+        
+        for nombre_nodo, salida_nodo in datos.items():
             yield {
                 "node": nombre_nodo,
+                "event": "update",
                 "messages": salida_nodo.get("mensajes", []),
                 "state": salida_nodo
             }
@@ -2,15 +2,17 @@
 Orquestador Principal: Coordina las dos fases del proceso de evaluación de candidatos.
 """
 
-from typing import Optional
+import asyncio
+from typing import List, Optional, Tuple
 from langchain_core.language_models import BaseChatModel
 
 from ..modelos import (
-    ResultadoEvaluacion, ResultadoFase1, Requisito, TipoRequisito, RespuestaEntrevista, NivelConfianza
+    ResultadoEvaluacion, ResultadoFase1, Requisito, TipoRequisito, RespuestaEntrevista, NivelConfianza,
+    ConsumoEvaluacion
 )
 from ..nucleo import AnalizadorFase1, EntrevistadorFase2
-from ..utilidades import cargar_archivo_texto, calcular_puntuacion
-from ..infraestructura.llm import configurar_langsmith, obtener_cliente_langsmith
+from ..utilidades import cargar_archivo_texto, calcular_puntuacion, obtener_registro_operacional
+from ..infraestructura.llm import configurar_langsmith, obtener_cliente_langsmith, medir_consumo
 
 
 class Orquestador:
@@ -67,16 +69,13 @@ class Orquestador:
     def phase2_interviewer(self):
         return self.entrevistador_fase2
     
-    def evaluar_candidato(
+    def _resolver_textos(
         self,
-        ruta_oferta: Optional[str] = None,
-        ruta_cv: Optional[str] = None,
-        texto_oferta: Optional[str] = None,
-        texto_cv: Optional[str] = None,
-        interactivo: bool = True,
-        respuestas_candidato: Optional[list] = None
-    ) -> ResultadoEvaluacion:
-        """Ejecuta la evaluación completa del candidato (Fase 1 + Fase 2 opcional)."""
+        ruta_oferta: Optional[str],
+        ruta_cv: Optional[str],
+        texto_oferta: Optional[str],
+        texto_cv: Optional[str]
+    ) -> Tuple[str, str]:
         if ruta_oferta:
             oferta = cargar_archivo_texto(ruta_oferta)
         elif texto_oferta:
@@ -91,8 +90,15 @@ class Orquestador:
         else:
             raise ValueError("Debe proporcionar ruta_cv o texto_cv")
         
-        resultado_fase1 = self.analizador_fase1.analizar(oferta, cv)
-        
+        return oferta, cv
+    
+    def _resultado_sin_reevaluacion(
+        self,
+        resultado_fase1: ResultadoFase1,
+        interactivo: bool,
+        respuestas_candidato: Optional[list]
+    ) -> Optional[ResultadoEvaluacion]:
+        """Resultado final cuando no hay que re-evaluar con entrevista, o None si hay que hacerlo."""
         # Si descartado, no continuar a Fase 2
         if resultado_fase1.descartado:
             return ResultadoEvaluacion(
@@ -103,7 +109,8 @@ class Orquestador:
                 requisitos_finales_cumplidos=resultado_fase1.requisitos_cumplidos,
                 requisitos_finales_no_cumplidos=resultado_fase1.requisitos_no_cumplidos,
                 descartado_final=True,
-                resumen_evaluacion=self._generar_resumen(resultado_fase1, [], resultado_fase1.puntuacion)
+                resumen_evaluacion=self._generar_resumen(resultado_fase1, [], resultado_fase1.puntuacion),
+                consumo=resultado_fase1.consumo
             )
         
         # Si no hay requisitos faltantes, no hay Fase 2
@@ -116,16 +123,12 @@ class Orquestador:
                 requisitos_finales_cumplidos=resultado_fase1.requisitos_cumplidos,
                 requisitos_finales_no_cumplidos=resultado_fase1.requisitos_no_cumplidos,
                 descartado_final=False,
-                resumen_evaluacion=self._generar_resumen(resultado_fase1, [], resultado_fase1.puntuacion)
+                resumen_evaluacion=self._generar_resumen(resultado_fase1, [], resultado_fase1.puntuacion),
+                consumo=resultado_fase1.consumo
             )
         
-        # Modo batch: usar respuestas predefinidas
-        if not interactivo and respuestas_candidato:
-            respuestas_entrevista = self._realizar_entrevista_batch(
-                resultado_fase1, cv, respuestas_candidato
-            )
-        else:
-            # Modo interactivo: el frontend maneja el streaming
+        # Modo interactivo: el frontend maneja el streaming
+        if interactivo or not respuestas_candidato:
             return ResultadoEvaluacion(
                 resultado_fase1=resultado_fase1,
                 fase2_completada=False,
@@ -134,14 +137,84 @@ class Orquestador:
                 requisitos_finales_cumplidos=resultado_fase1.requisitos_cumplidos,
                 requisitos_finales_no_cumplidos=resultado_fase1.requisitos_no_cumplidos,
                 descartado_final=False,
-                resumen_evaluacion="Pendiente: Completar entrevista interactiva (Fase 2)"
+                resumen_evaluacion="Pendiente: Completar entrevista interactiva (Fase 2)",
+                consumo=resultado_fase1.consumo
             )
         
-        resultado_final = self.reevaluar_con_entrevista(resultado_fase1, respuestas_entrevista)
-        return resultado_final
+        return None
+    
+    def evaluar_candidato(
+        self,
+        ruta_oferta: Optional[str] = None,
+        ruta_cv: Optional[str] = None,
+        texto_oferta: Optional[str] = None,
+        texto_cv: Optional[str] = None,
+        interactivo: bool = True,
+        respuestas_candidato: Optional[list] = None
+    ) -> ResultadoEvaluacion:
+        """Ejecuta la evaluación completa del candidato (Fase 1 + Fase 2 opcional)."""
+        oferta, cv = self._resolver_textos(ruta_oferta, ruta_cv, texto_oferta, texto_cv)
+        
+        resultado_fase1 = self.analizador_fase1.analizar(oferta, cv)
+        
+        resultado = self._resultado_sin_reevaluacion(resultado_fase1, interactivo, respuestas_candidato)
+        if resultado is not None:
+            return resultado
+        
+        # Modo batch: usar respuestas predefinidas
+        respuestas_entrevista = self._realizar_entrevista_batch(
+            resultado_fase1, cv, respuestas_candidato
+        )
+        return self.reevaluar_con_entrevista(resultado_fase1, respuestas_entrevista)
     
     evaluate_candidate = evaluar_candidato
     
+    async def aevaluar_candidato(
+        self,
+        ruta_oferta: Optional[str] = None,
+        ruta_cv: Optional[str] = None,
+        texto_oferta: Optional[str] = None,
+        texto_cv: Optional[str] = None,
+        interactivo: bool = True,
+        respuestas_candidato: Optional[list] = None
+    ) -> ResultadoEvaluacion:
+        """
+        Versión asíncrona de evaluar_candidato.
+        Permite lanzar muchas evaluaciones en un mismo event loop (asyncio.gather).
+        """
+        oferta, cv = self._resolver_textos(ruta_oferta, ruta_cv, texto_oferta, texto_cv)
+        
+        resultado_fase1 = await self.analizador_fase1.aanalizar(oferta, cv)
+        
+        resultado = self._resultado_sin_reevaluacion(resultado_fase1, interactivo, respuestas_candidato)
+        if resultado is not None:
+            return resultado
+        
+        respuestas_entrevista = self._construir_respuestas_batch(resultado_fase1, respuestas_candidato)
+        return await self.areevaluar_con_entrevista(resultado_fase1, respuestas_entrevista)
+    
+    aevaluate_candidate = aevaluar_candidato
+    
+    @staticmethod
+    def _construir_respuestas_batch(resultado_fase1: ResultadoFase1, respuestas_candidato: list) -> list:
+        """
+        Respuestas batch sin pasar por el estado del entrevistador,
+        que es por sesión y no admite evaluaciones concurrentes.
+        """
+        tipos = {req.descripcion.lower(): req.tipo for req in resultado_fase1.requisitos_no_cumplidos}
+        respuestas = []
+        
+        for i, descripcion in enumerate(resultado_fase1.requisitos_faltantes):
+            texto_respuesta = respuestas_candidato[i] if i < len(respuestas_candidato) else ""
+            respuestas.append(RespuestaEntrevista(
+                pregunta=f"Pregunta sobre: {descripcion}",
+                respuesta=texto_respuesta,
+                descripcion_requisito=descripcion,
+                tipo_requisito=tipos.get(descripcion.lower(), TipoRequisito.DESEABLE)
+            ))
+        
+        return respuestas
+    
     def _realizar_entrevista_batch(
         self,
         resultado_fase1: ResultadoFase1,
@@ -174,9 +247,72 @@ class Orquestador:
     def reevaluar_con_entrevista(
         self,
         resultado_fase1: ResultadoFase1,
-        respuestas_entrevista: list
+        respuestas_entrevista: list,
+        consumo_entrevista: Optional[ConsumoEvaluacion] = None
+    ) -> ResultadoEvaluacion:
+        """
+        Re-evalúa al candidato incorporando las respuestas de la entrevista.
+        consumo_entrevista: consumo de la conversación (EntrevistadorFase2.obtener_consumo).
+        """
+        with medir_consumo() as colector:
+            evaluaciones = [
+                self.entrevistador_fase2.evaluar_respuesta(
+                    resp.descripcion_requisito,
+                    resp.tipo_requisito,
+                    "",
+                    resp.respuesta
+                )
+                for resp in respuestas_entrevista
+            ]
+        resultado = self._combinar_con_entrevista(resultado_fase1, respuestas_entrevista, evaluaciones)
+        resultado.consumo = self._consumo_total(resultado_fase1, colector.resumen(), consumo_entrevista)
+        return resultado
+    
+    reevaluate_with_interview = reevaluar_con_entrevista
+    
+    async def areevaluar_con_entrevista(
+        self,
+        resultado_fase1: ResultadoFase1,
+        respuestas_entrevista: list,
+        consumo_entrevista: Optional[ConsumoEvaluacion] = None
+    ) -> ResultadoEvaluacion:
+        """Versión asíncrona: evalúa todas las respuestas en paralelo."""
+        with medir_consumo() as colector:
+            evaluaciones = await asyncio.gather(*[
+                self.entrevistador_fase2.aevaluar_respuesta(
+                    resp.descripcion_requisito,
+                    resp.tipo_requisito,
+                    "",
+                    resp.respuesta
+                )
+                for resp in respuestas_entrevista
+            ])
+        resultado = self._combinar_con_entrevista(resultado_fase1, respuestas_entrevista, list(evaluaciones))
+        resultado.consumo = self._consumo_total(resultado_fase1, colector.resumen(), consumo_entrevista)
+        return resultado
+    
+    areevaluate_with_interview = areevaluar_con_entrevista
+    
+    @staticmethod
+    def _consumo_total(
+        resultado_fase1: ResultadoFase1,
+        consumo_evaluacion: ConsumoEvaluacion,
+        consumo_entrevista: Optional[ConsumoEvaluacion]
+    ) -> ConsumoEvaluacion:
+        consumo_fase2 = consumo_evaluacion.combinar(consumo_entrevista)
+        totales = consumo_fase2.totales()
+        obtener_registro_operacional().consumo_evaluacion(
+            "FASE 2", totales["calls"], totales["input_tokens"] + totales["output_tokens"],
+            totales["cost_usd"], totales["duration_ms"]
+        )
+        return (resultado_fase1.consumo or ConsumoEvaluacion()).combinar(consumo_fase2)
+    
+    def _combinar_con_entrevista(
+        self,
+        resultado_fase1: ResultadoFase1,
+        respuestas_entrevista: list,
+        evaluaciones: List[dict]
     ) -> ResultadoEvaluacion:
-        """Re-evalúa al candidato incorporando las respuestas de la entrevista."""
         mapa_respuestas = {
             resp.descripcion_requisito: resp
             for resp in respuestas_entrevista
@@ -185,14 +321,7 @@ class Orquestador:
         cumplidos_entrevista = []
         no_cumplidos_entrevista = []
         
-        for resp in respuestas_entrevista:
-            evaluacion = self.entrevistador_fase2.evaluar_respuesta(
-                resp.descripcion_requisito,
-                resp.tipo_requisito,
-                "",
-                resp.respuesta
-            )
-            
+        for resp, evaluacion in zip(respuestas_entrevista, evaluaciones):
             requisito = Requisito(
                 descripcion=resp.descripcion_requisito,
                 tipo=resp.tipo_requisito,
@@ -241,8 +370,6 @@ class Orquestador:
             resumen_evaluacion=resumen_evaluacion
         )
     
-    reevaluate_with_interview = reevaluar_con_entrevista
-    
     def _generar_resumen(
         self,
         resultado_fase1: ResultadoFase1,
@@ -15,6 +15,14 @@ from .procesamiento import (
     limpiar_descripcion_requisito,
     procesar_coincidencias,
     agregar_requisitos_no_procesados,
+    seleccionar_para_escalado,
+    fusionar_escalado,
+    requisito_de_coincidencia,
+    es_candidato_apto,
+    fusionar_detalle,
+    dividir_requisitos_en_lotes,
+    fusionar_coincidencias_lotes,
+    resumir_coincidencias,
 )
 
 from .contexto_temporal import (
@@ -29,5 +37,8 @@ __all__ = [
     "calcular_puntuacion", "cargar_archivo_texto",
     "limpiar_descripcion_requisito",
     "procesar_coincidencias", "agregar_requisitos_no_procesados",
+    "seleccionar_para_escalado", "fusionar_escalado", "requisito_de_coincidencia",
+    "es_candidato_apto", "fusionar_detalle",
+    "dividir_requisitos_en_lotes", "fusionar_coincidencias_lotes", "resumir_coincidencias",
     "obtener_fecha_hoy", "obtener_fecha_formateada", "obtener_contexto_prompt",
 ]
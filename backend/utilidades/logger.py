@@ -157,6 +157,14 @@ class RegistroOperacional:
     
     matching_complete = matching_completo
     
+    def escalado_confianza(self, escalados: int, total: int, modelo: str):
+        if not self.habilitado:
+            return
+        msg = self._formatear(Indicadores.INFO, "MATCHING", f"Escalado: {Colores.NEGRITA}{escalados}/{total}{Colores.RESET} requisitos con confianza baja re-verificados con {modelo}", Colores.AZUL)
+        self.logger.info(msg)
+    
+    confidence_escalation = escalado_confianza
+    
     def fase1_completa(self, descartado: bool, puntuacion: float, duracion_ms: Optional[int] = None):
         if not self.habilitado:
             return
@@ -224,6 +232,33 @@ class RegistroOperacional:
     
     evaluation_saved = evaluacion_guardada
     
+    def consumo_llamada(
+        self,
+        etapa: str,
+        modelo: str,
+        tokens_entrada: int,
+        tokens_salida: int,
+        duracion_ms: int,
+        desde_cache: bool = False,
+        tokens_cacheados: int = 0
+    ):
+        if not self.habilitado:
+            return
+        origen = " (cache)" if desde_cache else ""
+        prefijo = f" ({tokens_cacheados} de entrada en cache de prefijo)" if tokens_cacheados else ""
+        msg = self._formatear(Indicadores.INFO, "CONSUMO", f"{etapa} - {modelo}{origen}: {tokens_entrada}+{tokens_salida} tokens{prefijo}, {duracion_ms}ms", Colores.TENUE)
+        self.logger.info(msg)
+    
+    call_usage = consumo_llamada
+    
+    def consumo_evaluacion(self, fase: str, llamadas: int, tokens: int, coste_usd: float, duracion_ms: int):
+        if not self.habilitado:
+            return
+        msg = self._formatear(Indicadores.INFO, "CONSUMO", f"{fase}: {Colores.NEGRITA}{llamadas} llamadas, {tokens} tokens, ${coste_usd:.4f}{Colores.RESET} ({duracion_ms}ms en llamadas)", Colores.MAGENTA)
+        self.logger.info(msg)
+    
+    evaluation_usage = consumo_evaluacion
+    
     def info(self, mensaje: str, componente: str = "INFO"):
         if not self.habilitado:
             return
@@ -2,9 +2,10 @@
 Funciones de procesamiento: cálculo de puntuaciones y procesamiento de requisitos.
 """
 
+import math
 import re
 from pathlib import Path
-from typing import List, Dict, Set, Tuple, Any
+from typing import List, Dict, Set, Tuple, Any, Iterable, Optional
 
 from ..modelos import Requisito, TipoRequisito, NivelConfianza
 
@@ -50,6 +51,17 @@ def limpiar_descripcion_requisito(descripcion: str) -> str:
 clean_requirement_description = limpiar_descripcion_requisito
 
 
+def _buscar_requisito(desc_lower: str, mapa_requisitos: Dict[str, Dict[str, str]]) -> Optional[Dict[str, str]]:
+    """Requisito original de una coincidencia: exacto o por inclusion de la descripcion."""
+    original = mapa_requisitos.get(desc_lower)
+    if original:
+        return original
+    for clave, req in mapa_requisitos.items():
+        if desc_lower in clave or clave in desc_lower:
+            return req
+    return None
+
+
 def procesar_coincidencias(
     coincidencias: List[Dict[str, Any]],
     requisitos: List[Dict[str, str]],
@@ -75,13 +87,7 @@ def procesar_coincidencias(
             continue
         procesados.add(desc_lower)
         
-        original = mapa_requisitos.get(desc_lower)
-        if not original:
-            for clave, req in mapa_requisitos.items():
-                if desc_lower in clave or clave in desc_lower:
-                    original = req
-                    break
-        
+        original = _buscar_requisito(desc_lower, mapa_requisitos)
         if not original:
             continue
         
@@ -149,3 +155,182 @@ def agregar_requisitos_no_procesados(
 
 
 add_unprocessed_requirements = agregar_requisitos_no_procesados
+
+
+def seleccionar_para_escalado(
+    coincidencias: List[Dict[str, Any]],
+    requisitos: List[Dict[str, str]],
+    confianzas: Iterable[str]
+) -> List[Dict[str, str]]:
+    """Requisitos cuya coincidencia tiene una confianza que debe re-verificarse (en orden de la oferta)."""
+    confianzas = set(confianzas)
+    mapa_requisitos = {req["description"].lower(): req for req in requisitos}
+    seleccionados: Set[str] = set()
+    
+    for coincidencia in coincidencias:
+        if coincidencia.get("confidence") not in confianzas:
+            continue
+        desc_lower = limpiar_descripcion_requisito(coincidencia["requirement_description"]).lower()
+        original = _buscar_requisito(desc_lower, mapa_requisitos)
+        if original:
+            seleccionados.add(original["description"].lower())
+    
+    return [req for req in requisitos if req["description"].lower() in seleccionados]
+
+
+select_for_escalation = seleccionar_para_escalado
+
+
+def _clave_coincidencia(coincidencia: Dict[str, Any], mapa_requisitos: Dict[str, Dict[str, str]]) -> str:
+    """Descripcion (en minusculas) del requisito original al que corresponde la coincidencia."""
+    desc_lower = limpiar_descripcion_requisito(coincidencia["requirement_description"]).lower()
+    original = _buscar_requisito(desc_lower, mapa_requisitos)
+    return original["description"].lower() if original else desc_lower
+
+
+def requisito_de_coincidencia(
+    coincidencia: Dict[str, Any],
+    requisitos: List[Dict[str, str]]
+) -> Optional[Dict[str, str]]:
+    """Requisito original al que corresponde una coincidencia, o None si no se reconoce."""
+    mapa_requisitos = {req["description"].lower(): req for req in requisitos}
+    desc_lower = limpiar_descripcion_requisito(coincidencia["requirement_description"]).lower()
+    return _buscar_requisito(desc_lower, mapa_requisitos)
+
+
+requirement_for_match = requisito_de_coincidencia
+
+
+def fusionar_escalado(
+    coincidencias: List[Dict[str, Any]],
+    escaladas: List[Dict[str, Any]],
+    requisitos: List[Dict[str, str]]
+) -> List[Dict[str, Any]]:
+    """Sustituye las coincidencias re-verificadas por las del modelo de escalado."""
+    mapa_requisitos = {req["description"].lower(): req for req in requisitos}
+    reemplazadas = {_clave_coincidencia(c, mapa_requisitos) for c in escaladas}
+    return [c for c in coincidencias if _clave_coincidencia(c, mapa_requisitos) not in reemplazadas] + list(escaladas)
+
+
+merge_escalation = fusionar_escalado
+
+
+def es_candidato_apto(coincidencias: List[Dict[str, Any]], requisitos: List[Dict[str, str]]) -> bool:
+    """True si cumple todos los obligatorios (un requisito sin coincidencia cuenta como no cumplido)."""
+    mapa_requisitos = {req["description"].lower(): req for req in requisitos}
+    cumplidos = {_clave_coincidencia(c, mapa_requisitos) for c in coincidencias if c["fulfilled"]}
+    return all(
+        req["description"].lower() in cumplidos
+        for req in requisitos if req["type"] == TipoRequisito.OBLIGATORIO.value
+    )
+
+
+passes_screening = es_candidato_apto
+
+
+def fusionar_detalle(
+    coincidencias: List[Dict[str, Any]],
+    detalladas: List[Dict[str, Any]],
+    requisitos: List[Dict[str, str]]
+) -> List[Dict[str, Any]]:
+    """Anade evidencia y razonamiento a las coincidencias del cribado sin cambiar sus veredictos."""
+    mapa_requisitos = {req["description"].lower(): req for req in requisitos}
+    detalle = {_clave_coincidencia(d, mapa_requisitos): d for d in detalladas}
+    
+    resultado = []
+    for coincidencia in coincidencias:
+        d = detalle.get(_clave_coincidencia(coincidencia, mapa_requisitos))
+        if d is None:
+            resultado.append(coincidencia)
+            continue
+        resultado.append({
+            **coincidencia,
+            "found_in_cv": coincidencia["fulfilled"] or d["found_in_cv"],
+            "evidence": d.get("evidence"),
+            "reasoning": d.get("reasoning")
+        })
+    return resultado
+
+
+merge_details = fusionar_detalle
+
+
+def dividir_requisitos_en_lotes(requisitos: List[dict], tamano_lote: int) -> List[List[dict]]:
+    """
+    Lotes consecutivos de como mucho tamano_lote requisitos, en el orden de la oferta y con
+    tamanos equilibrados (25 requisitos en lotes de 12: 9, 8 y 8). Con tamano_lote <= 0, un lote.
+    """
+    if tamano_lote <= 0 or len(requisitos) <= tamano_lote:
+        return [list(requisitos)]
+    num_lotes = math.ceil(len(requisitos) / tamano_lote)
+    base, resto = divmod(len(requisitos), num_lotes)
+    lotes = []
+    inicio = 0
+    for posicion in range(num_lotes):
+        fin = inicio + base + (1 if posicion < resto else 0)
+        lotes.append(list(requisitos[inicio:fin]))
+        inicio = fin
+    return lotes
+
+
+split_requirements = dividir_requisitos_en_lotes
+
+
+def fusionar_coincidencias_lotes(
+    lotes: List[Tuple[List[Dict[str, str]], List[Dict[str, Any]]]],
+    requisitos: List[Dict[str, str]]
+) -> List[Dict[str, Any]]:
+    """
+    Coincidencias de varios lotes (requisitos del lote, coincidencias), una por requisito y en
+    el orden de la oferta. Si dos lotes evaluan el mismo requisito gana el lote que lo tenia
+    asignado (o, si ninguno, el primero). Las que no corresponden a un requisito se descartan.
+    """
+    mapa_requisitos = {req["description"].lower(): req for req in requisitos}
+    elegidas: Dict[str, Tuple[bool, Dict[str, Any]]] = {}
+    for requisitos_lote, coincidencias in lotes:
+        asignados = {req["description"].lower() for req in requisitos_lote}
+        for coincidencia in coincidencias:
+            desc_lower = limpiar_descripcion_requisito(coincidencia["requirement_description"]).lower()
+            original = _buscar_requisito(desc_lower, mapa_requisitos)
+            if original is None:
+                continue
+            clave = original["description"].lower()
+            asignado = clave in asignados
+            if clave not in elegidas or (asignado and not elegidas[clave][0]):
+                elegidas[clave] = (asignado, coincidencia)
+    return [elegidas[clave][1] for clave in mapa_requisitos if clave in elegidas]
+
+
+merge_batch_matches = fusionar_coincidencias_lotes
+
+
+def _enumerar(descripciones: List[str], maximo: int = 5) -> str:
+    if len(descripciones) <= maximo:
+        return ", ".join(descripciones)
+    return ", ".join(descripciones[:maximo]) + f" y {len(descripciones) - maximo} mas"
+
+
+def resumir_coincidencias(coincidencias: List[Dict[str, Any]], requisitos: List[Dict[str, str]]) -> str:
+    """Resumen del analisis a partir de los veredictos (un requisito sin coincidencia no se cumple)."""
+    mapa_requisitos = {req["description"].lower(): req for req in requisitos}
+    cumplidos = {_clave_coincidencia(c, mapa_requisitos) for c in coincidencias if c["fulfilled"]}
+    obligatorios = [req for req in requisitos if req["type"] == TipoRequisito.OBLIGATORIO.value]
+    
+    resumen = f"Cumple {sum(1 for clave in mapa_requisitos if clave in cumplidos)} de {len(requisitos)} requisitos"
+    if obligatorios:
+        resumen += f" ({sum(1 for req in obligatorios if req['description'].lower() in cumplidos)} de {len(obligatorios)} obligatorios)"
+    resumen += "."
+    
+    obligatorios_fallidos = [req["description"] for req in obligatorios if req["description"].lower() not in cumplidos]
+    otros_fallidos = [
+        req["description"] for req in requisitos
+        if req["type"] != TipoRequisito.OBLIGATORIO.value and req["description"].lower() not in cumplidos
+    ]
+    if obligatorios_fallidos:
+        resumen += f" Obligatorios no cumplidos: {_enumerar(obligatorios_fallidos)}."
+    if otros_fallidos:
+        resumen += f" Opcionales no cumplidos: {_enumerar(otros_fallidos)}."
+    return resumen
+
+
+summarize_matches = resumir_coincidencias
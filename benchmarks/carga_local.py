@@ -0,0 +1,126 @@
+"""
+Prueba de carga de la Fase 1 contra el proveedor local-stub (sin red ni API keys).
+
+Uso:
+    python benchmarks/carga_local.py --evaluaciones 200 --concurrencia 50 --latencia-ms 800 --jitter-ms 300
+
+Mide rendimiento (evaluaciones/s), latencia por evaluacion (p50/p95/max), errores,
+pico de memoria de Python y fraccion de tokens de entrada servidos desde la cache de prefijos. La latencia y la tasa de errores del proveedor se inyectan.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import AnalizadorFase1, obtener_consumo_agregado
+from backend.infraestructura.llm import PROVEEDOR_LOCAL, configurar_proveedor_local
+from backend.utilidades import obtener_registro_operacional
+
+
+OFERTA = """Backend Developer Python
+
+Requisitos:
+- 3 años de experiencia con Python
+- Desarrollo de APIs REST con FastAPI o Django
+- Bases de datos PostgreSQL
+- Docker y despliegue en contenedores
+- Control de versiones con Git
+
+Se valora:
+- Experiencia con Kubernetes
+- Conocimientos de AWS
+- Inglés avanzado
+"""
+
+CV = """PERFIL
+Desarrolladora backend con 5 años de experiencia en Python.
+
+EXPERIENCIA
+Acme Corp (2020-2025): APIs REST con FastAPI y Django, PostgreSQL y Redis.
+Despliegue con Docker en AWS, integración continua con GitHub Actions y Git.
+
+IDIOMAS
+Inglés B2, español nativo.
+"""
+
+
+def _percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+async def ejecutar(args: argparse.Namespace) -> None:
+    configurar_proveedor_local(
+        latencia_ms=args.latencia_ms,
+        jitter_ms=args.jitter_ms,
+        tasa_error=args.tasa_error,
+        latencia_embeddings_ms=args.latencia_embeddings_ms,
+        semilla=args.semilla
+    )
+    obtener_registro_operacional().habilitado = False
+
+    analizador = AnalizadorFase1(
+        proveedor=PROVEEDOR_LOCAL,
+        usar_matching_semantico=not args.sin_embeddings,
+        usar_langgraph=args.langgraph,
+        matching_ligero=args.matching_ligero
+    )
+    semaforo = asyncio.Semaphore(args.concurrencia)
+    latencias, errores = [], 0
+
+    async def una_evaluacion() -> None:
+        nonlocal errores
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                await analizador.aanalizar(OFERTA, CV)
+                latencias.append(time.perf_counter() - inicio)
+            except Exception:
+                errores += 1
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    await asyncio.gather(*[una_evaluacion() for _ in range(args.evaluaciones)])
+    total = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"Evaluaciones: {args.evaluaciones} (concurrencia {args.concurrencia}, langgraph={args.langgraph}, matching_ligero={args.matching_ligero})")
+    print(f"Tiempo total: {total:.2f}s  ->  {args.evaluaciones / total:.1f} evaluaciones/s")
+    if latencias:
+        print(
+            f"Latencia por evaluacion: p50 {statistics.median(latencias) * 1000:.0f}ms, "
+            f"p95 {_percentil(latencias, 0.95) * 1000:.0f}ms, max {max(latencias) * 1000:.0f}ms"
+        )
+    print(f"Errores: {errores}")
+    print(f"Pico de memoria Python: {pico / 1024 / 1024:.1f} MiB")
+    for etapa, totales in obtener_consumo_agregado("stage").items():
+        print(
+            f"  {etapa}: {totales['calls']} llamadas, {totales['avg_duration_ms']}ms de media, "
+            f"{totales['cached_input_ratio']:.0%} de la entrada en cache de prefijo"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--evaluaciones", type=int, default=100)
+    parser.add_argument("--concurrencia", type=int, default=20)
+    parser.add_argument("--latencia-ms", type=float, default=500.0)
+    parser.add_argument("--jitter-ms", type=float, default=200.0)
+    parser.add_argument("--tasa-error", type=float, default=0.0)
+    parser.add_argument("--latencia-embeddings-ms", type=float, default=30.0)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--langgraph", action="store_true")
+    parser.add_argument("--sin-embeddings", action="store_true")
+    parser.add_argument("--matching-ligero", action="store_true")
+    asyncio.run(ejecutar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Memoria frente a recall del almacen vectorial del historial con indices cuantizados.
+
+Uso:
+    python benchmarks/cuantizacion_historial.py --evaluaciones 2000 --consultas 200 --k 5
+
+Genera un historial sintetico, lo indexa con embeddings locales (sin red) en float32,
+fp16, int8 y PQ, y compara el tamano del indice y el recall@k frente a la busqueda exacta,
+con y sin reordenacion exacta de los candidatos. Con --dimensiones-gruesas anade la busqueda
+en dos etapas (prefijo Matryoshka + vector completo). Los embeddings locales no estan entrenados
+con Matryoshka: el recall de esa fila es una cota inferior de lo que dan text-embedding-3/004.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.infraestructura.llm import PROVEEDOR_EMBEDDINGS_LOCAL
+from backend.nucleo.historial import AlmacenVectorialHistorial
+
+
+PUESTOS = [
+    "Backend Developer", "Frontend Developer", "Data Engineer", "Data Scientist", "DevOps Engineer",
+    "QA Engineer", "Product Manager", "Mobile Developer", "ML Engineer", "Security Analyst",
+]
+TECNOLOGIAS = [
+    "Python", "Django", "FastAPI", "Java", "Spring", "Kotlin", "React", "Angular", "Vue", "TypeScript",
+    "PostgreSQL", "MongoDB", "Redis", "Kafka", "Spark", "Airflow", "Docker", "Kubernetes", "Terraform",
+    "AWS", "GCP", "Azure", "Pandas", "PyTorch", "TensorFlow", "Selenium", "Swift", "Go", "Rust", "SQL",
+]
+EMPRESAS = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Tyrell", "Cyberdyne", "Soylent"]
+RESULTADOS = ["apto", "no apto", "fase 2 completada", "descartado por requisito obligatorio"]
+
+
+def _evaluacion(aleatorio: random.Random, i: int) -> tuple:
+    puesto = aleatorio.choice(PUESTOS)
+    tecnologias = aleatorio.sample(TECNOLOGIAS, 5)
+    empresa = aleatorio.choice(EMPRESAS)
+    puntuacion = aleatorio.randint(20, 100)
+    texto = (
+        f"Oferta {puesto} en {empresa}. Requisitos: {', '.join(tecnologias)}. "
+        f"Resultado: {aleatorio.choice(RESULTADOS)} con puntuación {puntuacion}%. "
+        f"Cumple {', '.join(tecnologias[:aleatorio.randint(1, 4)])}."
+    )
+    return texto, {"id": f"ev-{i}", "puesto": puesto, "empresa": empresa, "puntuacion": puntuacion}
+
+
+def _consulta(aleatorio: random.Random) -> str:
+    return f"{aleatorio.choice(PUESTOS)} con {' y '.join(aleatorio.sample(TECNOLOGIAS, 2))}"
+
+
+def _ids(documentos: list) -> list:
+    return [doc.metadata["id"] for doc in documentos]
+
+
+def _medir(almacen: AlmacenVectorialHistorial, consultas: list, exactos: list, k: int) -> tuple:
+    recalls, latencias = [], []
+    for consulta, esperados in zip(consultas, exactos):
+        inicio = time.perf_counter()
+        obtenidos = _ids(almacen.buscar(consulta, k=k))
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        recalls.append(len(set(obtenidos) & set(esperados)) / len(esperados))
+    return statistics.mean(recalls), statistics.median(latencias)
+
+
+def ejecutar(args: argparse.Namespace) -> None:
+    aleatorio = random.Random(args.semilla)
+    evaluaciones = [_evaluacion(aleatorio, i) for i in range(args.evaluaciones)]
+    consultas = [_consulta(aleatorio) for _ in range(args.consultas)]
+    
+    with tempfile.TemporaryDirectory() as ruta:
+        referencia = AlmacenVectorialHistorial("float32", ruta, PROVEEDOR_EMBEDDINGS_LOCAL, cuantizacion="none")
+        referencia.indexar_evaluaciones(evaluaciones)
+        exactos = [_ids(referencia.buscar(c, k=args.k)) for c in consultas]
+        _, latencia_ref = _medir(referencia, consultas, exactos, args.k)
+        bytes_ref = referencia.bytes_indice
+        
+        print(f"Historial sintético: {args.evaluaciones} evaluaciones, {args.consultas} consultas, recall@{args.k}")
+        print(f"{'índice':<22}{'bytes':>12}{'B/vector':>10}{'ahorro':>9}{'recall':>9}{'p50 ms':>9}")
+        print(f"{'float32':<22}{bytes_ref:>12}{bytes_ref // args.evaluaciones:>10}{'-':>9}{1.0:>9.3f}{latencia_ref:>9.2f}")
+        
+        for cuantizacion in ("fp16", "int8", "pq"):
+            for factor in (1, args.factor):
+                almacen = AlmacenVectorialHistorial(
+                    f"{cuantizacion}-{factor}", ruta, PROVEEDOR_EMBEDDINGS_LOCAL,
+                    cuantizacion=cuantizacion, factor_reordenacion=factor
+                )
+                almacen.indexar_evaluaciones(evaluaciones)
+                recall, latencia = _medir(almacen, consultas, exactos, args.k)
+                nombre = cuantizacion + (f" + reorden x{factor}" if factor > 1 else "")
+                tamano = almacen.bytes_indice
+                print(
+                    f"{nombre:<22}{tamano:>12}{tamano // args.evaluaciones:>10}"
+                    f"{1 - tamano / bytes_ref:>9.1%}{recall:>9.3f}{latencia:>9.2f}"
+                )
+        
+        if args.dimensiones_gruesas:
+            almacen = AlmacenVectorialHistorial(
+                "matryoshka", ruta, PROVEEDOR_EMBEDDINGS_LOCAL, cuantizacion="none",
+                dimensiones_gruesas=args.dimensiones_gruesas, factor_candidatos_gruesos=args.factor_grueso
+            )
+            almacen.indexar_evaluaciones(evaluaciones)
+            recall, latencia = _medir(almacen, consultas, exactos, args.k)
+            nombre = f"prefijo {args.dimensiones_gruesas} + completo"
+            print(f"{nombre:<22}{bytes_ref:>12}{bytes_ref // args.evaluaciones:>10}{'-':>9}{recall:>9.3f}{latencia:>9.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--evaluaciones", type=int, default=2000)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--factor", type=int, default=4, help="candidatos por resultado al reordenar")
+    parser.add_argument("--dimensiones-gruesas", type=int, default=0, help="prefijo de la etapa gruesa (0: omitir)")
+    parser.add_argument("--factor-grueso", type=int, default=10, help="candidatos por resultado en la etapa gruesa")
+    parser.add_argument("--semilla", type=int, default=7)
+    ejecutar(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
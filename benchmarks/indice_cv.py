@@ -0,0 +1,94 @@
+"""
+Microbenchmark del indice por CV: vectorstore FAISS frente a matriz NumPy.
+
+Uso:
+    python benchmarks/indice_cv.py --repeticiones 1000
+
+Con chunks y embeddings ya calculados, mide el coste de construir el indice de un CV y de
+buscar la evidencia de todos los requisitos para CVs de 5, 15 y 30 chunks y para documentos
+de 100 a 400 chunks, donde se cruzan las busquedas y se fija MAX_CHUNKS_MATRIZ (mejor de 5
+tandas, como timeit). El troceado y el modelo de embeddings son iguales en ambos casos.
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.embeddings import Embeddings
+
+from backend.infraestructura.llm import ComparadorSemantico, PROVEEDOR_EMBEDDINGS_LOCAL, desactivar_cache_indices_cv
+
+
+REQUISITOS = [
+    "3 años de experiencia con Python", "APIs REST con FastAPI o Django", "PostgreSQL",
+    "Docker y contenedores", "Git", "Kubernetes", "AWS", "Inglés avanzado",
+]
+TECNOLOGIAS = ["Python", "Django", "FastAPI", "PostgreSQL", "Docker", "Kubernetes", "AWS", "Git", "Redis", "React"]
+
+
+class EmbeddingsMemorizados(Embeddings):
+    """Calcula cada texto una vez: el benchmark mide el indice, no el modelo."""
+    
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self._vectores: Dict[str, List[float]] = {}
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        pendientes = [t for t in texts if t not in self._vectores]
+        if pendientes:
+            self._vectores.update(zip(pendientes, self.embeddings.embed_documents(pendientes)))
+        return [self._vectores[t] for t in texts]
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def _cv(aleatorio: random.Random, secciones: int) -> str:
+    return "\n\n".join(
+        f"PROYECTO {i}\nDesarrollo con {', '.join(aleatorio.sample(TECNOLOGIAS, 3))} "
+        f"durante {aleatorio.randint(1, 5)} años en el equipo {i}, con despliegue continuo, "
+        f"revisiones de código y guardias compartidas con {aleatorio.choice(TECNOLOGIAS)}."
+        for i in range(secciones)
+    )
+
+
+def _medir_us(funcion, repeticiones: int) -> float:
+    return min(timeit.repeat(funcion, number=repeticiones, repeat=5)) / repeticiones * 1e6
+
+
+def ejecutar(args: argparse.Namespace) -> None:
+    desactivar_cache_indices_cv()
+    aleatorio = random.Random(args.semilla)
+    faiss_cv = ComparadorSemantico(PROVEEDOR_EMBEDDINGS_LOCAL, max_chunks_matriz=0)
+    matriz_cv = ComparadorSemantico(PROVEEDOR_EMBEDDINGS_LOCAL, max_chunks_matriz=sys.maxsize)
+    memorizados = EmbeddingsMemorizados(faiss_cv.embeddings)
+    faiss_cv.embeddings = matriz_cv.embeddings = memorizados
+    
+    print(f"{'chunks':>6}  {'indice':<7}{'indexar us':>12}{'buscar us':>12}")
+    vectores_requisitos = memorizados.embed_documents(REQUISITOS)
+    for secciones in (5, 15, 30, 100, 200, 400):
+        chunks = matriz_cv._preparar_chunks(_cv(aleatorio, secciones))
+        vectores = memorizados.embed_documents(chunks)
+        for nombre, comparador in (("faiss", faiss_cv), ("numpy", matriz_cv)):
+            indice = comparador._construir_indice(chunks, vectores)
+            indexar = _medir_us(lambda: comparador._construir_indice(chunks, vectores), args.repeticiones)
+            buscar = _medir_us(
+                lambda: comparador._buscar_lote(indice, REQUISITOS, vectores_requisitos, 2, 0.0), args.repeticiones
+            )
+            print(f"{len(chunks):>6}  {nombre:<7}{indexar:>12.1f}{buscar:>12.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=1000)
+    parser.add_argument("--semilla", type=int, default=7)
+    ejecutar(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark del troceado de CVs largos: troceado anterior (tres regex + ventanas con rfind)
+frente al troceado en una pasada de troceado_cv.
+
+Uso:
+    python benchmarks/troceado_cv.py --paginas 50 100 200
+
+Genera CVs sinteticos de ~3000 caracteres por pagina en dos formatos (secciones con
+parrafos separados y texto extraido de PDF, con lineas cortadas y sin lineas en blanco) y
+mide el tiempo (mejor de 5, como timeit), los chunks y los caracteres que se embeben.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.infraestructura.llm import trocear_cv
+from backend.infraestructura.llm.comparador_semantico import TAMANO_CHUNK, SOLAPAMIENTO_CHUNK
+
+
+CARACTERES_POR_PAGINA = 3000
+PALABRAS = (
+    "desarrollo backend con Python Django FastAPI PostgreSQL Docker Kubernetes AWS equipo "
+    "cliente migracion rendimiento consultas servicios despliegue continuo pruebas datos "
+    "arquitectura microservicios colas mensajeria observabilidad guardias revisiones"
+).split()
+SECCIONES = ["PERFIL", "EXPERIENCIA", "PROYECTOS", "FORMACION", "CERTIFICACIONES", "HABILIDADES", "IDIOMAS"]
+
+
+def _troceado_anterior(texto_cv: str, tamano_chunk: int = TAMANO_CHUNK, solapamiento: int = SOLAPAMIENTO_CHUNK) -> List[str]:
+    """Copia del ComparadorSemantico._dividir_cv_en_chunks anterior, como referencia."""
+    patrones_seccion = [
+        r'\n(?=(?:EXPERIENCIA|FORMACION|EDUCACION|HABILIDADES|SKILLS|IDIOMAS|PROYECTOS|CERTIFICACIONES|PERFIL|RESUMEN))',
+        r'\n(?=[A-ZÁÉÍÓÚÑ]{4,}\s*(?:\n|:))',
+        r'\n{2,}',
+    ]
+    
+    def por_tamano(texto: str) -> List[str]:
+        chunks = []
+        inicio = 0
+        while inicio < len(texto):
+            fin = inicio + tamano_chunk
+            if fin < len(texto):
+                ultimo_corte = max(texto.rfind(' ', inicio, fin), texto.rfind('.', inicio, fin), texto.rfind('\n', inicio, fin))
+                if ultimo_corte > inicio:
+                    fin = ultimo_corte + 1
+            chunk = texto[inicio:fin].strip()
+            if chunk:
+                chunks.append(chunk)
+            inicio = max(0, fin - solapamiento)
+        return chunks
+    
+    chunks = []
+    for patron in patrones_seccion:
+        if len(texto_cv) > tamano_chunk:
+            partes = re.split(patron, texto_cv, flags=re.IGNORECASE)
+            if len(partes) > 1:
+                chunks.extend([p.strip() for p in partes if p.strip()])
+                break
+    if not chunks:
+        chunks = por_tamano(texto_cv)
+    else:
+        chunks = [c for chunk in chunks for c in (por_tamano(chunk) if len(chunk) > tamano_chunk * 2 else [chunk])]
+    return [c for c in chunks if len(c) > 30]
+
+
+def _frase(aleatorio: random.Random) -> str:
+    return " ".join(aleatorio.choice(PALABRAS) for _ in range(aleatorio.randint(8, 30))).capitalize() + "."
+
+
+def _cv_secciones(aleatorio: random.Random, paginas: int) -> str:
+    partes = []
+    while sum(map(len, partes)) < paginas * CARACTERES_POR_PAGINA:
+        parrafos = ["\n".join(_frase(aleatorio) for _ in range(aleatorio.randint(1, 4))) for _ in range(aleatorio.randint(2, 6))]
+        partes.append(aleatorio.choice(SECCIONES) + "\n" + "\n\n".join(parrafos))
+    return "\n\n".join(partes)
+
+
+def _cv_pdf(aleatorio: random.Random, paginas: int) -> str:
+    """Texto extraido de PDF: lineas de ~90 caracteres y ninguna linea en blanco."""
+    texto = " ".join(_frase(aleatorio) for _ in range(paginas * CARACTERES_POR_PAGINA // 120))
+    lineas, actual = [], []
+    for palabra in texto.split(" "):
+        actual.append(palabra)
+        if sum(len(p) + 1 for p in actual) > 90:
+            lineas.append(" ".join(actual))
+            actual = []
+    return "\n".join(lineas + [" ".join(actual)])
+
+
+def _medir_ms(funcion: Callable[[], object]) -> float:
+    return min(timeit.repeat(funcion, number=1, repeat=5)) * 1e3
+
+
+def ejecutar(args: argparse.Namespace) -> None:
+    aleatorio = random.Random(args.semilla)
+    print(f"{'formato':<10}{'paginas':>8}{'chars':>9}  {'troceado':<9}{'ms':>8}{'chunks':>8}{'chars emb':>11}")
+    for formato, generar in (("secciones", _cv_secciones), ("pdf", _cv_pdf)):
+        for paginas in args.paginas:
+            texto = generar(aleatorio, paginas)
+            for nombre, trocear in (
+                ("anterior", lambda: _troceado_anterior(texto)),
+                ("una_pasada", lambda: [f.texto for f in trocear_cv(texto, TAMANO_CHUNK, SOLAPAMIENTO_CHUNK)]),
+            ):
+                chunks = trocear()
+                print(
+                    f"{formato:<10}{paginas:>8}{len(texto):>9}  {nombre:<9}{_medir_ms(trocear):>8.1f}"
+                    f"{len(chunks):>8}{sum(map(len, chunks)):>11}"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--semilla", type=int, default=7)
+    ejecutar(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
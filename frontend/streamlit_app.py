@@ -2062,7 +2062,11 @@ def main():
                 
                 if evaluator and formatted_responses:
                     with st.spinner("Procesando entrevista y generando resultado final..."):
-                        resultado = evaluator.reevaluate_with_interview(phase1_result, formatted_responses)
+                        interviewer = st.session_state.get('agentic_interviewer')
+                        resultado = evaluator.reevaluate_with_interview(
+                            phase1_result, formatted_responses,
+                            consumo_entrevista=interviewer.get_usage() if interviewer else None
+                        )
                         
                         st.session_state['evaluation_result'] = resultado
                         st.session_state['evaluation_completed'] = True
@@ -2281,7 +2285,8 @@ def main():
                     with st.spinner("Buscando en tu historial..."):
                         response = ""
                         try:
-                            llm = LLMFactory.create_llm(
+                            llm = LLMFactory.create_stage_llm(
+                                "rag_chatbot",
                                 provider=st.session_state.get('provider') or 'openai',
                                 model_name=st.session_state.get('model_name') or 'gpt-4o-mini',
                                 api_key=api_key
@@ -0,0 +1,76 @@
+"""Historial cuantizado: reordenacion con la copia exacta y sincronizacion del indice grueso."""
+
+import random
+
+import faiss
+import numpy as np
+import pytest
+
+from backend.infraestructura.llm import PROVEEDOR_EMBEDDINGS_LOCAL, IndiceMatryoshka, desactivar_cache_embeddings
+from backend.nucleo.historial import AlmacenVectorialHistorial
+from backend.nucleo.historial.almacen_vectorial import ARCHIVO_VECTORES_EXACTOS
+from benchmarks.cuantizacion_historial import _evaluacion, _consulta
+
+
+@pytest.fixture(autouse=True)
+def sin_cache_embeddings():
+    desactivar_cache_embeddings()
+
+
+def _historial(n: int = 300):
+    aleatorio = random.Random(5)
+    return [_evaluacion(aleatorio, i) for i in range(n)], [_consulta(aleatorio) for _ in range(10)]
+
+
+def _ids(resultados: list) -> list:
+    return [doc.metadata["id"] for doc, _ in resultados]
+
+
+def test_reordenacion_no_reembebe_y_coincide_con_la_busqueda_exacta(tmp_path):
+    evaluaciones, consultas = _historial()
+    referencia = AlmacenVectorialHistorial("ref", str(tmp_path), PROVEEDOR_EMBEDDINGS_LOCAL, cuantizacion="none")
+    referencia.indexar_evaluaciones(evaluaciones)
+    almacen = AlmacenVectorialHistorial("pq", str(tmp_path), PROVEEDOR_EMBEDDINGS_LOCAL, cuantizacion="pq")
+    almacen.indexar_evaluaciones(evaluaciones)
+    
+    documentos_embebidos = []
+    embeber = almacen.embeddings.embed_documents
+    almacen.embeddings.embed_documents = lambda textos: documentos_embebidos.extend(textos) or embeber(textos)
+    
+    for consulta in consultas:
+        esperados = referencia.buscar_con_puntuaciones(consulta, k=5)
+        obtenidos = almacen.buscar_con_puntuaciones(consulta, k=5)
+        assert _ids(obtenidos) == _ids(esperados)
+        assert [d for _, d in obtenidos] == pytest.approx([d for _, d in esperados], rel=1e-4)
+    assert documentos_embebidos == []
+
+
+def test_copia_exacta_acompana_a_las_altas_y_se_regenera_si_falta(tmp_path):
+    evaluaciones, consultas = _historial(40)
+    almacen = AlmacenVectorialHistorial("u", str(tmp_path), PROVEEDOR_EMBEDDINGS_LOCAL, cuantizacion="int8")
+    almacen.indexar_evaluaciones(evaluaciones[:10])
+    for texto, metadatos in evaluaciones[10:]:
+        almacen.agregar_evaluacion(texto, metadatos)
+    exactos = almacen._vectores_exactos()
+    assert exactos is not None and len(exactos) == 40
+    esperados = almacen.buscar_con_puntuaciones(consultas[0], k=5)
+    
+    (tmp_path / "u" / ARCHIVO_VECTORES_EXACTOS).unlink()
+    recargado = AlmacenVectorialHistorial("u", str(tmp_path), PROVEEDOR_EMBEDDINGS_LOCAL, cuantizacion="int8")
+    assert np.allclose(recargado._vectores_exactos(), exactos, atol=1e-6)
+    assert _ids(recargado.buscar_con_puntuaciones(consultas[0], k=5)) == _ids(esperados)
+
+
+@pytest.mark.parametrize("con_ids", [True, False])
+def test_indice_grueso_detecta_indice_sustituido_con_el_mismo_tamano(con_ids):
+    aleatorio = np.random.default_rng(0)
+    primero, segundo = (aleatorio.standard_normal((200, 32)).astype(np.float32) for _ in range(2))
+    grueso = IndiceMatryoshka(dimensiones_gruesas=8, factor_candidatos=2)
+    
+    for vectores, prefijo in ((primero, "a"), (segundo, "b")):
+        indice = faiss.IndexFlatL2(32)
+        indice.add(vectores)
+        ids = {i: f"{prefijo}{i}" for i in range(len(vectores))} if con_ids else None
+        consulta = vectores[17:18]
+        _, posiciones = grueso.buscar(indice, consulta, k=1, ids=ids)
+        assert posiciones[0, 0] == 17
@@ -0,0 +1,60 @@
+"""Matching sin LangGraph: las ofertas que no caben en max_tokens se evaluan por lotes."""
+
+import asyncio
+
+import pytest
+
+from backend import AnalizadorFase1
+from backend.infraestructura.llm import ConfiguracionHiperparametros
+from backend.infraestructura.llm.proveedor_local import PROVEEDOR_LOCAL
+from backend.orquestacion.grafo_fase1 import crear_reparto_matching
+
+
+REQUISITOS = [
+    {"description": f"Experiencia con tecnologia {i}", "type": "obligatory" if i % 3 else "optional"}
+    for i in range(60)
+]
+CV = "Desarrollador con experiencia con tecnologia 1, tecnologia 2 y tecnologia 30."
+
+
+def _analizador_con_registro_de_lotes():
+    analizador = AnalizadorFase1(proveedor=PROVEEDOR_LOCAL, usar_matching_semantico=False)
+    tamanos = []
+    preparar = analizador._preparar_matching
+    analizador._preparar_matching = lambda cv, requisitos, *args: tamanos.append(len(requisitos)) or preparar(cv, requisitos, *args)
+    return analizador, tamanos
+
+
+def test_capacidad_del_matching_sale_de_max_tokens():
+    perfil = ConfiguracionHiperparametros.obtener_config("phase1_matching")
+    assert ConfiguracionHiperparametros.obtener_requisitos_por_llamada() == perfil.max_tokens // perfil.max_tokens_por_elemento
+    assert ConfiguracionHiperparametros.obtener_config("phase2_interview").elementos_por_llamada() == 0
+
+
+@pytest.mark.parametrize("asincrono", [False, True])
+def test_oferta_grande_se_reparte_y_se_fusiona_en_orden(asincrono):
+    analizador, tamanos = _analizador_con_registro_de_lotes()
+    capacidad = ConfiguracionHiperparametros.obtener_requisitos_por_llamada()
+    
+    if asincrono:
+        resultado = asyncio.run(analizador.aevaluar_cv_con_requisitos(CV, REQUISITOS))
+    else:
+        resultado = analizador.evaluar_cv_con_requisitos(CV, REQUISITOS)
+    
+    assert len(tamanos) > 1 and sum(tamanos) == len(REQUISITOS) and max(tamanos) <= capacidad
+    assert [m["requirement_description"].lower() for m in resultado["matches"]] == [r["description"].lower() for r in REQUISITOS]
+    assert resultado["analysis_summary"].startswith("Cumple ")
+    assert f"de {len(REQUISITOS)} requisitos" in resultado["analysis_summary"]
+
+
+def test_oferta_pequena_usa_una_llamada():
+    analizador, tamanos = _analizador_con_registro_de_lotes()
+    analizador.evaluar_cv_con_requisitos(CV, REQUISITOS[:10])
+    assert tamanos == [10]
+
+
+@pytest.mark.parametrize("tamano_lote", [0, 100])
+def test_grafo_no_supera_la_capacidad_aunque_se_pida_sin_dividir(tamano_lote):
+    envios = crear_reparto_matching(tamano_lote)({"cv": CV, "requisitos": REQUISITOS, "error": None})
+    capacidad = ConfiguracionHiperparametros.obtener_requisitos_por_llamada()
+    assert len(envios) > 1 and all(len(envio.arg["requisitos"]) <= capacidad for envio in envios)
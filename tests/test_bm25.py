@@ -0,0 +1,104 @@
+"""Busqueda lexica BM25: tokens tecnicos, ranking, fusion RRF y evidencia sin embeddings."""
+
+import asyncio
+
+import pytest
+
+from backend import AnalizadorFase1
+from backend.infraestructura.llm import FabricaEmbeddings, desactivar_cache_embeddings
+from backend.infraestructura.llm.bm25 import IndiceBM25, fusionar_rrf, tokenizar
+from backend.infraestructura.llm.cache_indices_cv import CacheIndicesCV
+from backend.infraestructura.llm.comparador_semantico import ComparadorSemantico
+from backend.infraestructura.llm.proveedor_local import PROVEEDOR_LOCAL
+from backend.nucleo.analisis.analizador import crear_prompt_matching
+
+
+PARRAFO = " ".join(["Desarrollo backend con Python y Django en un equipo de producto."] * 7)
+CV = (
+    "PERFIL\n" + PARRAFO + "\n\n"
+    "EXPERIENCIA\n" + PARRAFO + " Despliegue con Docker y K8s en AWS.\n\n"
+    "PROYECTOS\n" + PARRAFO + " Migracion de Oracle PL/SQL a PostgreSQL.\n\n"
+    "FORMACION\nIngenieria informatica."
+)
+
+
+@pytest.fixture(autouse=True)
+def sin_cache_embeddings():
+    desactivar_cache_embeddings()
+
+
+def _comparador(proveedor, **kwargs) -> ComparadorSemantico:
+    return ComparadorSemantico(proveedor, cache_indices=CacheIndicesCV(max_entradas=4), **kwargs)
+
+
+def test_tokens_tecnicos_enteros_y_por_partes():
+    assert tokenizar("Oracle PL/SQL") == ["oracle", "pl/sql", "pl", "sql"]
+    assert tokenizar("K8s y Kubernetes") == ["kubernetes", "kubernetes"]
+    assert tokenizar("C++, C# y Node.js.") == ["c++", "c#", "node.js", "node", "javascript"]
+    assert tokenizar("Inglés técnico") == ["ingles", "tecnico"]
+
+
+def test_ranking_bm25():
+    indice = IndiceBM25([
+        "Mantenimiento de procedimientos PL/SQL en Oracle",
+        "Consultas SQL sobre PostgreSQL y SQL Server con SQL avanzado",
+        "Frontend con React",
+        "Despliegue en K8s",
+    ])
+    
+    resultados = indice.buscar(["PL/SQL", "SQL", "Kubernetes", "COBOL"], k=3)
+    
+    assert [posicion for posicion, _, _ in resultados[0]] == [0, 1]
+    assert resultados[0][0][2] == pytest.approx(1.0) and resultados[0][1][2] < 1.0
+    # Mas apariciones pesan mas: "SQL" va primero en el texto que lo repite
+    assert [posicion for posicion, _, _ in resultados[1]] == [1, 0]
+    assert [(posicion, cobertura) for posicion, _, cobertura in resultados[2]] == [(3, pytest.approx(1.0))]
+    assert resultados[3] == []
+
+
+def test_rrf_premia_lo_que_aparece_alto_en_ambos_rankings():
+    fusion = fusionar_rrf([["a", "b", "c", "d"], ["d", "b", "e"]], k=60)
+    # "b" (segundo en ambos) supera a "d" (primero en uno y ultimo en el otro)
+    assert sorted(fusion, key=lambda t: -fusion[t]) == ["b", "d", "a", "c", "e"]
+    assert fusion["b"] == pytest.approx(2 / 62)
+    assert fusion["d"] == pytest.approx(1 / 64 + 1 / 61)
+
+
+def test_hibrido_ordena_por_rrf_pero_reporta_coseno_y_cobertura_aparte():
+    hibrido, denso = _comparador(PROVEEDOR_LOCAL), _comparador(PROVEEDOR_LOCAL, hibrido=False)
+    indice = hibrido.crear_indice(CV)
+    requisitos = ["Python", "PL/SQL", "Kubernetes"]
+    
+    evidencias = hibrido.encontrar_toda_la_evidencia(requisitos, k=2, indice=indice)
+    similitudes = denso.encontrar_toda_la_evidencia(requisitos, k=len(denso._chunks_de_indice(indice)), indice=indice)
+    coberturas = hibrido.coberturas_lexicas(evidencias, indice)
+    
+    for requisito in requisitos:
+        texto, score = evidencias[requisito][0]
+        assert score == pytest.approx(dict(similitudes[requisito])[texto], abs=1e-6) and score < 1.0
+    assert "PL/SQL" in evidencias["PL/SQL"][0][0] and "K8s" in evidencias["Kubernetes"][0][0]
+    assert coberturas == {requisito: pytest.approx(1.0) for requisito in requisitos}
+    assert denso.coberturas_lexicas(evidencias, indice) == {}
+    
+    # La pista lleva las dos medidas: el score ya no es 1.00 por una coincidencia de una palabra
+    mapa = {requisito.lower(): {"text": evidencias[requisito][0][0], "semantic_score": evidencias[requisito][0][1], "lexical_coverage": 1.0} for requisito in requisitos}
+    _, entradas = crear_prompt_matching(CV, [{"description": "Python", "type": "obligatory"}], mapa)
+    assert f"[Score: {evidencias['Python'][0][1]:.2f}, cobertura lexica: 1.00]" in entradas["semantic_hints"]
+
+
+@pytest.mark.parametrize("asincrono", [False, True])
+def test_sin_proveedor_de_embeddings_la_evidencia_es_solo_lexica(monkeypatch, asincrono):
+    monkeypatch.setattr(FabricaEmbeddings, "soporta_embeddings", staticmethod(lambda proveedor: False))
+    monkeypatch.setattr(FabricaEmbeddings, "obtener_proveedor_fallback", staticmethod(lambda excluir_proveedor=None: None))
+    analizador = AnalizadorFase1(proveedor=PROVEEDOR_LOCAL)
+    assert analizador.comparador_semantico.solo_lexico and analizador.comparador_semantico.embeddings is None
+    
+    requisitos = [{"description": "PL/SQL", "type": "obligatory"}, {"description": "COBOL", "type": "optional"}]
+    if asincrono:
+        mapa = asyncio.run(analizador._aobtener_evidencia_semantica(CV, requisitos))
+    else:
+        mapa = analizador._obtener_evidencia_semantica(CV, requisitos)
+    
+    assert list(mapa) == ["pl/sql"]
+    assert "PL/SQL" in mapa["pl/sql"]["text"]
+    assert mapa["pl/sql"]["semantic_score"] == mapa["pl/sql"]["lexical_coverage"] == pytest.approx(1.0)
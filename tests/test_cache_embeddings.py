@@ -0,0 +1,55 @@
+"""Cache de embeddings: las variantes asincronas no tocan SQLite desde el bucle de eventos."""
+
+import asyncio
+import threading
+
+from backend.infraestructura.llm import (
+    AlmacenEmbeddings, FabricaEmbeddings, PROVEEDOR_EMBEDDINGS_LOCAL, medir_consumo
+)
+from backend.infraestructura.llm.cache_embeddings import EmbeddingsCacheados
+
+
+TEXTOS = ["Experiencia con Python", "Docker y Kubernetes", "Experiencia con Python"]
+
+
+class AlmacenVigilado(AlmacenEmbeddings):
+    """Anota el hilo de cada acceso a SQLite."""
+    
+    def __init__(self, ruta: str):
+        super().__init__(ruta)
+        self.hilos = []
+    
+    def obtener_lote(self, claves):
+        self.hilos.append(threading.get_ident())
+        return super().obtener_lote(claves)
+    
+    def guardar_lote(self, vectores):
+        self.hilos.append(threading.get_ident())
+        return super().guardar_lote(vectores)
+
+
+def _cacheados(tmp_path) -> EmbeddingsCacheados:
+    # El proveedor local llega contabilizado y sin cache: los fallos cuentan como llamadas al modelo
+    base = FabricaEmbeddings.crear_embeddings(PROVEEDOR_EMBEDDINGS_LOCAL)
+    return EmbeddingsCacheados(base, PROVEEDOR_EMBEDDINGS_LOCAL, "ngramas", almacen=AlmacenVigilado(str(tmp_path / "v.sqlite")))
+
+
+def test_async_consulta_sqlite_fuera_del_bucle_y_contabiliza_aciertos(tmp_path):
+    cacheados = _cacheados(tmp_path)
+    
+    async def principal():
+        hilo_bucle = threading.get_ident()
+        primeros = await cacheados.aembed_documents(TEXTOS)
+        with medir_consumo() as colector:
+            segundos = await cacheados.aembed_documents(TEXTOS)
+            consulta = await cacheados.aembed_query(TEXTOS[0])
+            repetida = await cacheados.aembed_query(TEXTOS[0])
+        return hilo_bucle, primeros, segundos, (consulta, repetida), colector.resumen().llamadas
+    
+    hilo_bucle, primeros, segundos, (consulta, repetida), llamadas = asyncio.run(principal())
+    
+    assert cacheados.almacen.hilos and hilo_bucle not in cacheados.almacen.hilos
+    assert primeros == segundos == cacheados.embed_documents(TEXTOS)
+    assert consulta == repetida == cacheados.embed_query(TEXTOS[0])
+    # Lote servido de la cache, fallo de la consulta (llamada al modelo) y acierto de la consulta repetida
+    assert [l.desde_cache for l in llamadas] == [True, False, True]
@@ -0,0 +1,101 @@
+"""Cache de indices de CV: clave por contenido, LRU en memoria y copia en disco."""
+
+import pytest
+from langchain_community.vectorstores import FAISS
+
+from backend.infraestructura.llm import comparador_semantico, desactivar_cache_embeddings
+from backend.infraestructura.llm.bm25 import IndiceBM25
+from backend.infraestructura.llm.cache_indices_cv import CacheIndicesCV, calcular_clave_indice_cv
+from backend.infraestructura.llm.comparador_semantico import ComparadorSemantico
+from backend.infraestructura.llm.indice_matriz import IndiceMatrizCV
+from backend.infraestructura.llm.proveedor_local import PROVEEDOR_LOCAL
+
+
+PARRAFO = " ".join(["Desarrollo backend con Python y Django en un equipo de producto."] * 7)
+CV = (
+    "PERFIL\n" + PARRAFO + "\n\n"
+    "EXPERIENCIA\n" + PARRAFO + " Despliegue con Docker y Kubernetes en AWS.\n\n"
+    "FORMACION\nIngenieria informatica."
+)
+
+
+@pytest.fixture(autouse=True)
+def sin_cache_embeddings():
+    desactivar_cache_embeddings()
+
+
+def test_clave_cambia_con_modelo_troceado_y_version(monkeypatch):
+    base = calcular_clave_indice_cv(CV, "ngramas", 800, 150, "v1")
+    assert base == calcular_clave_indice_cv(CV, "ngramas", 800, 150, "v1")
+    variantes = [
+        calcular_clave_indice_cv(CV + " ", "ngramas", 800, 150, "v1"),
+        calcular_clave_indice_cv(CV, "text-embedding-3-small", 800, 150, "v1"),
+        calcular_clave_indice_cv(CV, "ngramas", 600, 150, "v1"),
+        calcular_clave_indice_cv(CV, "ngramas", 800, 100, "v1"),
+        calcular_clave_indice_cv(CV, "ngramas", 800, 150, "v2"),
+    ]
+    assert len({base, *variantes}) == len(variantes) + 1
+    
+    # El comparador usa el modelo de embeddings y las constantes del modulo
+    lexico, denso = ComparadorSemantico(None), ComparadorSemantico(PROVEEDOR_LOCAL)
+    clave = denso._clave_indice(CV)
+    assert lexico._clave_indice(CV) != clave
+    monkeypatch.setattr(comparador_semantico, "TAMANO_CHUNK", comparador_semantico.TAMANO_CHUNK // 2)
+    clave_troceado = denso._clave_indice(CV)
+    monkeypatch.setattr(comparador_semantico, "VERSION_INDICE", comparador_semantico.VERSION_INDICE + "-test")
+    assert len({clave, clave_troceado, denso._clave_indice(CV)}) == 3
+
+
+def test_lru_en_memoria():
+    cache = CacheIndicesCV(max_entradas=2)
+    indices = {nombre: IndiceBM25([nombre]) for nombre in ("a", "b", "c")}
+    cache.guardar("a", indices["a"])
+    cache.guardar("b", indices["b"])
+    assert cache.obtener("a", None) is indices["a"]
+    cache.guardar("c", indices["c"])
+    
+    assert cache.obtener("b", None) is None
+    assert cache.obtener("a", None) is indices["a"]
+    assert cache.obtener("c", None) is indices["c"]
+    estadisticas = cache.estadisticas()
+    assert (estadisticas["memory_hits"], estadisticas["misses"], estadisticas["entries"]) == (3, 1, 2)
+
+
+@pytest.mark.parametrize("proveedor, max_chunks_matriz, tipo", [
+    (PROVEEDOR_LOCAL, 512, IndiceMatrizCV),
+    (PROVEEDOR_LOCAL, 1, FAISS),
+    (None, 512, IndiceBM25),
+])
+def test_ida_y_vuelta_por_disco(tmp_path, proveedor, max_chunks_matriz, tipo):
+    comparador = ComparadorSemantico(proveedor, max_chunks_matriz=max_chunks_matriz)
+    clave = comparador._clave_indice(CV)
+    indice = comparador._indexar(CV)
+    assert isinstance(indice, tipo)
+    CacheIndicesCV(ruta=str(tmp_path)).guardar(clave, indice)
+    
+    # Otro proceso: memoria vacia, mismo directorio
+    cache = CacheIndicesCV(ruta=str(tmp_path))
+    cargado = cache.obtener(clave, comparador.embeddings)
+    assert isinstance(cargado, tipo)
+    assert comparador._chunks_de_indice(cargado) == comparador._chunks_de_indice(indice)
+    assert comparador._offsets_de_indice(cargado) == comparador._offsets_de_indice(indice)
+    assert cache.obtener(clave, comparador.embeddings) is cargado
+    assert (cache.aciertos_disco, cache.aciertos_memoria, cache.fallos) == (1, 1, 0)
+    
+    requisitos = ["Experiencia con Kubernetes", "Python"]
+    assert (
+        comparador.encontrar_evidencia_y_matriz(CV, requisitos, k=2, indice=cargado)[0]
+        == comparador.encontrar_evidencia_y_matriz(CV, requisitos, k=2, indice=indice)[0]
+    )
+
+
+def test_directorio_corrupto_se_borra_y_cuenta_como_fallo(tmp_path):
+    directorio = tmp_path / "clave"
+    directorio.mkdir()
+    (directorio / "matriz.npy").write_bytes(b"no es un npy")
+    (directorio / "textos.json").write_text("[", encoding="utf-8")
+    
+    cache = CacheIndicesCV(ruta=str(tmp_path))
+    assert cache.obtener("clave", None) is None
+    assert not directorio.exists()
+    assert (cache.aciertos_disco, cache.fallos) == (0, 1)
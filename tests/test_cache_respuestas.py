@@ -0,0 +1,117 @@
+"""Cache de respuestas LLM: componentes de la clave, TTL, eviccion LRU y contadores."""
+
+import pytest
+from langchain_core.outputs import Generation
+from langchain_openai import ChatOpenAI
+
+from backend.infraestructura.llm import CacheRespuestasLLM, calcular_version_prompts
+from backend.infraestructura.llm import cache_respuestas
+from backend.infraestructura.llm.proveedor_local import ChatLocalStub
+from backend.modelos import RespuestaExtraccionRequisitos, RespuestaMatchingCV
+from backend.recursos import prompts
+
+
+PROMPT = "Human: oferta de backend"
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1_000.0
+    
+    def __call__(self) -> float:
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch) -> Reloj:
+    reloj = Reloj()
+    monkeypatch.setattr(cache_respuestas.time, "time", reloj)
+    return reloj
+
+
+def _llm_string(llm, esquema=RespuestaMatchingCV) -> str:
+    """llm_string de LangChain tal como llega a la cache en una llamada estructurada."""
+    return llm._get_llm_string(**llm.with_structured_output(esquema).first.kwargs)
+
+
+def _openai(modelo: str = "gpt-4o-mini", temperatura: float = 0.0) -> ChatOpenAI:
+    return ChatOpenAI(model=modelo, temperature=temperatura, api_key="sk-test")
+
+
+def _cache(tmp_path, **kwargs) -> CacheRespuestasLLM:
+    return CacheRespuestasLLM(ruta=str(tmp_path / "respuestas.sqlite"), **kwargs)
+
+
+def test_cada_componente_cambia_la_clave(tmp_path):
+    cache = _cache(tmp_path, version_prompts="v1")
+    base = _llm_string(_openai())
+    variantes = {
+        "proveedor": _llm_string(ChatLocalStub()),
+        "modelo": _llm_string(_openai(modelo="gpt-4o")),
+        "temperatura": _llm_string(_openai(temperatura=0.3)),
+        "esquema": _llm_string(_openai(), RespuestaExtraccionRequisitos),
+    }
+    clave = cache._calcular_clave(PROMPT, base)
+    
+    assert clave == cache._calcular_clave(PROMPT, _llm_string(_openai()))
+    for componente, llm_string in variantes.items():
+        assert cache._calcular_clave(PROMPT, llm_string) != clave, componente
+    assert cache._calcular_clave(PROMPT + ".", base) != clave
+    assert _cache(tmp_path, version_prompts="v2")._calcular_clave(PROMPT, base) != clave
+
+
+def test_version_de_prompts_cambia_al_editar_un_prompt(monkeypatch):
+    version = calcular_version_prompts()
+    monkeypatch.setattr(prompts, "PROMPT_MATCHING_CV", prompts.PROMPT_MATCHING_CV + " ")
+    assert calcular_version_prompts() != version
+
+
+def test_ttl_expira_y_cuenta_como_fallo(tmp_path, reloj):
+    cache = _cache(tmp_path, ttl_segundos=60)
+    llm_string = _llm_string(_openai())
+    cache.update(PROMPT, llm_string, [Generation(text="{}")])
+    
+    reloj.ahora += 59
+    assert cache.lookup(PROMPT, llm_string)[0].text == "{}"
+    reloj.ahora += 2
+    assert cache.lookup(PROMPT, llm_string) is None
+    assert cache.estadisticas()["entries"] == 0
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+
+
+def test_eviccion_lru_por_entradas_y_bytes(tmp_path, reloj):
+    llm_string = _llm_string(_openai())
+    cache = _cache(tmp_path, max_entradas=2)
+    for prompt in ("a", "b"):
+        cache.update(prompt, llm_string, [Generation(text=prompt)])
+        reloj.ahora += 1
+    assert cache.lookup("a", llm_string) is not None
+    reloj.ahora += 1
+    cache.update("c", llm_string, [Generation(text="c")])
+    
+    assert cache.lookup("b", llm_string) is None
+    assert cache.lookup("a", llm_string) is not None and cache.lookup("c", llm_string) is not None
+    
+    por_bytes = _cache(tmp_path / "bytes", max_bytes=1)
+    por_bytes.update("a", llm_string, [Generation(text="a")])
+    assert por_bytes.estadisticas()["entries"] == 0
+
+
+def test_contadores_y_llamadas_no_estructuradas(tmp_path):
+    cache = _cache(tmp_path)
+    llm_string = _llm_string(_openai())
+    libre = _openai()._get_llm_string()
+    
+    assert cache.lookup(PROMPT, llm_string) is None
+    cache.update(PROMPT, llm_string, [Generation(text="{}")])
+    generaciones = cache.lookup(PROMPT, llm_string)
+    cache.lookup(PROMPT, llm_string)
+    cache.update(PROMPT, libre, [Generation(text="texto")])
+    assert cache.lookup(PROMPT, libre) is None
+    
+    assert generaciones[0].generation_info[cache_respuestas.MARCA_CACHE] is True
+    estadisticas = cache.estadisticas()
+    assert (estadisticas["hits"], estadisticas["misses"], estadisticas["entries"]) == (2, 1, 1)
+    assert estadisticas["hit_rate"] == pytest.approx(2 / 3)
+    cache.clear()
+    assert (cache.aciertos, cache.fallos, cache.estadisticas()["entries"]) == (0, 0, 0)
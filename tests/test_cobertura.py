@@ -0,0 +1,83 @@
+"""Cobertura de latencia: las peticiones perdedoras o canceladas (tambien en invoke) no dejan huecos del limitador."""
+
+import asyncio
+import contextlib
+import time
+
+from backend import AnalizadorFase1
+from backend.infraestructura.llm import (
+    ConfiguracionHiperparametros, configurar_cobertura, desactivar_cobertura, medir_consumo
+)
+from backend.infraestructura.llm.cobertura import PoliticaCobertura, RunnableConCobertura
+from backend.infraestructura.llm.limitador_tasa import GobernadorModelo, LimitesProveedor
+from backend.infraestructura.llm.proveedor_local import PROVEEDOR_LOCAL, ChatLocalStub
+
+
+POLITICA = PoliticaCobertura(presupuesto_inicial_s=0.05, presupuesto_minimo_s=0.01)
+
+
+def _gobernador() -> GobernadorModelo:
+    return GobernadorModelo("test", "stub", LimitesProveedor(rpm=100_000, tpm=10**9, max_en_vuelo=2))
+
+
+def _cobertura(clave: str, gobernador: GobernadorModelo, latencia_primario_ms: float, latencia_secundario_ms: float) -> RunnableConCobertura:
+    primario = ChatLocalStub(latencia_ms=latencia_primario_ms, rate_limiter=gobernador.limitador, callbacks=[gobernador.manejador])
+    secundario = ChatLocalStub(latencia_ms=latencia_secundario_ms, rate_limiter=gobernador.limitador, callbacks=[gobernador.manejador])
+    return RunnableConCobertura(primario, secundario, clave, POLITICA)
+
+
+def test_primario_perdedor_libera_su_hueco():
+    gobernador = _gobernador()
+    cobertura = _cobertura("test_perdedor", gobernador, 2000, 0)
+    
+    async def escenario():
+        for _ in range(3):
+            assert await asyncio.wait_for(cobertura.ainvoke("hola"), timeout=2) is not None
+        assert gobernador.estadisticas()["in_flight"] == 0
+    
+    asyncio.run(escenario())
+    assert cobertura.estadisticas.ganadas == 3
+
+
+def test_cancelar_llamada_cubierta_cancela_ambas_peticiones():
+    gobernador = _gobernador()
+    
+    async def escenario(tras: float):
+        tarea = asyncio.ensure_future(_cobertura(f"test_cancelada_{tras}", gobernador, 2000, 2000).ainvoke("hola"))
+        await asyncio.sleep(tras)
+        tarea.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await tarea
+        assert gobernador.estadisticas()["in_flight"] == 0
+    
+    # Durante la espera del primario y durante la carrera con la cobertura
+    asyncio.run(escenario(0.02))
+    asyncio.run(escenario(0.2))
+    assert gobernador.estadisticas()["in_flight"] == 0
+
+
+def test_invoke_sincrono_cancela_al_perdedor_y_conserva_el_contexto():
+    gobernador = _gobernador()
+    cobertura = _cobertura("test_sincrono", gobernador, 2000, 0)
+    
+    inicio = time.monotonic()
+    with medir_consumo() as colector:
+        assert cobertura.invoke("hola") is not None
+    
+    assert time.monotonic() - inicio < 1
+    assert gobernador.estadisticas()["in_flight"] == 0
+    assert cobertura.estadisticas.ganadas == 1
+    assert colector.resumen().llamadas
+
+
+def test_escalado_lleva_cobertura():
+    configurar_cobertura(proveedor_secundario=PROVEEDOR_LOCAL)
+    ConfiguracionHiperparametros.configurar_escalado(PROVEEDOR_LOCAL, "stub-fuerte")
+    try:
+        analizador = AnalizadorFase1(proveedor=PROVEEDOR_LOCAL, usar_matching_semantico=False)
+    finally:
+        ConfiguracionHiperparametros.desactivar_escalado()
+        desactivar_cobertura()
+    
+    assert isinstance(analizador.llm_escalado.bound, RunnableConCobertura)
+    assert isinstance(analizador.llm_matching.bound, RunnableConCobertura)
@@ -0,0 +1,94 @@
+"""Fusion de los lotes de matching: una coincidencia por requisito y un resumen unico."""
+
+from backend.orquestacion.grafo_fase1 import crear_nodo_fusion_matching, dividir_requisitos_en_lotes
+from backend.utilidades import fusionar_coincidencias_lotes
+
+
+REQUISITOS = [
+    {"description": "Experiencia con Python", "type": "obligatory"},
+    {"description": "Experiencia con Docker", "type": "obligatory"},
+    {"description": "Conocimientos de Kafka", "type": "optional"},
+    {"description": "Conocimientos de Go", "type": "optional"},
+]
+
+
+def _coincidencia(descripcion: str, cumple: bool, confianza: str = "high") -> dict:
+    return {
+        "requirement_description": descripcion, "fulfilled": cumple, "found_in_cv": cumple,
+        "evidence": None, "confidence": confianza, "reasoning": None, "semantic_score": None
+    }
+
+
+def _estado(lotes_matching: list) -> dict:
+    return {"requisitos": REQUISITOS, "lotes_matching": lotes_matching, "error": None, "evidencia_semantica": {}}
+
+
+def test_lotes_solapados_dan_una_coincidencia_por_requisito_en_orden():
+    primero, segundo = dividir_requisitos_en_lotes(REQUISITOS, 2)
+    lotes = [
+        # El segundo lote termina antes y ademas opina sobre un requisito del primero
+        {"lote": 1, "requisitos": segundo, "error": None, "resumen_analisis": "Sin Go.", "coincidencias": [
+            _coincidencia("[OPTIONAL] Conocimientos de Go", False),
+            _coincidencia("Experiencia con Python", False, "low"),
+            _coincidencia("conocimientos de kafka", True),
+        ]},
+        {"lote": 0, "requisitos": primero, "error": None, "resumen_analisis": "Perfil backend.", "coincidencias": [
+            _coincidencia("Experiencia con Python", True),
+            _coincidencia("Experiencia con Docker", True),
+            _coincidencia("Liderazgo de equipos", True),
+        ]},
+    ]
+    
+    salida = crear_nodo_fusion_matching().invoke(_estado(lotes))
+    
+    coincidencias = salida["coincidencias"]
+    assert [c["requirement_description"] for c in coincidencias] == [
+        "Experiencia con Python", "Experiencia con Docker", "conocimientos de kafka", "[OPTIONAL] Conocimientos de Go"
+    ]
+    assert coincidencias[0]["fulfilled"] and coincidencias[0]["confidence"] == "high"
+    assert salida["resumen_analisis"] == (
+        "Cumple 3 de 4 requisitos (2 de 2 obligatorios). Opcionales no cumplidos: Conocimientos de Go."
+    )
+    assert salida["mensajes"] == ["[OK] Matching completado: 3/4 cumplidos (2 lotes)"]
+
+
+def test_un_solo_lote_conserva_el_resumen_del_modelo():
+    lotes = [{"lote": 0, "requisitos": REQUISITOS, "error": None, "resumen_analisis": " Perfil backend solido. ", "coincidencias": [
+        _coincidencia(req["description"], True) for req in REQUISITOS
+    ] + [_coincidencia("Experiencia con Docker", False)]}]
+    
+    salida = crear_nodo_fusion_matching().invoke(_estado(lotes))
+    
+    assert salida["resumen_analisis"] == "Perfil backend solido."
+    assert len(salida["coincidencias"]) == len(REQUISITOS)
+    assert all(c["fulfilled"] for c in salida["coincidencias"])
+
+
+def test_resumen_nombra_obligatorios_no_cumplidos_y_los_que_faltan():
+    primero, segundo = dividir_requisitos_en_lotes(REQUISITOS, 2)
+    lotes = [
+        {"lote": 0, "requisitos": primero, "error": None, "resumen_analisis": "a", "coincidencias": [
+            _coincidencia("Experiencia con Python", True),
+            _coincidencia("Experiencia con Docker", False),
+        ]},
+        {"lote": 1, "requisitos": segundo, "error": None, "resumen_analisis": "b", "coincidencias": [
+            _coincidencia("Conocimientos de Kafka", True),
+        ]},
+    ]
+    
+    salida = crear_nodo_fusion_matching().invoke(_estado(lotes))
+    
+    assert salida["resumen_analisis"] == (
+        "Cumple 2 de 4 requisitos (1 de 2 obligatorios). Obligatorios no cumplidos: Experiencia con Docker. "
+        "Opcionales no cumplidos: Conocimientos de Go."
+    )
+
+
+def test_gana_el_lote_que_tenia_asignado_el_requisito():
+    primero, segundo = dividir_requisitos_en_lotes(REQUISITOS, 2)
+    ajena = _coincidencia("Experiencia con Docker", False, "low")
+    propia = _coincidencia("Experiencia con Docker", True)
+    
+    fusionadas = fusionar_coincidencias_lotes([(segundo, [ajena]), (primero, [propia])], REQUISITOS)
+    
+    assert fusionadas == [propia]
@@ -0,0 +1,77 @@
+"""Cuentas de huecos en vuelo del limitador de tasa, tambien con llamadas canceladas."""
+
+import asyncio
+import contextlib
+
+from backend.infraestructura.llm.limitador_tasa import GobernadorModelo, LimitesProveedor, EmbeddingsGobernados
+from backend.infraestructura.llm.proveedor_local import ChatLocalStub, EmbeddingsLocalStub
+
+
+def _gobernador(max_en_vuelo: int = 2) -> GobernadorModelo:
+    return GobernadorModelo("test", "stub", LimitesProveedor(rpm=100_000, tpm=10**9, max_en_vuelo=max_en_vuelo))
+
+
+def _llm(gobernador: GobernadorModelo, latencia_ms: float) -> ChatLocalStub:
+    return ChatLocalStub(latencia_ms=latencia_ms, rate_limiter=gobernador.limitador, callbacks=[gobernador.manejador])
+
+
+async def _cancelar(corrutina, tras: float = 0.05) -> None:
+    tarea = asyncio.ensure_future(corrutina)
+    await asyncio.sleep(tras)
+    tarea.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await tarea
+
+
+def test_llamadas_canceladas_liberan_su_hueco():
+    gobernador = _gobernador(max_en_vuelo=2)
+    
+    async def escenario():
+        for _ in range(5):
+            await _cancelar(_llm(gobernador, 1000).ainvoke("hola"))
+        assert gobernador.estadisticas()["in_flight"] == 0
+        # Sin fuga, la siguiente llamada no espera a huecos que nunca se liberan
+        await asyncio.wait_for(_llm(gobernador, 0).ainvoke("hola"), timeout=2)
+    
+    asyncio.run(escenario())
+    assert gobernador.estadisticas()["in_flight"] == 0
+
+
+def test_streaming_cancelado_libera_su_hueco():
+    gobernador = _gobernador(max_en_vuelo=1)
+    
+    async def consumir():
+        async for _ in _llm(gobernador, 1000).astream("hola"):
+            pass
+    
+    async def escenario():
+        await _cancelar(consumir())
+        assert gobernador.estadisticas()["in_flight"] == 0
+    
+    asyncio.run(escenario())
+
+
+def test_llamadas_completas_liberan_una_sola_vez():
+    gobernador = _gobernador(max_en_vuelo=2)
+    llm = _llm(gobernador, 0)
+    
+    llm.invoke("hola")
+    asyncio.run(llm.ainvoke("hola"))
+    
+    estadisticas = gobernador.estadisticas()
+    assert estadisticas["in_flight"] == 0
+    assert estadisticas["requests"] == 2
+
+
+def test_embeddings_cancelados_liberan_su_hueco():
+    gobernador = _gobernador(max_en_vuelo=1)
+    embeddings = EmbeddingsGobernados(EmbeddingsLocalStub(dimensiones=8, latencia_ms=1000), gobernador)
+    
+    async def escenario():
+        await _cancelar(embeddings.aembed_documents(["texto"]))
+        assert gobernador.estadisticas()["in_flight"] == 0
+        rapidos = EmbeddingsGobernados(EmbeddingsLocalStub(dimensiones=8), gobernador)
+        await asyncio.wait_for(rapidos.aembed_query("texto"), timeout=2)
+    
+    asyncio.run(escenario())
+    assert gobernador.estadisticas()["in_flight"] == 0
@@ -0,0 +1,105 @@
+"""Fase 1 por lotes con el backend local: pistas semanticas por oferta y reenvio de trabajos fallidos."""
+
+import json
+
+import pytest
+
+from backend import ProcesadorLotesFase1
+from backend.infraestructura.llm import (
+    BackendLotes, BackendLotesLocal, ESTADO_EXPIRADO, ESTADO_FALLIDO,
+    desactivar_cache_embeddings, desactivar_cache_indices_cv
+)
+from backend.infraestructura.llm.proveedor_local import PROVEEDOR_LOCAL
+from backend.nucleo.analisis.lotes import MAX_REENVIOS
+from benchmarks.carga_local import OFERTA, CV
+
+
+@pytest.fixture(autouse=True)
+def sin_caches():
+    desactivar_cache_embeddings()
+    desactivar_cache_indices_cv()
+
+
+def _candidaturas() -> dict:
+    otra_oferta = OFERTA + "\n- Go\n"
+    return {f"c{i}": (OFERTA if i % 2 else otra_oferta, CV + f"\nProyecto {i} con Kubernetes.") for i in range(6)}
+
+
+def test_requisitos_se_embeben_una_vez_por_oferta(tmp_path):
+    procesador = ProcesadorLotesFase1(
+        str(tmp_path), proveedor=PROVEEDOR_LOCAL, backend=BackendLotesLocal(tmp_path / "backend_local"),
+        intervalo_sondeo_s=0.01, proveedor_embeddings=PROVEEDOR_LOCAL
+    )
+    comparador = procesador.comparador_semantico
+    llamadas = []
+    embeber = comparador.embeber_requisitos
+    comparador.embeber_requisitos = lambda requisitos: llamadas.append(tuple(requisitos)) or embeber(requisitos)
+    
+    candidaturas = _candidaturas()
+    resultados = procesador.ejecutar(candidaturas)
+    
+    assert set(resultados) == set(candidaturas)
+    assert len(llamadas) == len({oferta for oferta, _ in candidaturas.values()})
+    peticiones = (tmp_path / "matching.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(peticiones) == len(candidaturas)
+    assert all("PISTAS SEMANTICAS" in json.loads(peticion)["body"]["messages"][-1]["content"][-1]["text"] for peticion in peticiones)
+    assert any(
+        r.puntuacion_semantica is not None
+        for resultado in resultados.values() for r in resultado.requisitos_cumplidos + resultado.requisitos_no_cumplidos
+    )
+
+
+def test_sin_proveedor_embeddings_no_hay_pistas(tmp_path):
+    procesador = ProcesadorLotesFase1(
+        str(tmp_path), proveedor=PROVEEDOR_LOCAL, backend=BackendLotesLocal(tmp_path / "backend_local"),
+        intervalo_sondeo_s=0.01
+    )
+    assert procesador.comparador_semantico is None
+    procesador.ejecutar(_candidaturas())
+    assert "PISTAS SEMANTICAS" not in (tmp_path / "matching.jsonl").read_text(encoding="utf-8")
+
+
+class BackendQueFalla(BackendLotesLocal):
+    """Backend local cuyos primeros trabajos terminan en el estado indicado."""
+    
+    def __init__(self, directorio, situacion: str, fallos: int):
+        super().__init__(directorio)
+        self.situacion = situacion
+        self.fallos = fallos
+        self.enviados = []
+    
+    def enviar(self, ruta_entrada):
+        self.enviados.append(super().enviar(ruta_entrada))
+        return self.enviados[-1]
+    
+    def consultar_estado(self, id_trabajo):
+        if self.enviados.index(id_trabajo) < self.fallos:
+            return self.situacion
+        return super().consultar_estado(id_trabajo)
+
+
+def test_backend_lotes_es_abstracto():
+    with pytest.raises(TypeError):
+        BackendLotes()
+
+
+@pytest.mark.parametrize("situacion", [ESTADO_FALLIDO, ESTADO_EXPIRADO])
+def test_trabajo_fallido_o_expirado_se_reenvia(tmp_path, situacion):
+    backend = BackendQueFalla(tmp_path / "backend_local", situacion, fallos=1)
+    procesador = ProcesadorLotesFase1(str(tmp_path), proveedor=PROVEEDOR_LOCAL, backend=backend, intervalo_sondeo_s=0.01)
+    
+    candidaturas = _candidaturas()
+    assert set(procesador.ejecutar(candidaturas)) == set(candidaturas)
+    estado = json.loads((tmp_path / "estado.json").read_text(encoding="utf-8"))
+    assert estado["reenvios"] == {"trabajo_extraccion": 1}
+    assert estado["trabajo_extraccion"] == backend.enviados[1]
+
+
+def test_reenvios_agotados_abandonan_el_lote(tmp_path):
+    backend = BackendQueFalla(tmp_path / "backend_local", ESTADO_FALLIDO, fallos=MAX_REENVIOS + 1)
+    procesador = ProcesadorLotesFase1(str(tmp_path), proveedor=PROVEEDOR_LOCAL, backend=backend, intervalo_sondeo_s=0.01)
+    
+    with pytest.raises(RuntimeError):
+        procesador.ejecutar(_candidaturas())
+    assert len(backend.enviados) == MAX_REENVIOS + 1
+    assert json.loads((tmp_path / "estado.json").read_text(encoding="utf-8"))["trabajo_extraccion"] is None
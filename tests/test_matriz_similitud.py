@@ -0,0 +1,72 @@
+"""Matriz de similitud: offsets del troceado y evidencia leida de la propia matriz."""
+
+import pytest
+
+from backend.infraestructura.llm import desactivar_cache_embeddings
+from backend.infraestructura.llm.bm25 import IndiceBM25
+from backend.infraestructura.llm.cache_indices_cv import CacheIndicesCV
+from backend.infraestructura.llm.comparador_semantico import ComparadorSemantico
+from backend.infraestructura.llm.indice_matriz import IndiceMatrizCV
+from backend.infraestructura.llm.proveedor_local import PROVEEDOR_LOCAL
+
+
+# Secciones de ~500 caracteres: el CV da varios chunks y el parrafo repetido aparece en todos
+PARRAFO = " ".join(["Desarrollo backend con Python y Django en un equipo de producto."] * 7)
+CV = (
+    "PERFIL\n" + PARRAFO + "\n\n"
+    "EXPERIENCIA\n" + PARRAFO + " Despliegue con Docker y Kubernetes en AWS.\n\n"
+    "PROYECTOS\n" + PARRAFO + " Migracion de Oracle PL/SQL a PostgreSQL.\n\n"
+    "FORMACION\nIngenieria informatica."
+)
+REQUISITOS = ["Experiencia con Kubernetes", "PL/SQL", "Ingles C1", "Experiencia con Kubernetes"]
+
+
+@pytest.fixture(autouse=True)
+def sin_cache_embeddings():
+    desactivar_cache_embeddings()
+
+
+def _comparador(proveedor, **kwargs) -> ComparadorSemantico:
+    return ComparadorSemantico(proveedor, cache_indices=CacheIndicesCV(max_entradas=4), **kwargs)
+
+
+@pytest.mark.parametrize("proveedor, max_chunks_matriz", [(None, 512), (PROVEEDOR_LOCAL, 512), (PROVEEDOR_LOCAL, 1)])
+def test_offsets_y_evidencia_salen_de_la_matriz(proveedor, max_chunks_matriz):
+    comparador = _comparador(proveedor, max_chunks_matriz=max_chunks_matriz)
+    indice = comparador.crear_indice(CV)
+    evidencias, matriz = comparador.encontrar_evidencia_y_matriz(CV, REQUISITOS, k=2, indice=indice)
+    
+    chunks = comparador._chunks_de_indice(indice)
+    assert matriz.num_chunks == len(chunks) > 1
+    assert [matriz.texto_chunk(CV, j) for j in range(matriz.num_chunks)] == chunks
+    assert (matriz.offsets >= 0).all()
+    
+    assert list(evidencias) == list(dict.fromkeys(REQUISITOS))
+    for requisito, evidencia in evidencias.items():
+        assert evidencia == matriz.evidencia(CV, requisito, k=2)
+        assert [score for _, score in evidencia] == sorted((score for _, score in evidencia), reverse=True)
+        if evidencia:
+            assert evidencia[0][1] == pytest.approx(float(matriz.fila(requisito).max()))
+
+
+def test_evidencia_lexica_apunta_al_chunk_correcto():
+    comparador = _comparador(None)
+    evidencias, matriz = comparador.encontrar_evidencia_y_matriz(CV, ["PL/SQL"], k=1, indice=comparador.crear_indice(CV))
+    texto, score = evidencias["PL/SQL"][0]
+    assert "PL/SQL" in texto and score == pytest.approx(1.0)
+    j, _ = matriz.top_k("PL/SQL", 1)[0]
+    inicio, fin = matriz.offsets[j]
+    assert CV[inicio:fin] == texto
+
+
+def test_offsets_sobreviven_a_la_cache_en_disco(tmp_path):
+    for indice in (IndiceBM25(["ab", "cd"], offsets=[(0, 2), (4, 6)]), IndiceMatrizCV(["ab", "cd"], [[1.0, 0.0], [0.0, 1.0]], [(0, 2), (4, 6)])):
+        directorio = tmp_path / type(indice).__name__
+        indice.save_local(str(directorio))
+        assert type(indice).load_local(str(directorio)).offsets == [(0, 2), (4, 6)]
+
+
+def test_indice_sin_offsets_no_inventa_posiciones():
+    comparador = _comparador(None)
+    with pytest.raises(ValueError):
+        comparador.encontrar_evidencia_y_matriz(CV, ["PL/SQL"], indice=IndiceBM25([CV]))
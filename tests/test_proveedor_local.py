@@ -0,0 +1,74 @@
+"""Proveedor local-stub: salidas deterministas y latencia/errores inyectados."""
+
+import asyncio
+import time
+
+import pytest
+from pydantic import BaseModel
+
+from backend.infraestructura.llm.proveedor_local import (
+    ChatLocalStub, EmbeddingsLocalStub, ErrorProveedorLocal
+)
+from backend.modelos import RespuestaExtraccionRequisitos, RespuestaMatchingCV
+from benchmarks.carga_local import OFERTA, CV
+
+
+PROMPT_MATCHING = f"Requisitos a evaluar:\n- [OBLIGATORY] Python\n- [OPTIONAL] Kubernetes\n\nCV del candidato:\n{CV}"
+
+
+def _fallos(modelo: ChatLocalStub, intentos: int = 40) -> list:
+    resultado = []
+    for _ in range(intentos):
+        try:
+            modelo.invoke("hola")
+            resultado.append(False)
+        except ErrorProveedorLocal:
+            resultado.append(True)
+    return resultado
+
+
+def test_mismas_entradas_dan_las_mismas_salidas():
+    for esquema, entrada in ((RespuestaExtraccionRequisitos, OFERTA), (RespuestaMatchingCV, PROMPT_MATCHING)):
+        primera = ChatLocalStub().with_structured_output(esquema).invoke(entrada)
+        segunda = ChatLocalStub().with_structured_output(esquema).invoke(entrada)
+        assert isinstance(primera, esquema) and primera == segunda
+    assert ChatLocalStub().invoke(CV).content == ChatLocalStub().invoke(CV).content
+    assert EmbeddingsLocalStub(semilla=3).embed_documents([OFERTA, CV]) == EmbeddingsLocalStub(semilla=7).embed_documents([OFERTA, CV])
+
+
+def test_tasa_de_error_inyectada_y_reproducible_por_semilla():
+    with pytest.raises(ErrorProveedorLocal) as error:
+        ChatLocalStub(tasa_error=1.0, codigo_error=429).invoke("hola")
+    assert error.value.status_code == 429
+    assert not any(_fallos(ChatLocalStub(tasa_error=0.0)))
+    
+    fallos = _fallos(ChatLocalStub(tasa_error=0.5, semilla=11))
+    assert 0 < sum(fallos) < len(fallos)
+    assert fallos == _fallos(ChatLocalStub(tasa_error=0.5, semilla=11))
+    with pytest.raises(ErrorProveedorLocal):
+        EmbeddingsLocalStub(tasa_error=1.0).embed_query("hola")
+
+
+def test_latencia_inyectada_en_sincrono_y_asincrono():
+    modelo = ChatLocalStub(latencia_ms=80)
+    inicio = time.perf_counter()
+    modelo.invoke("hola")
+    assert time.perf_counter() - inicio >= 0.08
+    
+    inicio = time.perf_counter()
+    asyncio.run(modelo.ainvoke("hola"))
+    assert time.perf_counter() - inicio >= 0.08
+    
+    inicio = time.perf_counter()
+    asyncio.run(EmbeddingsLocalStub(latencia_ms=80).aembed_query("hola"))
+    assert time.perf_counter() - inicio >= 0.08
+
+
+def test_esquema_no_soportado_nombra_los_soportados():
+    class Desconocido(BaseModel):
+        valor: int
+    
+    with pytest.raises(ValueError, match="RespuestaMatchingCV"):
+        ChatLocalStub().with_structured_output(Desconocido)
+    with pytest.raises(ValueError, match="include_raw"):
+        ChatLocalStub().with_structured_output(RespuestaMatchingCV, include_raw=True)
@@ -0,0 +1,84 @@
+"""Salida incremental: objetos JSON cerrados por fragmentos y un evento match por requisito."""
+
+import asyncio
+import json
+import random
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from backend.infraestructura.llm import etiquetar_etapa
+from backend.infraestructura.llm.cobertura import PoliticaCobertura, RunnableConCobertura
+from backend.infraestructura.llm.proveedor_local import ChatLocalStub
+from backend.infraestructura.llm.salida_incremental import ExtractorObjetosJSON
+from backend.modelos import RespuestaMatchingCV
+from backend.orquestacion import crear_grafo_fase1, ejecutar_grafo_fase1_streaming
+from benchmarks.carga_local import OFERTA, CV
+
+
+MATCHES = [
+    {"requirement_description": 'Dice "hola" y cierra }', "fulfilled": True, "evidence": "a {b} [c] \\\\ d"},
+    {"requirement_description": "Llaves { sin cerrar [", "fulfilled": False, "evidence": None},
+    {"requirement_description": "Anidado", "fulfilled": True, "extra": {"matches": [{"no": "emitir"}]}},
+]
+
+
+def _trocear(texto: str, semilla: int) -> list:
+    aleatorio = random.Random(semilla)
+    cortes = sorted(aleatorio.sample(range(1, len(texto)), 40))
+    return [texto[i:j] for i, j in zip([0] + cortes, cortes + [len(texto)])]
+
+
+def _extraer(texto: str, fragmentos: list, campo: str = "matches") -> list:
+    extractor = ExtractorObjetosJSON(campo)
+    objetos = []
+    for fragmento in fragmentos:
+        objetos.extend(extractor.alimentar(fragmento))
+    assert "".join(fragmentos) == texto
+    return objetos
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_objetos_partidos_a_mitad_de_cadena_con_escapes_y_llaves(semilla):
+    texto = json.dumps({"analysis_summary": "Resumen con \"comillas\" y {llaves}", "matches": MATCHES})
+    assert _extraer(texto, _trocear(texto, semilla)) == MATCHES
+
+
+def test_caracter_a_caracter():
+    texto = json.dumps({"matches": MATCHES}, indent=2)
+    assert _extraer(texto, list(texto)) == MATCHES
+
+
+def test_campo_en_otras_posiciones_no_emite():
+    texto = json.dumps({
+        "meta": {"matches": [{"anidado": 1}]},
+        "nota": "matches",
+        "otra": [{"matches": [{"dentro": 2}]}],
+        "matches": [{"raiz": 3}],
+        "despues": [{"fuera": 4}],
+    })
+    assert _extraer(texto, list(texto)) == [{"raiz": 3}]
+    assert _extraer(texto, [texto], campo="nota") == []
+
+
+def _fallar_tras_generar(_resultado):
+    raise RuntimeError("primario caido tras emitir su stream")
+
+
+def test_cobertura_con_dos_streams_emite_un_match_por_requisito():
+    # El primario genera todo el JSON y despues falla: la cobertura conmuta y el secundario
+    # vuelve a generar los mismos veredictos en un segundo stream
+    primario = ChatLocalStub().with_structured_output(RespuestaMatchingCV) | RunnableLambda(_fallar_tras_generar)
+    secundario = ChatLocalStub().with_structured_output(RespuestaMatchingCV)
+    cobertura = RunnableConCobertura(primario, secundario, "test_streams", PoliticaCobertura(presupuesto_inicial_s=5))
+    grafo = crear_grafo_fase1(ChatLocalStub(), llm_matching=etiquetar_etapa(cobertura, "phase1_matching"), tamano_lote_matching=0)
+    
+    async def recoger():
+        return [evento async for evento in ejecutar_grafo_fase1_streaming(grafo, OFERTA, CV)]
+    
+    eventos = asyncio.run(recoger())
+    
+    assert cobertura.estadisticas.conmutaciones == 1
+    requisitos = next(e["state"]["requisitos"] for e in eventos if e["node"] == "extraer_requisitos")
+    descripciones = [e["match"]["requirement_description"].lower() for e in eventos if e["event"] == "match"]
+    assert len(descripciones) == len(set(descripciones)) == len(requisitos)
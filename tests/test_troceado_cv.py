@@ -0,0 +1,59 @@
+"""Troceado de CVs: offsets exactos, encabezados y ventanas que siempre avanzan."""
+
+import random
+
+from backend.infraestructura.llm.troceado_cv import trocear_cv
+
+
+PALABRAS = "desarrollo backend python django docker kubernetes equipo cliente datos pruebas".split()
+
+
+def _parrafo(aleatorio: random.Random, palabras: int) -> str:
+    return " ".join(aleatorio.choice(PALABRAS) for _ in range(palabras)).capitalize() + "."
+
+
+def _cv(aleatorio: random.Random, secciones: int) -> str:
+    return "\n\n".join(
+        f"PROYECTO {i}\n" + "\n\n".join(_parrafo(aleatorio, aleatorio.randint(5, 80)) for _ in range(aleatorio.randint(1, 4)))
+        for i in range(secciones)
+    )
+
+
+def test_fragmentos_son_cortes_exactos_del_cv():
+    aleatorio = random.Random(3)
+    for _ in range(20):
+        texto = _cv(aleatorio, aleatorio.randint(1, 30))
+        fragmentos = trocear_cv(texto, tamano_chunk=300, solapamiento=60)
+        assert fragmentos
+        for fragmento in fragmentos:
+            assert fragmento.texto == texto[fragmento.inicio:fragmento.fin]
+            assert fragmento.texto.strip() == fragmento.texto
+        assert [f.inicio for f in fragmentos] == sorted(f.inicio for f in fragmentos)
+
+
+def test_texto_repetido_conserva_offsets_propios():
+    parrafo = "Desarrollo backend con Python y Django en un equipo de producto."
+    texto = "PERFIL\n" + parrafo + "\n\nEXPERIENCIA\n" + parrafo + " Despliegue con Docker.\n\nFORMACION\n" + parrafo
+    fragmentos = trocear_cv(texto, tamano_chunk=60, solapamiento=10)
+    for fragmento in fragmentos:
+        assert texto[fragmento.inicio:fragmento.fin] == fragmento.texto
+    # El texto identico de FORMACION se descarta, pero los demas mantienen su posicion real
+    assert fragmentos[1].inicio > fragmentos[0].fin
+
+
+def test_encabezados_en_mayusculas_con_cifras_y_signos():
+    cuerpo = " ".join(["Desarrollo de servicios backend con despliegue continuo."] * 3)
+    texto = f"PROYECTO 1\n{cuerpo}\n\nSQL-2\n{cuerpo}\n\nV2.0 RELEASE\n{cuerpo}"
+    fragmentos = trocear_cv(texto, tamano_chunk=200, solapamiento=20)
+    assert [f.seccion for f in fragmentos] == ["PROYECTO 1", "SQL-2"]
+    # "V2.0 RELEASE" no empieza por tres mayusculas: sigue en la seccion anterior
+    assert "V2.0 RELEASE" in fragmentos[-1].texto
+
+
+def test_parrafo_largo_se_trocea_en_ventanas_que_avanzan():
+    texto = "x" * 5000 + " " + " ".join(["palabra"] * 2000)
+    fragmentos = trocear_cv(texto, tamano_chunk=500, solapamiento=100)
+    assert all(len(f.texto) <= 500 for f in fragmentos)
+    inicios = [f.inicio for f in fragmentos]
+    assert inicios == sorted(set(inicios))
+    assert fragmentos[-1].fin == len(texto)